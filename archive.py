@@ -0,0 +1,294 @@
+"""完了したタスクのアーカイブ（圧縮したセグメントファイルへの移動と復元）。
+
+進捗 100% で期限から一定の日数（ARCHIVE_AGE_DAYS）が過ぎたタスクを、gzip で圧縮した
+セグメントファイルへ移し、データファイルからは delete_task レコードで取り除きます。
+起動時の読み込み・一覧・保存・カテゴリの削除などは、まだ終わっていないタスクと最近の
+完了タスク（ホットな分）だけを扱えばよくなります。
+
+ファイル構成（DATA_FILE = "tasks_std_v24.json" の場合）:
+    tasks_std_v24.json.archive/index.json     セグメントの一覧と集計（小さいので起動時に読む）
+    tasks_std_v24.json.archive/seg-*.jsonl.gz セグメント（1 行 1 タスクの JSON。書いた後は変えない）
+
+セグメントのタスクはメモの本文をそのまま "memo" に持ちます（メモのブロブは、参照する
+タスクがデータから無くなると掃除されるため）。索引にはセグメントごとのタスク名 × カテゴリの
+件数と作業時間の合計を持つので、グラフはセグメントを展開せずにアーカイブ済みの分を足せます。
+
+作業時間のエントリ（time_log.py）は delete_task では消えず、保存エンジンに残ります。
+セグメントのタスクは日ごとの作業時間を "time_days" に持ち、索引にはカテゴリ別・作業者別の
+日ごとの合計を持つので、作業時間レポートもアーカイブ済みの分を含められます。
+
+タスクの復元は add_task（と set_memo）レコードで行い、セグメントは書き換えずに、索引に
+復元したタスクの ID を記録して集計から引きます。すべて復元したセグメントは消します。
+移動の途中で終了した場合（セグメントを書いた後、delete_task を保存する前）は、
+次回の recover() でデータに残っているタスクを復元済みとして扱います。
+"""
+import gzip
+import json
+import os
+import time
+from datetime import date, timedelta
+
+from memo_store import set_memo_record
+from task_query import normalize
+from task_store import write_json_atomic
+
+ARCHIVE_SUFFIX = ".archive"
+INDEX_NAME = "index.json"
+ARCHIVE_VERSION = 1
+# 期限からこの日数が過ぎた完了タスクをアーカイブする（画面・archive サブコマンドで変えられる）
+ARCHIVE_AGE_DAYS = 365
+# 検索で返すタスクの件数の上限
+SEARCH_LIMIT = 500
+# セグメントのタスクだけが持つキー（データに戻すときは外す）
+SEGMENT_ONLY_KEYS = ("memo", "time_days")
+
+
+def _seconds(task):
+    try:
+        return int(task.get("actual_sec", 0))
+    except (TypeError, ValueError):
+        return 0
+
+
+def _is_done(task):
+    v = task.get("progress", 0)
+    try:
+        return float(v) >= 100
+    except (TypeError, ValueError):
+        return False
+
+
+def archivable(model, cutoff, skip=()):
+    """アーカイブの対象（完了していて、期限が cutoff（date）より前）のタスクを並び順で返します。"""
+    limit = cutoff.toordinal()
+    return [t for t in model
+            if t.end_ordinal is not None and t.end_ordinal < limit and t.id not in skip and _is_done(t)]
+
+
+class TaskArchive:
+    """アーカイブのセグメントと索引（index.json）。"""
+
+    def __init__(self, dir_path):
+        self.dir_path = dir_path
+        self.index_path = os.path.join(dir_path, INDEX_NAME)
+        self.segments = []  # {"file", "archived_at", "count", "state", "restored", "totals", "days"}
+        self._totals = None
+        self._days = None
+        try:
+            with open(self.index_path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return
+        if data.get("version") == ARCHIVE_VERSION:
+            self.segments = data["segments"]
+
+    def _save_index(self):
+        self._totals = None
+        self._days = None
+        if not self.segments:
+            if os.path.exists(self.index_path):
+                os.remove(self.index_path)
+            return
+        write_json_atomic(self.index_path, {"version": ARCHIVE_VERSION, "segments": self.segments})
+
+    def _path(self, seg):
+        return os.path.join(self.dir_path, seg["file"])
+
+    # --- 集計 ---
+    def __len__(self):
+        """アーカイブ済み（復元していない）タスクの件数。"""
+        return sum(seg["count"] - len(seg["restored"]) for seg in self.segments if seg["state"] == "done")
+
+    def totals(self):
+        """{(タスク名, カテゴリ): [件数, 作業時間の秒数]}。セグメントは読まず索引だけから作ります。"""
+        if self._totals is None:
+            totals = {}
+            for seg in self.segments:
+                if seg["state"] != "done":
+                    continue
+                for name, cats in seg["totals"].items():
+                    for cat, (count, sec) in cats.items():
+                        cell = totals.setdefault((name, cat), [0, 0])
+                        cell[0] += count
+                        cell[1] += sec
+            self._totals = {k: v for k, v in totals.items() if v[0]}
+        return self._totals
+
+    def day_totals(self):
+        """{"category" / "worker": {値: {日の序数: 秒数}}}（TimeRollup.set_extra() に渡す形）。"""
+        if self._days is None:
+            out = {"category": {}, "worker": {}}
+            for seg in self.segments:
+                if seg["state"] != "done":
+                    continue
+                for field, values in seg.get("days", {}).items():
+                    for value, per_day in values.items():
+                        cell = out[field].setdefault(value, {})
+                        for day, sec in per_day.items():
+                            cell[int(day)] = cell.get(int(day), 0) + sec
+            self._days = {field: {v: {d: s for d, s in cell.items() if s} for v, cell in values.items()}
+                          for field, values in out.items()}
+        return self._days
+
+    @staticmethod
+    def _count(totals, task, sign):
+        cell = totals.setdefault(task.get("name", "-"), {}).setdefault(task.get("category", "-"), [0, 0])
+        cell[0] += sign
+        cell[1] += sign * _seconds(task)
+
+    @staticmethod
+    def _count_days(days, task, sign):
+        for field in ("category", "worker"):
+            cell = days.setdefault(field, {}).setdefault(task.get(field, "-"), {})
+            for day, sec in task.get("time_days", {}).items():
+                cell[day] = cell.get(day, 0) + sign * sec
+
+    # --- 移動 ---
+    def write_segment(self, tasks):
+        """tasks（memo_ref の代わりに "memo" に本文を持つ辞書）をセグメントに書き、索引に加えます。
+
+        返したセグメントは保留中で、delete_task を保存できたら commit_segment() で確定します。
+        """
+        os.makedirs(self.dir_path, exist_ok=True)
+        stamp = time.strftime("%Y%m%d-%H%M%S")
+        name = f"seg-{stamp}-{len(self.segments)}.jsonl.gz"
+        path = os.path.join(self.dir_path, name)
+        totals, days = {}, {}
+        tmp = path + ".tmp"
+        with gzip.open(tmp, "wt", encoding="utf-8") as f:
+            for d in tasks:
+                f.write(json.dumps(d, ensure_ascii=False, separators=(",", ":")) + "\n")
+                self._count(totals, d, 1)
+                self._count_days(days, d, 1)
+        with open(tmp, "rb") as f:
+            os.fsync(f.fileno())
+        os.replace(tmp, path)
+        seg = {"file": name, "archived_at": stamp, "count": len(tasks), "state": "pending",
+               "restored": [], "totals": totals, "days": days}
+        self.segments.append(seg)
+        self._save_index()
+        return seg
+
+    def commit_segment(self, seg):
+        seg["state"] = "done"
+        self._save_index()
+
+    def recover(self, model):
+        """保留中のまま残ったセグメントを確定します（データに残っているタスクは復元済みにする）。"""
+        pending = [seg for seg in self.segments if seg["state"] == "pending"]
+        for seg in pending:
+            try:
+                kept = [d for d in self._read(seg) if d["id"] in model.tasks]
+            except OSError:
+                # セグメントを書き終える前に終了した（タスクはすべてデータに残っている）
+                self.segments.remove(seg)
+                continue
+            seg["state"] = "done"
+            self._mark(seg, kept)
+        if pending:
+            self._save_index()
+
+    # --- 読み出し・復元 ---
+    def _read(self, seg):
+        with gzip.open(self._path(seg), "rt", encoding="utf-8") as f:
+            for line in f:
+                yield json.loads(line)
+
+    def iter_tasks(self, seg):
+        """seg のタスクのうち、復元していないものを順に返します（セグメントを展開します）。"""
+        restored = set(seg["restored"])
+        for d in self._read(seg):
+            if d["id"] not in restored:
+                yield d
+
+    def search(self, text="", limit=SEARCH_LIMIT):
+        """タスク名に text を含むアーカイブ済みのタスクを、(セグメント, タスク) で新しいものから返します。
+
+        索引の集計にその名前が無いセグメントは展開しません。
+        """
+        key = normalize(text)
+        out = []
+        for seg in reversed(self.segments):
+            if seg["state"] != "done":
+                continue
+            if key and not any(key in normalize(name) for name, cats in seg["totals"].items()
+                               if any(c[0] for c in cats.values())):
+                continue
+            for d in self.iter_tasks(seg):
+                if key in normalize(d.get("name", "")):
+                    out.append((seg, d))
+                    if len(out) >= limit:
+                        return out
+        return out
+
+    def _mark(self, seg, tasks):
+        # 復元したタスクを集計から引き、すべて復元したセグメントは消す
+        for d in tasks:
+            seg["restored"].append(d["id"])
+            self._count(seg["totals"], d, -1)
+            self._count_days(seg.setdefault("days", {}), d, -1)
+        if len(seg["restored"]) >= seg["count"]:
+            self.segments.remove(seg)
+            try:
+                os.remove(self._path(seg))
+            except FileNotFoundError:
+                pass
+
+    def mark_restored(self, seg, tasks):
+        """seg から復元したタスク（add_task を保存した後に呼ぶ）を索引に記録します。"""
+        self._mark(seg, tasks)
+        self._save_index()
+
+
+def archive_tasks(model, archive, tasks, read_memo, commit, task_days=None):
+    """tasks をセグメントへ移し、commit(records) でデータから取り除きます。
+
+    read_memo(ref) はメモの本文を返す関数（無ければ KeyError）、commit は delete_task レコードを
+    適用して保存し終えるまで戻らない関数、task_days は {タスク ID: {日の序数: 秒数}}
+    （TimeRollup.task_days や time_log.task_days() の結果）です。移したタスクの件数を返します。
+    """
+    if not tasks:
+        return 0
+    rows = []
+    for t in tasks:
+        d = t.to_dict()
+        ref = d.pop("memo_ref", "")
+        try:
+            d["memo"] = read_memo(ref) if ref else d.get("memo", "")
+        except KeyError:
+            d["memo"] = ""
+        days = (task_days or {}).get(t.id)
+        if days:
+            # JSON のキーは文字列になるので、索引と同じく文字列で持つ
+            d["time_days"] = {str(day): sec for day, sec in days.items()}
+        rows.append(d)
+    seg = archive.write_segment(rows)
+    # 作業時間のエントリは消さない（戻したときにそのまま使う）
+    commit([{"op": "delete_task", "id": d["id"]} for d in rows])
+    archive.commit_segment(seg)
+    return len(rows)
+
+
+def restore_records(model, tasks):
+    """アーカイブのタスクをデータに戻すレコード（add_task と、メモがあれば set_memo）を作ります。
+
+    データに同じ ID のタスクが残っているもの（移動の途中で終了した場合など）は含めません。
+    消されたカテゴリのタスクは '-' に戻します。作業時間のエントリは保存エンジンに残っているので
+    レコードは作りません（画面の集計には TimeRollup.add_task_days() で "time_days" を戻します）。
+    """
+    records = []
+    for d in tasks:
+        if d["id"] in model.tasks:
+            continue
+        task = {k: v for k, v in d.items() if k not in SEGMENT_ONLY_KEYS}
+        if task.get("category", "-") not in model.categories:
+            task["category"] = "-"
+        records.append({"op": "add_task", "task": task})
+        if d.get("memo"):
+            records.append(set_memo_record(d["id"], d["memo"]))
+    return records
+
+
+def default_cutoff(days=ARCHIVE_AGE_DAYS, today=None):
+    """期限がこの日より前の完了タスクをアーカイブの対象にする日（今日から days 日前）。"""
+    return (today or date.today()) - timedelta(days=days)
@@ -0,0 +1,106 @@
+"""完了したタスクのアーカイブ（archive.py）の効果とコストの計測。
+
+    python benchmarks/bench_archive.py [タスク数 ...] [--days 30]
+
+dataset.py の合成データを一時ディレクトリに書き出し、archive サブコマンドと同じ手順で
+期限から --days 日が過ぎた完了タスクをアーカイブへ移して、次を測ります。
+    load_before_s / load_after_s       データファイルの読み込み（起動時）
+    snapshot_*_mib                     スナップショットの大きさ
+    archive_s                          アーカイブへの移動（セグメントの書き出しと delete_task の保存）
+    segment_mib                        セグメントの大きさ（gzip）
+    totals_ms                          グラフ用の集計（索引だけから作る）
+    search_ms                          アーカイブ済みのタスクの検索（1 件を名前で）
+    restore_ms                         1 件の復元（add_task の保存と索引の更新）
+結果は JSON で標準出力に書き出します。
+"""
+import argparse
+import json
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from archive import ARCHIVE_SUFFIX, TaskArchive, archivable, archive_tasks, default_cutoff, restore_records  # noqa: E402
+from dataset import write_dataset  # noqa: E402
+from task_store import open_store  # noqa: E402
+
+SIZES = [10000, 100000]
+DAYS = 30
+
+
+def timed(fn):
+    t0 = time.perf_counter()
+    result = fn()
+    return time.perf_counter() - t0, result
+
+
+def load(path):
+    store = open_store(path)
+    model = store.load()
+    return store, model
+
+
+def bench(n, days):
+    d = tempfile.mkdtemp()
+    try:
+        path = os.path.join(d, "tasks.json")
+        write_dataset(path, n)
+        # 最初の読み込みは ID の割り当てとメモの移行を含むので測らない
+        load(path)[0].close()
+        load_before, (store, model) = timed(lambda: load(path))
+        size_before = os.path.getsize(path)
+        archive = TaskArchive(path + ARCHIVE_SUFFIX)
+
+        def commit(records):
+            for rec in records:
+                model.apply(rec)
+            store.append(*records)
+
+        tasks = archivable(model, default_cutoff(days))
+        archive_s, moved = timed(lambda: archive_tasks(model, archive, tasks, store.load_memo, commit))
+        store.write_snapshot(model)
+        store.close()
+        load_after, (store, model) = timed(lambda: load(path))
+        segment = sum(os.path.getsize(os.path.join(archive.dir_path, s["file"])) for s in archive.segments)
+        totals_s, _ = timed(lambda: TaskArchive(path + ARCHIVE_SUFFIX).totals())
+        name = tasks[len(tasks) // 2]["name"] if tasks else ""
+        search_s, found = timed(lambda: archive.search(name, limit=1))
+
+        def restore():
+            seg, task = found[0]
+            recs = restore_records(model, [task])
+            commit(recs)
+            archive.mark_restored(seg, [task])
+
+        restore_s, _ = timed(restore) if found else (0.0, None)
+        store.close()
+        return {
+            "tasks": n,
+            "archived": moved,
+            "load_before_s": load_before,
+            "load_after_s": load_after,
+            "snapshot_before_mib": size_before / 2 ** 20,
+            "snapshot_after_mib": os.path.getsize(path) / 2 ** 20,
+            "archive_s": archive_s,
+            "segment_mib": segment / 2 ** 20,
+            "totals_ms": totals_s * 1000,
+            "search_ms": search_s * 1000,
+            "restore_ms": restore_s * 1000,
+        }
+    finally:
+        shutil.rmtree(d, ignore_errors=True)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="アーカイブの効果とコストの計測")
+    parser.add_argument("sizes", nargs="*", type=int, help="タスク数")
+    parser.add_argument("--days", type=int, default=DAYS, help="期限からこの日数が過ぎた完了タスクを移す")
+    args = parser.parse_args(argv)
+    print(json.dumps([bench(n, args.days) for n in args.sizes or SIZES], ensure_ascii=False, indent=2))
+
+
+if __name__ == "__main__":
+    main()
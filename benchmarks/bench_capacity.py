@@ -0,0 +1,73 @@
+"""作業負荷の計画（capacity.py）の作成・問い合わせ・差分更新のコスト計測。
+
+    python benchmarks/bench_capacity.py [タスク数 ...]
+
+dataset.py の合成データで CapacityPlanner を作り、次を測ります。
+    build_s            全タスクの割り付け（作業負荷の画面を最初に開いたとき）
+    load_by_worker_ms  担当者ごとの 4 週間の負荷（全担当者分）
+    load_by_week_ms    全体の負荷を 1 年分、週ごとに
+    late_tasks_s       期限に間に合わないタスクの検出（全担当者。初回）
+    update_ms          タスク 1 件の進捗の変更（割り付けの付け替え。中央値）
+    late_after_update_ms  1 件の変更後の検出（変更のあった担当者だけを数え直す）
+結果は JSON で標準出力に書き出します。
+"""
+import json
+import os
+import statistics
+import sys
+import time
+from datetime import date, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from capacity import CapacityPlanner  # noqa: E402
+from dataset import iter_tasks  # noqa: E402
+from task_model import TaskModel  # noqa: E402
+
+SIZES = [10000, 100000]
+# dataset.py の日付の範囲の中ほど
+TODAY = date(2025, 6, 2)
+
+
+def timed(fn):
+    t0 = time.perf_counter()
+    fn()
+    return time.perf_counter() - t0
+
+
+def bench(n):
+    model = TaskModel({"tasks": list(iter_tasks(n, memos=False, materials=False))})
+    planner = None
+
+    def build():
+        nonlocal planner
+        planner = CapacityPlanner(model, TODAY)
+
+    build_s = timed(build)
+    first, last = TODAY, TODAY + timedelta(days=27)
+    weeks = [(TODAY + timedelta(days=7 * i), TODAY + timedelta(days=7 * i + 6)) for i in range(52)]
+    tids = list(planner.spans)[:200]
+    updates = []
+    for i, tid in enumerate(tids):
+        updates.append(timed(lambda: model.apply(
+            {"op": "update_task", "id": tid, "fields": {"progress": 10 + i % 80}})))
+    return {
+        "tasks": n,
+        "planned_tasks": len(planner.spans),
+        "workers": len(planner.by_worker),
+        "build_s": build_s,
+        "load_by_worker_ms": timed(lambda: planner.load_by("worker", first, last)) * 1000,
+        "load_by_week_ms": timed(lambda: [planner.load(a, b) for a, b in weeks]) * 1000,
+        "late_tasks_s": timed(planner.late_tasks),
+        "update_ms": statistics.median(updates) * 1000,
+        "late_after_update_ms": timed(planner.late_tasks) * 1000,
+    }
+
+
+def main():
+    sizes = [int(a) for a in sys.argv[1:]] or SIZES
+    print(json.dumps([bench(n) for n in sizes], ensure_ascii=False, indent=2))
+
+
+if __name__ == "__main__":
+    main()
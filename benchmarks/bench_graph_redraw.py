@@ -0,0 +1,123 @@
+"""グラフの選択変更にかかる時間の計測: 従来の draw()（ax.clear() で作り直し）と StackedBarChart。
+
+    python benchmarks/bench_graph_redraw.py [タスク名の数 ...]
+
+Agg バックエンドで描画するのでディスプレイは不要です。選択を半分ずつ入れ替える変更を
+REPEAT 回行い、1 回あたりの時間を JSON で出力します。
+chart_update_ms はアーティストの更新だけ、chart_redraw_ms は canvas.draw() を含めた時間です。
+"""
+import json
+import os
+import random
+import sys
+import time
+import warnings
+
+import matplotlib
+matplotlib.use("Agg")
+import matplotlib.pyplot as plt  # noqa: E402
+import numpy as np  # noqa: E402
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from task_chart import StackedBarChart  # noqa: E402
+
+SIZES = [50, 500, 5000]
+REPEAT = 3
+CATEGORIES = ["-", "設計", "実装", "試験", "打合せ", "資料"]
+
+# 日本語フォントの無い環境では文字ごとに警告が出て計測の邪魔になるので抑える
+warnings.filterwarnings("ignore", message="Glyph")
+
+
+def format_seconds(seconds):
+    hrs, rem = divmod(int(seconds), 3600)
+    mins, secs = divmod(rem, 60)
+    return f"{hrs:02}:{mins:02}:{secs:02}"
+
+
+def make_data(n, seed=0):
+    rnd = np.random.default_rng(seed)
+    matrix = rnd.integers(0, 36000, size=(len(CATEGORIES), n)) * (rnd.random((len(CATEGORIES), n)) < 0.5) / 3600.0
+    order = np.argsort(-matrix.sum(axis=0), kind="stable")
+    return [f"タスク{i}" for i in range(n)], matrix[:, order]
+
+
+def legacy_draw(fig, ax, labels, categories, data_matrix, cat_colors, selected_labels):
+    # 変更前の open_category_graph の draw() から描画部分を抜き出したもの
+    ax.clear()
+    sel_idx = [i for i, l in enumerate(labels) if l in selected_labels]
+    sel_labels = [labels[i] for i in sel_idx]
+    x = np.arange(len(sel_labels))
+    filtered = data_matrix[:, sel_idx]
+    bottom = np.zeros(len(sel_labels))
+    bars = []
+    for i, c in enumerate(categories):
+        vals = filtered[i]
+        b = ax.bar(x, vals, bottom=bottom, color=cat_colors.get(c), label=c)
+        bars.append(b)
+        bottom += vals
+    totals_hours = bottom
+    max_total = max(totals_hours) if len(totals_hours) else 0
+    min_display = max_total * 0.02
+    for i, b in enumerate(bars):
+        for j, rect in enumerate(b):
+            h = rect.get_height()
+            if h <= 0 or h < min_display:
+                continue
+            ax.text(rect.get_x() + rect.get_width() / 2, rect.get_y() + h / 2, format_seconds(int(h * 3600)),
+                    ha='center', va='center', fontsize=8)
+    for xi, total in enumerate(totals_hours):
+        if total > 0:
+            ax.text(xi, total, format_seconds(int(total * 3600)), ha='center', va='bottom', fontsize=9)
+    ax.set_xticks(x)
+    ax.set_xticklabels(sel_labels, rotation=45, ha='right')
+    ax.legend(title='カテゴリ', bbox_to_anchor=(1.02, 1), loc='upper left')
+    fig.tight_layout()
+    fig.canvas.draw()
+
+
+def selections(n, seed=1):
+    rnd = random.Random(seed)
+    return [sorted(rnd.sample(range(n), n // 2)) for _ in range(REPEAT)]
+
+
+def bench(n):
+    labels, matrix = make_data(n)
+    cmap = plt.get_cmap('tab20')
+    colors = {c: cmap(i % cmap.N) for i, c in enumerate(CATEGORIES)}
+    sels = selections(n)
+
+    fig, ax = plt.subplots(figsize=(12, 5))
+    t0 = time.perf_counter()
+    for sel in sels:
+        legacy_draw(fig, ax, labels, CATEGORIES, matrix, colors, {labels[i] for i in sel})
+    legacy = (time.perf_counter() - t0) / REPEAT
+    plt.close(fig)
+
+    fig, ax = plt.subplots(figsize=(12, 5))
+    t0 = time.perf_counter()
+    chart = StackedBarChart(ax, labels, CATEGORIES, matrix, colors, format_seconds)
+    fig.tight_layout()
+    fig.canvas.draw()
+    build = time.perf_counter() - t0
+    update = redraw = 0
+    for sel in sels:
+        t0 = time.perf_counter()
+        chart.set_selection(sel)
+        t1 = time.perf_counter()
+        fig.canvas.draw()
+        update += t1 - t0
+        redraw += time.perf_counter() - t0
+    plt.close(fig)
+    return {"names": n, "legacy_redraw_ms": legacy * 1000, "chart_build_ms": build * 1000,
+            "chart_update_ms": update / REPEAT * 1000, "chart_redraw_ms": redraw / REPEAT * 1000}
+
+
+def main():
+    sizes = [int(a) for a in sys.argv[1:]] or SIZES
+    print(json.dumps([bench(n) for n in sizes], ensure_ascii=False, indent=2))
+
+
+if __name__ == "__main__":
+    main()
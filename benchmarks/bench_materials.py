@@ -0,0 +1,90 @@
+"""材料費の明細 100 万行の読み込み・編集・集計のコスト計測。
+
+    python benchmarks/bench_materials.py [明細の行数 ...]
+
+1 タスクあたり LINES_PER_TASK 行の v25 形式データを作り、JSON の読み込み、TaskModel の構築、
+MaterialLedger の構築、明細 1 行の編集（set_material）と集計の取得を測ります。
+比較のため、編集のたびに全明細を合計し直す従来の方法も EDITS_NAIVE 回だけ測ります。
+結果は JSON で標準出力に書き出します。
+"""
+import json
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from materials import MaterialLedger, line_cost, make_line  # noqa: E402
+from task_model import TaskModel  # noqa: E402
+
+SIZES = [100000, 1000000]
+LINES_PER_TASK = 10
+EDITS = 100000
+EDITS_NAIVE = 3
+CATEGORIES = ["-", "設計", "実装", "試験"]
+
+
+def make_json(lines, seed=0):
+    rnd = random.Random(seed)
+    tasks = []
+    for i in range(lines // LINES_PER_TASK):
+        tasks.append({
+            "name": f"タスク{i % 1000}", "worker": f"worker{i % 50}", "estimate": "1",
+            "start_date": "2025/12/01", "end_date": "2025/12/10", "category": rnd.choice(CATEGORIES),
+            "actual_sec": 0, "progress": 0, "memo": "",
+            "materials": [make_line(f"材料{j}", rnd.randint(1, 99999) / 100, rnd.randint(1, 40) / 4)
+                          for j in range(LINES_PER_TASK)],
+        })
+    return json.dumps({"tasks": tasks, "categories": CATEGORIES}, ensure_ascii=False)
+
+
+def naive_totals(model):
+    totals = {}
+    for t in model:
+        for m in t.get("materials") or ():
+            totals[t.get("category", "-")] = totals.get(t.get("category", "-"), 0) + line_cost(m)
+    return totals
+
+
+def timed(fn, *args):
+    t0 = time.perf_counter()
+    out = fn(*args)
+    return time.perf_counter() - t0, out
+
+
+def bench(lines):
+    text = make_json(lines)
+    t_json, data = timed(json.loads, text)
+    t_model, model = timed(TaskModel, data)
+    t_ledger, ledger = timed(MaterialLedger, model)
+
+    rnd = random.Random(1)
+    ids = list(model.tasks)
+    edits = [{"op": "set_material", "id": rnd.choice(ids), "pos": rnd.randrange(LINES_PER_TASK),
+              "line": make_line("変更", rnd.randint(1, 99999) / 100, rnd.randint(1, 40) / 4)} for _ in range(EDITS)]
+    t0 = time.perf_counter()
+    for rec in edits:
+        model.apply(rec)
+        ledger.totals["category"]
+    t_edit = (time.perf_counter() - t0) / EDITS
+
+    t0 = time.perf_counter()
+    for rec in edits[:EDITS_NAIVE]:
+        model.apply(rec)
+        totals = naive_totals(model)
+    t_naive = (time.perf_counter() - t0) / EDITS_NAIVE
+    assert totals == {k: v for k, v in ledger.totals["category"].items() if v}
+
+    t_rank, _ = timed(ledger.ranking, "name")
+    return {"lines": lines, "json_load_s": t_json, "model_build_s": t_model, "ledger_build_s": t_ledger,
+            "edit_and_rollup_us": t_edit * 1e6, "naive_resum_per_edit_s": t_naive, "ranking_by_name_ms": t_rank * 1000}
+
+
+def main():
+    sizes = [int(a) for a in sys.argv[1:]] or SIZES
+    print(json.dumps([bench(n) for n in sizes], ensure_ascii=False, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,92 @@
+"""メモの本文をタスクに直接持つ場合と、ブロブとして別に持つ場合の読み込み・保存のコスト計測。
+
+    python benchmarks/bench_memo_store.py [タスク数 ...]
+
+1 タスクあたり MEMO_CHARS 文字のメモを持つ v24 形式のファイルを作り、次を測ります。
+    legacy_load_s       本文を直接持つファイルの読み込み（初回はブロブへの移行を含む）
+    load_s              移行後の読み込み
+    snapshot_s          スナップショットの書き出し（メモ以外の保存が畳み込みで払うコスト）
+    memo_save_ms        メモ 1 件の保存（ブロブ 1 つ + ジャーナル 1 行）
+    memo_read_ms        選択時のメモの読み込み（キャッシュ無し / あり）
+結果は JSON で標準出力に書き出します。
+"""
+import json
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from memo_store import MemoCache, set_memo_record  # noqa: E402
+from task_store import JournalStore  # noqa: E402
+
+SIZES = [1000, 10000]
+MEMO_CHARS = 4000
+READS = 200
+
+
+def make_json(n, seed=0):
+    rnd = random.Random(seed)
+    line = "作業記録: 部材の確認と調整を行った。\n"
+    tasks = [{"name": f"タスク{i}", "worker": f"worker{i % 20}", "estimate": "1",
+              "start_date": "2025/12/01", "end_date": "2025/12/10", "category": "-",
+              "actual_sec": 0, "progress": 0,
+              "memo": f"{i}\n" + line * (MEMO_CHARS // len(line)) + str(rnd.random())} for i in range(n)]
+    return {"tasks": tasks, "categories": ["-"]}
+
+
+def timed(fn, *args):
+    t0 = time.perf_counter()
+    out = fn(*args)
+    return time.perf_counter() - t0, out
+
+
+def bench(n):
+    d = tempfile.mkdtemp()
+    try:
+        path = os.path.join(d, "tasks.json")
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(make_json(n), f, ensure_ascii=False)
+        legacy_bytes = os.path.getsize(path)
+
+        store = JournalStore(path)
+        t_legacy, model = timed(store.load)
+        store.close()
+        store = JournalStore(path)
+        t_load, model = timed(store.load)
+        t_snapshot, _ = timed(store.write_snapshot, model)
+
+        ids = list(model.tasks)
+        rnd = random.Random(1)
+        t0 = time.perf_counter()
+        for i in range(READS):
+            rec = set_memo_record(rnd.choice(ids), f"更新したメモ {i}\n" * 100)
+            model.apply(rec)
+            store.append(rec)
+        t_save = (time.perf_counter() - t0) / READS
+
+        refs = [model.get(rnd.choice(ids))["memo_ref"] for _ in range(READS)]
+        cache = MemoCache(store.load_memo)
+        t_cold, _ = timed(lambda: [store.load_memo(r) for r in refs])
+        for r in refs[:cache.size]:
+            cache.get(r)
+        t_warm, _ = timed(lambda: [cache.get(r) for r in refs[:cache.size]])
+        store.close()
+        return {"tasks": n, "memo_chars": MEMO_CHARS, "legacy_file_mb": legacy_bytes / 1e6,
+                "snapshot_file_mb": os.path.getsize(path) / 1e6, "legacy_load_s": t_legacy, "load_s": t_load,
+                "snapshot_s": t_snapshot, "memo_save_ms": t_save * 1000,
+                "memo_read_ms": t_cold / READS * 1000, "memo_read_cached_us": t_warm / cache.size * 1e6}
+    finally:
+        shutil.rmtree(d)
+
+
+def main():
+    sizes = [int(a) for a in sys.argv[1:]] or SIZES
+    print(json.dumps([bench(n) for n in sizes], ensure_ascii=False, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,87 @@
+"""グラフ用集計のコスト計測: 従来の辞書ループ集計と task_aggregate.CategoryPivot。
+
+    python benchmarks/bench_pivot.py [件数 ...]
+
+CategoryPivot は初回構築・変更なしでの再取得・タスク 1 件の時間更新後の再取得を測ります。
+結果は JSON で標準出力に書き出します。
+"""
+import json
+import os
+import random
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from task_aggregate import CategoryPivot  # noqa: E402
+from task_model import TaskModel  # noqa: E402
+
+SIZES = [1000, 10000, 100000]
+CATEGORIES = ["-", "設計", "実装", "試験", "打合せ", "資料"]
+
+
+def make_model(n, seed=0):
+    rnd = random.Random(seed)
+    tasks = [{
+        "name": f"タスク{rnd.randrange(max(n // 10, 1))}", "worker": f"worker{i % 20}", "estimate": "1",
+        "start_date": "2025/12/01", "end_date": "2025/12/10",
+        "category": rnd.choice(CATEGORIES), "actual_sec": rnd.randint(0, 36000), "progress": 0, "memo": "",
+    } for i in range(n)]
+    return TaskModel({"tasks": tasks, "categories": CATEGORIES})
+
+
+def legacy_pivot(model):
+    # 変更前の open_category_graph の集計部分
+    task_map = {}
+    categories = list(model.categories)
+    for t in model:
+        name = t.get('name', '-')
+        cat = t.get('category', '-')
+        try:
+            secs = int(t.get('actual_sec', 0))
+        except Exception:
+            secs = 0
+        task_map.setdefault(name, {})
+        task_map[name].setdefault(cat, 0)
+        task_map[name][cat] += secs
+    items = sorted([(name, d) for name, d in task_map.items()], key=lambda x: sum(x[1].values()), reverse=True)
+    labels = [i[0] for i in items]
+    data_matrix = []
+    for c in categories:
+        row = []
+        for _, d in items:
+            row.append(d.get(c, 0) / 3600.0)
+        data_matrix.append(row)
+    return labels, categories, np.array(data_matrix)
+
+
+def timed(fn, *args):
+    t0 = time.perf_counter()
+    out = fn(*args)
+    return time.perf_counter() - t0, out
+
+
+def bench(n):
+    model = make_model(n)
+    legacy, (labels, _, matrix) = timed(legacy_pivot, model)
+    build, pivot = timed(CategoryPivot, model)
+    first, (p_labels, _, p_matrix) = timed(pivot.pivot)
+    assert sorted(p_labels) == sorted(labels)
+    assert np.allclose(np.sort(p_matrix.sum(axis=0)), np.sort(matrix.sum(axis=0)))
+    cached, _ = timed(pivot.pivot)
+    tid = next(iter(model.tasks))
+    model.apply({"op": "add_time", "id": tid, "sec": 60})
+    after_edit, _ = timed(pivot.pivot)
+    return {"tasks": n, "names": len(labels), "legacy_ms": legacy * 1000, "build_ms": (build + first) * 1000,
+            "reopen_ms": cached * 1000, "reopen_after_edit_ms": after_edit * 1000}
+
+
+def main():
+    sizes = [int(a) for a in sys.argv[1:]] or SIZES
+    print(json.dumps([bench(n) for n in sizes], ensure_ascii=False, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,89 @@
+"""一覧更新のコスト計測: 全行作り直し（従来の refresh_listbox）と TreeRowSync の差分更新。
+
+    python benchmarks/bench_refresh.py [件数 ...]
+
+Tk のウィンドウは表示しません（withdraw）が、ディスプレイ環境は必要です。
+結果は JSON で標準出力に書き出します。
+"""
+import json
+import os
+import random
+import sys
+import time
+import tkinter as tk
+from tkinter import ttk
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from task_view import TreeRowSync  # noqa: E402
+
+SIZES = [1000, 5000, 20000, 50000]
+EDITS = 50
+
+
+def make_tasks(n, seed=0):
+    rnd = random.Random(seed)
+    cats = ["-", "設計", "実装", "試験"]
+    return [{
+        "id": f"task{i}", "name": f"タスク{i % 500}", "worker": f"worker{i % 20}", "estimate": str(rnd.randint(0, 16)),
+        "start_date": "2025/12/01", "end_date": f"2025/12/{rnd.randint(1, 28):02}",
+        "category": rnd.choice(cats), "actual_sec": 0, "progress": 0, "memo": "",
+    } for i in range(n)]
+
+
+def row_values(t):
+    return (t.get("name", ""), f"{t.get('progress', 0)}%", t.get('end_date', '')[2:], t.get("worker", "-"), t.get("category", "-"))
+
+
+def rebuild_all(tree, tasks):
+    for item in tree.get_children(): tree.delete(item)
+    for t in tasks:
+        tree.insert("", tk.END, values=row_values(t))
+
+
+def bench(root, n):
+    tasks = make_tasks(n)
+    tree = ttk.Treeview(root, columns=("name", "progress", "deadline", "worker", "category"), show="headings")
+    rnd = random.Random(1)
+
+    t0 = time.perf_counter()
+    rebuild_all(tree, tasks)
+    root.update_idletasks()
+    full = time.perf_counter() - t0
+
+    sync = TreeRowSync(tree, row_values)
+    sync.rebuild(tasks)
+    root.update_idletasks()
+
+    t0 = time.perf_counter()
+    for _ in range(EDITS):
+        t = tasks[rnd.randrange(n)]
+        t["progress"] = (t["progress"] + 10) % 110
+        sync.update_row(t)
+    root.update_idletasks()
+    edit = (time.perf_counter() - t0) / EDITS
+
+    t0 = time.perf_counter()
+    for _ in range(EDITS):
+        i, j = rnd.randrange(n), rnd.randrange(n)
+        t = tasks.pop(i); tasks.insert(j, t)
+        sync.move_row(t["id"], j)
+    root.update_idletasks()
+    move = (time.perf_counter() - t0) / EDITS
+
+    tree.destroy()
+    return {"tasks": n, "full_rebuild_ms": full * 1000, "update_row_ms": edit * 1000, "move_row_ms": move * 1000}
+
+
+def run(sizes=SIZES):
+    root = tk.Tk()
+    root.withdraw()
+    try:
+        return [bench(root, n) for n in sizes]
+    finally:
+        root.destroy()
+
+
+if __name__ == "__main__":
+    sizes = [int(a) for a in sys.argv[1:]] or SIZES
+    print(json.dumps({"benchmark": "refresh", "results": run(sizes)}, ensure_ascii=False, indent=2))
@@ -0,0 +1,59 @@
+"""レポートのグラフ描画（report.py）のプロセス数による所要時間の計測。
+
+    python benchmarks/bench_report.py [タスク数] [--jobs 1,2,4] [--format png]
+
+dataset.py の合成データからレポート用のグラフ（全体・担当者別・カテゴリ別）を作り、
+プロセス数ごとに描画だけの所要時間と、1 プロセスのときに対する速度比を測ります。
+結果は JSON で標準出力に書き出します。
+"""
+import argparse
+import json
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from dataset import iter_tasks  # noqa: E402
+from report import build_report, render_all, seconds_by_task  # noqa: E402
+from task_model import TaskModel  # noqa: E402
+
+TASKS = 20000
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="レポートの描画の並列化の計測")
+    parser.add_argument("tasks", type=int, nargs="?", default=TASKS)
+    parser.add_argument("--jobs", default=None, help="プロセス数（カンマ区切り。既定は 1 と 2 の累乗でコア数まで）")
+    parser.add_argument("--format", default="png")
+    args = parser.parse_args(argv)
+    cpus = os.cpu_count() or 1
+    if args.jobs:
+        counts = [int(x) for x in args.jobs.split(",")]
+    else:
+        counts = sorted({1, cpus} | {2 ** i for i in range(1, cpus.bit_length()) if 2 ** i <= cpus})
+
+    model = TaskModel({"tasks": list(iter_tasks(args.tasks, memos=False, materials=False))})
+    jobs, _, _ = build_report(model, seconds_by_task(model))
+    results = []
+    for n in counts:
+        d = tempfile.mkdtemp()
+        try:
+            t0 = time.perf_counter()
+            render_all(jobs, d, (args.format,), workers=n)
+            results.append({"processes": n, "wall_s": time.perf_counter() - t0})
+        finally:
+            shutil.rmtree(d)
+    base = results[0]["wall_s"] if results and results[0]["processes"] == 1 else None
+    for r in results:
+        r["charts_per_s"] = len(jobs) / r["wall_s"]
+        if base:
+            r["speedup"] = base / r["wall_s"]
+    print(json.dumps({"tasks": args.tasks, "charts": len(jobs), "cpus": cpus, "format": args.format,
+                      "results": results}, ensure_ascii=False, indent=2))
+
+
+if __name__ == "__main__":
+    main()
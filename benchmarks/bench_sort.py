@@ -0,0 +1,59 @@
+"""タスク一覧の列見出しでの並べ替え（task_sort.py / TaskListView）のコスト計測。
+
+    python benchmarks/bench_sort.py [タスク数 ...]
+
+dataset.py の合成データで、列ごとに次を測ります。
+    resort_s        毎回 sorted() で並べ替える場合（比較用）
+    first_sort_s    その列で初めて並べ替えたとき（索引を作る）
+    switch_ms       索引ができた後の列・昇順／降順の切り替え（先頭 50 行の取り出しを含む）
+    update_ms       並べ替え中のタスク 1 件の変更（索引の付け替え。中央値）
+結果は JSON で標準出力に書き出します。
+"""
+import json
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from dataset import iter_tasks  # noqa: E402
+from task_model import TaskModel  # noqa: E402
+from task_sort import SORT_FIELDS, SORT_KEYS  # noqa: E402
+from task_view import TaskListView  # noqa: E402
+
+SIZES = [10000, 100000]
+# 一覧に見えている行数の目安
+VISIBLE = 50
+
+
+def timed(fn):
+    t0 = time.perf_counter()
+    fn()
+    return time.perf_counter() - t0
+
+
+def bench(n):
+    model = TaskModel({"tasks": list(iter_tasks(n, memos=False, materials=False))})
+    view = TaskListView(model)
+    tids = list(model.tasks)[:200]
+    columns = {}
+    for column, key in SORT_KEYS.items():
+        resort = timed(lambda: sorted(model.tasks.values(), key=lambda t: (key(t), t.rank, t.id)))
+        first = timed(lambda: (view.set_sort(column), view.window(0, VISIBLE)))
+        switch = timed(lambda: (view.set_sort(column, descending=True), view.window(0, VISIBLE)))
+        value = {"progress": 50, "end_date": "2025/06/30"}.get(SORT_FIELDS[column], "更新")
+        updates = [timed(lambda: model.apply({"op": "update_task", "id": tid, "fields": {SORT_FIELDS[column]: value}}))
+                   for tid in tids]
+        columns[column] = {"resort_s": resort, "first_sort_s": first, "switch_ms": switch * 1000,
+                           "update_ms": statistics.median(updates) * 1000}
+    return {"tasks": n, "columns": columns}
+
+
+def main():
+    sizes = [int(a) for a in sys.argv[1:]] or SIZES
+    print(json.dumps([bench(n) for n in sizes], ensure_ascii=False, indent=2))
+
+
+if __name__ == "__main__":
+    main()
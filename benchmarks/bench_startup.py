@@ -0,0 +1,203 @@
+"""起動の速さ（ウィンドウが出るまでと、操作できるようになるまで）の計測。
+
+    python benchmarks/bench_startup.py [--sizes 10000,100000] [--repeat 3] [--mode auto|tk|model]
+
+dataset.py の合成データを一時ディレクトリに書き出し（初回の読み込みでの移行は済ませておく）、
+起動を repeat 回ずつ測ります。
+
+--mode tk（ディスプレイが必要）は TaskTimerApp を起動し、イベントを回しながら次を測ります。
+    first_paint_ms     TaskTimerApp() を呼んでから、最初の update() でウィンドウが描かれるまで
+    first_rows_ms      一覧に最初の FIRST_PAGE_ROWS 行が出て、選択・絞り込みができるようになるまで
+    interactive_ms     データを読み終えて編集できるようになるまで
+    list_filled_ms     一覧の行をすべて入れ終えるまで
+    max_loop_gap_ms    読み込み中にイベントループが止まった最長の時間（画面が反応しない時間）
+--mode model は Tk を使わず、同じ処理をモデル層で測ります。
+    blocking_load_ms   データファイルの読み込み（読み込みを待ってからウィンドウを出すときの待ち時間）
+    first_rows_ms      ワーカースレッドで load_stages() を読み始めてから、メインスレッドのモデルに
+                       FIRST_PAGE_ROWS 件が入る（一覧に行が出る）まで
+    loaded_ms          すべての段階をモデルに適用し終えるまで
+    max_loop_gap_ms    その間、5 ms ごとに回るループ（段階の適用を含む）が止まった最長の時間
+auto は Tk が使えれば tk、使えなければ model です。結果は JSON で標準出力に書き出します。
+"""
+import argparse
+import json
+import os
+import shutil
+import statistics
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from dataset import write_dataset  # noqa: E402
+from task_store import open_store  # noqa: E402
+
+SIZES = [10000, 100000]
+REPEAT = 3
+# model モードでイベントループの代わりに回すループの間隔（秒）
+TICK = 0.005
+
+
+def tk_available():
+    try:
+        import tkinter as tk
+        tk.Tk().destroy()
+        return True
+    except Exception:
+        return False
+
+
+def run_tk(path):
+    import tkinter as tk
+    import scheduler
+    for name in ("showinfo", "showwarning", "showerror"):
+        setattr(scheduler.messagebox, name, lambda *a, **k: None)
+    scheduler.messagebox.askyesno = lambda *a, **k: True
+    t0 = time.perf_counter()
+    root = tk.Tk()
+    app = scheduler.TaskTimerApp(root, data_file=path)
+    root.update()
+    first_paint = time.perf_counter() - t0
+    gap = 0.0
+    last = time.perf_counter()
+    while "list_filled" not in app.startup_marks:
+        root.update()
+        now = time.perf_counter()
+        gap = max(gap, now - last)
+        last = now
+        time.sleep(0.001)
+    # マークは TaskTimerApp() の呼び出しからの秒数なので、Tk() の作成の分を足す
+    offset = app._started - t0
+    result = {
+        "first_paint_ms": first_paint * 1000,
+        "first_rows_ms": (app.startup_marks["first_rows"] + offset) * 1000,
+        "interactive_ms": (app.startup_marks["interactive"] + offset) * 1000,
+        "list_filled_ms": (app.startup_marks["list_filled"] + offset) * 1000,
+        "max_loop_gap_ms": gap * 1000,
+    }
+    app.on_close()
+    return result
+
+
+def run_model(path):
+    import queue
+    from scheduler import FIRST_PAGE_ROWS, LIST_COLUMNS, LOAD_SLICE
+    from task_model import TaskModel
+    from task_query import TaskQueryIndex
+    from task_view import TaskListView
+    from time_log import TimeRollup
+
+    t0 = time.perf_counter()
+    store = open_store(path)
+    store.load()
+    store.close()
+    blocking = time.perf_counter() - t0
+
+    class Rows:
+        # 一覧の代わりに行の表示値だけを作る（Treeview への挿入の分は含まない）
+        def __init__(self):
+            self.values = {}
+
+        def insert_row(self, task, index=None):
+            self.values[task.id] = tuple(task.get(k, "") for k, *_ in LIST_COLUMNS)
+
+        def update_row(self, task):
+            self.insert_row(task)
+
+        def delete_row(self, iid):
+            self.values.pop(iid, None)
+
+        def move_row(self, iid, index):
+            pass
+
+    # TaskTimerApp.poll_loading() と同じく、ワーカースレッドが読んだ段階を LOAD_SLICE 秒ずつモデルへ入れる
+    stages = queue.Queue()
+    done = object()
+
+    def worker():
+        s = open_store(path)
+        for stage in s.load_stages():
+            stages.put(stage)
+        s.close()
+        stages.put((done, None))
+
+    model = TaskModel()
+    TaskQueryIndex(model)
+    TimeRollup(model)
+    rows = Rows()
+    TaskListView(model, rows)
+    thread = threading.Thread(target=worker)
+    gap = 0.0
+    first_rows = None
+    t0 = last = time.perf_counter()
+    thread.start()
+    finished = False
+    while not finished:
+        time.sleep(TICK)
+        deadline = time.perf_counter() + LOAD_SLICE
+        while time.perf_counter() < deadline:
+            try:
+                kind, value = stages.get_nowait()
+            except queue.Empty:
+                break
+            if kind is done:
+                finished = True
+                break
+            if kind == "tasks":
+                model.extend(value)
+            elif kind == "categories":
+                model.apply({"op": "set_categories", "categories": value})
+            elif kind == "records":
+                for rec in value:
+                    model.apply(rec)
+            else:
+                raise AssertionError(f"unexpected stage: {kind}")
+        now = time.perf_counter()
+        if first_rows is None and (len(model) >= FIRST_PAGE_ROWS or finished):
+            first_rows = now - t0
+        gap = max(gap, now - last - TICK)
+        last = now
+    loaded = time.perf_counter() - t0
+    thread.join()
+    assert len(rows.values) == len(model)
+    return {
+        "blocking_load_ms": blocking * 1000,
+        "first_rows_ms": first_rows * 1000,
+        "loaded_ms": loaded * 1000,
+        "max_loop_gap_ms": gap * 1000,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="起動の速さの計測")
+    parser.add_argument("--sizes", default=",".join(map(str, SIZES)))
+    parser.add_argument("--repeat", type=int, default=REPEAT)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--mode", choices=("auto", "tk", "model"), default="auto")
+    args = parser.parse_args(argv)
+    mode = args.mode
+    if mode == "auto":
+        mode = "tk" if tk_available() else "model"
+    run = run_tk if mode == "tk" else run_model
+
+    d = tempfile.mkdtemp()
+    results = []
+    try:
+        for n in (int(x) for x in args.sizes.split(",")):
+            path = os.path.join(d, f"tasks_{n}.json")
+            write_dataset(path, n, args.seed)
+            # 初回の読み込みでの移行（ID の割り当て・メモの移動）を済ませておく
+            store = open_store(path)
+            store.load()
+            store.close()
+            runs = [run(path) for _ in range(args.repeat)]
+            results.append(dict({"tasks": n}, **{k: statistics.median(r[k] for r in runs) for k in runs[0]}))
+    finally:
+        shutil.rmtree(d, ignore_errors=True)
+    print(json.dumps({"mode": mode, "repeat": args.repeat, "results": results}, ensure_ascii=False, indent=2))
+
+
+if __name__ == "__main__":
+    main()
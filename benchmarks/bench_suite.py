@@ -0,0 +1,343 @@
+"""scheduler.py の主な処理をまとめて測るベンチマーク（ヘッドレス）。
+
+    python benchmarks/bench_suite.py [--sizes 1000,10000,100000] [--seed 0] [--repeat 5]
+                                     [--mode auto|tk|model] [--out result.json] [--compare old.json]
+
+dataset.py で件数ごとのデータセットを一時ディレクトリに作り（シードが同じなら常に同じ内容）、
+次の処理を repeat 回ずつ測ります。
+    startup           アプリの起動（データの読み込み + 画面の構築 + 一覧を入れ終えるまで。tk のみ）
+    load_data         データファイルの読み込み（初回の移行は load_data_first として別に測る）
+    save_data         1 件の変更を渡してからディスクに書き終わるまで
+    refresh_listbox   一覧全体の作り直し
+    on_select_task    タスクの選択（詳細とメモの表示）
+    drag_reorder      ドラッグでの並び替え 1 回（モデルの更新と一覧の行の移動）
+    delete_category   カテゴリの削除（参照しているタスクの付け替えを含む）
+    graph_aggregate   グラフ用の集計（タスク名 × カテゴリ。最初の 1 回）
+    graph_draw        グラフの描画
+
+--mode tk は非表示の tk.Tk() の上に TaskTimerApp を作り、アプリのメソッドをそのまま呼びます
+（ディスプレイが必要。確認ダイアログは「はい」として扱います。ドラッグはマウス座標の判定を
+省き、移動先を決めた後の処理だけを測ります）。--mode model は Tk を使わず、同じ処理を
+モデル層（TaskStore / StoreWriter / TaskListView / CategoryPivot / StackedBarChart + Agg）で
+行います。auto は Tk が使えれば tk、使えなければ model です。
+
+結果は JSON で書き出します（--out が無ければ標準出力）。--compare に前回の結果を渡すと、
+中央値の比を標準エラーに表示し、REGRESSION_RATIO 倍より遅くなった処理があれば終了コード 1 で終わります
+（差が NOISE_MS 未満のものは除く）。
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import warnings
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from dataset import write_dataset  # noqa: E402
+
+SIZES = [1000, 10000, 100000]
+REPEAT = 5
+# 前回の中央値よりこの倍率を超えて遅くなったら退行とみなす（差が NOISE_MS 未満なら誤差として無視）
+REGRESSION_RATIO = 1.25
+NOISE_MS = 1.0
+
+
+def _row_values(t):
+    return (t.get("name", ""), f"{t.get('progress', 0)}%", t.get('end_date', '')[2:], t.get("worker", "-"),
+            t.get("category", "-"))
+
+
+class ModelHarness:
+    """Tk を使わずにモデル層で同じ処理を行います。"""
+
+    mode = "model"
+
+    def __init__(self, path):
+        from memo_store import MemoCache
+        from store_writer import StoreWriter
+        from task_store import open_store
+        from task_view import TaskListView
+        self.path = path
+        self._open_store = open_store
+        self.store = open_store(path)
+        self.model = self.store.load()
+        self.writer = StoreWriter(self.store)
+        self.memos = MemoCache(lambda ref: self.writer.read(self.store.load_memo, ref))
+        self.list_view = TaskListView(self.model)
+
+    def commit(self, *records):
+        for rec in records:
+            self.model.apply(rec)
+        self.writer.submit(*records)
+
+    def load_data(self):
+        store = self._open_store(self.path)
+        try:
+            store.load()
+        finally:
+            store.close()
+
+    def refresh_listbox(self):
+        # TreeRowSync.rebuild() のうち Tk 以外の部分（行の値を並び順に作る）
+        return [_row_values(t) for t in self.list_view]
+
+    def on_select_task(self, tid):
+        task = self.model.get(tid)
+        self.memos.get(task.get("memo_ref", ""))
+        return _row_values(task)
+
+    def delete_category(self, name):
+        self.commit({"op": "delete_category", "name": name})
+
+    def graph(self):
+        from task_aggregate import CategoryPivot
+        t0 = time.perf_counter()
+        labels, categories, matrix = CategoryPivot(self.model).pivot()
+        t_aggregate = time.perf_counter() - t0
+
+        import matplotlib
+        matplotlib.use("Agg")
+        import matplotlib.pyplot as plt
+        from task_chart import StackedBarChart
+        t0 = time.perf_counter()
+        # 幅はアプリと同じ求め方で、Agg の上限（1 辺 65536 px）を超えないよう抑える
+        fig, ax = plt.subplots(figsize=(min(max(8, len(labels) * 0.6), 600), 5))
+        cmap = plt.get_cmap('tab20')
+        StackedBarChart(ax, labels, categories, matrix, {c: cmap(i % cmap.N) for i, c in enumerate(categories)},
+                        lambda s: f"{s // 3600:02}:{s // 60 % 60:02}:{s % 60:02}")
+        fig.tight_layout()
+        fig.canvas.draw()
+        t_draw = time.perf_counter() - t0
+        plt.close(fig)
+        return t_aggregate, t_draw
+
+    def close(self):
+        self.writer.close()
+
+
+class TkHarness(ModelHarness):
+    """非表示の tk.Tk() の上に TaskTimerApp を作り、アプリのメソッドを呼びます。"""
+
+    mode = "tk"
+
+    def __init__(self, path):
+        import tkinter as tk
+        import scheduler
+        # 確認・通知のダイアログを出さない（確認は「はい」）
+        for name in ("showinfo", "showwarning", "showerror"):
+            setattr(scheduler.messagebox, name, lambda *a, **k: None)
+        scheduler.messagebox.askyesno = lambda *a, **k: True
+        self.path = path
+        self.tk = tk
+        self.scheduler = scheduler
+        self.root = tk.Tk()
+        self.root.withdraw()
+        self.app = scheduler.TaskTimerApp(self.root, data_file=path)
+        self.wait_loaded(self.app, self.root)
+        self.model = self.app.model
+        self.writer = self.app.writer
+
+    def startup(self):
+        root = self.tk.Toplevel(self.root)
+        root.withdraw()
+        app = self.scheduler.TaskTimerApp(root, data_file=self.path)
+        self.wait_loaded(app, root)
+        app.writer.close()
+        root.destroy()
+
+    @staticmethod
+    def wait_loaded(app, root):
+        # データはワーカースレッドで読み込まれ、一覧は after() で少しずつ入るので、入れ終えるまでイベントを回す
+        while "list_filled" not in app.startup_marks:
+            root.update()
+            time.sleep(0.001)
+        root.update_idletasks()
+
+    def commit(self, *records):
+        self.app.commit(*records)
+        self.root.update_idletasks()
+
+    def load_data(self):
+        holder = type("Holder", (), {})()
+        holder.store, holder.root = None, self.root
+        self.scheduler.TaskTimerApp.load_data(holder, self.path)
+        holder.store.close()
+
+    def refresh_listbox(self):
+        self.app.refresh_listbox()
+        self.root.update_idletasks()
+
+    def on_select_task(self, tid):
+        self.app.task_tree.selection_set(tid)
+        self.app.on_select_task(None)
+        self.root.update_idletasks()
+
+    def delete_category(self, name):
+        self.app.open_category_manager()
+        self.app.cat_listbox.selection_set(self.model.categories.index(name))
+        self.app.delete_selected_category()
+        self.root.update_idletasks()
+        self.app.cat_listbox.winfo_toplevel().destroy()
+
+    def graph(self):
+        import matplotlib.pyplot as plt
+        from task_aggregate import CategoryPivot
+        t0 = time.perf_counter()
+        CategoryPivot(self.model).pivot()
+        t_aggregate = time.perf_counter() - t0
+        before = set(self.root.winfo_children())
+        self.app.category_pivot = None
+        t0 = time.perf_counter()
+        self.app.open_category_graph()
+        self.root.update_idletasks()
+        t_draw = time.perf_counter() - t0 - t_aggregate
+        for w in set(self.root.winfo_children()) - before:
+            w.destroy()
+        plt.close("all")
+        return t_aggregate, max(t_draw, 0.0)
+
+    def close(self):
+        self.app.writer.close()
+        self.root.destroy()
+
+
+def tk_available():
+    try:
+        import tkinter as tk
+        tk.Tk().destroy()
+        return True
+    except Exception:
+        return False
+
+
+def _summary(times):
+    ms = [t * 1000 for t in times]
+    return {"median_ms": statistics.median(ms), "min_ms": min(ms), "max_ms": max(ms), "runs": len(ms)}
+
+
+def bench(n, seed, repeat, mode, workdir):
+    path = os.path.join(workdir, f"tasks_{n}.json")
+    dataset_bytes = write_dataset(path, n, seed)
+    rnd = random.Random(seed + 1)
+    ops = {}
+
+    def measure(name, fn, *args):
+        t0 = time.perf_counter()
+        fn(*args)
+        ops.setdefault(name, []).append(time.perf_counter() - t0)
+
+    # 初回の読み込みでは本文を持つメモのブロブへの移行などが行われる
+    from task_store import open_store
+    store = open_store(path)
+    t0 = time.perf_counter()
+    store.load()
+    ops["load_data_first"] = [time.perf_counter() - t0]
+    store.close()
+
+    h = TkHarness(path) if mode == "tk" else ModelHarness(path)
+    try:
+        ids = list(h.model.tasks)
+        for _ in range(repeat):
+            if mode == "tk":
+                measure("startup", h.startup)
+            measure("load_data", h.load_data)
+
+            def save():
+                h.commit({"op": "update_task", "id": rnd.choice(ids), "fields": {"progress": rnd.randint(0, 100)}})
+                h.writer.flush()
+            measure("save_data", save)
+            measure("refresh_listbox", h.refresh_listbox)
+            measure("on_select_task", h.on_select_task, rnd.choice(ids))
+            src, dst = rnd.sample(ids, 2)
+            measure("drag_reorder", lambda: h.commit(h.model.move_task_record(src, dst)))
+        # 削除できるカテゴリ（"-" 以外）を件数の多い順に消していく
+        for name in [c for c in h.model.categories if c != "-"][:repeat]:
+            measure("delete_category", h.delete_category, name)
+        h.writer.flush()
+        for _ in range(repeat):
+            t_aggregate, t_draw = h.graph()
+            ops.setdefault("graph_aggregate", []).append(t_aggregate)
+            ops.setdefault("graph_draw", []).append(t_draw)
+    finally:
+        h.close()
+    return {"tasks": n, "mode": mode, "dataset_bytes": dataset_bytes,
+            "ops": {name: _summary(times) for name, times in ops.items()}}
+
+
+def _git_revision():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True, text=True,
+                              timeout=10).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+def compare(old, new):
+    """前回の結果 old と今回の new の中央値の比を表示し、退行した処理の一覧を返します。"""
+    before = {(r["tasks"], r["mode"], op): s["median_ms"] for r in old["results"] for op, s in r["ops"].items()}
+    regressions = []
+    for r in new["results"]:
+        for op, s in r["ops"].items():
+            prev = before.get((r["tasks"], r["mode"], op))
+            if not prev:
+                continue
+            ratio = s["median_ms"] / prev
+            flag = "  <-- 退行" if ratio > REGRESSION_RATIO and s["median_ms"] - prev > NOISE_MS else ""
+            print(f"{r['tasks']:>8} {op:<16} {prev:10.2f} ms -> {s['median_ms']:10.2f} ms  x{ratio:.2f}{flag}",
+                  file=sys.stderr)
+            if flag:
+                regressions.append((r["tasks"], op, ratio))
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="scheduler.py の主な処理を測る")
+    parser.add_argument("--sizes", default=",".join(map(str, SIZES)), help="タスク数（カンマ区切り。最大 1000000）")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--repeat", type=int, default=REPEAT)
+    parser.add_argument("--mode", choices=("auto", "tk", "model"), default="auto")
+    parser.add_argument("--out", help="結果の JSON の出力先（無ければ標準出力）")
+    parser.add_argument("--compare", help="比較する前回の結果の JSON")
+    args = parser.parse_args(argv)
+
+    mode = args.mode
+    if mode == "auto":
+        mode = "tk" if tk_available() else "model"
+    # グラフの描画で出るフォントのグリフの警告は結果に関係ない
+    warnings.filterwarnings("ignore", message="Glyph .* missing from")
+    workdir = tempfile.mkdtemp(prefix="task-bench-")
+    try:
+        results = []
+        for n in (int(s) for s in args.sizes.split(",") if s):
+            print(f"{n} 件を計測中...", file=sys.stderr)
+            results.append(bench(n, args.seed, args.repeat, mode, workdir))
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+    out = {"meta": {"mode": mode, "seed": args.seed, "repeat": args.repeat, "revision": _git_revision(),
+                    "python": platform.python_version(), "platform": platform.platform(),
+                    "time": time.strftime("%Y-%m-%dT%H:%M:%S")},
+           "results": results}
+    text = json.dumps(out, ensure_ascii=False, indent=2)
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+    if args.compare:
+        with open(args.compare, "r", encoding="utf-8") as f:
+            if compare(json.load(f), out):
+                return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,161 @@
+"""同期サーバー（task_sync.py）に多数のクライアントから同時に変更を送ったときの処理量と待ち時間の計測。
+
+    python benchmarks/bench_sync.py [--clients 1,10,50] [--tasks 10000] [--seconds 5]
+                                    [--batch 1] [--hot 0.01] [--time-ratio 0.5]
+
+dataset.py の合成データを一時ディレクトリに書き出し、別プロセスで同期サーバーを起動します。
+クライアントは asyncio でプロトコルをそのまま話し（SyncClient と同じく差分から版を覚える）、
+それぞれが応答を待っては次の変更を送ることを --seconds 秒間続けます。
+変更は --batch 件ずつまとめて送り、--time-ratio の割合で作業時間の加算（add_time。衝突しない）、
+残りは進捗の更新（update_task）です。対象のタスクは --hot の割合の一部のタスクから選ぶので、
+値を小さくするほど同じタスクの取り合い（衝突）が増えます。
+
+    commits_per_s    受け付けられた送信の回数（1 秒あたり）
+    records_per_s    受け付けられたレコードの件数（1 秒あたり）
+    latency_*_ms     送ってから応答が届くまで（受け付け・拒否とも）
+    reject_rate      拒否された送信の割合
+    delta_lag_*_ms   受け付けられた変更が各クライアントに差分として届くまで
+結果は JSON で標準出力に書き出します。
+"""
+import argparse
+import asyncio
+import json
+import multiprocessing
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from dataset import write_dataset  # noqa: E402
+from perf_trace import Histogram  # noqa: E402
+from task_store import open_store  # noqa: E402
+from task_sync import MAX_MESSAGE, encode, serve  # noqa: E402
+
+CLIENTS = [1, 10, 50]
+TASKS = 10000
+SECONDS = 5.0
+
+
+def _serve(path, ports):
+    serve(open_store(path), "127.0.0.1", 0, lambda server, address: ports.put(address[1]))
+
+
+class Client:
+    def __init__(self, stats, rnd):
+        self.stats = stats
+        self.rnd = rnd
+        self.versions = {}
+        self.ids = []
+        self.waiting = {}
+        self.next_id = 0
+
+    async def connect(self, port):
+        self.reader, self.writer = await asyncio.open_connection("127.0.0.1", port, limit=MAX_MESSAGE)
+        self.writer.write(encode({"type": "hello"}))
+        snap = json.loads(await self.reader.readline())
+        self.ids = [t["id"] for t in snap["data"]["tasks"]]
+        self.versions = snap["versions"]
+        self.receiver = asyncio.ensure_future(self._receive())
+
+    async def _receive(self):
+        async for line in self.reader:
+            msg = json.loads(line)
+            if "reply_to" in msg:
+                self.waiting.pop(msg["reply_to"]).set_result(msg)
+                continue
+            for key in msg["bumped"]:
+                self.versions[key] = msg["version"]
+            sent = msg["records"][0].get("sent")
+            if sent is not None:
+                self.stats["lag"].add(max(time.time() - sent, 0.0))
+
+    async def run(self, hot, batch, time_ratio, deadline):
+        loop = asyncio.get_running_loop()
+        while time.perf_counter() < deadline:
+            records, base = [], {}
+            for tid in self.rnd.sample(hot, min(batch, len(hot))):
+                if self.rnd.random() < time_ratio:
+                    records.append({"op": "add_time", "id": tid, "sec": 1})
+                else:
+                    base[tid] = self.versions.get(tid, 0)
+                    records.append({"op": "update_task", "id": tid, "fields": {"progress": self.rnd.randrange(101)}})
+            # 差分が各クライアントに届くまでの時間を測るため、送った時刻を最初のレコードに入れておく
+            records[0]["sent"] = time.time()
+            self.next_id += 1
+            reply = self.waiting[self.next_id] = loop.create_future()
+            t0 = time.perf_counter()
+            self.writer.write(encode({"type": "commit", "id": self.next_id, "records": records, "base": base}))
+            msg = await reply
+            self.stats["latency"].add(time.perf_counter() - t0)
+            if msg["type"] == "ack":
+                self.stats["commits"] += 1
+                self.stats["records"] += len(records)
+            else:
+                self.stats["rejects"] += 1
+
+    async def close(self):
+        self.writer.close()
+        self.receiver.cancel()
+
+
+async def bench(port, clients, seconds, batch, hot_ratio, time_ratio, seed):
+    stats = {"commits": 0, "records": 0, "rejects": 0, "latency": Histogram(), "lag": Histogram()}
+    rnd = random.Random(seed)
+    peers = [Client(stats, random.Random(rnd.getrandbits(64))) for _ in range(clients)]
+    for c in peers:
+        await c.connect(port)
+    ids = peers[0].ids
+    hot = rnd.sample(ids, max(batch, int(len(ids) * hot_ratio)))
+    t0 = time.perf_counter()
+    await asyncio.gather(*(c.run(hot, batch, time_ratio, t0 + seconds) for c in peers))
+    elapsed = time.perf_counter() - t0
+    for c in peers:
+        await c.close()
+    sent = stats["commits"] + stats["rejects"]
+    return {
+        "clients": clients,
+        "commits_per_s": stats["commits"] / elapsed,
+        "records_per_s": stats["records"] / elapsed,
+        "latency_p50_ms": stats["latency"].percentile(50) * 1000,
+        "latency_p99_ms": stats["latency"].percentile(99) * 1000,
+        "reject_rate": stats["rejects"] / sent if sent else 0.0,
+        "delta_lag_p50_ms": stats["lag"].percentile(50) * 1000,
+        "delta_lag_p99_ms": stats["lag"].percentile(99) * 1000,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="同期サーバーの処理量と待ち時間の計測")
+    parser.add_argument("--clients", default=",".join(map(str, CLIENTS)), help="クライアント数（カンマ区切り）")
+    parser.add_argument("--tasks", type=int, default=TASKS)
+    parser.add_argument("--seconds", type=float, default=SECONDS, help="クライアント数ごとの計測時間")
+    parser.add_argument("--batch", type=int, default=1, help="1 回の送信に含めるレコードの件数")
+    parser.add_argument("--hot", type=float, default=0.01, help="変更の対象にするタスクの割合")
+    parser.add_argument("--time-ratio", type=float, default=0.5, help="作業時間の加算の割合")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+
+    d = tempfile.mkdtemp()
+    ports = multiprocessing.Queue()
+    server = multiprocessing.Process(target=_serve, args=(os.path.join(d, "tasks.json"), ports), daemon=True)
+    try:
+        write_dataset(os.path.join(d, "tasks.json"), args.tasks, args.seed, memos=False, materials=False)
+        server.start()
+        port = ports.get(timeout=60)
+        results = [asyncio.run(bench(port, int(n), args.seconds, args.batch, args.hot, args.time_ratio, args.seed))
+                   for n in args.clients.split(",")]
+    finally:
+        server.terminate()
+        server.join()
+        shutil.rmtree(d, ignore_errors=True)
+    print(json.dumps({"tasks": args.tasks, "seconds": args.seconds, "batch": args.batch, "hot": args.hot,
+                      "time_ratio": args.time_ratio, "cpus": os.cpu_count(), "results": results},
+                     ensure_ascii=False, indent=2))
+
+
+if __name__ == "__main__":
+    main()
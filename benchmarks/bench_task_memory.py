@@ -0,0 +1,81 @@
+"""タスクを辞書のまま持つ場合と Task（__slots__）で持つ場合のメモリと比較のコスト計測。
+
+    python benchmarks/bench_task_memory.py [タスク数 ...]
+
+dataset.py の合成データ（メモは移行済みの memo_ref として持たせる）を読み込み、次を測ります。
+    dict_bytes / task_bytes   1 件あたりのメモリ（tracemalloc。タスク本体から参照する値を含む）
+    *_no_materials_bytes      材料費の明細を持たないタスクだけの場合
+    convert_s                 辞書から Task への変換（読み込み時に増える分）
+    sort_end_*_s              期限日での並べ替え（文字列の比較 / 序数の比較）
+    sort_estimate_*_s         予定での並べ替え（毎回 float() / 数値のまま）
+結果は JSON で標準出力に書き出します。
+"""
+import gc
+import json
+import os
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from dataset import iter_tasks  # noqa: E402
+from task_model import Task  # noqa: E402
+
+SIZES = [10000, 100000]
+
+
+def make_json(n, materials=True):
+    tasks = []
+    for t in iter_tasks(n, memos=False, materials=materials):
+        t.pop("memo")
+        if len(t["name"]) % 3 == 0:
+            t["memo_ref"] = f"{hash(t['id']) & (2 ** 64 - 1):064x}"
+        tasks.append(t)
+    return json.dumps(tasks, ensure_ascii=False)
+
+
+def bytes_per_task(fn, n):
+    gc.collect()
+    tracemalloc.start()
+    objs = fn()
+    size = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del objs
+    return size / n
+
+
+def timed(fn):
+    t0 = time.perf_counter()
+    fn()
+    return time.perf_counter() - t0
+
+
+def bench(n):
+    src = make_json(n)
+    plain = make_json(n, materials=False)
+    dicts = json.loads(src)
+    t_convert = timed(lambda: [Task(t) for t in dicts])
+    tasks = [Task(t) for t in dicts]
+    assert [t.to_dict() for t in tasks] == dicts
+    return {
+        "tasks": n,
+        "dict_bytes": bytes_per_task(lambda: json.loads(src), n),
+        "task_bytes": bytes_per_task(lambda: [Task(t) for t in json.loads(src)], n),
+        "dict_no_materials_bytes": bytes_per_task(lambda: json.loads(plain), n),
+        "task_no_materials_bytes": bytes_per_task(lambda: [Task(t) for t in json.loads(plain)], n),
+        "convert_s": t_convert,
+        "sort_end_str_s": timed(lambda: sorted(dicts, key=lambda t: t["end_date"])),
+        "sort_end_ordinal_s": timed(lambda: sorted(tasks, key=lambda t: t.end)),
+        "sort_estimate_str_s": timed(lambda: sorted(dicts, key=lambda t: float(t["estimate"]))),
+        "sort_estimate_number_s": timed(lambda: sorted(tasks, key=lambda t: t.estimate)),
+    }
+
+
+def main():
+    sizes = [int(a) for a in sys.argv[1:]] or SIZES
+    print(json.dumps([bench(n) for n in sizes], ensure_ascii=False, indent=2))
+
+
+if __name__ == "__main__":
+    main()
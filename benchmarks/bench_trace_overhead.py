@@ -0,0 +1,55 @@
+"""計測（perf_trace）のオーバーヘッドの計測。
+
+    python benchmarks/bench_trace_overhead.py [呼び出し回数]
+
+何もしない関数を、包まない場合・tracer.traced で包んで計測を無効にした場合・有効にした場合で
+呼び出し、1 回あたりの時間を比べます。あわせて Histogram のパーセンタイルの誤差を確かめます。
+結果は JSON で標準出力に書き出します。
+"""
+import json
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from perf_trace import Histogram, Tracer  # noqa: E402
+
+CALLS = 1000000
+
+
+def per_call(fn, n):
+    t0 = time.perf_counter()
+    for _ in range(n):
+        fn()
+    return (time.perf_counter() - t0) / n
+
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else CALLS
+    tracer = Tracer(max_events=10000)
+
+    def noop():
+        pass
+
+    wrapped = tracer.traced("noop")(noop)
+    plain = per_call(noop, n)
+    tracer.enabled = False
+    disabled = per_call(wrapped, n)
+    tracer.enabled = True
+    enabled = per_call(wrapped, n // 10)
+
+    rnd = random.Random(0)
+    samples = sorted(rnd.lognormvariate(-6, 1.5) for _ in range(100000))
+    h = Histogram()
+    for s in samples:
+        h.add(s)
+    errors = {f"p{p}": h.percentile(p) / samples[int(len(samples) * p / 100) - 1] - 1 for p in (50, 90, 99)}
+    print(json.dumps({"calls": n, "plain_ns": plain * 1e9, "disabled_ns": disabled * 1e9, "enabled_ns": enabled * 1e9,
+                      "disabled_overhead_ns": (disabled - plain) * 1e9, "percentile_relative_error": errors},
+                     ensure_ascii=False, indent=2))
+
+
+if __name__ == "__main__":
+    main()
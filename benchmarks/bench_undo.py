@@ -0,0 +1,88 @@
+"""元に戻す／やり直すの履歴（undo.py）の記録のコストと大きさの計測。
+
+    python benchmarks/bench_undo.py [タスク数 ...]
+
+dataset.py の合成データで、次を測ります。
+    record_us          1 回の操作（タスクの編集・削除・並び替えを順に）を履歴に記録する時間（中央値）
+    undo_us            1 回の操作を元に戻す（逆向きのレコードの作成と適用。中央値）
+    history_kib        MAX_STEPS 回の操作を記録した履歴の大きさ（レコードを JSON にしたバイト数）
+    delete_category_ms 多くのタスクが参照しているカテゴリの削除の記録
+    deepcopy_ms        比較用: 操作のたびにデータ全体を複製した場合の 1 回分
+結果は JSON で標準出力に書き出します。
+"""
+import copy
+import json
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from dataset import iter_tasks  # noqa: E402
+from task_model import TaskModel  # noqa: E402
+from undo import MAX_STEPS, UndoHistory  # noqa: E402
+
+SIZES = [10000, 100000]
+
+
+def timed(fn):
+    t0 = time.perf_counter()
+    fn()
+    return time.perf_counter() - t0
+
+
+def bench(n):
+    model = TaskModel({"tasks": list(iter_tasks(n, memos=False))})
+    history = UndoHistory()
+    tids = list(model.tasks)
+    records, undos = [], []
+    for i in range(MAX_STEPS):
+        tid = tids[i * 7 % len(tids)]
+        kind = i % 3
+        if kind == 0:
+            recs = [{"op": "update_task", "id": tid, "fields": {"progress": i % 101, "name": f"変更{i}"}}]
+        elif kind == 1:
+            recs = [model.move_task_record(tid, tids[(i * 13 + 1) % len(tids)])]
+        else:
+            recs = [{"op": "delete_task", "id": tid}]
+        t0 = time.perf_counter()
+        step = history.prepare(model, recs)
+        history.push(step)
+        records.append(time.perf_counter() - t0)
+        for rec in recs:
+            model.apply(rec)
+    size = history.bytes
+    for _ in range(MAX_STEPS // 2):
+        t0 = time.perf_counter()
+        _, inv = history.undo(model)
+        for rec in inv:
+            model.apply(rec)
+        history.done_undo()
+        undos.append(time.perf_counter() - t0)
+    # 一番多く参照されているカテゴリの削除
+    counts = {}
+    for t in model.tasks.values():
+        counts[t.category] = counts.get(t.category, 0) + 1
+    name = max(counts, key=counts.get)
+    if name not in model.categories:
+        model.apply({"op": "add_category", "name": name})
+    category_ms = timed(lambda: history.prepare(model, [{"op": "delete_category", "name": name}])) * 1000
+    return {
+        "tasks": n,
+        "record_us": statistics.median(records) * 1e6,
+        "undo_us": statistics.median(undos) * 1e6,
+        "history_kib": size / 1024,
+        "delete_category_tasks": counts[name],
+        "delete_category_ms": category_ms,
+        "deepcopy_ms": timed(lambda: copy.deepcopy(model.to_data())) * 1000,
+    }
+
+
+def main():
+    sizes = [int(a) for a in sys.argv[1:]] or SIZES
+    print(json.dumps([bench(n) for n in sizes], ensure_ascii=False, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,94 @@
+"""タスク一覧の表示コスト計測: Treeview と VirtualTaskList の起動時間・スクロール遅延。
+
+    python benchmarks/bench_virtual_list.py [件数 ...]
+
+既定では 10k / 100k / 1M 件を計測します（Treeview は TREEVIEW_MAX 件まで）。
+Tk のウィンドウは画面外に置きますが、ディスプレイ環境は必要です。結果は JSON で出力します。
+"""
+import json
+import os
+import random
+import statistics
+import sys
+import time
+import tkinter as tk
+from tkinter import ttk
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from scheduler import LIST_COLUMNS  # noqa: E402
+from task_model import TaskModel  # noqa: E402
+from task_view import TreeRowSync, VirtualTaskList  # noqa: E402
+
+SIZES = [10000, 100000, 1000000]
+TREEVIEW_MAX = 100000
+SCROLLS = 50
+
+
+def make_model(n, seed=0):
+    rnd = random.Random(seed)
+    cats = ["-", "設計", "実装", "試験"]
+    return TaskModel({"tasks": [{
+        "name": f"タスク{i % 500}", "worker": f"worker{i % 20}", "estimate": str(rnd.randint(0, 16)),
+        "start_date": "2025/12/01", "end_date": f"2025/12/{rnd.randint(1, 28):02}",
+        "category": rnd.choice(cats), "actual_sec": 0, "progress": rnd.randrange(0, 101, 10), "memo": "",
+    } for i in range(n)], "categories": cats})
+
+
+def row_values(t):
+    return (t.get("name", ""), f"{t.get('progress', 0)}%", t.get('end_date', '')[2:], t.get("worker", "-"), t.get("category", "-"))
+
+
+def _scroll_latency(root, widget, total):
+    rnd = random.Random(1)
+    samples = []
+    for _ in range(SCROLLS):
+        t0 = time.perf_counter()
+        widget.yview("moveto", rnd.random())
+        root.update_idletasks()
+        samples.append((time.perf_counter() - t0) * 1000)
+    return {"scroll_p50_ms": statistics.median(samples), "scroll_max_ms": max(samples)}
+
+
+def bench_virtual(root, model):
+    t0 = time.perf_counter()
+    lst = VirtualTaskList(root, LIST_COLUMNS, row_values, height=30)
+    lst.pack(fill=tk.BOTH, expand=True)
+    lst.rebuild(model)
+    root.update()
+    result = {"mode": "virtual", "open_ms": (time.perf_counter() - t0) * 1000}
+    result.update(_scroll_latency(root, lst, len(model)))
+    lst.destroy()
+    return result
+
+
+def bench_treeview(root, model):
+    t0 = time.perf_counter()
+    tree = ttk.Treeview(root, columns=[c[0] for c in LIST_COLUMNS], show="headings", height=30)
+    tree.pack(fill=tk.BOTH, expand=True)
+    TreeRowSync(tree, row_values).rebuild(model)
+    root.update()
+    result = {"mode": "treeview", "open_ms": (time.perf_counter() - t0) * 1000}
+    result.update(_scroll_latency(root, tree, len(model)))
+    tree.destroy()
+    return result
+
+
+def run(sizes=SIZES):
+    root = tk.Tk()
+    root.geometry("500x700+-2000+-2000")
+    results = []
+    try:
+        for n in sizes:
+            model = make_model(n)
+            results.append(dict(bench_virtual(root, model), tasks=n))
+            if n <= TREEVIEW_MAX:
+                results.append(dict(bench_treeview(root, model), tasks=n))
+    finally:
+        root.destroy()
+    return results
+
+
+if __name__ == "__main__":
+    sizes = [int(a) for a in sys.argv[1:]] or SIZES
+    print(json.dumps({"benchmark": "virtual_list", "results": run(sizes)}, ensure_ascii=False, indent=2))
@@ -0,0 +1,109 @@
+"""ベンチマーク用の合成データセット（tasks_std_v24.json 互換）の生成。
+
+    python benchmarks/dataset.py 件数 出力ファイル [--seed N] [--no-memos] [--no-materials] [--legacy]
+
+同じ件数・シードからは常に同じファイルができます。実際のデータに近づけるため、
+    - タスク名は少数の名前が何度も使われる（Zipf 分布）
+    - 作業者・カテゴリも偏りを持たせる
+    - メモは 4 割ほどのタスクに、数行〜数十行の作業記録として入れる
+    - 材料費の明細（v25 形式）は 3 割ほどのタスクに 1〜5 行入れる
+ようにしています。--legacy を付けると id / rank の無い従来の形式で書き出します
+（読み込み時の移行のコストを測る場合）。タスクは 1 件ずつ書き出すので、100 万件でも
+全件をメモリに持ちません。
+"""
+import argparse
+import itertools
+import json
+import os
+import random
+import sys
+from datetime import date, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from materials import make_line  # noqa: E402
+from task_model import initial_ranks  # noqa: E402
+
+CATEGORIES = ["-", "設計", "施工", "検査", "事務", "営業", "保守", "その他"]
+CATEGORY_WEIGHTS = [3, 10, 14, 6, 5, 3, 2, 1]
+NAME_STEMS = ["基礎工事", "配筋検査", "図面修正", "見積作成", "打合せ", "資材発注", "現場確認", "報告書作成",
+              "測量", "型枠組立", "コンクリート打設", "内装仕上げ", "電気配線", "配管", "塗装", "清掃",
+              "安全点検", "工程調整", "施主対応", "写真整理"]
+SURNAMES = ["佐藤", "鈴木", "高橋", "田中", "伊藤", "渡辺", "山本", "中村", "小林", "加藤",
+            "吉田", "山田", "佐々木", "山口", "松本", "井上", "木村", "林", "斎藤", "清水"]
+MATERIALS = ["セメント", "鉄筋 D13", "合板", "角材", "ボルト", "塗料", "配線ケーブル", "塩ビ管", "石膏ボード", "養生シート"]
+MEMO_LINES = ["{d} 現場で{s}さんと作業内容を確認した。", "{d} 資材の納品が遅れたため段取りを変更。",
+              "{d} 午前中に{t}を完了。午後は片付け。", "{d} 図面との差異あり。設計へ問い合わせ中。",
+              "{d} 天候不良のため作業を中断した。", "{d} {s}さんに引き継ぎ。残りは明日対応。"]
+FIRST_DAY = date(2024, 1, 1)
+DAYS = 3 * 365
+
+
+def _zipf_cum_weights(n, s=1.1):
+    return list(itertools.accumulate(1 / (k + 1) ** s for k in range(n)))
+
+
+def iter_tasks(n, seed=0, memos=True, materials=True, legacy=False):
+    """n 件のタスク（辞書）を順に返します。"""
+    rnd = random.Random(seed)
+    # 名前の種類は件数とともに緩やかに増える（件数の 1/20、最低 50）
+    names = [f"{NAME_STEMS[i % len(NAME_STEMS)]}{'' if i < len(NAME_STEMS) else i // len(NAME_STEMS) + 1}"
+             for i in range(max(50, n // 20))]
+    name_weights = _zipf_cum_weights(len(names))
+    workers = [f"{s}{i // len(SURNAMES) + 1 if i >= len(SURNAMES) else ''}" for i, s in enumerate(SURNAMES * 3)]
+    worker_weights = _zipf_cum_weights(len(workers), 0.8)
+    category_weights = list(itertools.accumulate(CATEGORY_WEIGHTS))
+    ranks = None if legacy else initial_ranks(n)
+    for i in range(n):
+        name = rnd.choices(names, cum_weights=name_weights)[0]
+        worker = rnd.choices(workers, cum_weights=worker_weights)[0]
+        start = FIRST_DAY + timedelta(days=rnd.randrange(DAYS))
+        end = start + timedelta(days=rnd.randrange(31))
+        estimate = rnd.randint(1, 40)
+        task = {
+            "name": name, "worker": worker, "estimate": str(estimate),
+            "start_date": start.strftime("%Y/%m/%d"), "end_date": end.strftime("%Y/%m/%d"),
+            "category": rnd.choices(CATEGORIES, cum_weights=category_weights)[0],
+            "actual_sec": rnd.randint(0, estimate * 5400), "progress": rnd.choice((0, 0, 10, 30, 50, 80, 100)),
+            "memo": "",
+        }
+        if memos and rnd.random() < 0.4:
+            lines = []
+            for k in range(rnd.randint(2, 40)):
+                d = start + timedelta(days=k)
+                lines.append(rnd.choice(MEMO_LINES).format(d=d.strftime("%m/%d"), s=rnd.choice(SURNAMES), t=name))
+            task["memo"] = "\n".join(lines)
+        if materials and rnd.random() < 0.3:
+            task["materials"] = [make_line(rnd.choice(MATERIALS), rnd.randint(100, 500000) / 100, rnd.randint(1, 80) / 4)
+                                 for _ in range(rnd.randint(1, 5))]
+        if not legacy:
+            task["id"] = f"{rnd.getrandbits(128):032x}"
+            task["rank"] = ranks[i]
+        yield task
+
+
+def write_dataset(path, n, seed=0, memos=True, materials=True, legacy=False):
+    """データセットを path に書き出します。書き出したバイト数を返します。"""
+    with open(path, "w", encoding="utf-8") as f:
+        f.write('{"tasks": [\n')
+        for i, t in enumerate(iter_tasks(n, seed, memos, materials, legacy)):
+            f.write((",\n" if i else "") + json.dumps(t, ensure_ascii=False))
+        f.write('\n], "categories": ' + json.dumps(CATEGORIES, ensure_ascii=False) + "}\n")
+        return f.tell()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="ベンチマーク用のデータセットを作る")
+    parser.add_argument("count", type=int, help="タスク数（1000〜1000000 を想定）")
+    parser.add_argument("path", help="出力ファイル")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--no-memos", action="store_true", help="メモを入れない")
+    parser.add_argument("--no-materials", action="store_true", help="材料費の明細を入れない")
+    parser.add_argument("--legacy", action="store_true", help="id / rank の無い従来の形式で書く")
+    args = parser.parse_args(argv)
+    size = write_dataset(args.path, args.count, args.seed, not args.no_memos, not args.no_materials, args.legacy)
+    print(json.dumps({"path": args.path, "tasks": args.count, "seed": args.seed, "bytes": size}, ensure_ascii=False))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,345 @@
+"""作業負荷の計画（担当者ごとの残り作業の割り付けと、期限に間に合わないタスクの検出）。
+
+各タスクの残り作業時間を、開始日（今日より前なら今日）から期限までの稼働日に均等に割り付け、
+担当者別・カテゴリ別に任意の期間の負荷（時間）を求めます。
+
+    残り = 予定 × (1 - 進捗)               進捗が入っている場合
+           max(予定 - 作業時間の累計, 0)   進捗が 0 の場合（actual_sec から）
+    完了（進捗 100）のタスクと、予定・期限の無いタスクは数えません。
+
+稼働日は月〜金から休日（holidays）を除いた日です。稼働日に通し番号を振ると、1 件の割り付けは
+通し番号の連続した区間に 1 日あたり一定の時間を足すことになるので、担当者・カテゴリごとに
+区間加算・区間和の Fenwick 木（累積和を 2 本）で持てます。期間の負荷は O(log n)、
+タスクの変更はそのタスクの区間を付け替えるだけ（O(log n)）です。
+
+期限に間に合わないタスクは、担当者ごとに期限の早い順に残り作業を積み上げ、
+今日から期限までの稼働可能時間（稼働日 × hours_per_day）を超えたものを挙げます
+（開始日は考えない概算です）。担当者ごとに結果を覚えておき、変更のあった担当者だけを数え直します。
+"""
+from bisect import bisect_left
+from datetime import date
+
+from task_model import SortedKeyList
+
+# 1 人 1 稼働日あたりの作業可能時間
+HOURS_PER_DAY = 8.0
+# 月曜から数えて何曜日までを稼働日とするか（5 なら月〜金）
+WORK_WEEKDAYS = 5
+# 木の大きさ（稼働日数）の最小値。期限がこれより先のタスクが来たら倍にして作り直す
+MIN_DAYS = 256
+# 負荷に関係するフィールド
+PLAN_FIELDS = {"start_date", "end_date", "estimate", "progress", "actual_sec", "worker", "category"}
+
+
+class RangeTotals:
+    """区間加算と区間和の Fenwick 木。添字は 1 から size - 1 までの整数です。"""
+
+    def __init__(self, size, spans=()):
+        # spans: (lo, hi, v) の並び。差分を置いてから O(size) で木にする（1 件ずつ add するより速い）
+        self.size = size
+        b1 = [0.0] * (size + 1)
+        b2 = [0.0] * (size + 1)
+        for lo, hi, v in spans:
+            b1[lo] += v
+            b1[hi + 1] -= v
+            b2[lo] += v * (lo - 1)
+            b2[hi + 1] -= v * hi
+        for tree in (b1, b2):
+            for i in range(1, size + 1):
+                j = i + (i & -i)
+                if j <= size:
+                    tree[j] += tree[i]
+        self._b1 = b1
+        self._b2 = b2
+
+    def _add(self, tree, i, v):
+        size = self.size
+        while i <= size:
+            tree[i] += v
+            i += i & -i
+
+    @staticmethod
+    def _sum(tree, i):
+        total = 0.0
+        while i > 0:
+            total += tree[i]
+            i -= i & -i
+        return total
+
+    def add(self, lo, hi, v):
+        """lo から hi まで（両端を含む）の各添字に v を足します。"""
+        self._add(self._b1, lo, v)
+        self._add(self._b1, hi + 1, -v)
+        self._add(self._b2, lo, v * (lo - 1))
+        self._add(self._b2, hi + 1, -v * hi)
+
+    def prefix(self, i):
+        i = min(i, self.size - 1)
+        if i <= 0:
+            return 0.0
+        return self._sum(self._b1, i) * i - self._sum(self._b2, i)
+
+    def between(self, lo, hi):
+        return self.prefix(hi) - self.prefix(lo - 1)
+
+
+class WorkCalendar:
+    """稼働日の通し番号。date.toordinal() の序数 1（西暦 1 年 1 月 1 日）は月曜です。"""
+
+    def __init__(self, holidays=()):
+        ords = {d.toordinal() if isinstance(d, date) else int(d) for d in holidays}
+        # 土日の休日は数えない
+        self.holidays = sorted(o for o in ords if (o - 1) % 7 < WORK_WEEKDAYS)
+        self._holiday_set = set(self.holidays)
+
+    def index(self, ordinal):
+        """ordinal より前の稼働日の数 + 1（ordinal が稼働日ならその日の通し番号）。"""
+        weeks, rem = divmod(ordinal - 1, 7)
+        return weeks * WORK_WEEKDAYS + min(rem, WORK_WEEKDAYS) - bisect_left(self.holidays, ordinal) + 1
+
+    def span(self, first, last):
+        """first 日から last 日まで（序数、両端を含む）の稼働日の通し番号の区間。稼働日が無ければ None。"""
+        lo, hi = self.index(first), self.index(last + 1) - 1
+        return (lo, hi) if lo <= hi else None
+
+    def workdays(self, first, last):
+        return self.index(last + 1) - self.index(first) if first <= last else 0
+
+    def is_workday(self, ordinal):
+        return (ordinal - 1) % 7 < WORK_WEEKDAYS and ordinal not in self._holiday_set
+
+    def next_workday(self, ordinal):
+        while not self.is_workday(ordinal):
+            ordinal += 1
+        return ordinal
+
+
+def remaining_hours(task):
+    """タスクの残り作業時間（時間）。"""
+    est = task.estimate_hours
+    if not est or est <= 0:
+        return 0.0
+    try:
+        progress = min(max(float(task.get("progress", 0) or 0), 0.0), 100.0)
+    except (TypeError, ValueError):
+        progress = 0.0
+    if progress >= 100:
+        return 0.0
+    if progress > 0:
+        return est * (1 - progress / 100)
+    try:
+        actual = float(task.get("actual_sec", 0) or 0) / 3600
+    except (TypeError, ValueError):
+        actual = 0.0
+    return max(est - actual, 0.0)
+
+
+class _Span:
+    __slots__ = ("worker", "category", "lo", "hi", "rate", "hours", "end", "first")
+
+    def __init__(self, worker, category, lo, hi, rate, hours, end, first):
+        self.worker = worker
+        self.category = category
+        self.lo = lo          # 割り付けた稼働日の区間（木の添字）
+        self.hi = hi
+        self.rate = rate      # 1 稼働日あたりの時間
+        self.hours = hours    # 残り作業時間
+        self.end = end        # 期限（序数）
+        self.first = first    # 割り付けの開始日（序数）
+
+
+class CapacityPlanner:
+    """担当者別・カテゴリ別の負荷をタスクの変更通知に合わせて差分で保持します。"""
+
+    def __init__(self, model, today=None, hours_per_day=HOURS_PER_DAY, holidays=()):
+        self.model = model
+        self.hours_per_day = hours_per_day
+        self.calendar = WorkCalendar(holidays)
+        self.today = (today or date.today()).toordinal()
+        self.by_worker = {}    # 担当者 -> RangeTotals
+        self.by_category = {}  # カテゴリ -> RangeTotals
+        self.total = None
+        self.spans = {}        # id -> _Span
+        self.starts = {}       # 担当者 -> SortedKeyList((割り付けの開始, id))
+        self._late = {}        # 担当者 -> 期限に間に合わないタスクの一覧（数え直すまでの結果）
+        self._base = 0         # 木の添字 = 稼働日の通し番号 - _base（今日が 1）
+        self._size = MIN_DAYS
+        self._build()
+        model.add_listener(self.on_change)
+
+    def _build(self):
+        self._base = self.calendar.index(self.today) - 1
+        self.spans = {}
+        for t in self.model.tasks.values():
+            s = self._span(t)
+            if s is not None:
+                self.spans[t.id] = s
+        last = max((s.hi for s in self.spans.values()), default=0)
+        size = MIN_DAYS
+        while size < last + 2:
+            size *= 2
+        self._size = size
+        by_worker, by_category, starts = {}, {}, {}
+        for tid, s in self.spans.items():
+            item = (s.lo, s.hi, s.rate)
+            by_worker.setdefault(s.worker, []).append(item)
+            by_category.setdefault(s.category, []).append(item)
+            starts.setdefault(s.worker, []).append((s.lo, tid))
+        self.by_worker = {k: RangeTotals(size, v) for k, v in by_worker.items()}
+        self.by_category = {k: RangeTotals(size, v) for k, v in by_category.items()}
+        self.total = RangeTotals(size, ((s.lo, s.hi, s.rate) for s in self.spans.values()))
+        self.starts = {k: SortedKeyList(v) for k, v in starts.items()}
+        self._late = {}
+
+    def set_today(self, today):
+        """基準日を変えて作り直します（日付が変わったとき用）。"""
+        self.today = today.toordinal()
+        self._build()
+
+    # --- 割り付け ---
+    def _span(self, task):
+        end = task.end_ordinal
+        if end is None:
+            return None
+        hours = remaining_hours(task)
+        if hours <= 0:
+            return None
+        start = task.start_ordinal
+        first = max(start if start is not None else self.today, self.today)
+        span = self.calendar.span(first, end)
+        if span is None:
+            # 期限を過ぎている・期間に稼働日が無い: 残りはすべて次の稼働日に積む
+            first = self.calendar.next_workday(max(self.today, min(first, end)))
+            lo = hi = self.calendar.index(first)
+        else:
+            lo, hi = span
+        base = self._base
+        return _Span(task.get("worker", "-"), task.get("category", "-"), lo - base, hi - base,
+                     hours / (hi - lo + 1), hours, end, first)
+
+    def _add(self, task):
+        s = self._span(task)
+        if s is None:
+            return
+        if s.hi + 2 > self._size:
+            # 木に入らない先の期限: 大きさを倍にして作り直す（このタスクも含まれる）
+            self._build()
+            return
+        self.spans[task.id] = s
+        self._bump(s, s.rate)
+        starts = self.starts.get(s.worker)
+        if starts is None:
+            starts = self.starts[s.worker] = SortedKeyList()
+        starts.add((s.lo, task.id))
+        self._late.pop(s.worker, None)
+
+    def _remove(self, tid):
+        s = self.spans.pop(tid, None)
+        if s is None:
+            return
+        self._bump(s, -s.rate)
+        self.starts[s.worker].remove((s.lo, tid))
+        self._late.pop(s.worker, None)
+
+    def _bump(self, s, rate):
+        worker = self.by_worker.get(s.worker)
+        if worker is None:
+            worker = self.by_worker[s.worker] = RangeTotals(self._size)
+        category = self.by_category.get(s.category)
+        if category is None:
+            category = self.by_category[s.category] = RangeTotals(self._size)
+        for totals in (worker, category, self.total):
+            totals.add(s.lo, s.hi, rate)
+
+    # --- タスクの変更通知 ---
+    def on_change(self, event, task, old):
+        if task is None:
+            return
+        if event == "add":
+            self._add(task)
+        elif event == "remove":
+            self._remove(task.id)
+        elif event == "update" and not PLAN_FIELDS.isdisjoint(old):
+            self._remove(task.id)
+            self._add(task)
+
+    # --- 期間の負荷 ---
+    def _range(self, first, last):
+        # 今日より前の日には割り付けが無いので、木の添字 1 より前は切り捨てる
+        base = self._base
+        return (max(self.calendar.index(first.toordinal()) - base, 1),
+                self.calendar.index(last.toordinal() + 1) - 1 - base)
+
+    def load(self, first, last, worker=None, category=None):
+        """first 日から last 日まで（date）に割り付けた残り作業時間。worker / category で絞り込めます。"""
+        if worker is not None:
+            totals = self.by_worker.get(worker)
+        elif category is not None:
+            totals = self.by_category.get(category)
+        else:
+            totals = self.total
+        lo, hi = self._range(first, last)
+        if totals is None or lo > hi:
+            return 0.0
+        return max(totals.between(lo, hi), 0.0)
+
+    def load_by(self, field, first, last):
+        """値 -> 負荷 の辞書。field は "worker" / "category"。"""
+        index = self.by_worker if field == "worker" else self.by_category
+        return {value: self.load(first, last, **{field: value}) for value in index}
+
+    def capacity(self, first, last):
+        """first 日から last 日まで（date）の 1 人あたりの稼働可能時間。"""
+        return self.calendar.workdays(first.toordinal(), last.toordinal()) * self.hours_per_day
+
+    def overloaded(self, first, last):
+        """期間の負荷が稼働可能時間を超える担当者の (担当者, 負荷, 稼働可能時間) を、負荷率の降順で返します。"""
+        cap = self.capacity(first, last)
+        rows = [(w, h, cap) for w, h in self.load_by("worker", first, last).items() if h > cap + 1e-9]
+        return sorted(rows, key=lambda r: r[1] / cap if cap else float("inf"), reverse=True)
+
+    def tasks_in(self, worker, first, last):
+        """期間に割り付けのある worker のタスク ID の一覧（割り付けの開始順）。"""
+        starts = self.starts.get(worker)
+        if starts is None:
+            return []
+        lo, hi = self._range(first, last)
+        if lo > hi:
+            return []
+        spans = self.spans
+        # 割り付けが hi 以前に始まるもののうち、lo 以降まで続くもの
+        return [tid for _, tid in starts.islice(0, starts.bisect_left((hi + 1,))) if spans[tid].hi >= lo]
+
+    # --- 期限 ---
+    def late_tasks(self, worker=None):
+        """期限に間に合わないタスクの (タスク ID, 不足する時間) の一覧を返します。
+
+        担当者ごとに期限の早い順に残り作業を積み上げ、今日から期限までの稼働可能時間を
+        超えた分を不足として数えます。worker を省略するとすべての担当者の分を返します。
+        """
+        workers = [worker] if worker is not None else list(self.starts)
+        out = []
+        for w in workers:
+            late = self._late.get(w)
+            if late is None:
+                late = self._late[w] = self._check(w)
+            out.extend(late)
+        return out
+
+    def _check(self, worker):
+        starts = self.starts.get(worker)
+        if starts is None:
+            return []
+        spans = self.spans
+        tids = sorted((tid for _, tid in starts), key=lambda tid: spans[tid].end)
+        today = self.today
+        base = self.calendar.index(today)
+        late, cum = [], 0.0
+        for tid in tids:
+            s = spans[tid]
+            cum += s.hours
+            # 今日から期限までの稼働日（期限を過ぎていれば 0）
+            available = max(self.calendar.index(s.end + 1) - base, 0) * self.hours_per_day
+            if cum > available + 1e-9:
+                late.append((tid, min(cum - available, s.hours)))
+        return late
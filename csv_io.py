@@ -0,0 +1,282 @@
+"""CSV へのエクスポート／インポート（タスク・作業時間のエントリ・材料費の明細）。
+
+どちらも 1 行ずつ流すジェネレータで、ファイル全体やデータ全体の写しをメモリに
+作りません。エクスポートはタスクを並び順に CHUNK 件ずつ、エントリは保存エンジンから
+順に読み出して一時ファイルへ書き、最後に置き換えます（途中で止めると元のファイルは残ります）。
+
+インポートは BATCH_SIZE 行ごとに日付・数値を検証して変更レコードにし、モデルへ
+適用してからバッチ単位で返します。呼び出し側はバッチごとに 1 回だけ保存すればよく、
+1 行ごとの保存や一覧の再描画は起きません。不正な行は読み飛ばし、行番号と理由を
+errors に残します。
+
+CSV の列（1 行目は見出し。列の順番は問いません）:
+    tasks      id, name, worker, estimate, start_date, end_date, category, actual_sec, progress, memo
+    time       task_id, start, end, sec
+    materials  task_id, name, price, qty, subtotal
+
+タスクは id が既存のタスクと一致すれば更新、それ以外は追加します（id が空なら新しく割り当てる）。
+メモの本文は set_memo レコードにして、タスクとは別に保存します（memo_store.py）。
+エントリは time_entry レコードとして取り込み、タスクの actual_sec は変えません
+（actual_sec はタスクの CSV に含まれるため）。材料費の明細は既存の明細の後ろに追加し、
+小計は単価 × 数量から計算し直します。
+"""
+import csv
+import functools
+import os
+from datetime import datetime
+
+from materials import from_minor, line_cost, make_line
+from memo_store import set_memo_record
+
+TASK_FIELDS = ("id", "name", "worker", "estimate", "start_date", "end_date", "category", "actual_sec", "progress", "memo")
+TIME_FIELDS = ("task_id", "start", "end", "sec")
+MATERIAL_FIELDS = ("task_id", "name", "price", "qty", "subtotal")
+FIELDS = {"tasks": TASK_FIELDS, "time": TIME_FIELDS, "materials": MATERIAL_FIELDS}
+# 見出しに必ず含まれていなければならない列
+REQUIRED = {"tasks": ("name",), "time": ("task_id", "start", "end"), "materials": ("task_id", "name", "price")}
+KIND_LABELS = {"tasks": "タスク", "time": "作業時間", "materials": "材料費"}
+
+DATE_FORMAT = "%Y/%m/%d"
+TIME_FORMAT = "%Y/%m/%d %H:%M:%S"
+# インポートで検証・保存をまとめて行う行数
+BATCH_SIZE = 5000
+# エクスポートでモデルから一度に取り出すタスク数
+CHUNK = 1000
+# errors に残す不正な行の件数（件数自体は error_count で数える）
+MAX_ERRORS = 100
+
+
+# --- エクスポート ---
+def _model_chunks(model):
+    # 位置で少しずつ取り出すので、UI で途中に変更が入っても反復が壊れない
+    pos = 0
+    while True:
+        chunk = model.window(pos, pos + CHUNK)
+        if not chunk:
+            return
+        yield from chunk
+        pos += len(chunk)
+
+
+def _task_rows(model, load_memo):
+    for t in _model_chunks(model):
+        # メモの本文は 1 件ずつ読む（memo_store.py）
+        memo = load_memo(t["memo_ref"]) if t.get("memo_ref") else t.get("memo", "")
+        yield [t.get("id", ""), t.get("name", ""), t.get("worker", ""), t.get("estimate", ""),
+               t.get("start_date", ""), t.get("end_date", ""), t.get("category", "-"),
+               t.get("actual_sec", 0), t.get("progress", 0), memo]
+
+
+def _time_rows(store):
+    for e in store.load_time_entries():
+        yield [e.task_id, _format_time(e.start), _format_time(e.end), e.sec]
+
+
+def _material_rows(model):
+    for t in _model_chunks(model):
+        for m in t.get("materials") or ():
+            # 小計は整数で計算し直した値を出す
+            yield [t["id"], m.get("name", ""), m.get("price", 0), m.get("qty", 0), from_minor(line_cost(m))]
+
+
+def _format_time(ts):
+    return datetime.fromtimestamp(ts).strftime(TIME_FORMAT)
+
+
+def export_csv(path, kind, model, store=None, every=BATCH_SIZE):
+    """kind（"tasks" / "time" / "materials"）を CSV に書き出すジェネレータ。
+
+    every 行ごとと最後に、それまでに書いた行数を返します。"time" のエントリと
+    "tasks" のメモの本文は store から読みます。
+    ファイルは Excel でも開けるよう BOM 付きの UTF-8 で書きます。
+    """
+    if kind == "time":
+        rows = _time_rows(store)
+    elif kind == "tasks":
+        rows = _task_rows(model, store.load_memo)
+    else:
+        rows = _material_rows(model)
+    tmp = path + ".tmp"
+    done = False
+    try:
+        with open(tmp, "w", encoding="utf-8-sig", newline="") as f:
+            writer = csv.writer(f)
+            writer.writerow(FIELDS[kind])
+            n = 0
+            for row in rows:
+                writer.writerow(row)
+                n += 1
+                if n % every == 0:
+                    yield n
+        os.replace(tmp, path)
+        done = True
+        yield n
+    finally:
+        # 途中で止めた（close() された）場合は書きかけのファイルを消す
+        if not done and os.path.exists(tmp):
+            os.remove(tmp)
+
+
+# --- インポート ---
+@functools.lru_cache(maxsize=4096)
+def _parse_date(value):
+    # 同じ日付が何度も現れるので、検証の結果を覚えておく
+    try:
+        return datetime.strptime(value, DATE_FORMAT).strftime(DATE_FORMAT)
+    except ValueError:
+        raise ValueError(f"日付は YYYY/MM/DD 形式で入力してください: {value!r}") from None
+
+
+def _parse_time(value):
+    try:
+        return datetime.strptime(value, TIME_FORMAT).timestamp()
+    except ValueError:
+        raise ValueError(f"日時は YYYY/MM/DD HH:MM:SS 形式で入力してください: {value!r}") from None
+
+
+def _parse_int(value, name, lo=0, hi=None):
+    try:
+        n = int(float(value)) if value else 0
+    except ValueError:
+        raise ValueError(f"{name} は数値で入力してください: {value!r}") from None
+    if n < lo or (hi is not None and n > hi):
+        raise ValueError(f"{name} の値が範囲外です: {value!r}")
+    return n
+
+
+class CsvImporter:
+    """CSV を 1 行ずつ読み、検証した変更レコードをバッチで返します。
+
+    importer.batches() の各バッチは TaskModel に適用済みのレコードのリストで、
+    そのまま保存エンジン（または StoreWriter）に渡せます。
+    """
+
+    def __init__(self, path, kind, model, batch_size=BATCH_SIZE):
+        if kind not in FIELDS:
+            raise ValueError(f"unknown kind: {kind!r}")
+        self.path = path
+        self.kind = kind
+        self.model = model
+        self.batch_size = batch_size
+        self.total_bytes = os.path.getsize(path)
+        self.bytes_read = 0
+        self.rows = 0        # 読んだデータ行の数
+        self.imported = 0    # 取り込んだ行の数
+        self.error_count = 0
+        self.errors = []     # (行番号, 理由)。先頭の MAX_ERRORS 件のみ
+
+    @property
+    def progress(self):
+        """読み終えた割合（0.0〜1.0）。"""
+        return self.bytes_read / self.total_bytes if self.total_bytes else 1.0
+
+    def _lines(self):
+        # バイト数で進み具合を数えるため、バイナリで読んで 1 行ずつ復号する
+        with open(self.path, "rb") as f:
+            first = True
+            for raw in f:
+                self.bytes_read += len(raw)
+                if first:
+                    raw = raw[3:] if raw.startswith(b"\xef\xbb\xbf") else raw
+                    first = False
+                yield raw.decode("utf-8")
+
+    def batches(self):
+        reader = csv.reader(self._lines())
+        header = [h.strip() for h in next(reader, [])]
+        missing = [c for c in REQUIRED[self.kind] if c not in header]
+        if missing:
+            raise ValueError(f"{KIND_LABELS[self.kind]}の CSV に必要な列がありません: {', '.join(missing)}")
+        columns = [(name, header.index(name)) for name in FIELDS[self.kind] if name in header]
+        convert = getattr(self, f"_{self.kind}_records")
+        batch = []
+        for row in reader:
+            if not any(row):
+                continue
+            self.rows += 1
+            values = {name: row[i] if i < len(row) else "" for name, i in columns}
+            # メモ以外は前後の空白を無視する
+            values.update((k, v.strip()) for k, v in values.items() if k != "memo")
+            batch.append((reader.line_num, values))
+            if len(batch) >= self.batch_size:
+                yield self._convert(batch, convert)
+                batch = []
+        if batch:
+            yield self._convert(batch, convert)
+
+    def _convert(self, batch, convert):
+        records = []
+        for line, values in batch:
+            try:
+                recs = convert(values)
+            except (ValueError, ArithmeticError) as e:
+                self.error_count += 1
+                if len(self.errors) < MAX_ERRORS:
+                    self.errors.append((line, str(e)))
+                continue
+            for rec in recs:
+                self.model.apply(rec)
+            records.extend(recs)
+            self.imported += 1
+        return records
+
+    def _task(self, tid):
+        task = self.model.get(tid)
+        if task is None:
+            raise ValueError(f"タスクが見つかりません: {tid!r}")
+        return task
+
+    def _tasks_records(self, v):
+        if not v.get("name"):
+            raise ValueError("タスク名は必須です")
+        fields = {"name": v["name"]}
+        for key in ("worker", "estimate", "category"):
+            if key in v:
+                fields[key] = v[key] or ("0" if key == "estimate" else "-")
+        if fields.get("estimate"):
+            _parse_int(fields["estimate"], "予定")
+        for key in ("start_date", "end_date"):
+            if v.get(key):
+                fields[key] = _parse_date(v[key])
+        if "actual_sec" in v:
+            fields["actual_sec"] = _parse_int(v["actual_sec"], "actual_sec")
+        if "progress" in v:
+            fields["progress"] = _parse_int(v["progress"], "進捗", 0, 100)
+        records = []
+        category = fields.get("category")
+        if category and category not in self.model.categories:
+            records.append({"op": "add_category", "name": category})
+        tid = v.get("id")
+        task = self.model.get(tid) if tid else None
+        if task is not None:
+            # 変わったフィールドだけを書き換える
+            rec = self.model.update_task_record(tid, fields)
+            if rec is not None:
+                records.append(rec)
+        else:
+            fields = dict({"worker": "-", "estimate": "0", "category": "-", "actual_sec": 0, "progress": 0}, **fields)
+            rec = self.model.add_task_record(fields)
+            if tid:
+                rec["task"]["id"] = tid
+            records.append(rec)
+            tid = rec["task"]["id"]
+        # メモの本文はブロブとして別に保存する（変わっていなければ書かない）
+        if "memo" in v:
+            memo = set_memo_record(tid, v["memo"])
+            if memo["ref"] != (task or {}).get("memo_ref", ""):
+                records.append(memo)
+        return records
+
+    def _time_records(self, v):
+        tid = self._task(v["task_id"])["id"]
+        start, end = _parse_time(v["start"]), _parse_time(v["end"])
+        if end < start:
+            raise ValueError("終了が開始より前です")
+        sec = _parse_int(v["sec"], "sec") if v.get("sec") else int(end - start)
+        return [{"op": "time_entry", "id": tid, "start": start, "end": end, "sec": sec}]
+
+    def _materials_records(self, v):
+        task = self._task(v["task_id"])
+        line = make_line(v["name"], v["price"] or 0, v.get("qty") or 1)
+        pos = len(task.get("materials") or [])
+        return [{"op": "set_material", "id": task["id"], "pos": pos, "line": line}]
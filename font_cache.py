@@ -0,0 +1,149 @@
+"""グラフ用の日本語フォントの解決と matplotlib の事前読み込み。
+
+fm.findSystemFonts() はシステムのフォントファイルをすべて列挙するため、フォントの多い
+環境では数秒かかります。解決したフォントのパスとファミリー名をディスクにキャッシュし、
+フォントディレクトリの更新時刻から作った指紋が変わらない限り再利用します。
+
+warm_up_in_background() は matplotlib / numpy の import とフォントの解決を
+バックグラウンドのスレッドで済ませておき、最初にグラフを開くときの待ち時間をなくします。
+"""
+import hashlib
+import json
+import os
+import sys
+import threading
+
+FONT_CANDIDATES = ['Meiryo', 'Yu Gothic', 'MS Gothic', 'Noto Sans CJK JP', 'IPAPGothic', 'TakaoPGothic']
+CACHE_VERSION = 1
+
+_lock = threading.Lock()
+_resolved = False
+_font = None  # (フォントファイルのパス, ファミリー名) または None
+
+
+def cache_path():
+    if sys.platform == "win32":
+        base = os.environ.get("LOCALAPPDATA") or os.path.expanduser("~")
+    else:
+        base = os.environ.get("XDG_CACHE_HOME") or os.path.join(os.path.expanduser("~"), ".cache")
+    return os.path.join(base, "task-manager", "font_cache.json")
+
+
+def font_dirs():
+    """matplotlib がフォントを探すディレクトリ（存在するもののみ）。"""
+    home = os.path.expanduser("~")
+    if sys.platform == "win32":
+        windir = os.environ.get("WINDIR", r"C:\Windows")
+        dirs = [os.path.join(windir, "Fonts")]
+        if os.environ.get("LOCALAPPDATA"):
+            dirs.append(os.path.join(os.environ["LOCALAPPDATA"], "Microsoft", "Windows", "Fonts"))
+    elif sys.platform == "darwin":
+        dirs = ["/Library/Fonts", "/System/Library/Fonts", "/Network/Library/Fonts",
+                os.path.join(home, "Library", "Fonts")]
+    else:
+        dirs = ["/usr/share/fonts", "/usr/local/share/fonts", "/usr/X11R6/lib/X11/fonts/TTF",
+                os.path.join(home, ".fonts"), os.path.join(home, ".local", "share", "fonts")]
+    return [d for d in dirs if os.path.isdir(d)]
+
+
+def fingerprint(dirs=None):
+    """フォントディレクトリ（サブディレクトリを含む）の更新時刻から指紋を作ります。
+
+    フォントの追加・削除でディレクトリの更新時刻が変わるので、ファイル自体は調べません。
+    """
+    h = hashlib.sha1()
+    for top in dirs if dirs is not None else font_dirs():
+        for path, _, _ in os.walk(top):
+            try:
+                h.update(f"{path}\0{os.stat(path).st_mtime_ns}\n".encode("utf-8", "surrogateescape"))
+            except OSError:
+                pass
+    return h.hexdigest()
+
+
+def _read_cache(path, fp):
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+    except (OSError, ValueError):
+        return False, None
+    if data.get("version") != CACHE_VERSION or data.get("fingerprint") != fp:
+        return False, None
+    font = data.get("font")
+    if font is None:
+        return True, None
+    if not os.path.exists(font[0]):
+        return False, None
+    return True, tuple(font)
+
+
+def _write_cache(path, fp, font):
+    try:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp = path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump({"version": CACHE_VERSION, "fingerprint": fp, "font": font}, f, ensure_ascii=False)
+        os.replace(tmp, path)
+    except OSError:
+        pass
+
+
+def _scan():
+    import matplotlib.font_manager as fm
+    candidates = [c.lower() for c in FONT_CANDIDATES]
+    for fpath in fm.findSystemFonts():
+        name = fpath.lower()
+        if any(c in name for c in candidates):
+            try:
+                return fpath, fm.FontProperties(fname=fpath).get_name()
+            except Exception:
+                # 読めない候補は飛ばして次を試す
+                continue
+    return None
+
+
+def resolve_japanese_font():
+    """日本語を表示できるフォントの (パス, ファミリー名) を返します。見つからなければ None。"""
+    global _resolved, _font
+    with _lock:
+        if not _resolved:
+            path = cache_path()
+            fp = fingerprint()
+            hit, font = _read_cache(path, fp)
+            if not hit:
+                font = _scan()
+                _write_cache(path, fp, list(font) if font else None)
+            _font = font
+            _resolved = True
+        return _font
+
+
+def apply_japanese_font():
+    """解決したフォントを matplotlib の既定のフォントに設定します。"""
+    import matplotlib
+    font = resolve_japanese_font()
+    if font is None:
+        return
+    family = font[1]
+    matplotlib.rcParams['font.family'] = 'sans-serif'
+    rest = [f for f in matplotlib.rcParams.get('font.sans-serif', []) if f != family]
+    matplotlib.rcParams['font.sans-serif'] = [family] + rest
+
+
+def _warm_up():
+    try:
+        import numpy  # noqa: F401
+        import matplotlib.pyplot  # noqa: F401
+        import matplotlib.font_manager  # noqa: F401  フォント一覧のキャッシュもここで作られる
+        from matplotlib.backends import backend_tkagg  # noqa: F401
+        resolve_japanese_font()
+    except Exception:
+        # 失敗してもグラフを開くときに改めて読み込み、そこでエラーを表示する
+        pass
+
+
+def warm_up_in_background():
+    """グラフ表示に必要な読み込みをバックグラウンドのスレッドで始めます。"""
+    thread = threading.Thread(target=_warm_up, name="graph-warm-up", daemon=True)
+    thread.start()
+    return thread
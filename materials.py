@@ -0,0 +1,151 @@
+"""材料費の明細と集計（v25 形式の "materials"）。
+
+各タスクの "materials" は {"name", "price", "qty", "subtotal"} の配列で、ファイル上は
+従来どおりの数値で保存します。計算はすべて整数で行い、金額は最小単位
+（MINOR_UNIT 分の 1 円）、数量は QTY_SCALE 分の 1 単位の整数に直してから扱うので、
+小数の丸め誤差で合計がずれることはありません。
+
+明細 1 行の変更は set_material / delete_material レコードで表し、MaterialLedger は
+その差分だけでタスク・タスク名・カテゴリ・作業者ごとの合計を O(1) で更新します。
+"""
+from decimal import Decimal, ROUND_HALF_UP
+
+MINOR_UNIT = 100   # 金額の最小単位（1 円 = 100）
+QTY_SCALE = 1000   # 数量の最小単位（0.001）
+
+
+def _to_scaled(value, scale):
+    if isinstance(value, int):
+        return value * scale
+    if isinstance(value, float):
+        # 小数 2〜3 桁までの値なら round() で正確に戻る
+        return round(value * scale)
+    if value in (None, ""):
+        return 0
+    return int((Decimal(str(value).replace(",", "")) * scale).to_integral_value(ROUND_HALF_UP))
+
+
+def _from_scaled(n, scale):
+    # 割り切れるなら整数、そうでなければ小数としてファイルに書く（v25 形式と互換）
+    if n % scale == 0:
+        return n // scale
+    return float(Decimal(n) / scale)
+
+
+def to_minor(amount):
+    """金額（円）を最小単位の整数にします。"""
+    return _to_scaled(amount, MINOR_UNIT)
+
+
+def from_minor(minor):
+    return _from_scaled(minor, MINOR_UNIT)
+
+
+def to_qty(qty):
+    return _to_scaled(qty, QTY_SCALE)
+
+
+def from_qty(n):
+    return float(Decimal(n) / QTY_SCALE)
+
+
+def line_subtotal(price_minor, qty_scaled):
+    """単価 × 数量（最小単位、四捨五入）。"""
+    n = price_minor * qty_scaled
+    q, r = divmod(abs(n), QTY_SCALE)
+    if r * 2 >= QTY_SCALE:
+        q += 1
+    return q if n >= 0 else -q
+
+
+def make_line(name, price, qty):
+    """入力値から v25 形式の明細 1 行を作ります。小計は整数で計算し直します。"""
+    price_minor = to_minor(price)
+    qty_scaled = to_qty(qty)
+    return {"name": name, "price": from_minor(price_minor), "qty": from_qty(qty_scaled),
+            "subtotal": from_minor(line_subtotal(price_minor, qty_scaled))}
+
+
+def line_cost(line):
+    """明細 1 行の小計（最小単位）。小計が無い行は単価 × 数量から求めます。"""
+    if line.get("subtotal") is not None:
+        return to_minor(line["subtotal"])
+    return line_subtotal(to_minor(line.get("price", 0)), to_qty(line.get("qty", 0)))
+
+
+def format_amount(minor):
+    """表示用の金額（"¥1,234" / 端数があれば "¥1,234.50"）。"""
+    sign = "-" if minor < 0 else ""
+    major, frac = divmod(abs(minor), MINOR_UNIT)
+    if frac:
+        return f"{sign}¥{major:,}.{frac:02}"
+    return f"{sign}¥{major:,}"
+
+
+class MaterialLedger:
+    """材料費の合計をタスクの変更通知に合わせて差分で保持します。"""
+
+    GROUPS = ("name", "category", "worker")
+
+    def __init__(self, model):
+        self.model = model
+        self.by_task = {}  # id -> 合計（最小単位）
+        self.totals = {field: {} for field in self.GROUPS}  # フィールド -> 値 -> 合計
+        self.total = 0
+        self._keys = {}    # id -> 集計に使った (name, category, worker)
+        for t in model.tasks.values():
+            self._add_task(t)
+        model.add_listener(self.on_change)
+
+    @staticmethod
+    def _key(task):
+        return (task.get("name", "-"), task.get("category", "-"), task.get("worker", "-"))
+
+    def _bump(self, key, delta):
+        if not delta:
+            return
+        for field, value in zip(self.GROUPS, key):
+            group = self.totals[field]
+            group[value] = group.get(value, 0) + delta
+        self.total += delta
+
+    def _add_task(self, task):
+        tid = task["id"]
+        cost = sum(line_cost(m) for m in task.get("materials") or ())
+        key = self._key(task)
+        self.by_task[tid] = cost
+        self._keys[tid] = key
+        self._bump(key, cost)
+
+    def _remove_task(self, tid):
+        cost = self.by_task.pop(tid, 0)
+        self._bump(self._keys.pop(tid), -cost)
+
+    # --- 差分更新 ---
+    def on_change(self, event, task, old):
+        if task is None:
+            return
+        tid = task["id"]
+        if event == "add":
+            self._add_task(task)
+        elif event == "remove":
+            self._remove_task(tid)
+        elif event == "material":
+            # 明細 1 行の変更: 差額だけを足す
+            delta = (line_cost(old["new"]) if old["new"] else 0) - (line_cost(old["old"]) if old["old"] else 0)
+            self.by_task[tid] += delta
+            self._bump(self._keys[tid], delta)
+        elif event == "update":
+            if "materials" in old:
+                self._remove_task(tid)
+                self._add_task(task)
+            elif {"name", "category", "worker"} & old.keys():
+                # 集計先が変わるだけなので、このタスクの合計を移し替える
+                cost = self.by_task[tid]
+                self._bump(self._keys[tid], -cost)
+                self._keys[tid] = self._key(task)
+                self._bump(self._keys[tid], cost)
+
+    def ranking(self, field):
+        """(値, 合計) の一覧を合計の降順で返します。field は "name" / "category" / "worker"。"""
+        return sorted(((k, v) for k, v in self.totals[field].items() if v), key=lambda kv: kv[1], reverse=True)
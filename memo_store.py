@@ -0,0 +1,130 @@
+"""タスクのメモ（作業記録）をタスク本体とは別に保存するブロブストア。
+
+メモの本文は SHA-256 を名前にしたブロブとして保存し、タスクには "memo_ref"（本文のハッシュ。
+空のメモは "" またはキー無し）だけを持たせます。スナップショットやジャーナルにはメモの本文が
+入らないので、起動時の読み込みやメモ以外の保存のコストはメモの量によらなくなります。
+
+メモの変更は {"op": "set_memo", "id", "ref", "text"} レコードで表します。TaskModel は
+"memo_ref" だけを書き換え、保存エンジンは本文をブロブとして書いてから text を除いた
+レコードを保存します。同じ本文は同じブロブになるので、書き直しても増えません。
+
+本文は画面でタスクを選んだときに MemoCache（小さな LRU）を通して読み込みます。
+
+    JournalStore  "<データファイル>.memos/<ハッシュの先頭 2 文字>/<ハッシュ>"
+    SqliteStore   memos テーブル
+
+本文をタスクに直接持つ従来のファイル（"memo"）は、読み込み時に externalize_memos() で移行します。
+"""
+import hashlib
+import os
+from collections import OrderedDict
+
+MEMOS_SUFFIX = ".memos"
+# 画面で読み込んだメモを覚えておく件数
+MEMO_CACHE_SIZE = 32
+# これより新しいブロブは掃除しない（畳み込み中に書かれたメモの参照はまだスナップショットに無いため）
+GC_GRACE_SEC = 60
+
+
+def memo_ref(text):
+    """メモの本文からブロブの名前（SHA-256）を作ります。空のメモは ""。"""
+    return hashlib.sha256(text.encode("utf-8")).hexdigest() if text else ""
+
+
+def set_memo_record(tid, text):
+    return {"op": "set_memo", "id": tid, "ref": memo_ref(text), "text": text}
+
+
+def externalize_memos(model, write):
+    """タスクに直接入っているメモの本文を write(ref, text) で保存し、"memo_ref" に置き換えます。
+
+    置き換えたタスクの件数を返します（0 でなければスナップショットを書き直してください）。
+    """
+    n = 0
+    for t in model.tasks.values():
+        if "memo" not in t:
+            continue
+        text = t.pop("memo") or ""
+        if text:
+            ref = memo_ref(text)
+            write(ref, text)
+            t["memo_ref"] = ref
+        n += 1
+    return n
+
+
+class FileBlobStore:
+    """1 ブロブ = 1 ファイルの保存先（JournalStore 用）。"""
+
+    def __init__(self, dir_path):
+        self.dir_path = dir_path
+
+    def _path(self, ref):
+        return os.path.join(self.dir_path, ref[:2], ref)
+
+    def read(self, ref):
+        try:
+            with open(self._path(ref), "r", encoding="utf-8") as f:
+                return f.read()
+        except FileNotFoundError:
+            raise KeyError(ref) from None
+
+    def write(self, ref, text):
+        path = self._path(ref)
+        if os.path.exists(path):
+            # 同じ本文がすでにある。掃除の対象にならないよう更新時刻だけを進める
+            os.utime(path)
+            return
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp = path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            f.write(text)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, path)
+
+    def collect_garbage(self, referenced, before):
+        """referenced に無く、更新時刻が before より古いブロブを削除します。削除した件数を返します。"""
+        removed = 0
+        if not os.path.isdir(self.dir_path):
+            return removed
+        for sub in os.scandir(self.dir_path):
+            if not sub.is_dir():
+                continue
+            for entry in os.scandir(sub.path):
+                if entry.name in referenced:
+                    continue
+                try:
+                    if entry.stat().st_mtime < before:
+                        os.remove(entry.path)
+                        removed += 1
+                except OSError:
+                    pass
+        return removed
+
+
+class MemoCache:
+    """load(ref) で読み込んだメモの本文を最近使った順に size 件まで覚えておきます。"""
+
+    def __init__(self, load, size=MEMO_CACHE_SIZE):
+        self.load = load
+        self.size = size
+        self._items = OrderedDict()
+
+    def get(self, ref):
+        if not ref:
+            return ""
+        text = self._items.get(ref)
+        if text is None:
+            text = self.load(ref)
+        self.put(ref, text)
+        return text
+
+    def put(self, ref, text):
+        """保存したばかりのメモを入れておきます（書き込みを待たずに読めるように）。"""
+        if not ref:
+            return
+        self._items[ref] = text
+        self._items.move_to_end(ref)
+        while len(self._items) > self.size:
+            self._items.popitem(last=False)
@@ -0,0 +1,197 @@
+"""処理時間の計測（スパン）と、イベントループの遅れの記録。
+
+アプリの主な処理は tracer.traced("名前") で包んでおき、計測を有効にしたときだけ
+処理時間をスパンとして記録します。無効のときは有効かどうかを 1 回見て元の関数を
+呼ぶだけなので、ふだんの動作はほとんど遅くなりません。
+
+スパンごとに対数目盛りのヒストグラム（Histogram）を持ち、件数によらず一定のメモリで
+パーセンタイルを求めます。直近のスパンは MAX_EVENTS 件まで保持し、Chrome のトレース形式
+（chrome://tracing や Perfetto で開ける JSON）に書き出せます。
+
+LoopLagMonitor は root.after() のコールバックが予定よりどれだけ遅れて呼ばれたかを測り、
+"event_loop_lag" として記録します（UI が固まっていた時間の目安）。
+
+    TASK_MANAGER_TRACE=1 python scheduler.py   # 起動時から計測する
+"""
+import functools
+import json
+import math
+import os
+import threading
+import time
+from collections import deque
+
+# 保持する直近のスパンの件数（Chrome トレースに書き出す分）
+MAX_EVENTS = 100000
+# ヒストグラムの目盛り: 1 µs から 2 倍ごとに BUCKETS_PER_OCTAVE 分割（誤差は約 9%）
+BUCKETS_PER_OCTAVE = 8
+MAX_BUCKET = BUCKETS_PER_OCTAVE * 32
+# イベントループの遅れを測る間隔（ミリ秒）
+LAG_INTERVAL_MS = 100
+LOOP_LAG = "event_loop_lag"
+
+
+class Histogram:
+    """処理時間（秒）の分布。"""
+
+    __slots__ = ("counts", "count", "total", "max")
+
+    def __init__(self):
+        self.counts = [0] * (MAX_BUCKET + 1)
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def add(self, sec):
+        us = sec * 1e6
+        i = int(math.log2(us) * BUCKETS_PER_OCTAVE) + 1 if us >= 1 else 0
+        self.counts[min(i, MAX_BUCKET)] += 1
+        self.count += 1
+        self.total += sec
+        if sec > self.max:
+            self.max = sec
+
+    def percentile(self, p):
+        """p（0〜100）パーセンタイルの秒数。目盛りの上端を返すので、実際の値より最大で約 9% 大きくなります。"""
+        if not self.count:
+            return 0.0
+        rank = math.ceil(self.count * p / 100) or 1
+        seen = 0
+        for i, c in enumerate(self.counts):
+            seen += c
+            if seen >= rank:
+                upper = 2 ** (i / BUCKETS_PER_OCTAVE) / 1e6 if i else 1e-6
+                return min(upper, self.max)
+        return self.max
+
+
+class _NullSpan:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NULL_SPAN = _NullSpan()
+
+
+class _Span:
+    __slots__ = ("tracer", "name", "start")
+
+    def __init__(self, tracer, name):
+        self.tracer = tracer
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.tracer.record(self.name, self.start, time.perf_counter() - self.start)
+        return False
+
+
+class Tracer:
+    def __init__(self, max_events=MAX_EVENTS):
+        self.enabled = False
+        self.histograms = {}
+        self.events = deque(maxlen=max_events)  # (名前, 開始, 秒数, スレッド ID)
+        self._lock = threading.Lock()
+        self._origin = time.perf_counter()
+
+    def span(self, name):
+        """with tracer.span("名前"): の範囲を計測します（無効なら何もしません）。"""
+        if not self.enabled:
+            return _NULL_SPAN
+        return _Span(self, name)
+
+    def traced(self, name=None):
+        """関数（メソッド）の呼び出しを計測するデコレータ。"""
+        def decorate(fn):
+            label = name or fn.__name__
+
+            @functools.wraps(fn)
+            def wrapper(*args, **kwargs):
+                if not self.enabled:
+                    return fn(*args, **kwargs)
+                start = time.perf_counter()
+                try:
+                    return fn(*args, **kwargs)
+                finally:
+                    self.record(label, start, time.perf_counter() - start)
+            return wrapper
+        return decorate
+
+    def record(self, name, start, sec):
+        # 保存のスレッドからも記録されるのでロックを取る
+        with self._lock:
+            h = self.histograms.get(name)
+            if h is None:
+                h = self.histograms[name] = Histogram()
+            h.add(sec)
+            self.events.append((name, start, sec, threading.get_ident()))
+
+    def reset(self):
+        with self._lock:
+            self.histograms = {}
+            self.events.clear()
+
+    def summary(self, percentiles=(50, 90, 99)):
+        """(名前, 回数, パーセンタイルの秒数..., 最大) の一覧を合計時間の降順で返します。"""
+        with self._lock:
+            items = sorted(self.histograms.items(), key=lambda kv: kv[1].total, reverse=True)
+            return [(name, h.count) + tuple(h.percentile(p) for p in percentiles) + (h.max,) for name, h in items]
+
+    def export_chrome_trace(self, path):
+        """直近のスパンを Chrome のトレース形式で書き出します。書き出した件数を返します。"""
+        with self._lock:
+            events = list(self.events)
+        pid = os.getpid()
+        trace = [{"name": name, "cat": "lag" if name == LOOP_LAG else "app", "ph": "X", "pid": pid, "tid": tid,
+                  "ts": round((start - self._origin) * 1e6, 1), "dur": round(sec * 1e6, 1)}
+                 for name, start, sec, tid in events]
+        tmp = path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump({"traceEvents": trace, "displayTimeUnit": "ms"}, f, ensure_ascii=False)
+        os.replace(tmp, path)
+        return len(trace)
+
+
+class LoopLagMonitor:
+    """root.after(interval) のコールバックが予定よりどれだけ遅れたかを記録します。"""
+
+    def __init__(self, root, tracer, interval_ms=LAG_INTERVAL_MS):
+        self.root = root
+        self.tracer = tracer
+        self.interval = interval_ms / 1000
+        self._job = None
+        self._due = None
+
+    @property
+    def running(self):
+        return self._job is not None
+
+    def start(self):
+        if self._job is None:
+            self._schedule()
+
+    def stop(self):
+        if self._job is not None:
+            self.root.after_cancel(self._job)
+            self._job = None
+
+    def _schedule(self):
+        self._due = time.perf_counter() + self.interval
+        self._job = self.root.after(int(self.interval * 1000), self._tick)
+
+    def _tick(self):
+        now = time.perf_counter()
+        # 遅れた区間を、本来呼ばれるはずだった時刻からのスパンとして残す
+        self.tracer.record(LOOP_LAG, self._due, max(now - self._due, 0.0))
+        self._schedule()
+
+
+# アプリ全体で共有する計測器
+tracer = Tracer()
+tracer.enabled = os.environ.get("TASK_MANAGER_TRACE", "") not in ("", "0")
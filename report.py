@@ -0,0 +1,256 @@
+"""画面を出さずに作るレポート（担当者別・カテゴリ別のグラフと集計表）。
+
+    python scheduler.py report 出力先 [--month 2025-12] [--format png svg pdf] [--jobs N]
+
+グラフは「タスク別グラフ」と同じ積み上げ棒グラフ（task_chart.StackedBarChart）を
+matplotlib の Agg で描きます。全体・担当者ごと（内訳はカテゴリ）・カテゴリごと（内訳は担当者）の
+グラフを作り、集計表とあわせて出力先の index.html から一覧できるようにします。
+
+集計はすべて親プロセスで済ませ、グラフ 1 枚分の集計結果（ChartJob: ラベル × 内訳の時間の表）
+だけを ProcessPoolExecutor のワーカーへ渡します。ワーカーはタスクのデータを持たず、
+matplotlib の読み込みとフォントの設定もワーカーごとに 1 回だけなので、枚数が多いときの
+所要時間はほぼコア数に反比例します。
+
+--month を指定するとその月の作業時間のエントリ（time_log.py）から集計し、
+指定しなければタスクの累計（actual_sec）で集計します。
+"""
+import html
+import os
+import time
+import warnings
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import date, datetime
+
+from time_log import split_by_day
+
+FORMATS = ("png", "svg", "pdf")
+# 1 枚のグラフに出すタスク名の数（残りは「その他」にまとめる）
+TOP_N = 40
+OTHERS = "その他"
+# グラフの幅（インチ）。タスク名 1 つあたりの幅と上限
+INCH_PER_BAR = 0.6
+MAX_WIDTH_IN = 30
+DPI = 100
+CHARTS_DIR = "charts"
+
+# name: ファイル名（拡張子なし）、matrix: 内訳 × ラベルの時間（時間単位）、colors: 内訳ごとの色番号（tab20）
+ChartJob = namedtuple("ChartJob", "name title legend_title labels stacks matrix colors")
+
+
+def format_seconds(seconds):
+    hrs, rem = divmod(int(seconds), 3600)
+    mins, secs = divmod(rem, 60)
+    return f"{hrs:02}:{mins:02}:{secs:02}"
+
+
+def parse_month(text):
+    """"2025-12" / "2025/12" を (月初, 月末) の date にします。"""
+    try:
+        d = datetime.strptime(text.replace("/", "-"), "%Y-%m").date()
+    except ValueError:
+        raise ValueError(f"月は YYYY-MM の形式で指定してください: {text!r}") from None
+    nxt = date(d.year + d.month // 12, d.month % 12 + 1, 1)
+    return d, date.fromordinal(nxt.toordinal() - 1)
+
+
+# --- 集計（親プロセス） ---
+def seconds_by_task(model, entries=None, month=None):
+    """タスク ID -> 秒数。month（(月初, 月末)）を指定すると entries のうちその月の分だけを数えます。"""
+    if month is None:
+        return {tid: int(t.get("actual_sec", 0) or 0) for tid, t in model.tasks.items()}
+    first, last = month[0].toordinal(), month[1].toordinal()
+    out = {}
+    for e in entries or ():
+        if e.task_id not in model.tasks:
+            continue
+        for day, sec in split_by_day(e.start, e.end):
+            if first <= day <= last:
+                out[e.task_id] = out.get(e.task_id, 0) + sec
+    return out
+
+
+def _chart(name, title, legend_title, cells, stacks, color_of):
+    # cells: (ラベル, 内訳) -> 秒数。合計の多い TOP_N 件だけを残して残りは「その他」にまとめる
+    totals = {}
+    for (label, _), sec in cells.items():
+        totals[label] = totals.get(label, 0) + sec
+    labels = sorted(totals, key=lambda k: (-totals[k], k))
+    if len(labels) > TOP_N:
+        kept = set(labels[:TOP_N - 1])
+        labels = labels[:TOP_N - 1] + [OTHERS]
+    else:
+        kept = None
+    present = {s for _, s in cells}
+    used = [s for s in stacks if s in present]
+    col = {label: j for j, label in enumerate(labels)}
+    matrix = [[0.0] * len(labels) for _ in used]
+    row = {s: i for i, s in enumerate(used)}
+    for (label, stack), sec in cells.items():
+        j = col[label] if kept is None or label in kept else col[OTHERS]
+        matrix[row[stack]][j] += sec / 3600.0
+    return ChartJob(name, title, legend_title, labels, used, matrix, [color_of(s) for s in used])
+
+
+def build_report(model, seconds):
+    """(グラフの一覧, 担当者別の集計表, カテゴリ別の集計表) を作ります。
+
+    集計表の行は (値, タスク数, 完了数, 予定の合計（時間）, 作業時間の合計（秒）) です。
+    """
+    categories = list(model.categories)
+    workers = sorted({t.get("worker", "-") for t in model.tasks.values()})
+    cat_color = {c: i for i, c in enumerate(categories)}
+    worker_color = {w: i for i, w in enumerate(workers)}
+
+    overall, by_worker, by_category = {}, {}, {}
+    tables = {"worker": {}, "category": {}}
+    for tid, t in model.tasks.items():
+        name, worker, cat = t.get("name", "-"), t.get("worker", "-"), t.get("category", "-")
+        sec = seconds.get(tid, 0)
+        for field, value in (("worker", worker), ("category", cat)):
+            row = tables[field].setdefault(value, [value, 0, 0, 0.0, 0])
+            row[1] += 1
+            row[2] += (t.get("progress") == 100)
+            row[3] += t.estimate_hours or 0
+            row[4] += sec
+        if not sec:
+            continue
+        overall[(name, cat)] = overall.get((name, cat), 0) + sec
+        cells = by_worker.setdefault(worker, {})
+        cells[(name, cat)] = cells.get((name, cat), 0) + sec
+        cells = by_category.setdefault(cat, {})
+        cells[(name, worker)] = cells.get((name, worker), 0) + sec
+    if any(c not in cat_color for _, c in overall):
+        # カテゴリ一覧に無いカテゴリ（削除済みなど）も内訳に出す
+        for _, c in overall:
+            cat_color.setdefault(c, len(cat_color))
+        categories = list(cat_color)
+
+    jobs = []
+    if overall:
+        jobs.append(_chart("overall", "タスク別 作業時間（カテゴリ内訳）", "カテゴリ",
+                           overall, categories, cat_color.get))
+    for i, w in enumerate(sorted(by_worker)):
+        jobs.append(_chart(f"worker-{i:03d}", f"担当者: {w}（カテゴリ内訳）", "カテゴリ",
+                           by_worker[w], categories, cat_color.get))
+    for i, c in enumerate(sorted(by_category, key=lambda c: cat_color.get(c, 0))):
+        jobs.append(_chart(f"category-{i:03d}", f"カテゴリ: {c}（担当者内訳）", "担当者",
+                           by_category[c], workers, worker_color.get))
+    return jobs, _by_time(tables["worker"]), _by_time(tables["category"])
+
+
+def _by_time(table):
+    return sorted(table.values(), key=lambda r: (-r[4], str(r[0])))
+
+
+# --- 描画（ワーカープロセス） ---
+def _init_worker():
+    import matplotlib
+    matplotlib.use("Agg")
+    # 日本語フォントが無い環境では文字ごとに警告が出るので抑える（グラフ自体は書き出せる）
+    warnings.filterwarnings("ignore", message="Glyph .* missing from font")
+    warnings.filterwarnings("ignore", message="Tight layout not applied")
+    try:
+        from font_cache import apply_japanese_font
+        apply_japanese_font()
+    except Exception:
+        pass
+
+
+def render_chart(job, out_dir, formats):
+    """job のグラフを out_dir に formats の形式で書き出します。(名前, ファイル名の一覧, 秒数) を返します。"""
+    t0 = time.perf_counter()
+    from matplotlib import colormaps
+    from matplotlib.backends.backend_agg import FigureCanvasAgg
+    from matplotlib.figure import Figure
+
+    from task_chart import StackedBarChart
+
+    cmap = colormaps["tab20"]
+    colors = {s: cmap(c % cmap.N) for s, c in zip(job.stacks, job.colors)}
+    fig = Figure(figsize=(min(max(8, len(job.labels) * INCH_PER_BAR), MAX_WIDTH_IN), 5), dpi=DPI)
+    FigureCanvasAgg(fig)
+    ax = fig.add_subplot()
+    StackedBarChart(ax, job.labels, job.stacks, job.matrix, colors, format_seconds,
+                    title=job.title, legend_title=job.legend_title)
+    fig.tight_layout()
+    files = []
+    for fmt in formats:
+        name = f"{job.name}.{fmt}"
+        fig.savefig(os.path.join(out_dir, name), format=fmt)
+        files.append(name)
+    return job.name, files, time.perf_counter() - t0
+
+
+def render_all(jobs, out_dir, formats=("png",), workers=None, progress=None):
+    """グラフをまとめて描きます。名前 -> ファイル名の一覧 を返します。
+
+    workers が 1 ならこのプロセスで順に描きます。progress(済んだ枚数, 全体) で進み具合を受け取れます。
+    """
+    os.makedirs(out_dir, exist_ok=True)
+    workers = workers or os.cpu_count() or 1
+    # 大きいグラフから先に配ると、最後に 1 枚だけ残って待つことが減る
+    order = sorted(jobs, key=lambda j: -len(j.labels) * max(len(j.stacks), 1))
+    files = {}
+    if workers == 1 or len(order) <= 1:
+        _init_worker()
+        for i, job in enumerate(order, 1):
+            name, out, _ = render_chart(job, out_dir, formats)
+            files[name] = out
+            if progress:
+                progress(i, len(order))
+        return files
+    with ProcessPoolExecutor(max_workers=min(workers, len(order)), initializer=_init_worker) as pool:
+        futures = [pool.submit(render_chart, job, out_dir, formats) for job in order]
+        for i, future in enumerate(as_completed(futures), 1):
+            name, out, _ = future.result()
+            files[name] = out
+            if progress:
+                progress(i, len(order))
+    return files
+
+
+# --- 一覧ページ ---
+def _table(title, heading, rows):
+    cells = "".join(
+        f"<tr><td>{html.escape(str(value))}</td><td>{count:,}</td><td>{done:,}</td>"
+        f"<td>{estimate:,.1f}</td><td>{format_seconds(sec)}</td></tr>\n"
+        for value, count, done, estimate, sec in rows)
+    return (f"<h2>{title}</h2>\n<table>\n<tr><th>{heading}</th><th>タスク数</th><th>完了</th>"
+            f"<th>予定(h)</th><th>作業時間</th></tr>\n{cells}</table>\n")
+
+
+def write_index(path, period, jobs, files, worker_rows, category_rows):
+    parts = [f"<h1>作業時間レポート（{html.escape(period)}）</h1>\n",
+             f"<p>作成: {datetime.now():%Y/%m/%d %H:%M}</p>\n",
+             _table("担当者別", "担当者", worker_rows), _table("カテゴリ別", "カテゴリ", category_rows),
+             "<h2>グラフ</h2>\n"]
+    for job in jobs:
+        out = files.get(job.name, [])
+        image = next((f for f in out if not f.endswith(".pdf")), None)
+        parts.append(f"<h3>{html.escape(job.title)}</h3>\n")
+        if image:
+            parts.append(f'<p><img src="{CHARTS_DIR}/{image}" alt="{html.escape(job.title)}"></p>\n')
+        links = " ".join(f'<a href="{CHARTS_DIR}/{f}">{f.rsplit(".", 1)[1].upper()}</a>' for f in out)
+        parts.append(f"<p>{links}</p>\n")
+    with open(path, "w", encoding="utf-8") as f:
+        f.write('<!DOCTYPE html>\n<html lang="ja">\n<head><meta charset="utf-8"><title>作業時間レポート</title>\n'
+                "<style>body{font-family:sans-serif} table{border-collapse:collapse} "
+                "td,th{border:1px solid #ccc;padding:2px 8px} td+td{text-align:right} "
+                "img{max-width:100%}</style>\n</head>\n<body>\n" + "".join(parts) + "</body>\n</html>\n")
+
+
+def write_report(model, out_dir, entries=None, month=None, formats=("png",), workers=None, progress=None):
+    """レポートを out_dir に書き出します。(グラフの枚数, 描画にかかった秒数) を返します。"""
+    if month is not None:
+        period = f"{month[0]:%Y/%m}"
+        seconds = seconds_by_task(model, entries, month)
+    else:
+        period = "累計"
+        seconds = seconds_by_task(model)
+    jobs, worker_rows, category_rows = build_report(model, seconds)
+    t0 = time.perf_counter()
+    files = render_all(jobs, os.path.join(out_dir, CHARTS_DIR), formats, workers, progress)
+    elapsed = time.perf_counter() - t0
+    write_index(os.path.join(out_dir, "index.html"), period, jobs, files, worker_rows, category_rows)
+    return len(jobs), elapsed
@@ -2,27 +2,264 @@ import tkinter as tk
 from tkinter import messagebox
 from tkinter import ttk
 from tkinter import simpledialog
-import json
-import time
+from tkinter import filedialog
+import argparse
 import os
-from datetime import datetime
+import queue
+import sys
+import threading
+import time
+from datetime import date, datetime, timedelta
+
+from csv_io import KIND_LABELS, CsvImporter, export_csv
+from task_model import TaskModel
+from task_query import TaskQuery, TaskQueryIndex
+from store_writer import StoreWriter, StoreWriteError
+from task_store import open_store, quarantine_store_files
+from memo_store import MemoCache, set_memo_record
+from perf_trace import LOOP_LAG, LoopLagMonitor, tracer
+from capacity import CapacityPlanner
+from materials import MaterialLedger, format_amount, line_cost, make_line, to_minor
+from font_cache import apply_japanese_font, warm_up_in_background
+from task_timer import CHECKPOINT_INTERVAL, TickScheduler, TimerSet, interrupted_records
+from task_view import TaskListView, TreeRowSync, VirtualTaskList
+from time_log import TimeRollup, task_days
+from task_sync import CATEGORIES_KEY, DEFAULT_HOST, DEFAULT_PORT, SyncClient, SyncError
+from undo import HISTORY_SUFFIX, UndoError, UndoHistory
+from archive import (ARCHIVE_AGE_DAYS, ARCHIVE_SUFFIX, TaskArchive, archivable, archive_tasks, default_cutoff,
+                     restore_records)
 
 DATA_FILE = "tasks_std_v24.json"
+# タスク一覧の列: (キー, 見出し, 幅, 配置)
+LIST_COLUMNS = [
+    ("name", "タスク名", 120, "w"),
+    ("progress", "進捗", 50, "center"),
+    ("deadline", "期限", 70, "center"),
+    ("worker", "担当", 70, "w"),
+    ("category", "カテゴリ", 70, "w"),
+]
+# タスク数がこれ以上なら起動時から仮想スクロール一覧を使う
+VIRTUAL_LIST_THRESHOLD = 20000
+# CSV の取り込み・書き出しで 1 回の after() に使う時間（秒）と、その間に扱う行数の単位
+CSV_SLICE = 0.05
+CSV_UI_BATCH = 1000
+# 作業負荷の画面に並べる「期限に間に合わないタスク」の件数（不足の大きい順）
+LATE_TASKS_SHOWN = 500
+# 起動時に読み込んだ分を取り込む間隔（ミリ秒）と、1 回の after() で取り込みに使う時間（秒）
+LOAD_POLL_MS = 20
+LOAD_SLICE = 0.03
+# 一覧を作り直すときに最初に入れる行数（残りは後から少しずつ入れる）
+FIRST_PAGE_ROWS = 100
+# 読み込みの途中では使えないメニューの項目。データを変えるか、全件がそろわないと結果が欠けるもの
+# （集計・レポートは作った時点のタスクにしか作業時間のエントリを割り当てず、CSV は途中までしか書き出せない）
+LOADING_DISABLED_MENU = ("カテゴリ", "グラフ", "材料費集計", "作業時間レポート", "作業負荷", "アーカイブ",
+                         "CSV エクスポート", "CSV インポート")
+# 同期サーバーを使うときは使えないメニューの項目
+SYNC_DISABLED_MENU = ("アーカイブ", "CSV インポート")
+# 同期サーバーから届いた変更を取り込む間隔（ミリ秒）
+SYNC_POLL_MS = 100
+# 同期サーバーを使うときの計測中のセッションの保存先（アプリごと）
+SYNC_TIMERS_DIR = os.path.join(os.path.expanduser("~"), ".cache", "task-manager")
+
+def event_in_text_field(root):
+    """キーボードの入力先が文字の入力欄かを返します（Ctrl+Z を入力欄に任せるため）。"""
+    widget = root.focus_get()
+    return isinstance(widget, (tk.Entry, tk.Text, ttk.Entry))
+
 
 class TaskTimerApp:
-    def __init__(self, root):
+    def __init__(self, root, data_file=DATA_FILE, server=None):
+        # 起動から各段階までの秒数（window / first_rows / interactive / list_filled。benchmarks/bench_startup.py が読む）
+        self._started = time.perf_counter()
+        self.startup_marks = {}
         self.root = root
         self.root.title("Task Manager (UI Fixed)")
         self.root.geometry("1100x800")
 
-        self.is_running = False
-        self.start_time = 0
-        self.selected_task_index = None
+        # 計測中のタスク（複数可）と、その表示をまとめて更新するティック
+        self.timers = TimerSet()
+        self.ticker = TickScheduler(self.root)
+        self.timer_rows = {}  # task_id -> 「計測中」欄の行
+        self.selected_task_id = None
         self.is_edit_mode = False 
-        self.data = self.load_data()
+        self.edit_base = None
+        self.data_file = data_file
+        # 拡張子が .db / .sqlite なら SQLite、それ以外は JSON + ジャーナルで保存する
+        self.store = None
+        # 保存はバックグラウンドのスレッドで行い、UI はディスクの書き込みを待たない（読み込めたら作る）
+        self.writer = None
+        # server（"ホスト:ポート"）を指定すると、データは同期サーバーが持ち、変更はサーバー経由で共有する
+        self.sync = None
+        # 完了したタスクのアーカイブ（索引だけを読む。同期サーバーを使うときは使わない）
+        self.archive = None
+        # データファイルを読み込んでいるスレッド（読み込み終えたら None）
+        self.loading = None
+        if server:
+            model = self.connect_server(server)
+            self.writer = StoreWriter(self.store)
+        else:
+            # データファイルはウィンドウを出してからワーカースレッドで読み込む。それまでは空のモデルで画面を作る
+            model = TaskModel()
+        # 元に戻す／やり直すの履歴（同期サーバーを使うときは保存しない）
+        self.history = UndoHistory(None if server else data_file + HISTORY_SUFFIX)
+        # メモの本文はタスクを選んだときに読み込む（最近のものだけ覚えておく）
+        self.memos = MemoCache(self.load_memo)
+        self.attach_model(model)
+        self._filter_job = None
+        self.root.protocol("WM_DELETE_WINDOW", self.on_close)
+        self.virtual_list_var = tk.BooleanVar(value=len(self.model) >= VIRTUAL_LIST_THRESHOLD)
 
         self.setup_menu()
         self.setup_ui()
+        self.mark_startup("window")
+        # グラフ用の matplotlib の読み込みとフォントの解決は、ウィンドウが表示されてから裏で済ませておく
+        self.root.after(1000, warm_up_in_background)
+        # 計測が有効なら、イベントループの遅れも記録する（メニュー > パフォーマンス で切り替え）
+        self.lag_monitor = LoopLagMonitor(self.root, tracer)
+        if tracer.enabled:
+            self.lag_monitor.start()
+        if server:
+            self.show_model()
+            self.on_data_ready()
+        else:
+            self.start_loading(data_file)
+
+    def mark_startup(self, name):
+        sec = time.perf_counter() - self._started
+        self.startup_marks[name] = sec
+        if tracer.enabled:
+            tracer.record(f"startup.{name}", self._started, sec)
+
+    def attach_model(self, model):
+        """モデルと、モデルの変更通知で差分更新する索引・集計を（作り直して）結び付けます。"""
+        self.model = model
+        # 検索用の索引と一覧の表示対象。どちらもモデルの変更通知で差分更新される
+        self.query_index = TaskQueryIndex(model)
+        self.list_view = TaskListView(model)
+        # 作業時間の集計（エントリの読み込みはレポートを開くまで遅らせる）
+        self.time_rollup = TimeRollup(model)
+        # グラフ用の集計表（numpy を使うので最初にグラフを開いたときに作る）
+        self.category_pivot = None
+        # 材料費の集計（最初に集計画面を開いたときに作り、以降は差分更新）
+        self.material_ledger = None
+        # 作業負荷の計画（最初に作業負荷の画面を開いたときに作り、以降は差分更新）
+        self.capacity_planner = None
+
+    # --- 起動時の読み込み ---
+    def start_loading(self, data_file):
+        """データファイルの読み込み（JSON の解析・ジャーナルの再生）をワーカースレッドで始めます。
+
+        読み込んだタスクは poll_loading() が少しずつモデルへ入れ、一覧には入れた分から行が出ます。
+        """
+        self.set_data_ready(False)
+        self._loaded = queue.Queue()
+        self.loading = threading.Thread(target=self._load_worker, args=(data_file, self._loaded),
+                                        name="data-loader", daemon=True)
+        self.loading.start()
+        self.root.after(LOAD_POLL_MS, self.poll_loading)
+
+    @staticmethod
+    def _load_worker(data_file, out):
+        # Tk には触れず、読んだ分を (種類, 値) で out に入れる: ("store", 保存エンジン)、
+        # TaskStore.load_stages() の各段階、最後に ("archive", TaskArchive)。失敗したら ("error", 例外)
+        try:
+            store = open_store(data_file)
+            out.put(("store", store))
+            for stage in store.load_stages():
+                out.put(stage)
+            out.put(("archive", TaskArchive(data_file + ARCHIVE_SUFFIX)))
+        except Exception as e:
+            out.put(("error", e))
+
+    def poll_loading(self):
+        # 届いた分を LOAD_SLICE 秒までモデルへ入れる。一覧の行・検索用の索引はモデルの変更通知で増え、
+        # 残りは次の after() で入れるので、その間も選択・絞り込み・並べ替え・メモの表示ができる
+        deadline = time.perf_counter() + LOAD_SLICE
+        while time.perf_counter() < deadline:
+            try:
+                kind, value = self._loaded.get_nowait()
+            except queue.Empty:
+                break
+            if kind == "store":
+                self.store = value
+            elif kind == "tasks":
+                self.model.extend(value)
+                if len(self.model) >= VIRTUAL_LIST_THRESHOLD and not self.virtual_list_var.get():
+                    self.virtual_list_var.set(True)
+                    self.toggle_list_mode()
+            elif kind == "categories":
+                self.model.apply({"op": "set_categories", "categories": value})
+                self.refresh_category_comboboxes()
+            elif kind == "records":
+                for rec in value:
+                    self.model.apply(rec)
+            elif kind == "model":
+                # 移行が要るデータなどで、読み直したモデルに置き換える
+                self.attach_model(value)
+                self.show_model()
+            elif kind == "error":
+                self.loading.join()
+                self.attach_model(self.recover_unreadable(self.data_file, value))
+                self.show_model()
+                self.finish_loading(TaskArchive(self.data_file + ARCHIVE_SUFFIX))
+                return
+            else:
+                self.loading.join()
+                self.finish_loading(value)
+                return
+        if "first_rows" not in self.startup_marks and len(self.model) >= FIRST_PAGE_ROWS:
+            self.mark_startup("first_rows")
+        self.root.after(LOAD_POLL_MS, self.poll_loading)
+
+    def finish_loading(self, archive):
+        # 保留中のまま残ったアーカイブのセグメントを確定してから、保存と編集を始める
+        self.loading = None
+        archive.recover(self.model)
+        self.archive = archive
+        self.writer = StoreWriter(self.store)
+        if "first_rows" not in self.startup_marks:
+            self.mark_startup("first_rows")
+        self.on_data_ready()
+        # 読み直したモデルで一覧を作り直している途中なら、入れ終えたときに記録される
+        if "list_filled" not in self.startup_marks and not self.row_sync.filling:
+            self.mark_startup("list_filled")
+
+    def show_model(self):
+        """今のモデルで一覧を作り直します（最初の FIRST_PAGE_ROWS 行だけをすぐに入れ、残りは after() で入れる）。"""
+        if len(self.model) >= VIRTUAL_LIST_THRESHOLD and not self.virtual_list_var.get():
+            self.virtual_list_var.set(True)
+            self.build_task_list()
+        else:
+            self.list_view.rows = self.row_sync
+            self.update_sort_headings()
+        # 読み込み中に入力された絞り込みの条件も反映する
+        self._apply_query()
+        self.refresh_listbox(first=FIRST_PAGE_ROWS)
+        self.refresh_category_comboboxes()
+
+    def on_data_ready(self):
+        """読み込みを終えたデータを編集できるようにします。検索用の索引はアイドル時に少しずつ作ります。"""
+        self.set_data_ready(True)
+        self.mark_startup("interactive")
+        self.root.after(500, self.build_query_index_step)
+        self.recover_timers()
+        self.root.after(CHECKPOINT_INTERVAL * 1000, self.checkpoint_timers_loop)
+        if self.sync is not None:
+            self.root.after(SYNC_POLL_MS, self.poll_sync)
+
+    def set_data_ready(self, ready):
+        # 読み込み中は、データを変える操作（追加・進捗とメモの保存・計測・並べ替えのドラッグ・元に戻す）と
+        # LOADING_DISABLED_MENU を止める。一覧の選択・絞り込み・列での並べ替え・メモの表示はできる
+        state = "normal" if ready else "disabled"
+        for btn in (self.action_btn, self.prog_save_btn, self.memo_save_btn):
+            btn.config(state=state)
+        for label in LOADING_DISABLED_MENU:
+            if not (ready and self.sync is not None and label in SYNC_DISABLED_MENU):
+                self.data_menu.entryconfig(label, state=state)
+        self.menubar.entryconfig("編集", state=state)
+        if ready and self.selected_task_id is not None:
+            # 読み込み中に選んだタスクの編集・計測のボタンを使えるようにする
+            self.enable_task_buttons()
 
     def format_seconds(self, seconds):
         hrs, rem = divmod(int(seconds), 3600)
@@ -30,6 +267,11 @@ class TaskTimerApp:
         return f"{hrs:02}:{mins:02}:{secs:02}"
 
     def setup_ui(self):
+        # 最下部: 保存の状態（書き込み待ちの件数と前回の保存にかかった時間）
+        self.status_label = tk.Label(self.root, anchor="w", font=("Arial", 8), fg="gray")
+        self.status_label.pack(side=tk.BOTTOM, fill="x", padx=6)
+        self.update_save_status()
+
         self.main_paned = tk.PanedWindow(self.root, orient=tk.HORIZONTAL, sashwidth=4)
         self.main_paned.pack(fill=tk.BOTH, expand=True)
 
@@ -49,8 +291,8 @@ class TaskTimerApp:
         
         # カテゴリ選択
         tk.Label(self.left_frame, text="カテゴリ", font=("Arial", 9)).pack(anchor="w")
-        self.category_cb = ttk.Combobox(self.left_frame, values=self.data.get("categories", ["-"]), state="readonly")
-        current_cat = self.data.get("categories", ["-"])[0] if self.data.get("categories") else "-"
+        self.category_cb = ttk.Combobox(self.left_frame, values=self.model.categories, state="readonly")
+        current_cat = self.model.categories[0] if self.model.categories else "-"
         self.category_cb.set(current_cat)
         self.category_cb.pack(fill="x", pady=1)
         
@@ -79,32 +321,38 @@ class TaskTimerApp:
         # キャンセルボタンをあらかじめ作成し、初期状態は隠す
         self.cancel_btn = tk.Button(self.left_frame, text="編集をキャンセル", command=self.exit_edit_mode, bg="#f8d7da")
         
-        # Treeview (表形式)
-        columns = ("name", "progress", "deadline", "worker", "category")
-        self.task_tree = ttk.Treeview(self.left_frame, columns=columns, show="headings", height=20)
-        self.task_tree.heading("name", text="タスク名")
-        self.task_tree.heading("progress", text="進捗")
-        self.task_tree.heading("deadline", text="期限")
-        self.task_tree.heading("worker", text="担当")
-        self.task_tree.heading("category", text="カテゴリ")
-        self.task_tree.column("name", width=120, anchor="w")
-        self.task_tree.column("progress", width=50, anchor="center")
-        self.task_tree.column("deadline", width=70, anchor="center")
-        self.task_tree.column("worker", width=70, anchor="w")
-        self.task_tree.column("category", width=70, anchor="w")
-
-        scrollbar = ttk.Scrollbar(self.left_frame, orient=tk.VERTICAL, command=self.task_tree.yview)
-        self.task_tree.configure(yscroll=scrollbar.set)
-        
-        # Treeviewを配置する前にキャンセルボタン用のスペースを確保
-        self.task_tree.pack(side=tk.LEFT, fill=tk.BOTH, expand=True, pady=(10, 0))
-        scrollbar.pack(side=tk.RIGHT, fill=tk.Y, pady=(10, 0))
-
-        self.task_tree.bind("<<TreeviewSelect>>", self.on_select_task)
-        self.task_tree.bind("<ButtonPress-1>", self.on_tree_drag_start)
-        self.task_tree.bind("<ButtonRelease-1>", self.on_tree_drag_stop)
-        
-        self.refresh_listbox()
+        # 検索・絞り込み（入力するたびに一覧を絞り込む）
+        filter_frame = tk.LabelFrame(self.left_frame, text="検索・絞り込み", font=("Arial", 9), padx=4, pady=2)
+        filter_frame.pack(fill="x", pady=(10, 0))
+        self.filter_vars = {k: tk.StringVar() for k in ("text", "worker", "category", "end_from", "end_to")}
+        f = tk.Frame(filter_frame)
+        f.pack(fill="x", pady=1)
+        tk.Label(f, text="キーワード", font=("Arial", 9), width=8, anchor="w").pack(side=tk.LEFT)
+        tk.Entry(f, textvariable=self.filter_vars["text"]).pack(side=tk.LEFT, fill="x", expand=True)
+        f = tk.Frame(filter_frame)
+        f.pack(fill="x", pady=1)
+        tk.Label(f, text="担当", font=("Arial", 9), width=8, anchor="w").pack(side=tk.LEFT)
+        self.filter_worker_cb = ttk.Combobox(f, textvariable=self.filter_vars["worker"], width=10, state="readonly",
+                                             postcommand=lambda: self.filter_worker_cb.config(values=[""] + self.query_index.values("worker")))
+        self.filter_worker_cb.pack(side=tk.LEFT)
+        tk.Label(f, text="カテゴリ", font=("Arial", 9)).pack(side=tk.LEFT, padx=(6, 0))
+        self.filter_category_cb = ttk.Combobox(f, textvariable=self.filter_vars["category"], width=10, state="readonly",
+                                               values=[""] + self.model.categories)
+        self.filter_category_cb.pack(side=tk.LEFT)
+        f = tk.Frame(filter_frame)
+        f.pack(fill="x", pady=1)
+        tk.Label(f, text="期限", font=("Arial", 9), width=8, anchor="w").pack(side=tk.LEFT)
+        tk.Entry(f, textvariable=self.filter_vars["end_from"], width=11).pack(side=tk.LEFT)
+        tk.Label(f, text="〜").pack(side=tk.LEFT)
+        tk.Entry(f, textvariable=self.filter_vars["end_to"], width=11).pack(side=tk.LEFT)
+        tk.Button(f, text="クリア", command=self.clear_filter).pack(side=tk.RIGHT)
+        for var in self.filter_vars.values():
+            var.trace_add("write", lambda *args: self.schedule_filter())
+
+        # タスク一覧 (Treeview または仮想スクロール一覧)
+        self.list_frame = tk.Frame(self.left_frame)
+        self.list_frame.pack(fill=tk.BOTH, expand=True, pady=(10, 0))
+        self.build_task_list()
 
         # --- 右側: 詳細エリア ---
         self.right_frame = tk.Frame(self.main_paned, padx=20, pady=20, bg="#fdfdfd")
@@ -116,6 +364,8 @@ class TaskTimerApp:
         self.info_label.pack(side=tk.LEFT)
         self.task_total_time_label = tk.Label(task_header_frame, text="", bg="#fdfdfd", font=("Arial", 11, "bold"), fg="#0056b3")
         self.task_total_time_label.pack(side=tk.LEFT, padx=10)
+        self.material_cost_label = tk.Label(task_header_frame, text="", bg="#fdfdfd", font=("Arial", 11, "bold"), fg="#8a5a00")
+        self.material_cost_label.pack(side=tk.LEFT)
 
         self.sub_info_label = tk.Label(self.right_frame, text="", bg="#fdfdfd", font=("Arial", 10), fg="#666")
         self.sub_info_label.pack(anchor="w", pady=5)
@@ -126,13 +376,16 @@ class TaskTimerApp:
         self.edit_btn.pack(side=tk.LEFT, padx=2)
         self.delete_btn = tk.Button(btn_f, text="削除", state="disabled", fg="red", command=self.delete_task)
         self.delete_btn.pack(side=tk.LEFT, padx=2)
+        self.materials_btn = tk.Button(btn_f, text="材料費", state="disabled", command=self.open_materials_editor)
+        self.materials_btn.pack(side=tk.LEFT, padx=2)
 
         self.prog_input_frame = tk.LabelFrame(self.right_frame, text="進捗率", bg="#fdfdfd", padx=10)
         self.prog_input_frame.pack(fill="x", pady=10)
         self.prog_var = tk.IntVar()
         self.prog_slider = tk.Scale(self.prog_input_frame, from_=0, to=100, orient=tk.HORIZONTAL, variable=self.prog_var, bg="#fdfdfd")
         self.prog_slider.pack(side=tk.LEFT, fill="x", expand=True)
-        tk.Button(self.prog_input_frame, text="更新", command=self.save_manual_progress).pack(side=tk.LEFT, padx=5)
+        self.prog_save_btn = tk.Button(self.prog_input_frame, text="更新", command=self.save_manual_progress)
+        self.prog_save_btn.pack(side=tk.LEFT, padx=5)
 
         self.timer_label = tk.Label(self.right_frame, text="00:00:00", font=("Courier", 50, "bold"), bg="#fdfdfd", fg="#28a745")
         self.timer_label.pack(pady=10)
@@ -144,16 +397,85 @@ class TaskTimerApp:
         self.stop_btn = tk.Button(self.btn_frame, text="計測停止", width=12, height=2, command=self.stop_timer, state="disabled")
         self.stop_btn.pack(side=tk.LEFT, padx=5)
 
+        # 計測中のタスクの一覧（複数のタスクを同時に計測できる）
+        self.running_frame = tk.LabelFrame(self.right_frame, text="計測中", bg="#fdfdfd", padx=10)
+        self.running_frame.pack(fill="x", pady=(10, 0))
+        self.running_empty_label = tk.Label(self.running_frame, text="なし", bg="#fdfdfd", fg="#999")
+        self.running_empty_label.pack(anchor="w")
+
         tk.Label(self.right_frame, text="作業メモ:", bg="#fdfdfd", font=("Arial", 10, "bold")).pack(anchor="w", pady=(10,0))
         self.memo_text = tk.Text(self.right_frame, height=10, font=("Arial", 10))
         self.memo_text.pack(fill="both", expand=True, pady=5)
-        tk.Button(self.right_frame, text="メモを保存", command=self.save_memo).pack(anchor="e")
+        self.memo_save_btn = tk.Button(self.right_frame, text="メモを保存", command=self.save_memo)
+        self.memo_save_btn.pack(anchor="e")
+
+    def build_task_list(self):
+        # list_frame の中身を、現在のモードに応じた一覧で作り直す
+        for w in self.list_frame.winfo_children(): w.destroy()
+        if self.virtual_list_var.get():
+            # 見えている行だけウィジェットを作る。行の更新メソッドも一覧自身が持つ
+            self.task_tree = VirtualTaskList(self.list_frame, LIST_COLUMNS, self.task_row_values, height=20)
+            self.task_tree.pack(fill=tk.BOTH, expand=True)
+            self.row_sync = self.task_tree
+        else:
+            # Treeview (表形式)
+            self.task_tree = ttk.Treeview(self.list_frame, columns=[c[0] for c in LIST_COLUMNS], show="headings", height=20)
+            for key, heading, width, anchor in LIST_COLUMNS:
+                self.task_tree.heading(key, text=heading)
+                self.task_tree.column(key, width=width, anchor=anchor)
+            scrollbar = ttk.Scrollbar(self.list_frame, orient=tk.VERTICAL, command=self.task_tree.yview)
+            self.task_tree.configure(yscroll=scrollbar.set)
+            self.task_tree.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
+            scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
+            self.row_sync = TreeRowSync(self.task_tree, self.task_row_values)
+        self.list_view.rows = self.row_sync
+        # 見出しを押すと その列の昇順 → 降順 → 手動の並び の順に切り替わる
+        for key, *_ in LIST_COLUMNS:
+            self.task_tree.heading(key, command=lambda k=key: self.sort_by_column(k))
+        self.update_sort_headings()
+
+        self.task_tree.bind("<<TreeviewSelect>>", self.on_select_task)
+        self.task_tree.bind("<ButtonPress-1>", self.on_tree_drag_start)
+        self.task_tree.bind("<ButtonRelease-1>", self.on_tree_drag_stop)
+
+        self.refresh_listbox()
+
+    def toggle_list_mode(self):
+        # 選択中のタスクを保ったまま一覧の表示方式を切り替える
+        selected = self.selected_task_id
+        self.build_task_list()
+        if selected is not None and self.model.get(selected) is not None:
+            self.task_tree.selection_set(selected)
+            self.task_tree.see(selected)
+
+    @tracer.traced("sort_by_column")
+    def sort_by_column(self, key):
+        view = self.list_view
+        if view.sort_column != key:
+            view.set_sort(key)
+        elif not view.descending:
+            view.set_sort(key, descending=True)
+        else:
+            view.set_sort(None)
+        self.update_sort_headings()
+        # 行は作り直さず、並べ替えた順に置き直すだけ
+        self.row_sync.reorder(view)
+        if self.selected_task_id is not None and self.selected_task_id in view:
+            self.task_tree.see(self.selected_task_id)
+
+    def update_sort_headings(self):
+        view = self.list_view
+        for key, heading, _, _ in LIST_COLUMNS:
+            mark = (" ▼" if view.descending else " ▲") if key == view.sort_column else ""
+            self.task_tree.heading(key, text=heading + mark)
 
     # --- 編集モード管理 (修正箇所) ---
     def enter_edit_mode(self):
-        if self.selected_task_index is None: return
+        if self.selected_task_id is None: return
         self.is_edit_mode = True
-        task = self.data["tasks"][self.selected_task_index]
+        task = self.model.get(self.selected_task_id)
+        # 同期サーバーを使うときは、編集を始めた時点の版を前提に更新する（その間の他のユーザーの変更を上書きしない）
+        self.edit_base = {task.id: self.sync.versions.get(task.id, 0)} if self.sync is not None else None
         
         # 入力欄に現在の値をセット
         self.clear_entry_fields()
@@ -161,7 +483,7 @@ class TaskTimerApp:
         self.entries["worker"].insert(0, task.get("worker", ""))
         self.entries["estimate"].insert(0, task.get("estimate", "0"))
         # カテゴリの選択を復元
-        self.category_cb.set(task.get("category", self.data.get("categories", ["-"])[0]))
+        self.category_cb.set(task.get("category", (self.model.categories or ["-"])[0]))
         
         # ボタン状態の変更
         self.input_title_label.config(text="【編集モード】", fg="blue")
@@ -179,6 +501,7 @@ class TaskTimerApp:
         self.cancel_btn.pack_forget()
 
     # --- 基本機能 ---
+    @tracer.traced("handle_action")
     def handle_action(self):
         name = self.entries["name"].get().strip()
         if not name:
@@ -197,111 +520,452 @@ class TaskTimerApp:
             "category": self.category_cb.get() or "-"
         }
 
+        # 一覧の行はモデルの変更通知を受けた list_view が更新する
         if self.is_edit_mode:
-            self.data["tasks"][self.selected_task_index].update(task_data)
+            # 書き換えるのは変えたフィールドだけ
+            rec = self.model.update_task_record(self.selected_task_id, task_data)
+            if rec is not None:
+                self.commit(rec, base=self.edit_base)
             self.exit_edit_mode()
         else:
-            task_data.update({"actual_sec": 0, "progress": 0, "memo": ""})
-            self.data["tasks"].append(task_data)
+            task_data.update({"actual_sec": 0, "progress": 0})
+            self.commit(self.model.add_task_record(task_data))
             
-        self.save_data()
-        self.refresh_listbox()
         self.clear_entry_fields()
 
-    def refresh_listbox(self):
-        for item in self.task_tree.get_children(): self.task_tree.delete(item)
-        for t in self.data["tasks"]:
-            deadline_short = t.get('end_date', '')[2:]
-            self.task_tree.insert("", tk.END, values=(
-                t.get("name", ""), f"{t.get('progress', 0)}%", deadline_short, t.get("worker", "-"), t.get("category", "-")
-            ))
+    def task_row_values(self, t):
+        deadline_short = t.get('end_date', '')[2:]
+        return (t.get("name", ""), f"{t.get('progress', 0)}%", deadline_short, t.get("worker", "-"), t.get("category", "-"))
+
+    def update_save_status(self):
+        w = self.writer
+        if w is None:
+            self.status_label.config(text=f"データを読み込んでいます…（{time.perf_counter() - self._started:.1f} 秒）",
+                                     fg="gray")
+            self.root.after(100, self.update_save_status)
+            return
+        text = f"保存待ち: {w.queue_depth} 件"
+        if w.last_latency is not None:
+            text += f" | 前回の保存: {w.last_latency * 1000:.0f} ms（書き込み {w.last_write_time * 1000:.0f} ms）"
+        if w.last_error is not None:
+            text += f" | 保存に失敗しました（再試行中）: {w.last_error}"
+        lost = self.sync is not None and self.sync.closed
+        if lost:
+            text += " | 同期サーバーとの接続が切れました（変更は保存されません）"
+        self.status_label.config(text=text, fg="red" if w.last_error is not None or lost else "gray")
+        self.root.after(500, self.update_save_status)
+
+    @tracer.traced("refresh_listbox")
+    def refresh_listbox(self, first=None):
+        # 一覧全体の作り直し。個々の編集では list_view が該当行だけを更新する。
+        # first を指定すると最初の first 行だけを入れて戻り、残りは後から入れる
+        done = None if first is None else (lambda: self.mark_startup("list_filled"))
+        self.row_sync.rebuild(self.list_view, first, done)
+
+    # --- 検索・絞り込み ---
+    def schedule_filter(self):
+        # 連続した入力は最後の 1 回だけ検索する
+        if self._filter_job is not None:
+            self.root.after_cancel(self._filter_job)
+        self._filter_job = self.root.after(80, self.apply_filter)
+
+    def build_query_index_step(self):
+        if not self.query_index.build_chunk():
+            self.root.after(1, self.build_query_index_step)
+
+    @tracer.traced("apply_filter")
+    def apply_filter(self):
+        self._filter_job = None
+        self._apply_query()
+        self.refresh_listbox()
+
+    def _apply_query(self):
+        query = TaskQuery(**{k: v.get().strip() for k, v in self.filter_vars.items()})
+        self.list_view.set_filter(query, self.query_index.search(query))
+
+    def clear_filter(self):
+        for var in self.filter_vars.values():
+            var.set("")
 
+    @tracer.traced("on_select_task")
     def on_select_task(self, event):
-        if self.is_running: return # 計測中は選択変更不可
+        # 計測中でも別のタスクを選べる（計測は「計測中」欄で続く）
         selected_items = self.task_tree.selection()
         if selected_items:
-            item = selected_items[0]
-            self.selected_task_index = self.task_tree.index(item)
-            task = self.data["tasks"][self.selected_task_index]
-            self.info_label.config(text=task['name'])
-            self.task_total_time_label.config(text=f"累計: {self.format_seconds(task.get('actual_sec', 0))}")
-            self.sub_info_label.config(text=f"期間: {task.get('start_date')}〜{task.get('end_date')} | 担当: {task['worker']} | 予定: {task['estimate']}h | カテゴリ: {task.get('category', '-')}")
-            self.prog_var.set(task.get("progress", 0))
-            self.memo_text.delete("1.0", tk.END); self.memo_text.insert("1.0", task.get("memo", ""))
-            self.start_btn.config(state="normal"); self.edit_btn.config(state="normal"); self.delete_btn.config(state="normal")
-            self.timer_label.config(text="00:00:00")
+            # Treeview の iid はタスク ID
+            self.selected_task_id = selected_items[0]
+            task = self.model.get(self.selected_task_id)
+            self.show_task_info(task)
+            self.memo_text.delete("1.0", tk.END); self.memo_text.insert("1.0", self.read_memo(task))
+            if self.loading is None:
+                self.enable_task_buttons()
+
+    def enable_task_buttons(self):
+        # 選択中のタスクを編集・削除・計測するボタン（読み込み中は使えない）
+        self.edit_btn.config(state="normal"); self.delete_btn.config(state="normal"); self.materials_btn.config(state="normal")
+        self.show_selected_timer()
+
+    def show_task_info(self, task):
+        self.info_label.config(text=task['name'])
+        self.task_total_time_label.config(text=f"累計: {self.format_seconds(task.get('actual_sec', 0))}")
+        self.sub_info_label.config(text=f"期間: {task.get('start_date')}〜{task.get('end_date')} | 担当: {task['worker']} | 予定: {task['estimate']}h | カテゴリ: {task.get('category', '-')}")
+        self.prog_var.set(task.get("progress", 0))
+        self.update_material_label()
+
+    def update_material_label(self):
+        task = self.model.get(self.selected_task_id) if self.selected_task_id is not None else None
+        if task is None or not task.get("materials"):
+            self.material_cost_label.config(text="")
+        else:
+            self.material_cost_label.config(text=f"材料費: {format_amount(sum(line_cost(m) for m in task['materials']))}")
+
+    # --- 計測 ---
+    def show_selected_timer(self):
+        # 大きな表示は選択中のタスクの計測を映す
+        tid = self.selected_task_id
+        self.ticker.remove("main")
+        self.timer_label.config(text="00:00:00")
+        running = tid is not None and tid in self.timers
+        if running:
+            self.ticker.add("main", self.timers.sessions[tid],
+                            lambda sec: self.timer_label.config(text=self.format_seconds(sec)))
+        self.start_btn.config(state="normal" if tid is not None and not running else "disabled")
+        self.stop_btn.config(state="normal" if running else "disabled")
 
     def start_timer(self):
-        self.is_running = True; self.start_time = time.time()
-        self.start_btn.config(state="disabled"); self.stop_btn.config(state="normal")
-        self.update_timer_loop()
-
-    def update_timer_loop(self):
-        if self.is_running:
-            self.timer_label.config(text=self.format_seconds(time.time() - self.start_time))
-            self.root.after(200, self.update_timer_loop)
+        tid = self.selected_task_id
+        if tid is None or tid in self.timers:
+            return
+        self.timers.start(tid)
+        self.add_timer_row(tid)
+        self.checkpoint_timers()
+        self.show_selected_timer()
 
     def stop_timer(self):
-        self.is_running = False
-        duration = int(time.time() - self.start_time)
-        self.data["tasks"][self.selected_task_index]["actual_sec"] += duration
-        self.save_data()
-        self.task_total_time_label.config(text=f"累計: {self.format_seconds(self.data['tasks'][self.selected_task_index]['actual_sec'])}")
-        self.stop_btn.config(state="disabled"); self.start_btn.config(state="normal")
-        self.refresh_listbox()
+        if self.selected_task_id in self.timers:
+            self.stop_timer_for(self.selected_task_id)
+
+    def stop_timer_for(self, tid):
+        # 開始・終了時刻も残し、日・週ごとの集計に使う（actual_sec は従来どおり加算される）
+        self.commit(self.timers.stop_record(tid))
+        self.remove_timer_row(tid)
+        self.checkpoint_timers()
+        task = self.model.get(tid)
+        if tid == self.selected_task_id and task is not None:
+            self.task_total_time_label.config(text=f"累計: {self.format_seconds(task['actual_sec'])}")
+            self.show_selected_timer()
+
+    def add_timer_row(self, tid):
+        self.running_empty_label.pack_forget()
+        row = tk.Frame(self.running_frame, bg="#fdfdfd")
+        row.pack(fill="x")
+        tk.Label(row, text=self.model.get(tid).get("name", ""), bg="#fdfdfd", anchor="w").pack(side=tk.LEFT)
+        tk.Button(row, text="停止", command=lambda: self.stop_timer_for(tid)).pack(side=tk.RIGHT)
+        time_label = tk.Label(row, text="00:00:00", bg="#fdfdfd", font=("Courier", 11), fg="#28a745")
+        time_label.pack(side=tk.RIGHT, padx=6)
+        self.timer_rows[tid] = row
+        self.ticker.add(("row", tid), self.timers.sessions[tid],
+                        lambda sec: time_label.config(text=self.format_seconds(sec)))
+
+    def remove_timer_row(self, tid):
+        self.ticker.remove(("row", tid))
+        row = self.timer_rows.pop(tid, None)
+        if row is not None:
+            row.destroy()
+        if not self.timer_rows:
+            self.running_empty_label.pack(anchor="w")
+
+    def checkpoint_timers(self):
+        # 計測中のセッションを保存しておき、異常終了しても次回の起動で復元できるようにする
+        self.save_data(self.timers.checkpoint_record())
+
+    def checkpoint_timers_loop(self):
+        if len(self.timers):
+            self.checkpoint_timers()
+        self.root.after(CHECKPOINT_INTERVAL * 1000, self.checkpoint_timers_loop)
+
+    def recover_timers(self):
+        checkpoint = self.store.load_running_timers()
+        if not checkpoint:
+            return
+        sessions = [s for s in checkpoint.get("sessions", []) if self.model.get(s["id"]) is not None]
+        if sessions:
+            names = "\n".join(f"・{self.model.get(s['id'])['name']}（{datetime.fromtimestamp(s['start']):%m/%d %H:%M} 開始）"
+                              for s in sessions)
+            checked = datetime.fromtimestamp(checkpoint.get("checked", 0))
+            if messagebox.askyesno(
+                    "計測の復元",
+                    f"前回、計測中のまま終了したタスクがあります。\n\n{names}\n\n"
+                    f"計測を続けますか？\n（いいえ: 最後に保存できた {checked:%m/%d %H:%M:%S} までを記録して止めます）"):
+                self.timers.restore(sessions)
+                for s in sessions:
+                    self.add_timer_row(s["id"])
+            else:
+                self.commit(*interrupted_records(dict(checkpoint, sessions=sessions)))
+        self.checkpoint_timers()
 
     def save_manual_progress(self):
-        if self.selected_task_index is not None:
-            self.data["tasks"][self.selected_task_index]["progress"] = self.prog_var.get()
-            self.save_data(); self.refresh_listbox()
+        if self.selected_task_id is not None:
+            self.commit({"op": "update_task", "id": self.selected_task_id, "fields": {"progress": self.prog_var.get()}})
 
-    def save_memo(self):
-        if self.selected_task_index is not None:
-            self.data["tasks"][self.selected_task_index]["memo"] = self.memo_text.get("1.0", tk.END).strip()
-            self.save_data(); messagebox.showinfo("保存", "メモを保存しました")
+    def load_memo(self, ref):
+        # 書き込み待ちのメモがあれば書き終えてから読む（読み込み中はまだ何も書き込んでいない）
+        if self.writer is None:
+            return self.store.load_memo(ref)
+        return self.writer.read(self.store.load_memo, ref)
+
+    def read_memo(self, task):
+        try:
+            return self.memos.get(task.get("memo_ref", ""))
+        except KeyError:
+            messagebox.showerror("エラー", "メモの本文が見つかりませんでした")
+            return ""
+        except StoreWriteError as e:
+            messagebox.showerror("エラー", str(e))
+            return ""
+
+    def undo_memo_text(self, ref):
+        # 元に戻すためにメモの本文を読む。保存が失敗し続けていて読めなければ、元に戻せない操作として扱う
+        try:
+            return self.memos.get(ref)
+        except StoreWriteError:
+            raise KeyError(ref) from None
 
+    def save_memo(self):
+        if self.selected_task_id is not None:
+            memo = self.memo_text.get("1.0", tk.END).strip()
+            # 書き込むのはこのメモの本文と参照だけ。本文は保存を待たずに読めるよう覚えておく
+            rec = set_memo_record(self.selected_task_id, memo)
+            self.memos.put(rec["ref"], memo)
+            self.commit(rec)
+            messagebox.showinfo("保存", "メモを保存しました")
+
+    @tracer.traced("delete_task")
     def delete_task(self):
-        if self.selected_task_index is not None and messagebox.askyesno("確認", "このタスクを削除しますか？"):
-            self.data["tasks"].pop(self.selected_task_index)
-            self.save_data(); self.refresh_listbox(); self.selected_task_index = None
+        if self.selected_task_id is not None and messagebox.askyesno("確認", "このタスクを削除しますか？"):
+            tid = self.selected_task_id
+            if tid in self.timers:
+                # 計測中なら記録せずに止める（タスクごと消えるため）
+                self.timers.discard(tid)
+                self.remove_timer_row(tid)
+                self.checkpoint_timers()
+            self.commit({"op": "delete_task", "id": tid})
+            self.selected_task_id = None
+            self.show_selected_timer()
 
     def on_tree_drag_start(self, event):
         item = self.task_tree.identify_row(event.y)
         if item: self._drag_item = item
 
+    @tracer.traced("on_tree_drag_stop")
     def on_tree_drag_stop(self, event):
         if hasattr(self, '_drag_item'):
             target = self.task_tree.identify_row(event.y)
-            if target and self._drag_item != target:
-                idx_f = self.task_tree.index(self._drag_item)
-                idx_t = self.task_tree.index(target)
-                self.data["tasks"].insert(idx_t, self.data["tasks"].pop(idx_f))
-                self.save_data(); self.refresh_listbox()
+            # 列で並べ替えている間は手動の並びを変えない（見出しで手動の並びに戻してから並べ替える）
+            # 読み込み中も並びを変えない（移動先の前後のタスクがまだ入っていないことがある）
+            if target and self._drag_item != target and self.list_view.sort_column is None and self.loading is None:
+                # 移動先の前後の rank の間に新しい rank を割り当てるだけで並びを変える
+                self.commit(self.model.move_task_record(self._drag_item, target))
             del self._drag_item
 
     def clear_entry_fields(self):
         for e in self.entries.values(): e.delete(0, tk.END)
 
-    def load_data(self):
-        if os.path.exists(DATA_FILE):
-            try:
-                with open(DATA_FILE, "r", encoding="utf-8") as f: return json.load(f)
-            except: pass
-        # 初期データにはカテゴリ配列を持たせる
-        return {"tasks": [], "categories": ["-"]}
-
-    def save_data(self):
-        with open(DATA_FILE, "w", encoding="utf-8") as f:
-            json.dump(self.data, f, ensure_ascii=False, indent=4)
+    @tracer.traced("load_data")
+    def load_data(self, data_file):
+        # JSON の場合はスナップショット（v24 形式）+ ジャーナルの未反映分を再生して復元する
+        # （起動時は同じ処理を start_loading() のワーカースレッドで行う）
+        try:
+            self.store = open_store(data_file)
+            return self.store.load()
+        except Exception as e:
+            return self.recover_unreadable(data_file, e)
+
+    def recover_unreadable(self, data_file, e):
+        # 読めないファイルを空のデータで上書きしないよう、起動するかを確認してから退避する
+        if not messagebox.askyesno(
+                "読み込みエラー",
+                f"データファイルを読み込めませんでした。\n\n{e}\n\n"
+                "空のデータで起動しますか？\n（読み込めなかったファイルは .broken-日時 を付けて退避します）"):
+            self.root.destroy()
+            raise SystemExit(1)
+        if self.store is not None:
+            self.store.close()
+        quarantine_store_files(data_file)
+        # 空のデータ（カテゴリは "-" のみ）から始める
+        self.store = open_store(data_file)
+        return self.store.load()
+
+    @tracer.traced("save_data")
+    def save_data(self, *records):
+        # 全体を書き直さず、変更レコードだけをジャーナル（SQLite なら該当行）へ書き込む。
+        # 書き込みは StoreWriter のスレッドが行い、続けて来た変更はまとめて 1 回で書く
+        self.writer.submit(*records)
+
+    @tracer.traced("commit")
+    def commit(self, *records, base=None, undoable=True):
+        # 変更レコードをモデルに適用してから保存する。元に戻すためのレコードは適用する前に作っておく
+        step = self.history.prepare(self.model, records, self.undo_memo_text) if undoable else None
+        if self.sync is not None:
+            ok = self.commit_sync(records, base)
+        else:
+            for rec in records:
+                self.model.apply(rec)
+            self.save_data(*records)
+            ok = True
+        if ok:
+            self.history.push(step)
+        return ok
+
+    # --- 元に戻す／やり直す ---
+    def undo(self, event=None):
+        self._replay_history(self.history.undo, self.history.done_undo, "元に戻す")
+
+    def redo(self, event=None):
+        self._replay_history(self.history.redo, self.history.done_redo, "やり直し")
+
+    def _replay_history(self, take, done, title):
+        if self.loading is not None or event_in_text_field(self.root):
+            # 入力欄の中では何もしない（入力中の文字の操作と区別する）
+            return
+        try:
+            _, records = take(self.model)
+        except UndoError as e:
+            messagebox.showinfo(title, str(e))
+            return
+        if self.is_edit_mode:
+            self.exit_edit_mode()
+        if self.commit(*records, undoable=False):
+            done()
+        touched = {r["task"]["id"] if r["op"] == "add_task" else r.get("id", CATEGORIES_KEY) for r in records}
+        self.refresh_touched(touched, reload_memo=True)
+
+    # --- 同期サーバー ---
+    def connect_server(self, server):
+        host, _, port = server.rpartition(":")
+        host = host or DEFAULT_HOST
+        try:
+            port = int(port or DEFAULT_PORT)
+            timers = os.path.join(SYNC_TIMERS_DIR, f"timers-{host}_{port}.json")
+            self.sync = self.store = SyncClient(host, port, timers_path=timers)
+            return self.sync.load()
+        except (OSError, ValueError, SyncError) as e:
+            messagebox.showerror("接続エラー", f"同期サーバー {server} に接続できませんでした。\n\n{e}")
+            self.root.destroy()
+            raise SystemExit(1)
+
+    def commit_sync(self, records, base=None):
+        # サーバーが受け付けた変更は、他のアプリの変更と同じく差分としてモデルに適用される
+        try:
+            ok = self.sync.commit(records, base)
+        except SyncError as e:
+            messagebox.showerror("同期エラー", f"変更を送れませんでした。\n\n{e}")
+            return False
+        self.refresh_touched(self.sync.poll())
+        if not ok:
+            messagebox.showwarning("同期", "他のユーザーが先にこのタスク（またはカテゴリ）を変更していました。\n"
+                                         "最新の内容を表示しているので、もう一度操作してください。")
+        return ok
+
+    def poll_sync(self):
+        # 一覧の行と検索用の索引はモデルの変更通知で更新される。ここでは選択中のタスクの表示などを直す
+        touched = self.sync.poll()
+        if touched:
+            self.refresh_touched(touched)
+        self.root.after(SYNC_POLL_MS, self.poll_sync)
+
+    def refresh_touched(self, touched, reload_memo=False):
+        # 一覧以外の表示（計測中の欄・カテゴリの選択肢・選択中のタスクの詳細）を、
+        # 他のユーザーの変更や元に戻す操作で変わったタスク（touched）について直す
+        if not touched:
+            return
+        for tid in [t for t in self.timers.sessions if t in touched and self.model.get(t) is None]:
+            # 削除されたタスクの計測は記録せずに止める
+            self.timers.discard(tid)
+            self.remove_timer_row(tid)
+            self.checkpoint_timers()
+        if CATEGORIES_KEY in touched:
+            self.refresh_category_listbox()
+            self.refresh_category_comboboxes()
+        tid = self.selected_task_id
+        if tid is not None and tid in touched:
+            task = self.model.get(tid)
+            if task is None:
+                self.selected_task_id = None
+                if self.is_edit_mode:
+                    self.exit_edit_mode()
+                self.info_label.config(text="タスクを選択")
+                self.task_total_time_label.config(text="")
+                self.sub_info_label.config(text="")
+                self.memo_text.delete("1.0", tk.END)
+                self.update_material_label()
+                self.edit_btn.config(state="disabled"); self.delete_btn.config(state="disabled"); self.materials_btn.config(state="disabled")
+                self.show_selected_timer()
+            else:
+                self.show_task_info(task)
+                if reload_memo:
+                    # 他のユーザーの変更では、編集中かもしれないメモ欄はそのままにする
+                    self.memo_text.delete("1.0", tk.END); self.memo_text.insert("1.0", self.read_memo(task))
+
+    def on_close(self):
+        # 計測中のタスクはここまでの時間を記録して止める
+        for tid in list(self.timers.sessions):
+            self.stop_timer_for(tid)
+        self.history.save()
+        if self.writer is None:
+            # 読み込みの途中で閉じた。読み込み（ID の割り当てなどの書き直しを含む）を終えてから閉じる
+            self.loading.join()
+            store = self.store
+            while store is None and not self._loaded.empty():
+                kind, value = self._loaded.get()
+                if kind == "store":
+                    store = value
+            if store is not None:
+                store.close()
+            self.root.destroy()
+            return
+        # 書き込み待ちの変更と実行中の畳み込みを待ってから終了する
+        if not self.writer.close():
+            messagebox.showerror("保存エラー", f"一部の変更を保存できませんでした。\n\n{self.writer.last_error}")
+        self.root.destroy()
 
     # --- メニュとカテゴリ管理 ---
     def setup_menu(self):
-        menubar = tk.Menu(self.root)
+        menubar = self.menubar = tk.Menu(self.root)
         menu = tk.Menu(menubar, tearoff=0)
         menu.add_command(label="カテゴリ", command=self.open_category_manager)
         menu.add_command(label="グラフ", command=self.open_category_graph)
+        menu.add_command(label="材料費集計", command=self.open_cost_view)
+        menu.add_command(label="作業時間レポート", command=self.open_time_report)
+        menu.add_command(label="作業負荷", command=self.open_capacity_view)
+        menu.add_command(label="アーカイブ", command=self.open_archive_view)
+        menu.add_separator()
+        menu.add_command(label="CSV エクスポート", command=lambda: self.open_csv_transfer("export"))
+        menu.add_command(label="CSV インポート", command=lambda: self.open_csv_transfer("import"))
+        menu.add_separator()
+        menu.add_command(label="パフォーマンス", command=self.open_perf_view)
+        menu.add_checkbutton(label="仮想スクロール一覧", variable=self.virtual_list_var, command=self.toggle_list_mode)
         menubar.add_cascade(label="メニュー", menu=menu)
+        self.data_menu = menu
+        if self.sync is not None:
+            # 同期サーバーを使うときはアーカイブしない。CSV はサーバーを止めてから import-csv で取り込む
+            for label in SYNC_DISABLED_MENU:
+                menu.entryconfig(label, state="disabled")
+        # 「編集」は開くたびに、次に元に戻す／やり直す操作の名前を表示する
+        edit = tk.Menu(menubar, tearoff=0)
+
+        def update_edit_menu():
+            for i, (text, label) in enumerate((("元に戻す", self.history.undo_label),
+                                               ("やり直す", self.history.redo_label))):
+                edit.entryconfig(i, label=f"{text}: {label}" if label else text,
+                                 state="normal" if label else "disabled")
+        edit.add_command(label="元に戻す", accelerator="Ctrl+Z", command=self.undo)
+        edit.add_command(label="やり直す", accelerator="Ctrl+Y", command=self.redo)
+        edit.config(postcommand=update_edit_menu)
+        menubar.add_cascade(label="編集", menu=edit)
         self.root.config(menu=menubar)
+        self.root.bind("<Control-z>", self.undo)
+        self.root.bind("<Control-y>", self.redo)
 
     def open_category_manager(self):
         win = tk.Toplevel(self.root)
@@ -333,7 +997,7 @@ class TaskTimerApp:
         if not hasattr(self, 'cat_listbox'):
             return
         self.cat_listbox.delete(0, tk.END)
-        for c in self.data.get('categories', []):
+        for c in self.model.categories:
             self.cat_listbox.insert(tk.END, c)
 
     def add_category(self):
@@ -341,14 +1005,14 @@ class TaskTimerApp:
         if not new: return
         new = new.strip()
         if not new: return
-        if new in self.data.get('categories', []):
+        if new in self.model.categories:
             messagebox.showinfo("情報", "既に同名のカテゴリが存在します")
             return
-        self.data.setdefault('categories', []).append(new)
-        self.save_data()
+        self.commit({"op": "add_category", "name": new})
         self.refresh_category_listbox()
         self.refresh_category_comboboxes()
 
+    @tracer.traced("delete_selected_category")
     def delete_selected_category(self):
         sel = None
         try:
@@ -362,18 +1026,17 @@ class TaskTimerApp:
         if not messagebox.askyesno("確認", f"カテゴリ '{sel}' を削除しますか？\n削除するとこのカテゴリを参照しているタスクのカテゴリは '-' に変更されます"):
             return
         # タスクのカテゴリ参照をリセット
-        for t in self.data.get('tasks', []):
-            if t.get('category') == sel:
-                t['category'] = '-'
-        self.data['categories'].remove(sel)
-        self.save_data()
+        # 参照しているタスクの行は list_view が個別に更新する
+        self.commit({"op": "delete_category", "name": sel})
         self.refresh_category_listbox()
         self.refresh_category_comboboxes()
-        self.refresh_listbox()
 
     def refresh_category_comboboxes(self):
-        vals = self.data.get('categories', ['-'])
+        vals = self.model.categories
         try:
+            self.filter_category_cb.config(values=[""] + vals)
+            if self.filter_category_cb.get() and self.filter_category_cb.get() not in vals:
+                self.filter_vars["category"].set("")
             self.category_cb.config(values=vals)
             # 既定値が存在しなければ '-' を選択
             if self.category_cb.get() not in vals:
@@ -417,8 +1080,7 @@ class TaskTimerApp:
         try:
             # 新しい順序を保存
             new_order = list(self.cat_listbox.get(0, tk.END))
-            self.data['categories'] = new_order
-            self.save_data()
+            self.commit({"op": "set_categories", "categories": new_order})
             self.refresh_category_comboboxes()
             # 選択を残す
             try:
@@ -435,61 +1097,34 @@ class TaskTimerApp:
             if hasattr(self, '_cat_drag_value'):
                 del self._cat_drag_value
 
+    @tracer.traced("open_category_graph")
     def open_category_graph(self):
         """タスク別の累計作業時間を、同名タスクの合計で比較する棒グラフとして表示します。
         各タスクのバーはカテゴリごとの内訳で色分け（積み上げ）して表示されます。
         日本語を表示できるフォントがあれば自動で設定を試みます。
         """
         try:
-            import matplotlib
             import matplotlib.pyplot as plt
             from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
-            import matplotlib.font_manager as fm
             import numpy as np
         except Exception:
             messagebox.showerror("依存パッケージ不足", "グラフ表示には matplotlib と numpy が必要です。\n\npip install matplotlib numpy でインストールしてください。")
             return
 
-        # --- 日本語フォントの自動検出（Windows の代表的なフォントを探す）
+        # --- 日本語フォントの自動検出（結果はディスクにキャッシュされ、通常は起動後に解決済み）
         try:
-            candidates = ['Meiryo', 'Yu Gothic', 'MS Gothic', 'Noto Sans CJK JP', 'IPAPGothic', 'TakaoPGothic']
-            jp_font = None
-            for fpath in fm.findSystemFonts():
-                name = fpath.lower()
-                for c in candidates:
-                    if c.lower() in name:
-                        jp_font = fpath
-                        break
-                if jp_font:
-                    break
-            if jp_font:
-                prop = fm.FontProperties(fname=jp_font)
-                try:
-                    font_name = prop.get_name()
-                    matplotlib.rcParams['font.family'] = 'sans-serif'
-                    matplotlib.rcParams['font.sans-serif'] = [font_name] + matplotlib.rcParams.get('font.sans-serif', [])
-                except Exception:
-                    pass
+            apply_japanese_font()
         except Exception:
             pass
 
-        # 集計: タスク名ごと -> カテゴリごとの秒数合計
-        task_map = {}
-        categories = list(self.data.get('categories', ['-']))
-        for t in self.data.get('tasks', []):
-            name = t.get('name', '-')
-            cat = t.get('category', '-')
-            try:
-                secs = int(t.get('actual_sec', 0))
-            except Exception:
-                secs = 0
-            task_map.setdefault(name, {})
-            task_map[name].setdefault(cat, 0)
-            task_map[name][cat] += secs
-
-        # ソート（合計降順）
-        items = sorted([(name, d) for name, d in task_map.items()], key=lambda x: sum(x[1].values()), reverse=True)
-        labels = [i[0] for i in items]
+        # 集計: タスク名 × カテゴリの時間（合計降順）。初回に作った集計表をモデルの変更に合わせて差分更新する
+        if self.category_pivot is None:
+            from task_aggregate import CategoryPivot
+            self.category_pivot = CategoryPivot(self.model)
+            if self.archive is not None:
+                # アーカイブ済みのタスクの分は索引の集計から足す（セグメントは読まない）
+                self.category_pivot.set_extra(self.archive.totals())
+        labels, categories, data_matrix = self.category_pivot.pivot()
         if not labels:
             messagebox.showinfo("情報", "表示するタスクデータがありません。")
             return
@@ -498,15 +1133,6 @@ class TaskTimerApp:
         cmap = plt.get_cmap('tab20')
         cat_colors = {c: cmap(i % cmap.N) for i, c in enumerate(categories)}
 
-        # 各カテゴリごとの値配列を作成（単位: 時間）
-        data_matrix = []
-        for c in categories:
-            row = []
-            for _, d in items:
-                row.append(d.get(c, 0) / 3600.0)
-            data_matrix.append(row)
-        data_matrix = np.array(data_matrix)
-
         # ウィンドウとレイアウト
         win = tk.Toplevel(self.root)
         win.title("タスク別グラフ（カテゴリ内訳）")
@@ -517,8 +1143,28 @@ class TaskTimerApp:
         right_area = tk.Frame(win)
         right_area.pack(side=tk.RIGHT, fill=tk.BOTH, expand=True)
 
-        # タスクが5件以上の場合はチェックボックスで選択可能にする
+        # 描画領域（棒と文字は 1 回だけ作り、選択の変更では位置と表示だけを更新する）
+        from task_chart import StackedBarChart
+        fig, ax = plt.subplots(figsize=(max(8, len(labels) * 0.6), 5))
+        chart = StackedBarChart(ax, labels, categories, data_matrix, cat_colors, self.format_seconds)
+        fig.tight_layout()
+
+        # タスクが5件以上の場合はチェックボックスで選択可能にする（変更はまとめてすぐ反映する）
         sel_vars = []
+        redraw_job = None
+
+        def redraw():
+            nonlocal redraw_job
+            redraw_job = None
+            chart.set_selection([i for i, (_, v) in enumerate(sel_vars) if v.get()])
+            canvas.draw_idle()
+
+        def schedule_redraw(*_):
+            nonlocal redraw_job
+            if redraw_job is not None:
+                win.after_cancel(redraw_job)
+            redraw_job = win.after(150, redraw)
+
         if len(labels) >= 5:
             tk.Label(left_ctrl, text="表示するタスク（チェック）", anchor='w').pack(anchor='nw')
 
@@ -537,99 +1183,797 @@ class TaskTimerApp:
 
             for lbl in labels:
                 var = tk.BooleanVar(value=True)
-                cb = tk.Checkbutton(inner, text=lbl, variable=var, anchor='w')
+                cb = tk.Checkbutton(inner, text=lbl, variable=var, anchor='w', command=schedule_redraw)
                 cb.pack(fill='x', anchor='w')
                 sel_vars.append((lbl, var))
 
+            def set_all(value):
+                for _, v in sel_vars:
+                    v.set(value)
+                schedule_redraw()
+
             btnf = tk.Frame(left_ctrl)
             btnf.pack(fill='x', pady=(6, 0))
-            tk.Button(btnf, text='全選択', command=lambda: [v.set(True) for _, v in sel_vars]).pack(side=tk.LEFT, padx=4)
-            tk.Button(btnf, text='全解除', command=lambda: [v.set(False) for _, v in sel_vars]).pack(side=tk.LEFT, padx=4)
-            tk.Button(btnf, text='適用', command=lambda: draw([l for l, v in sel_vars if v.get()])).pack(side=tk.RIGHT, padx=4)
-        else:
-            sel_vars = None
+            tk.Button(btnf, text='全選択', command=lambda: set_all(True)).pack(side=tk.LEFT, padx=4)
+            tk.Button(btnf, text='全解除', command=lambda: set_all(False)).pack(side=tk.LEFT, padx=4)
 
-        # 描画領域
-        fig, ax = plt.subplots(figsize=(max(8, len(labels) * 0.6), 5))
         canvas = FigureCanvasTkAgg(fig, master=right_area)
+        # draw_idle() からの描画も計測されるよう、インスタンスの draw を包む
+        canvas.draw = tracer.traced("graph.draw")(canvas.draw)
         canvas.get_tk_widget().pack(fill=tk.BOTH, expand=True)
+        # 初回描画（全選択）
+        canvas.draw()
 
-        def draw(selected_labels=None):
-            ax.clear()
+    def ensure_time_rollup(self):
+        """作業時間の集計を作ります。保存が失敗し続けていてエントリを読めなければ False を返します。"""
+        if not self.time_rollup.built:
+            # 書き込み待ちのエントリを書き終えてから読む
+            try:
+                entries = self.writer.read(lambda: list(self.store.load_time_entries()))
+            except StoreWriteError as e:
+                messagebox.showerror("エラー", str(e))
+                return False
+            fixes = self.time_rollup.build(entries)
+            if self.archive is not None:
+                # アーカイブ済みのタスクのエントリは集計から外れるので、索引の日ごとの合計を足す
+                self.time_rollup.set_extra(self.archive.day_totals())
+            if fixes:
+                self.commit(*fixes, undoable=False)
+        return True
+
+    def open_time_report(self):
+        """作業時間を日または週ごとに、作業者別・カテゴリ別に集計して表示します。"""
+        if not self.ensure_time_rollup():
+            return
+        rollup = self.time_rollup
 
-            # 選択ラベルのインデックスを作る
-            if selected_labels is None or len(labels) < 5:
-                sel_idx = list(range(len(labels)))
-                sel_labels = labels
+        win = tk.Toplevel(self.root)
+        win.title("作業時間レポート")
+        win.geometry("800x450")
+
+        ctrl = tk.Frame(win)
+        ctrl.pack(fill="x", padx=8, pady=6)
+        today = date.today()
+        from_var = tk.StringVar(value=(today - timedelta(days=27)).strftime("%Y/%m/%d"))
+        to_var = tk.StringVar(value=today.strftime("%Y/%m/%d"))
+        unit_var = tk.StringVar(value="week")
+        axis_var = tk.StringVar(value="worker")
+        tk.Label(ctrl, text="期間").pack(side=tk.LEFT)
+        tk.Entry(ctrl, textvariable=from_var, width=11).pack(side=tk.LEFT)
+        tk.Label(ctrl, text="〜").pack(side=tk.LEFT)
+        tk.Entry(ctrl, textvariable=to_var, width=11).pack(side=tk.LEFT)
+        tk.Radiobutton(ctrl, text="日", variable=unit_var, value="day").pack(side=tk.LEFT, padx=(10, 0))
+        tk.Radiobutton(ctrl, text="週", variable=unit_var, value="week").pack(side=tk.LEFT)
+        tk.Radiobutton(ctrl, text="作業者別", variable=axis_var, value="worker").pack(side=tk.LEFT, padx=(10, 0))
+        tk.Radiobutton(ctrl, text="カテゴリ別", variable=axis_var, value="category").pack(side=tk.LEFT)
+
+        tree_frame = tk.Frame(win)
+        tree_frame.pack(fill="both", expand=True, padx=8, pady=(0, 8))
+        tree = ttk.Treeview(tree_frame, show="headings")
+        xsb = ttk.Scrollbar(tree_frame, orient=tk.HORIZONTAL, command=tree.xview)
+        tree.configure(xscrollcommand=xsb.set)
+        xsb.pack(side=tk.BOTTOM, fill=tk.X)
+        tree.pack(fill="both", expand=True)
+
+        def show():
+            try:
+                first = datetime.strptime(from_var.get().strip(), "%Y/%m/%d").date()
+                last = datetime.strptime(to_var.get().strip(), "%Y/%m/%d").date()
+            except ValueError:
+                messagebox.showerror("エラー", "日付は YYYY/MM/DD 形式で入力してください", parent=win)
+                return
+            if axis_var.get() == "worker":
+                values = sorted(rollup.worker_days)
             else:
-                sel_idx = [i for i, l in enumerate(labels) if l in selected_labels]
-                sel_labels = [labels[i] for i in sel_idx]
+                values = [c for c in self.model.categories if c in rollup.category_days]
+            cols = ["period"] + [f"v{i}" for i in range(len(values))] + ["total"]
+            tree.configure(columns=cols)
+            tree.heading("period", text="期間")
+            tree.column("period", width=170, anchor="w", stretch=False)
+            for i, v in enumerate(values):
+                tree.heading(f"v{i}", text=v)
+                tree.column(f"v{i}", width=90, anchor="e", stretch=False)
+            tree.heading("total", text="合計")
+            tree.column("total", width=90, anchor="e", stretch=False)
+            tree.delete(*tree.get_children())
+            # 各セルは累積和の差で求まるので、エントリ数によらず O(log n)
+            key = axis_var.get()
+            for lo, hi in rollup.periods(first, last, unit_var.get()):
+                label = lo.strftime("%Y/%m/%d") if lo == hi else f"{lo:%Y/%m/%d}〜{hi:%m/%d}"
+                cells = [self.format_seconds(rollup.period_total(lo, hi, **{key: v})) for v in values]
+                tree.insert("", tk.END, values=[label] + cells + [self.format_seconds(rollup.period_total(lo, hi))])
+
+        tk.Button(ctrl, text="表示", command=show).pack(side=tk.LEFT, padx=10)
+        show()
+
+    def open_capacity_view(self):
+        """担当者別・カテゴリ別の残り作業の負荷と、期限に間に合わないタスクを表示します。"""
+        today = date.today()
+        if self.capacity_planner is None:
+            self.capacity_planner = CapacityPlanner(self.model, today)
+        planner = self.capacity_planner
 
-            if not sel_idx:
-                messagebox.showinfo("情報", "表示するタスクが選択されていません。")
-                canvas.draw()
+        win = tk.Toplevel(self.root)
+        win.title("作業負荷")
+        win.geometry("640x560")
+
+        ctrl = tk.Frame(win)
+        ctrl.pack(fill="x", padx=8, pady=6)
+        from_var = tk.StringVar(value=today.strftime("%Y/%m/%d"))
+        to_var = tk.StringVar(value=(today + timedelta(days=13)).strftime("%Y/%m/%d"))
+        axis_var = tk.StringVar(value="worker")
+        tk.Label(ctrl, text="期間").pack(side=tk.LEFT)
+        tk.Entry(ctrl, textvariable=from_var, width=11).pack(side=tk.LEFT)
+        tk.Label(ctrl, text="〜").pack(side=tk.LEFT)
+        tk.Entry(ctrl, textvariable=to_var, width=11).pack(side=tk.LEFT)
+        tk.Radiobutton(ctrl, text="担当者別", variable=axis_var, value="worker").pack(side=tk.LEFT, padx=(10, 0))
+        tk.Radiobutton(ctrl, text="カテゴリ別", variable=axis_var, value="category").pack(side=tk.LEFT)
+
+        load_tree = ttk.Treeview(win, columns=("key", "load", "capacity", "ratio"), show="headings", height=10)
+        for col, text, width, anchor in (("key", "担当者", 200, "w"), ("load", "残り作業(h)", 110, "e"),
+                                         ("capacity", "稼働可能(h)", 110, "e"), ("ratio", "負荷率", 90, "e")):
+            load_tree.heading(col, text=text)
+            load_tree.column(col, width=width, anchor=anchor)
+        load_tree.tag_configure("over", foreground="red")
+        load_tree.pack(fill="both", expand=True, padx=8)
+        late_label = tk.Label(win, anchor="w", font=("Arial", 10, "bold"))
+        late_label.pack(fill="x", padx=8, pady=(8, 0))
+        late_tree = ttk.Treeview(win, columns=("name", "worker", "deadline", "short"), show="headings", height=8)
+        for col, text, width, anchor in (("name", "タスク名", 200, "w"), ("worker", "担当者", 120, "w"),
+                                         ("deadline", "期限", 100, "center"), ("short", "不足(h)", 90, "e")):
+            late_tree.heading(col, text=text)
+            late_tree.column(col, width=width, anchor=anchor)
+        late_tree.pack(fill="both", expand=True, padx=8, pady=(0, 8))
+
+        def show():
+            try:
+                first = datetime.strptime(from_var.get().strip(), "%Y/%m/%d").date()
+                last = datetime.strptime(to_var.get().strip(), "%Y/%m/%d").date()
+            except ValueError:
+                messagebox.showerror("エラー", "日付は YYYY/MM/DD 形式で入力してください", parent=win)
                 return
+            if planner.today != date.today().toordinal():
+                # 日付が変わっていたら今日から割り付け直す
+                planner.set_today(date.today())
+            # 負荷は累積和の差で求まるので、タスク数によらず担当者 1 人あたり O(log n)
+            field = axis_var.get()
+            load_tree.heading("key", text="担当者" if field == "worker" else "カテゴリ")
+            load_tree.delete(*load_tree.get_children())
+            cap = planner.capacity(first, last)
+            loads = planner.load_by(field, first, last)
+            for key, hours in sorted(loads.items(), key=lambda kv: kv[1], reverse=True):
+                if hours < 0.05:
+                    continue
+                if field == "worker":
+                    ratio = f"{hours / cap:.0%}" if cap else "-"
+                    tags = ("over",) if hours > cap else ()
+                    load_tree.insert("", tk.END, values=(key, f"{hours:,.1f}", f"{cap:,.1f}", ratio), tags=tags)
+                else:
+                    load_tree.insert("", tk.END, values=(key, f"{hours:,.1f}", "", ""))
+            late = sorted(planner.late_tasks(), key=lambda r: -r[1])
+            late_label.config(text=f"期限に間に合わないタスク: {len(late):,} 件", fg="red" if late else "black")
+            late_tree.delete(*late_tree.get_children())
+            for tid, short in late[:LATE_TASKS_SHOWN]:
+                t = self.model.get(tid)
+                late_tree.insert("", tk.END, values=(t.get("name", ""), t.get("worker", "-"), t.get("end_date", ""),
+                                                     f"{short:,.1f}"))
+
+        tk.Button(ctrl, text="表示", command=show).pack(side=tk.LEFT, padx=10)
+        show()
+
+    # --- アーカイブ ---
+    def archive_completed(self, days):
+        """期限から days 日が過ぎた完了タスクをアーカイブへ移し、移した件数を返します。
+
+        削除を保存できなければ StoreWriteError を出します（セグメントは保留中のまま残り、
+        次回の起動時に recover() で片付きます）。
+        """
+        # 計測中のタスクは移さない
+        tasks = archivable(self.model, default_cutoff(days), skip=set(self.timers.sessions))
+        if not tasks:
+            return 0
+        # 日ごとの作業時間をセグメントに持たせる
+        if not self.ensure_time_rollup():
+            return 0
+
+        def commit(records):
+            # 行ごとの一覧の更新を止めてから消し、削除が保存されるまで待ってからセグメントを確定する
+            self.list_view.rows = None
+            try:
+                self.commit(*records, undoable=False)
+            finally:
+                self.list_view.rows = self.row_sync
+            if not self.writer.flush():
+                raise StoreWriteError(f"削除を保存できませんでした: {self.writer.last_error}")
 
-            x = np.arange(len(sel_labels))
-
-            # フィルタしたデータ行列
-            filtered = data_matrix[:, sel_idx]
-
-            bottom = np.zeros(len(sel_labels))
-            bars = []
-            for i, c in enumerate(categories):
-                vals = filtered[i]
-                b = ax.bar(x, vals, bottom=bottom, color=cat_colors.get(c), label=c)
-                bars.append(b)
-                bottom += vals
-
-            # 小さなセグメントはラベルを非表示にするための閾値（最大合計の 2%）
-            totals_hours = bottom
-            max_total = max(totals_hours) if len(totals_hours) else 0
-            min_display = max_total * 0.02
-
-            # セグメント内部に hh:mm:ss 表示
-            for i, b in enumerate(bars):
-                for j, rect in enumerate(b):
-                    h = rect.get_height()
-                    if h <= 0 or h < min_display:
-                        continue
-                    secs = int(h * 3600)
-                    label = self.format_seconds(secs)
-                    x_pos = rect.get_x() + rect.get_width() / 2
-                    y_pos = rect.get_y() + h / 2
-                    color_rgba = cat_colors.get(categories[i])
-                    try:
-                        r, g, bl = color_rgba[:3]
-                        luminance = 0.299 * r + 0.587 * g + 0.114 * bl
-                        text_color = 'white' if luminance < 0.5 else 'black'
-                    except Exception:
-                        text_color = 'black'
-                    ax.text(x_pos, y_pos, label, ha='center', va='center', color=text_color, fontsize=8)
-
-            # バー上に合計を hh:mm:ss で表示
-            for xi, total in enumerate(totals_hours):
-                if total > 0:
-                    total_secs = int(total * 3600)
-                    ax.text(xi, total, self.format_seconds(total_secs), ha='center', va='bottom', fontsize=9)
-
-            ax.set_xticks(x)
-            ax.set_xticklabels(sel_labels, rotation=45, ha='right')
-            ax.set_ylabel('作業時間（時間）')
-            ax.set_title('タスク別 作業時間（カテゴリ内訳）')
-
-            # 凡例（カテゴリ）
-            ax.legend(title='カテゴリ', bbox_to_anchor=(1.02, 1), loc='upper left')
-
-            fig.tight_layout()
-            canvas.draw()
+        try:
+            return archive_tasks(self.model, self.archive, tasks, self.load_memo, commit, self.time_rollup.task_days)
+        finally:
+            self.after_archive_change({t.id for t in tasks})
 
-        # 初回描画（全選択）
-        draw()
+    def restore_archived(self, picked):
+        """アーカイブのタスク [(セグメント, タスク)] をデータに戻します。
 
+        追加を保存できなければ、索引には記録せずに StoreWriteError を出します。
+        """
+        by_seg = {}
+        for seg, d in picked:
+            by_seg.setdefault(seg["file"], (seg, []))[1].append(d)
+        try:
+            for seg, tasks in by_seg.values():
+                records = restore_records(self.model, tasks)
+                if records:
+                    self.commit(*records, undoable=False)
+                # 追加が保存されてから索引に記録する（途中で終了しても、タスクが無くなることはない）
+                if not self.writer.flush():
+                    raise StoreWriteError(f"戻したタスクを保存できませんでした: {self.writer.last_error}")
+                self.archive.mark_restored(seg, tasks)
+                if self.time_rollup.built:
+                    # エントリは保存エンジンに残っているので、集計にはセグメントの日ごとの分を戻す
+                    # （この起動中にアーカイブしたタスクは、追加の通知で TimeRollup が戻し済み）
+                    added = {r["task"]["id"] for r in records if r["op"] == "add_task"}
+                    for d in tasks:
+                        if (d.get("time_days") and d["id"] in added and d["id"] in self.model.tasks
+                                and d["id"] not in self.time_rollup.task_days):
+                            days = ((int(day), sec) for day, sec in d["time_days"].items())
+                            self.time_rollup.add_task_days(d["id"], days)
+        finally:
+            self.after_archive_change({d["id"] for _, d in picked})
 
+    def after_archive_change(self, touched):
+        if self.category_pivot is not None:
+            self.category_pivot.set_extra(self.archive.totals())
+        if self.time_rollup.built:
+            self.time_rollup.set_extra(self.archive.day_totals())
+        self.refresh_category_comboboxes()
+        self.apply_filter()
+        self.refresh_touched(touched)
+
+    def open_archive_view(self):
+        """完了したタスクをアーカイブへ移す画面と、アーカイブ済みのタスクを探して戻す画面。"""
+        win = tk.Toplevel(self.root)
+        win.title("アーカイブ")
+        win.geometry("640x520")
+
+        top = tk.Frame(win)
+        top.pack(fill="x", padx=8, pady=6)
+        days_var = tk.StringVar(value=str(ARCHIVE_AGE_DAYS))
+        tk.Label(top, text="期限から").pack(side=tk.LEFT)
+        tk.Entry(top, textvariable=days_var, width=5).pack(side=tk.LEFT)
+        tk.Label(top, text="日以上過ぎた完了タスク").pack(side=tk.LEFT)
+        count_label = tk.Label(top)
+        count_label.pack(side=tk.LEFT, padx=6)
+        summary_label = tk.Label(win, anchor="w")
+        summary_label.pack(fill="x", padx=8)
+
+        find = tk.Frame(win)
+        find.pack(fill="x", padx=8, pady=(10, 4))
+        text_var = tk.StringVar()
+        tk.Label(find, text="アーカイブ済みのタスク名").pack(side=tk.LEFT)
+        find_entry = tk.Entry(find, textvariable=text_var, width=24)
+        find_entry.pack(side=tk.LEFT)
+        tree = ttk.Treeview(win, columns=("name", "worker", "deadline", "category", "archived"), show="headings",
+                            height=14, selectmode="extended")
+        for col, text, width, anchor in (("name", "タスク名", 180, "w"), ("worker", "担当者", 90, "w"),
+                                         ("deadline", "期限", 90, "center"), ("category", "カテゴリ", 90, "w"),
+                                         ("archived", "移した日時", 130, "center")):
+            tree.heading(col, text=text)
+            tree.column(col, width=width, anchor=anchor)
+        tree.pack(fill="both", expand=True, padx=8)
+        found = {}
+
+        def days():
+            try:
+                return max(int(days_var.get()), 0)
+            except ValueError:
+                messagebox.showerror("エラー", "日数は整数で入力してください", parent=win)
+                return None
+
+        def show_summary():
+            summary_label.config(text=f"アーカイブ済み: {len(self.archive):,} 件"
+                                      f"（{len(self.archive.segments):,} ファイル） / データ: {len(self.model):,} 件")
+
+        def count():
+            d = days()
+            if d is not None:
+                n = len(archivable(self.model, default_cutoff(d), skip=set(self.timers.sessions)))
+                count_label.config(text=f"{n:,} 件")
+
+        def run():
+            d = days()
+            if d is None:
+                return
+            if not messagebox.askyesno("確認", f"期限から {d} 日以上過ぎた完了タスクをアーカイブへ移しますか？",
+                                       parent=win):
+                return
+            try:
+                n = self.archive_completed(d)
+            except StoreWriteError as e:
+                messagebox.showerror("エラー", str(e), parent=win)
+                return
+            count_label.config(text="")
+            show_summary()
+            messagebox.showinfo("アーカイブ", f"{n:,} 件をアーカイブへ移しました", parent=win)
+
+        def search(event=None):
+            tree.delete(*tree.get_children())
+            found.clear()
+            for seg, d in self.archive.search(text_var.get().strip()):
+                iid = tree.insert("", tk.END, values=(d.get("name", ""), d.get("worker", "-"), d.get("end_date", ""),
+                                                      d.get("category", "-"), seg["archived_at"]))
+                found[iid] = (seg, d)
+
+        def restore():
+            picked = [found[iid] for iid in tree.selection()]
+            if not picked:
+                return
+            try:
+                self.restore_archived(picked)
+            except StoreWriteError as e:
+                messagebox.showerror("エラー", str(e), parent=win)
+            show_summary()
+            search()
+
+        tk.Button(top, text="件数", command=count).pack(side=tk.LEFT)
+        tk.Button(top, text="アーカイブへ移す", command=run).pack(side=tk.RIGHT)
+        tk.Button(find, text="検索", command=search).pack(side=tk.LEFT, padx=4)
+        find_entry.bind("<Return>", search)
+        tk.Button(win, text="選択したタスクを戻す", command=restore).pack(anchor="e", padx=8, pady=6)
+        show_summary()
+
+    # --- 材料費 ---
+    def open_materials_editor(self):
+        """選択中のタスクの材料費の明細を編集します（1 行ごとに保存）。"""
+        tid = self.selected_task_id
+        if tid is None:
+            return
+        task = self.model.get(tid)
+        win = tk.Toplevel(self.root)
+        win.title(f"材料費 - {task['name']}")
+        win.geometry("520x380")
+
+        cols = (("name", "品名", 180, "w"), ("price", "単価", 90, "e"), ("qty", "数量", 70, "e"), ("subtotal", "小計", 100, "e"))
+        tree = ttk.Treeview(win, columns=[c[0] for c in cols], show="headings", height=10)
+        for key, heading, width, anchor in cols:
+            tree.heading(key, text=heading)
+            tree.column(key, width=width, anchor=anchor)
+        tree.pack(fill="both", expand=True, padx=10, pady=(10, 4))
+        total_label = tk.Label(win, anchor="e", font=("Arial", 10, "bold"))
+        total_label.pack(fill="x", padx=10)
+
+        form = tk.Frame(win)
+        form.pack(fill="x", padx=10, pady=6)
+        fields = {}
+        for key, label, width in (("name", "品名", 18), ("price", "単価", 9), ("qty", "数量", 7)):
+            tk.Label(form, text=label).pack(side=tk.LEFT)
+            fields[key] = tk.Entry(form, width=width)
+            fields[key].pack(side=tk.LEFT, padx=(0, 6))
+
+        def show():
+            lines = self.model.get(tid).get("materials") or []
+            tree.delete(*tree.get_children())
+            for pos, m in enumerate(lines):
+                tree.insert("", tk.END, iid=str(pos), values=(
+                    m.get("name", ""), format_amount(to_minor(m.get("price", 0))),
+                    m.get("qty", ""), format_amount(line_cost(m))))
+            total_label.config(text=f"合計: {format_amount(sum(line_cost(m) for m in lines))}")
+            self.update_material_label()
+
+        def read_line():
+            try:
+                return make_line(fields["name"].get().strip(), fields["price"].get().strip() or 0,
+                                 fields["qty"].get().strip() or 1)
+            except ArithmeticError:
+                messagebox.showwarning("入力エラー", "単価と数量は数値で入力してください", parent=win)
+                return None
+
+        def on_select(event):
+            sel = tree.selection()
+            if sel:
+                m = self.model.get(tid)["materials"][int(sel[0])]
+                for key in ("name", "price", "qty"):
+                    fields[key].delete(0, tk.END)
+                    fields[key].insert(0, str(m.get(key, "")))
+
+        def add_line():
+            line = read_line()
+            if line is not None:
+                pos = len(self.model.get(tid).get("materials") or [])
+                self.commit({"op": "set_material", "id": tid, "pos": pos, "line": line})
+                show()
+
+        def update_line():
+            sel = tree.selection()
+            line = read_line() if sel else None
+            if line is not None:
+                self.commit({"op": "set_material", "id": tid, "pos": int(sel[0]), "line": line})
+                show()
+
+        def delete_line():
+            sel = tree.selection()
+            if sel:
+                self.commit({"op": "delete_material", "id": tid, "pos": int(sel[0])})
+                show()
+
+        tree.bind("<<TreeviewSelect>>", on_select)
+        btns = tk.Frame(win)
+        btns.pack(fill="x", padx=10, pady=(0, 10))
+        tk.Button(btns, text="追加", command=add_line).pack(side=tk.LEFT, padx=2)
+        tk.Button(btns, text="更新", command=update_line).pack(side=tk.LEFT, padx=2)
+        tk.Button(btns, text="削除", command=delete_line).pack(side=tk.LEFT, padx=2)
+        tk.Button(btns, text="閉じる", command=win.destroy).pack(side=tk.RIGHT, padx=2)
+        show()
+
+    def open_cost_view(self):
+        """材料費の合計をタスク名・カテゴリ・作業者ごとに表示します。"""
+        if self.material_ledger is None:
+            self.material_ledger = MaterialLedger(self.model)
+        ledger = self.material_ledger
+
+        win = tk.Toplevel(self.root)
+        win.title("材料費集計")
+        win.geometry("420x420")
+        ctrl = tk.Frame(win)
+        ctrl.pack(fill="x", padx=10, pady=6)
+        group_var = tk.StringVar(value="name")
+        tree = ttk.Treeview(win, columns=("key", "amount"), show="headings")
+        tree.column("key", width=220, anchor="w")
+        tree.heading("amount", text="材料費")
+        tree.column("amount", width=140, anchor="e")
+        total_label = tk.Label(win, anchor="e", font=("Arial", 10, "bold"))
+
+        def show():
+            # 合計は差分更新済みなので、開くたび・切り替えるたびに明細を数え直す必要はない
+            field = group_var.get()
+            tree.heading("key", text={"name": "タスク名", "category": "カテゴリ", "worker": "作業者"}[field])
+            tree.delete(*tree.get_children())
+            for key, amount in ledger.ranking(field):
+                tree.insert("", tk.END, values=(key, format_amount(amount)))
+            total_label.config(text=f"合計: {format_amount(ledger.total)}")
+
+        for value, text in (("name", "タスク名別"), ("category", "カテゴリ別"), ("worker", "作業者別")):
+            tk.Radiobutton(ctrl, text=text, variable=group_var, value=value, command=show).pack(side=tk.LEFT)
+        tk.Button(ctrl, text="再表示", command=show).pack(side=tk.RIGHT)
+        tree.pack(fill="both", expand=True, padx=10)
+        total_label.pack(fill="x", padx=10, pady=6)
+        show()
+
+    # --- CSV ---
+    def open_csv_transfer(self, mode):
+        """CSV へのエクスポート（mode="export"）／インポート（mode="import"）。
+
+        処理は after() で少しずつ進め、進み具合と 1 秒あたりの行数を表示します。
+        取り込みはバッチごとに 1 回だけ保存し、一覧は最後に 1 回だけ作り直します。
+        """
+        win = tk.Toplevel(self.root)
+        win.title("CSV エクスポート" if mode == "export" else "CSV インポート")
+        win.geometry("460x200")
+        win.transient(self.root)
+        # 処理中に一覧の切り替えなどが行われないよう、このウィンドウ以外の操作を止める
+        win.grab_set()
+
+        kind_var = tk.StringVar(value="tasks")
+        kinds = tk.Frame(win)
+        kinds.pack(fill="x", padx=10, pady=(10, 4))
+        for kind, label in KIND_LABELS.items():
+            tk.Radiobutton(kinds, text=label, variable=kind_var, value=kind).pack(side=tk.LEFT)
+        bar = ttk.Progressbar(win, maximum=1.0, length=430)
+        bar.pack(padx=10, pady=6)
+        status = tk.Label(win, anchor="w", justify="left")
+        status.pack(fill="x", padx=10)
+        btns = tk.Frame(win)
+        btns.pack(fill="x", padx=10, pady=10)
+        state = {"gen": None, "job": None}
+
+        def rows_done():
+            return state["importer"].rows if mode == "import" else state["rows"]
+
+        def show_progress():
+            n = rows_done()
+            elapsed = max(time.monotonic() - state["t0"], 1e-6)
+            if mode == "import":
+                bar["value"] = state["importer"].progress
+            elif state["total"]:
+                bar["value"] = min(n / state["total"], 1.0)
+            status.config(text=f"{n:,} 行（{n / elapsed:,.0f} 行/秒）")
+
+        def step():
+            state["job"] = None
+            deadline = time.monotonic() + CSV_SLICE
+            try:
+                while time.monotonic() < deadline:
+                    item = next(state["gen"])
+                    if mode == "import":
+                        # バッチのレコードは適用済み。保存は StoreWriter がまとめて行う
+                        self.save_data(*item)
+                    else:
+                        state["rows"] = item
+            except StopIteration:
+                finish()
+                return
+            except (OSError, ValueError, KeyError) as e:
+                finish(e)
+                return
+            show_progress()
+            state["job"] = self.root.after(1, step)
+
+        def finish(error=None, cancelled=False):
+            state["gen"] = None
+            if mode == "import":
+                # 取り込み中は止めていた一覧の更新を戻し、まとめて作り直す
+                self.list_view.rows = self.row_sync
+                # 取り込みは履歴を通らないので、それより前の操作は元に戻せなくする
+                self.history.clear()
+                self.refresh_category_comboboxes()
+                self.apply_filter()
+                self.update_material_label()
+            if state["total"] is None:
+                bar.stop()
+                bar.config(mode="determinate")
+            show_progress()
+            run_btn.config(state="normal")
+            cancel_btn.config(text="閉じる")
+            if error is not None:
+                messagebox.showerror("エラー", f"CSV を処理できませんでした。\n\n{error}", parent=win)
+                return
+            text = "中止しました" if cancelled else "完了しました"
+            if mode == "import":
+                imp = state["importer"]
+                text += f"\n取り込み: {imp.imported:,} 行 / 読み飛ばし: {imp.error_count:,} 行"
+                if imp.errors:
+                    text += "\n\n" + "\n".join(f"{line} 行目: {msg}" for line, msg in imp.errors[:10])
+            messagebox.showinfo(win.title(), text, parent=win)
+
+        def start():
+            kind = kind_var.get()
+            if mode == "export":
+                path = filedialog.asksaveasfilename(parent=win, defaultextension=".csv", initialfile=f"{kind}.csv",
+                                                    filetypes=[("CSV", "*.csv")])
+            else:
+                path = filedialog.askopenfilename(parent=win, filetypes=[("CSV", "*.csv"), ("すべてのファイル", "*.*")])
+            if not path:
+                return
+            try:
+                if mode == "export":
+                    # 書き込み待ちのエントリ・メモを書き終えてから読む
+                    self.writer.flush()
+                    state["gen"] = export_csv(path, kind, self.model, self.store, every=CSV_UI_BATCH)
+                    state["rows"] = 0
+                    state["total"] = len(self.model) if kind == "tasks" else None
+                else:
+                    state["importer"] = CsvImporter(path, kind, self.model, batch_size=CSV_UI_BATCH)
+                    state["gen"] = state["importer"].batches()
+                    state["total"] = 1.0
+                    # 行ごとの一覧の更新を止める（終わったら絞り込みごと作り直す）
+                    self.list_view.rows = None
+            except OSError as e:
+                messagebox.showerror("エラー", f"ファイルを開けませんでした。\n\n{e}", parent=win)
+                return
+            bar["value"] = 0
+            if state["total"] is None:
+                bar.config(mode="indeterminate")
+                bar.start(50)
+            state["t0"] = time.monotonic()
+            run_btn.config(state="disabled")
+            cancel_btn.config(text="中止")
+            step()
+
+        def cancel():
+            if state["gen"] is None:
+                win.destroy()
+                return
+            if state["job"] is not None:
+                self.root.after_cancel(state["job"])
+                state["job"] = None
+            # 書き出しは書きかけのファイルを消す。取り込みは保存済みのバッチまでが残る
+            state["gen"].close()
+            finish(cancelled=True)
+
+        run_btn = tk.Button(btns, text="ファイルを選択して実行", command=start)
+        run_btn.pack(side=tk.LEFT)
+        cancel_btn = tk.Button(btns, text="閉じる", command=cancel)
+        cancel_btn.pack(side=tk.RIGHT)
+
+        def on_close():
+            if state["gen"] is not None:
+                cancel()
+            win.destroy()
+
+        win.protocol("WM_DELETE_WINDOW", on_close)
+
+    # --- パフォーマンス ---
+    def open_perf_view(self):
+        """計測した処理時間のパーセンタイルとイベントループの遅れを表示します（1 秒ごとに更新）。"""
+        win = tk.Toplevel(self.root)
+        win.title("パフォーマンス")
+        win.geometry("640x380")
+        ctrl = tk.Frame(win)
+        ctrl.pack(fill="x", padx=10, pady=6)
+        enabled_var = tk.BooleanVar(value=tracer.enabled)
+
+        def toggle():
+            tracer.enabled = enabled_var.get()
+            if tracer.enabled:
+                self.lag_monitor.start()
+            else:
+                self.lag_monitor.stop()
+
+        def export():
+            path = filedialog.asksaveasfilename(parent=win, defaultextension=".json", initialfile="trace.json",
+                                                filetypes=[("Chrome トレース", "*.json")])
+            if path:
+                try:
+                    n = tracer.export_chrome_trace(path)
+                except OSError as e:
+                    messagebox.showerror("エラー", f"書き出せませんでした。\n\n{e}", parent=win)
+                    return
+                messagebox.showinfo("パフォーマンス", f"{n:,} 件のスパンを書き出しました。\n"
+                                    "chrome://tracing または Perfetto で開けます。", parent=win)
+
+        tk.Checkbutton(ctrl, text="計測する", variable=enabled_var, command=toggle).pack(side=tk.LEFT)
+        tk.Button(ctrl, text="リセット", command=lambda: (tracer.reset(), show())).pack(side=tk.LEFT, padx=6)
+        tk.Button(ctrl, text="トレースを書き出す", command=export).pack(side=tk.RIGHT)
+
+        cols = (("name", "処理", 220, "w"), ("count", "回数", 70, "e"), ("p50", "p50 (ms)", 80, "e"),
+                ("p90", "p90 (ms)", 80, "e"), ("p99", "p99 (ms)", 80, "e"), ("max", "最大 (ms)", 80, "e"))
+        tree = ttk.Treeview(win, columns=[c[0] for c in cols], show="headings")
+        for key, heading, width, anchor in cols:
+            tree.heading(key, text=heading)
+            tree.column(key, width=width, anchor=anchor)
+        tree.pack(fill="both", expand=True, padx=10, pady=(0, 10))
+
+        def show():
+            if not win.winfo_exists():
+                return
+            tree.delete(*tree.get_children())
+            for name, count, *times in tracer.summary():
+                label = "イベントループの遅れ" if name == LOOP_LAG else name
+                tree.insert("", tk.END, values=(label, f"{count:,}") + tuple(f"{t * 1000:.1f}" for t in times))
+            win.after(1000, show)
+
+        show()
+
+
+def run_csv_command(args):
+    """export-csv / import-csv サブコマンド（画面を出さずに実行する）。進み具合は標準エラーに出します。"""
+    store = open_store(args.data)
+    try:
+        model = store.load()
+        t0 = time.monotonic()
+        if args.command == "export-csv":
+            n = 0
+            for n in export_csv(args.csv_file, args.kind, model, store):
+                print(f"\r{n:,} 行", end="", file=sys.stderr, flush=True)
+            print(f"\r{n:,} 行を {args.csv_file} に書き出しました（{time.monotonic() - t0:.1f} 秒）", file=sys.stderr)
+            return 0
+        importer = CsvImporter(args.csv_file, args.kind, model)
+        for batch in importer.batches():
+            # バッチごとに 1 回で保存する（JournalStore は 1 回の追記、SQLite は 1 トランザクション）
+            store.append(*batch)
+            rate = importer.rows / max(time.monotonic() - t0, 1e-6)
+            print(f"\r{importer.progress:6.1%}  {importer.rows:,} 行（{rate:,.0f} 行/秒）",
+                  end="", file=sys.stderr, flush=True)
+        print(f"\r取り込み: {importer.imported:,} 行 / 読み飛ばし: {importer.error_count:,} 行"
+              f"（{time.monotonic() - t0:.1f} 秒）", file=sys.stderr)
+        for line, msg in importer.errors:
+            print(f"  {line} 行目: {msg}", file=sys.stderr)
+        return 1 if importer.error_count else 0
+    finally:
+        store.close()
+
+
+def run_report_command(args):
+    """report サブコマンド（担当者別・カテゴリ別のグラフと集計表を書き出す）。"""
+    from report import FORMATS, parse_month, write_report
+    formats = args.format or ["png"]
+    bad = [f for f in formats if f not in FORMATS]
+    if bad:
+        print(f"出力形式は {' / '.join(FORMATS)} のいずれかです: {', '.join(bad)}", file=sys.stderr)
+        return 2
+    try:
+        month = parse_month(args.month) if args.month else None
+    except ValueError as e:
+        print(e, file=sys.stderr)
+        return 2
+    store = open_store(args.data)
+    try:
+        model = store.load()
+        entries = store.load_time_entries() if month else None
+        count, elapsed = write_report(
+            model, args.out_dir, entries, month, formats, args.jobs,
+            lambda done, total: print(f"\r{done:,} / {total:,} 枚", end="", file=sys.stderr, flush=True))
+    finally:
+        store.close()
+    print(f"\r{count:,} 枚のグラフを {args.out_dir} に書き出しました（描画 {elapsed:.1f} 秒）", file=sys.stderr)
+    return 0
+
+
+def run_archive_command(args):
+    """archive サブコマンド（期限から --days 日が過ぎた完了タスクをアーカイブへ移す）。"""
+    store = open_store(args.data)
+    try:
+        model = store.load()
+        archive = TaskArchive(args.data + ARCHIVE_SUFFIX)
+        archive.recover(model)
+        tasks = archivable(model, default_cutoff(args.days))
+        if args.dry_run:
+            print(f"{len(tasks):,} 件が対象です（データ {len(model):,} 件）", file=sys.stderr)
+            return 0
+
+        def commit(records):
+            for rec in records:
+                model.apply(rec)
+            store.append(*records)
+
+        t0 = time.monotonic()
+        days = task_days(store.load_time_entries(), {t.id for t in tasks})
+        n = archive_tasks(model, archive, tasks, store.load_memo, commit, days)
+    finally:
+        store.close()
+    print(f"{n:,} 件をアーカイブへ移しました（残り {len(model):,} 件 / アーカイブ {len(archive):,} 件、"
+          f"{time.monotonic() - t0:.1f} 秒）", file=sys.stderr)
+    return 0
+
+
+def run_serve_command(args):
+    """serve サブコマンド（--data のデータファイルを同期サーバーとして共有する）。"""
+    from task_sync import serve
+
+    def ready(server, address):
+        print(f"{args.data} を {address[0]}:{address[1]} で共有しています（{len(server.model):,} 件。Ctrl+C で終了）",
+              file=sys.stderr)
+
+    server = serve(open_store(args.data), args.host, args.port, ready)
+    print(f"終了しました（受け付け {server.commits:,} 回 / 衝突 {server.rejects:,} 回）", file=sys.stderr)
+    return 0
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="タスク／作業計測アプリ")
+    parser.add_argument("--data", default=DATA_FILE, help="データファイル（.db / .sqlite なら SQLite）")
+    parser.add_argument("--server", metavar="HOST:PORT", help="同期サーバーに接続して使う（--data は使わない）")
+    sub = parser.add_subparsers(dest="command")
+    p = sub.add_parser("import-sqlite", help="JSON ファイルを SQLite データベースへ取り込む")
+    p.add_argument("db", help="取り込み先の SQLite ファイル")
+    p.add_argument("json_files", nargs="+", help="tasks_std_v24.json / tasks_with_materials_v25.json など")
+    for name, help_text, file_help in (
+            ("export-csv", "CSV へ書き出す（--data のデータファイルから）", "書き出す CSV ファイル"),
+            ("import-csv", "CSV を取り込む（--data のデータファイルへ）", "取り込む CSV ファイル")):
+        p = sub.add_parser(name, help=help_text)
+        p.add_argument("kind", choices=tuple(KIND_LABELS), help="tasks / time / materials")
+        p.add_argument("csv_file", help=file_help)
+    p = sub.add_parser("report", help="担当者別・カテゴリ別のグラフと集計表を書き出す（画面は出さない）")
+    p.add_argument("out_dir", help="出力先のフォルダ（index.html と charts/ を作る）")
+    p.add_argument("--month", help="集計する月（YYYY-MM）。省略すると累計")
+    p.add_argument("--format", nargs="+", help="png / svg / pdf（複数可。既定は png）")
+    p.add_argument("--jobs", type=int, help="描画に使うプロセス数（既定は CPU のコア数）")
+    p = sub.add_parser("archive", help="期限から日数が過ぎた完了タスクをアーカイブへ移す（画面は出さない）")
+    p.add_argument("--days", type=int, default=ARCHIVE_AGE_DAYS,
+                   help=f"期限からこの日数が過ぎた進捗 100%% のタスクを移す（既定は {ARCHIVE_AGE_DAYS}）")
+    p.add_argument("--dry-run", action="store_true", help="移さずに件数だけを表示する")
+    p = sub.add_parser("serve", help="データファイルを同期サーバーとして共有する（画面は出さない）")
+    p.add_argument("--host", default=DEFAULT_HOST, help=f"待ち受けるアドレス（既定は {DEFAULT_HOST}。認証は無い）")
+    p.add_argument("--port", type=int, default=DEFAULT_PORT, help=f"待ち受けるポート（既定は {DEFAULT_PORT}）")
+    args = parser.parse_args(argv)
+
+    if args.command == "import-sqlite":
+        from sqlite_store import import_json
+        n = import_json(args.db, args.json_files)
+        print(f"{n} 件のタスクを {args.db} に取り込みました")
+        return
+    if args.command in ("export-csv", "import-csv"):
+        return run_csv_command(args)
+    if args.command == "report":
+        return run_report_command(args)
+    if args.command == "archive":
+        return run_archive_command(args)
+    if args.command == "serve":
+        return run_serve_command(args)
 
-if __name__ == "__main__":
     root = tk.Tk()
-    app = TaskTimerApp(root)
-    root.mainloop()
\ No newline at end of file
+    app = TaskTimerApp(root, data_file=args.data, server=args.server)
+    root.mainloop()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
\ No newline at end of file
@@ -0,0 +1,347 @@
+"""SQLite による保存エンジン。
+
+JSON ファイル（JournalStore）の代わりに、WAL モードの SQLite データベースへ保存します。
+変更レコード 1 回分（append() 1 回）が 1 トランザクション（BEGIN IMMEDIATE）になり、変わった行だけを
+書き換えるので、複数のアプリから同じファイルを開いても書き込みが壊れることはありません。
+
+複数のアプリが書き込む場合、変更はレコードの単位で合わさります。update_task は変えたフィールドだけを
+持つ（TaskModel.update_task_record()）ので、同じタスクでも別のフィールドの変更は両方残り、同じ
+フィールドは後から保存したほうが残ります。set_categories は挙げられたカテゴリの並べ替えだけを行い、
+他のアプリが足した・消したカテゴリはそのままです。どのタスクからも参照されなくなったメモは、参照を
+外した書き込み（set_memo / delete_task）の中で消します（読み込みのときには消しません）。
+
+    python scheduler.py --data tasks.db
+    python scheduler.py import-sqlite tasks.db tasks_std_v24.json tasks_with_materials_v25.json
+"""
+import json
+import sqlite3
+
+from memo_store import MEMOS_SUFFIX, FileBlobStore, memo_ref
+from task_model import TaskModel
+from task_store import LOAD_CHUNK, TaskStore, loaded_tasks
+from time_log import TimeEntry
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS tasks (
+    id          TEXT PRIMARY KEY,
+    rank        TEXT NOT NULL,      -- 並び順（TaskModel の rank）
+    name        TEXT,
+    worker      TEXT,
+    estimate    TEXT,
+    start_date  TEXT,
+    end_date    TEXT,
+    category    TEXT,
+    actual_sec  INTEGER,
+    progress    INTEGER,
+    memo        TEXT,               -- 従来の本文（読み込み時に memos へ移す）
+    memo_ref    TEXT,               -- メモの本文のハッシュ（memo_store.py）
+    extra       TEXT                -- 上記以外のキー（JSON）
+);
+CREATE INDEX IF NOT EXISTS idx_tasks_rank ON tasks(rank);
+CREATE INDEX IF NOT EXISTS idx_tasks_worker ON tasks(worker);
+CREATE INDEX IF NOT EXISTS idx_tasks_category ON tasks(category);
+CREATE INDEX IF NOT EXISTS idx_tasks_end_date ON tasks(end_date);
+CREATE INDEX IF NOT EXISTS idx_tasks_memo_ref ON tasks(memo_ref);
+
+CREATE TABLE IF NOT EXISTS categories (
+    name        TEXT PRIMARY KEY,
+    position    INTEGER NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS materials (
+    task_id     TEXT NOT NULL,
+    position    INTEGER NOT NULL,
+    name        TEXT,
+    price,                          -- 数値は JSON の整数/小数の区別を保つため型を付けない
+    qty,
+    subtotal,
+    PRIMARY KEY (task_id, position)
+);
+
+CREATE TABLE IF NOT EXISTS time_entries (
+    id          INTEGER PRIMARY KEY,
+    task_id     TEXT NOT NULL,
+    start       REAL NOT NULL,
+    end         REAL NOT NULL,
+    duration    INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_time_entries_task ON time_entries(task_id, start);
+
+CREATE TABLE IF NOT EXISTS memos (
+    ref         TEXT PRIMARY KEY,   -- 本文の SHA-256
+    body        TEXT NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS app_state (
+    key         TEXT PRIMARY KEY,
+    value       TEXT                -- JSON（"timers": 計測中のセッション）
+);
+"""
+
+# tasks テーブルに列として持つキー（これ以外は extra に JSON で入れる）
+TASK_COLUMNS = ("name", "worker", "estimate", "start_date", "end_date", "category", "actual_sec", "progress", "memo",
+                "memo_ref")
+MATERIAL_COLUMNS = ("name", "price", "qty", "subtotal")
+
+
+class SqliteStore(TaskStore):
+    def __init__(self, path):
+        self.path = path
+        # 書き込みは append() を呼んだスレッドから行う（バックグラウンド保存でも使えるように）
+        self.conn = sqlite3.connect(path, timeout=10, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        # memo_ref 列の無い古いデータベースには列を足してから索引などを作る
+        if self.conn.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'tasks'").fetchone():
+            cols = [r[1] for r in self.conn.execute("PRAGMA table_info(tasks)")]
+            if "memo_ref" not in cols:
+                self.conn.execute("ALTER TABLE tasks ADD COLUMN memo_ref TEXT")
+        self.conn.executescript(SCHEMA)
+        if self.conn.execute("SELECT COUNT(*) FROM categories").fetchone()[0] == 0:
+            with self.conn:
+                self.conn.execute("INSERT INTO categories (name, position) VALUES ('-', 0)")
+
+    # --- 読み込み ---
+    def _migrate_memos(self):
+        # 本文を tasks に直接持つ従来のメモを memos へ移す（使われなくなったメモは書き込みのときに消す）
+        rows = self.conn.execute("SELECT id, memo FROM tasks WHERE memo IS NOT NULL").fetchall()
+        if not rows:
+            return
+        with self.conn:
+            for tid, text in rows:
+                ref = memo_ref(text) or None
+                if ref:
+                    self.conn.execute("INSERT OR IGNORE INTO memos (ref, body) VALUES (?, ?)", (ref, text))
+                self.conn.execute("UPDATE tasks SET memo = NULL, memo_ref = ? WHERE id = ? AND memo IS NOT NULL",
+                                  (ref, tid))
+
+    def _task_dicts(self):
+        # 並び順にタスクの辞書を返す
+        materials = {}
+        for row in self.conn.execute(
+                "SELECT task_id, name, price, qty, subtotal FROM materials ORDER BY task_id, position"):
+            materials.setdefault(row[0], []).append(
+                {k: v for k, v in zip(MATERIAL_COLUMNS, row[1:]) if v is not None})
+        cols = ", ".join(TASK_COLUMNS)
+        for row in self.conn.execute(f"SELECT id, rank, {cols}, extra FROM tasks ORDER BY rank, id"):
+            t = {"id": row[0], "rank": row[1]}
+            # NULL の列は元のタスクに無かったキーなので復元しない
+            t.update((k, v) for k, v in zip(TASK_COLUMNS, row[2:-1]) if v is not None)
+            if row[-1]:
+                t.update(json.loads(row[-1]))
+            if row[0] in materials:
+                t["materials"] = materials[row[0]]
+            yield t
+
+    def _categories(self):
+        return [r[0] for r in self.conn.execute("SELECT name FROM categories ORDER BY position")]
+
+    def load(self):
+        self._migrate_memos()
+        tasks = list(self._task_dicts())
+        old_ids = [t.get("id") for t in tasks]
+        model = TaskModel()
+        if model.load({"tasks": tasks, "categories": self._categories()}):
+            # 振り直した ID を書き戻す（起動のたびに別の ID にならないように）。
+            # 作業時間のエントリも新しい ID に付け替える
+            renamed = [(t.id, old) for t, old in zip(tasks, old_ids) if old is not None and t.id != old]
+            with self.conn:
+                self.conn.executemany("UPDATE time_entries SET task_id = ? WHERE task_id = ?", renamed)
+                self._replace_all(model)
+        return model
+
+    def load_stages(self, chunk=LOAD_CHUNK):
+        """行を読んだ分ずつ Task にして返します（TaskStore.load_stages()）。"""
+        self._migrate_memos()
+        seen = set()
+        batch = []
+        try:
+            for t in self._task_dicts():
+                batch.append(t)
+                if len(batch) >= chunk:
+                    yield "tasks", loaded_tasks(batch, seen)
+                    batch = []
+            tasks = loaded_tasks(batch, seen)
+        except ValueError:
+            # ID が空の行など、load() が ID を振り直すデータ
+            yield "model", self.load()
+            return
+        yield "tasks", tasks
+        yield "categories", self._categories()
+
+    def load_running_timers(self):
+        row = self.conn.execute("SELECT value FROM app_state WHERE key = 'timers'").fetchone()
+        return json.loads(row[0]) if row else None
+
+    def load_memo(self, ref):
+        row = self.conn.execute("SELECT body FROM memos WHERE ref = ?", (ref,)).fetchone()
+        if row is None:
+            raise KeyError(ref)
+        return row[0]
+
+    def load_time_entries(self):
+        for row in self.conn.execute("SELECT task_id, start, end, duration FROM time_entries ORDER BY id"):
+            yield TimeEntry(*row)
+
+    # --- 書き込み ---
+    def append(self, *records):
+        """変更レコードをまとめて 1 トランザクションで反映します。"""
+        if not records:
+            return
+        with self.conn:
+            # 読んでから書き換える処理（extra・カテゴリの並び）の間に他のアプリが書き込まないよう、先に書き込みのロックを取る
+            self.conn.execute("BEGIN IMMEDIATE")
+            for rec in records:
+                self._apply(rec)
+
+    def _apply(self, rec):
+        op = rec["op"]
+        c = self.conn
+        if op == "add_task":
+            self._insert_task(rec["task"])
+        elif op == "update_task":
+            self._update_task(rec["id"], rec["fields"])
+        elif op == "delete_task":
+            row = c.execute("SELECT memo_ref FROM tasks WHERE id = ?", (rec["id"],)).fetchone()
+            c.execute("DELETE FROM tasks WHERE id = ?", (rec["id"],))
+            if row:
+                self._drop_memo(row[0])
+            c.execute("DELETE FROM materials WHERE task_id = ?", (rec["id"],))
+            # 作業時間のエントリは消さない（JournalStore の .timelog と同じ。元に戻す・アーカイブから戻すときにそのまま使う）
+        elif op == "move_task":
+            c.execute("UPDATE tasks SET rank = ? WHERE id = ?", (rec["rank"], rec["id"]))
+        elif op == "add_time":
+            c.execute("UPDATE tasks SET actual_sec = COALESCE(actual_sec, 0) + ? WHERE id = ?", (rec["sec"], rec["id"]))
+            if "start" in rec:
+                c.execute("INSERT INTO time_entries (task_id, start, end, duration) VALUES (?, ?, ?, ?)",
+                          (rec["id"], rec["start"], rec["end"], rec["sec"]))
+        elif op == "set_material":
+            c.execute("INSERT OR REPLACE INTO materials (task_id, position, name, price, qty, subtotal) "
+                      "VALUES (?, ?, ?, ?, ?, ?)",
+                      (rec["id"], rec["pos"]) + tuple(rec["line"].get(k) for k in MATERIAL_COLUMNS))
+        elif op == "delete_material":
+            # 後ろの行を 1 つずつ詰める（主キーが重ならないよう小さい位置から順に動かす）
+            c.execute("DELETE FROM materials WHERE task_id = ? AND position = ?", (rec["id"], rec["pos"]))
+            rows = c.execute("SELECT position FROM materials WHERE task_id = ? AND position > ? ORDER BY position",
+                             (rec["id"], rec["pos"])).fetchall()
+            c.executemany("UPDATE materials SET position = ? WHERE task_id = ? AND position = ?",
+                          [(p - 1, rec["id"], p) for (p,) in rows])
+        elif op == "timers":
+            c.execute("INSERT OR REPLACE INTO app_state (key, value) VALUES ('timers', ?)",
+                      (json.dumps(rec, ensure_ascii=False),))
+        elif op == "time_entry":
+            c.execute("INSERT INTO time_entries (task_id, start, end, duration) VALUES (?, ?, ?, ?)",
+                      (rec["id"], rec["start"], rec["end"], rec["sec"]))
+        elif op == "set_memo":
+            if rec["ref"]:
+                c.execute("INSERT OR IGNORE INTO memos (ref, body) VALUES (?, ?)", (rec["ref"], rec["text"]))
+            row = c.execute("SELECT memo_ref FROM tasks WHERE id = ?", (rec["id"],)).fetchone()
+            c.execute("UPDATE tasks SET memo = NULL, memo_ref = ? WHERE id = ?", (rec["ref"] or None, rec["id"]))
+            if row and row[0] != rec["ref"]:
+                self._drop_memo(row[0])
+        elif op == "add_category":
+            c.execute("INSERT OR IGNORE INTO categories (name, position) "
+                      "VALUES (?, (SELECT COALESCE(MAX(position), -1) + 1 FROM categories))", (rec["name"],))
+        elif op == "delete_category":
+            c.execute("UPDATE tasks SET category = '-' WHERE category = ?", (rec["name"],))
+            c.execute("DELETE FROM categories WHERE name = ?", (rec["name"],))
+        elif op == "set_categories":
+            # 並べ替えとして、挙げられたカテゴリの位置だけを変える。他のアプリが足したカテゴリ（挙げられていないもの）は
+            # 元の順のまま後ろに残し、他のアプリが消したカテゴリは足し直さない
+            names = list(rec["categories"])
+            listed = set(names)
+            names += [n for (n,) in c.execute("SELECT name FROM categories ORDER BY position") if n not in listed]
+            c.executemany("UPDATE categories SET position = ? WHERE name = ?", [(i, n) for i, n in enumerate(names)])
+        else:
+            raise ValueError(f"unknown journal op: {op}")
+
+    def _drop_memo(self, ref):
+        # どのタスクからも参照されなくなったメモを消す（元に戻す履歴・アーカイブはメモを本文で持つ）
+        if ref:
+            self.conn.execute("DELETE FROM memos WHERE ref = ? AND NOT EXISTS "
+                              "(SELECT 1 FROM tasks WHERE memo_ref = ?)", (ref, ref))
+
+    @staticmethod
+    def _task_row(task):
+        extra = {k: v for k, v in task.items() if k not in TASK_COLUMNS and k not in ("id", "rank", "materials")}
+        return ((task["id"], task["rank"]) + tuple(task.get(k) for k in TASK_COLUMNS)
+                + (json.dumps(extra, ensure_ascii=False) if extra else None,))
+
+    def _insert_task(self, task):
+        marks = ", ".join("?" * (len(TASK_COLUMNS) + 3))
+        self.conn.execute(f"INSERT OR REPLACE INTO tasks (id, rank, {', '.join(TASK_COLUMNS)}, extra) VALUES ({marks})",
+                          self._task_row(task))
+        self._write_materials(task["id"], task.get("materials"))
+
+    def _update_task(self, tid, fields):
+        cols = [k for k in fields if k in TASK_COLUMNS]
+        if cols:
+            self.conn.execute(f"UPDATE tasks SET {', '.join(f'{k} = ?' for k in cols)} WHERE id = ?",
+                              [fields[k] for k in cols] + [tid])
+        if "materials" in fields:
+            self._write_materials(tid, fields["materials"])
+        extra_fields = {k: v for k, v in fields.items() if k not in TASK_COLUMNS and k != "materials"}
+        if extra_fields:
+            row = self.conn.execute("SELECT extra FROM tasks WHERE id = ?", (tid,)).fetchone()
+            extra = json.loads(row[0]) if row and row[0] else {}
+            extra.update(extra_fields)
+            self.conn.execute("UPDATE tasks SET extra = ? WHERE id = ?", (json.dumps(extra, ensure_ascii=False), tid))
+
+    def _write_materials(self, tid, materials):
+        self.conn.execute("DELETE FROM materials WHERE task_id = ?", (tid,))
+        if materials:
+            self.conn.executemany(
+                "INSERT INTO materials (task_id, position, name, price, qty, subtotal) VALUES (?, ?, ?, ?, ?, ?)",
+                [(tid, i) + tuple(m.get(k) for k in MATERIAL_COLUMNS) for i, m in enumerate(materials)])
+
+    def write_snapshot(self, model):
+        """モデル全体でデータベースの内容を置き換えます（インポート用）。"""
+        with self.conn:
+            self._replace_all(model)
+
+    def _replace_all(self, model):
+        self.conn.execute("DELETE FROM tasks")
+        self.conn.execute("DELETE FROM materials")
+        for t in model:
+            self._insert_task(t)
+        self.conn.execute("DELETE FROM categories")
+        self.conn.executemany("INSERT INTO categories (name, position) VALUES (?, ?)",
+                              [(name, i) for i, name in enumerate(model.categories)])
+        self.conn.execute("DELETE FROM memos WHERE ref NOT IN "
+                          "(SELECT memo_ref FROM tasks WHERE memo_ref IS NOT NULL)")
+
+    def close(self):
+        self.conn.close()
+
+
+def import_json(db_path, json_paths):
+    """v24 / v25 形式の JSON ファイルをまとめて SQLite データベースへ取り込みます。
+
+    タスクはファイルの指定順・ファイル内の並び順のまま連結し、カテゴリは和集合をとります。
+    取り込んだタスク数を返します。
+    """
+    tasks = []
+    categories = []
+    for path in json_paths:
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        blobs = FileBlobStore(path + MEMOS_SUFFIX)
+        for t in data.get("tasks", []):
+            # ファイルをまたいだ並び順を作り直すため rank は捨てる（ID は引き継ぐ）
+            t.pop("rank", None)
+            # 別に保存されているメモの本文を戻す（次の読み込みで memos テーブルへ移る）
+            if t.get("memo_ref"):
+                t["memo"] = blobs.read(t.pop("memo_ref"))
+            tasks.append(t)
+        for c in data.get("categories", ["-"]):
+            if c not in categories:
+                categories.append(c)
+    if "-" not in categories:
+        categories.insert(0, "-")
+    model = TaskModel({"tasks": tasks, "categories": categories})
+    store = SqliteStore(db_path)
+    try:
+        store.write_snapshot(model)
+    finally:
+        store.close()
+    return len(model)
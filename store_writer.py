@@ -0,0 +1,188 @@
+"""保存エンジンへの書き込みを Tk のメインループから切り離すバックグラウンドの書き込み役。
+
+UI は submit() で変更レコードを渡すだけで、ディスクへの書き込みは専用のスレッドが行います。
+短い間隔で続いた変更（更新ボタンの連打やドラッグでの並び替えなど）はまとめて
+1 回の append() で書き込み、同じタスクへの連続した更新は 1 件のレコードに畳み込みます。
+
+flush() は渡したレコードがすべて書き込まれるまで待つ境界で、ウィンドウを閉じるときや
+保存エンジンから読み直す前に使います。read() は書き込み待ちを書き終えてから、書き込みのスレッドだけを
+止めて読みます（読んでいる間も submit() は待たずに戻り、その分は読み終えてから書き込みます）。書き込みが失敗し続けている間（ディスクの空きが無い、
+データベースがロックされているなど）は待ち続けず、flush() は False を返し、read() は
+StoreWriteError を出します。
+"""
+import copy
+import threading
+import time
+
+from perf_trace import tracer
+
+# 最初の変更からこの秒数だけ待ち、その間に来た変更をまとめて書き込む
+COALESCE_DELAY = 0.05
+# 書き込みに失敗したときに再試行するまでの秒数
+RETRY_DELAY = 1.0
+
+
+class StoreWriteError(Exception):
+    """書き込み待ちのレコードを書き込めないため、保存エンジンから読めない。"""
+
+
+def coalesce(records):
+    """隣り合ったレコードのうち、1 件にまとめられるものをまとめます。
+
+    同じタスクへの update_task はフィールドを合わせ（後のものを優先）、
+    同じタスクの move_task は最後の rank だけを残します。
+    計測中のセッションのチェックポイント（timers）は全体で最後の 1 件だけを残します。
+    """
+    out = []
+    last_timers = max((i for i, rec in enumerate(records) if rec["op"] == "timers"), default=None)
+    for i, rec in enumerate(records):
+        if rec["op"] == "timers" and i != last_timers:
+            continue
+        prev = out[-1] if out else None
+        if prev is not None and prev["op"] == rec["op"] and prev.get("id") == rec.get("id") and "id" in rec:
+            if rec["op"] == "update_task":
+                out[-1] = dict(prev, fields=dict(prev["fields"], **rec["fields"]))
+                continue
+            if rec["op"] == "move_task" and "rank" in rec and "rank" in prev:
+                out[-1] = rec
+                continue
+        out.append(rec)
+    return out
+
+
+class StoreWriter:
+    def __init__(self, store, coalesce_delay=COALESCE_DELAY):
+        self.store = store
+        self.coalesce_delay = coalesce_delay
+        self._cond = threading.Condition()
+        self._pending = []
+        self._first_submit = None  # 待ち行列の先頭が入った時刻
+        self._busy = False
+        self._closed = False
+        self._readers = 0  # read() で fn を呼んでいる数（その間は書き込まない）
+        # 状態（UI の表示用）
+        self.last_latency = None   # 最初の変更から書き込み完了までの秒数
+        self.last_write_time = None  # append() 自体にかかった秒数
+        self.writes = 0
+        self.failures = 0
+        self.last_error = None
+        self._thread = threading.Thread(target=self._run, name="store-writer", daemon=True)
+        self._thread.start()
+
+    @property
+    def queue_depth(self):
+        """まだ書き込まれていないレコードの件数。"""
+        with self._cond:
+            return len(self._pending)
+
+    def submit(self, *records):
+        """変更レコードを書き込み待ちに加えます。すぐに戻ります。"""
+        if not records:
+            return
+        # 呼び出し側がこの後に辞書を書き換えても影響しないよう、渡された時点の内容で保存する
+        records = copy.deepcopy(records)
+        with self._cond:
+            if self._closed:
+                raise RuntimeError("StoreWriter is closed")
+            if not self._pending:
+                self._first_submit = time.monotonic()
+            self._pending.extend(records)
+            self._cond.notify_all()
+
+    def flush(self, timeout=None):
+        """渡したレコードがすべて書き込まれるまで待ちます。
+
+        書き込めたら True、時間切れか書き込みに失敗した場合は False を返します
+        （失敗して再試行待ちのレコードは、待たずにすぐ再試行させます）。
+        """
+        with self._cond:
+            return self._drain(timeout)
+
+    def read(self, fn, *args, timeout=None):
+        """書き込み待ちを書き終えてから、書き込みを止めた状態で fn(*args) を呼びます（保存エンジンから読み直すとき用）。
+
+        fn はロックの外で呼ぶので、その間の submit() は待たされません（書き込みは fn が戻るまで待ちます）。
+        書き込み待ちのレコードを書き込めない（失敗した、または timeout 秒を過ぎた）場合は
+        fn を呼ばずに StoreWriteError を出します。
+        """
+        with self._cond:
+            if not self._drain(timeout):
+                raise StoreWriteError(f"保存できていない変更があるため読み込めません: {self.last_error or '時間切れ'}")
+            self._readers += 1
+        try:
+            return fn(*args)
+        finally:
+            with self._cond:
+                self._readers -= 1
+                self._cond.notify_all()
+
+    def _drain(self, timeout):
+        # self._cond を持った状態で、待ち行列が空になるまで待つ。失敗・時間切れなら False
+        deadline = None if timeout is None else time.monotonic() + timeout
+        failures = self.failures
+        # 再試行待ちのレコードは、待たずにすぐ再試行させる
+        self._cond.notify_all()
+        while self._pending or self._busy:
+            # 呼んだときに書き込み中だった分と、その直後の再試行の両方が失敗したら諦める
+            if self.failures > failures + 1 or (self.failures > failures and self._closed):
+                return False
+            remaining = None if deadline is None else deadline - time.monotonic()
+            if remaining is not None and remaining <= 0:
+                return False
+            self._cond.wait(remaining if remaining is not None else 0.1)
+        return True
+
+    def close(self):
+        """残りを書き込んでからスレッドを止め、保存エンジンを閉じます。
+
+        すべて書き込めたら True を返します。書き込めなかったレコードは捨てられます。
+        """
+        ok = self.flush()
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+        self._thread.join()
+        self.store.close()
+        return ok
+
+    def _run(self):
+        while True:
+            with self._cond:
+                # read() の fn を呼んでいる間は書き込まない（閉じるときも読み終えるのを待つ）
+                while self._readers or (not self._pending and not self._closed):
+                    self._cond.wait()
+                if not self._pending and self._closed:
+                    return
+                # 続けて来る変更を少し待ってまとめる（close 中は待たない）
+                wait_until = self._first_submit + self.coalesce_delay
+                while not self._closed and time.monotonic() < wait_until:
+                    self._cond.wait(wait_until - time.monotonic())
+                batch = coalesce(self._pending)
+                first = self._first_submit
+                self._pending = []
+                self._busy = True
+            t0 = time.monotonic()
+            try:
+                with tracer.span("store.append"):
+                    self.store.append(*batch)
+            except Exception as e:
+                with self._cond:
+                    # 書き込めなかった分は先頭に戻して再試行する
+                    self._pending[:0] = batch
+                    self._first_submit = first
+                    self.last_error = e
+                    self.failures += 1
+                    self._busy = False
+                    self._cond.notify_all()
+                    if self._closed:
+                        return
+                    self._cond.wait(RETRY_DELAY)
+                continue
+            done = time.monotonic()
+            with self._cond:
+                self.last_write_time = done - t0
+                self.last_latency = done - first
+                self.writes += 1
+                self.last_error = None
+                self._busy = False
+                self._cond.notify_all()
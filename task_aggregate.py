@@ -0,0 +1,153 @@
+"""グラフ用の集計（タスク名 × カテゴリの作業時間）。
+
+タスク名・カテゴリ・actual_sec を整数コード化した NumPy の列（配列）で持ち、
+名前 × カテゴリの集計表を np.bincount でまとめて作ります。集計表は TaskModel の
+変更通知を受けて該当するセルだけを足し引きするので、グラフを開き直すたびに
+全タスクを数え直すことはありません。
+
+numpy が必要です（グラフ表示と同じく、使うときに読み込んでください）。
+"""
+import numpy as np
+
+
+def _seconds(task):
+    try:
+        return int(task.get("actual_sec", 0))
+    except Exception:
+        return 0
+
+
+class CategoryPivot:
+    def __init__(self, model):
+        self.model = model
+        self._name_codes = {}  # タスク名 -> コード
+        self._cat_codes = {}   # カテゴリ -> コード
+        self._names = []       # コード -> タスク名
+        self._cats = []        # コード -> カテゴリ
+        self._slots = {}       # id -> 列の位置
+        self._free = []        # 削除で空いた列の位置
+        self._extra = {}       # (タスク名, カテゴリ) -> (件数, 秒数)。モデルに無いタスク（アーカイブ済み）の分
+        self._result = None
+        self._build()
+        model.add_listener(self.on_change)
+
+    def close(self):
+        self.model.remove_listener(self.on_change)
+
+    # --- 列の構築 ---
+    def _code(self, codes, values, value):
+        code = codes.get(value)
+        if code is None:
+            code = codes[value] = len(values)
+            values.append(value)
+        return code
+
+    def _build(self):
+        name_col, cat_col, sec_col = [], [], []
+        for tid, t in self.model.tasks.items():
+            self._slots[tid] = len(sec_col)
+            name_col.append(self._code(self._name_codes, self._names, t.get("name", "-")))
+            cat_col.append(self._code(self._cat_codes, self._cats, t.get("category", "-")))
+            sec_col.append(_seconds(t))
+        self._name = np.array(name_col, dtype=np.int64)
+        self._cat = np.array(cat_col, dtype=np.int64)
+        self._sec = np.array(sec_col, dtype=np.int64)
+        n_names, n_cats = len(self._names), len(self._cats)
+        # 集計表（名前 × カテゴリの秒数）と名前ごとのタスク数。行・列は余裕を持って確保する
+        self._table = np.zeros((max(n_names, 1) * 2, max(n_cats, 1) * 2), dtype=np.int64)
+        self._table[:n_names, :n_cats] = np.bincount(
+            self._name * n_cats + self._cat, weights=self._sec, minlength=n_names * n_cats
+        ).astype(np.int64).reshape(n_names, n_cats)
+        self._count = np.zeros(self._table.shape[0], dtype=np.int64)
+        self._count[:n_names] = np.bincount(self._name, minlength=n_names)
+
+    def _ensure_capacity(self):
+        rows, cols = self._table.shape
+        need_rows, need_cols = len(self._names), len(self._cats)
+        if need_rows > rows or need_cols > cols:
+            table = np.zeros((max(rows, need_rows * 2), max(cols, need_cols * 2)), dtype=np.int64)
+            table[:rows, :cols] = self._table
+            self._table = table
+            count = np.zeros(table.shape[0], dtype=np.int64)
+            count[:rows] = self._count
+            self._count = count
+
+    def _add(self, task):
+        tid = task["id"]
+        name = self._code(self._name_codes, self._names, task.get("name", "-"))
+        cat = self._code(self._cat_codes, self._cats, task.get("category", "-"))
+        sec = _seconds(task)
+        if self._free:
+            slot = self._free.pop()
+        else:
+            slot = len(self._sec)
+            size = max(slot + 1, slot * 2)
+            self._name = np.resize(self._name, size)
+            self._cat = np.resize(self._cat, size)
+            self._sec = np.resize(self._sec, size)
+            self._free.extend(range(size - 1, slot, -1))
+        self._slots[tid] = slot
+        self._name[slot], self._cat[slot], self._sec[slot] = name, cat, sec
+        self._ensure_capacity()
+        self._table[name, cat] += sec
+        self._count[name] += 1
+
+    def _remove(self, tid):
+        slot = self._slots.pop(tid)
+        name, cat = self._name[slot], self._cat[slot]
+        self._table[name, cat] -= self._sec[slot]
+        self._count[name] -= 1
+        self._free.append(slot)
+
+    def set_extra(self, totals):
+        """モデルに無いタスクの集計 {(タスク名, カテゴリ): (件数, 秒数)} を集計表に足します。
+
+        アーカイブ済みのタスク（archive.py の索引の集計）用です。前回渡した分は引いてから足します。
+        """
+        for sign, cells in ((-1, self._extra), (1, totals)):
+            for (name, cat), (count, sec) in cells.items():
+                n = self._code(self._name_codes, self._names, name)
+                c = self._code(self._cat_codes, self._cats, cat)
+                self._ensure_capacity()
+                self._table[n, c] += sign * sec
+                self._count[n] += sign * count
+        self._extra = dict(totals)
+        self._result = None
+
+    # --- 差分更新 ---
+    def on_change(self, event, task, old):
+        if event == "add":
+            self._add(task)
+        elif event == "remove":
+            self._remove(task["id"])
+        elif event == "update":
+            if not {"name", "category", "actual_sec"} & old.keys():
+                return
+            self._remove(task["id"])
+            self._add(task)
+        elif event != "categories":
+            return
+        # 並び替え済みの結果だけを捨てる（集計表はそのまま）
+        self._result = None
+
+    # --- 集計結果 ---
+    def pivot(self):
+        """(タスク名の一覧, カテゴリの一覧, 時間の行列) を返します。
+
+        タスク名は合計時間の降順、カテゴリは model.categories の順で、
+        行列は カテゴリ × タスク名 の作業時間（時間単位）です。
+        """
+        if self._result is None:
+            n_names = len(self._names)
+            present = np.flatnonzero(self._count[:n_names] > 0)
+            categories = list(self.model.categories)
+            cols = [self._cat_codes.get(c) for c in categories]
+            sub = np.zeros((len(present), len(categories)), dtype=np.int64)
+            for j, code in enumerate(cols):
+                if code is not None:
+                    sub[:, j] = self._table[present, code]
+            # 合計の降順（同じ合計なら最初に現れた名前が先）
+            order = np.argsort(-self._table[present, :len(self._cats)].sum(axis=1), kind="stable")
+            labels = [self._names[i] for i in present[order]]
+            self._result = (labels, categories, sub[order].T / 3600.0)
+        return self._result
@@ -0,0 +1,126 @@
+"""タスク別グラフ（カテゴリ内訳の積み上げ棒グラフ）の描画。
+
+棒はカテゴリごとに 1 つの PolyCollection として持ち、表示するタスクの選択が変わったら
+頂点の配列だけを NumPy でまとめて作り直します。時間の文字は棒が十分に太いときだけ
+使い回しの Text に割り当て、軸の目盛りも重ならない間隔に間引きます。
+ax.clear() や tight_layout() を毎回行わないので、タスク名が数千件あっても
+選択の変更はすぐ反映されます。
+
+matplotlib / numpy が必要です（グラフを開くときに読み込んでください）。
+"""
+import numpy as np
+from matplotlib.collections import PolyCollection
+
+from perf_trace import tracer
+
+BAR_WIDTH = 0.8
+# 最大の合計に対してこの割合より小さいセグメントには時間を表示しない
+MIN_LABEL_RATIO = 0.02
+# 棒の幅（ピクセル）がこれより細いときは時間を表示しない（文字が重なって読めないため）
+MIN_LABEL_BAR_PX = 40
+# 目盛りのタスク名どうしの最小間隔（ピクセル）
+MIN_TICK_PX = 14
+
+
+class StackedBarChart:
+    def __init__(self, ax, labels, categories, matrix, colors, format_seconds,
+                 title='タスク別 作業時間（カテゴリ内訳）', legend_title='カテゴリ'):
+        """matrix は カテゴリ × タスク名 の時間（時間単位）。colors はカテゴリ -> 色。
+
+        積み上げる内訳はカテゴリ以外（作業者など）でもよく、見出しは title / legend_title で変えられます。
+        """
+        self.ax = ax
+        self.labels = list(labels)
+        self.format_seconds = format_seconds
+        self.matrix = np.asarray(matrix, dtype=float).reshape(len(categories), len(self.labels))
+        self.tops = np.cumsum(self.matrix, axis=0)
+        self.bottoms = self.tops - self.matrix
+        self.totals = self.tops[-1] if len(categories) else np.zeros(len(self.labels))
+        self.text_colors = [_text_color(colors.get(c)) for c in categories]
+
+        self.collections = []
+        for c in categories:
+            coll = PolyCollection([], facecolors=[colors.get(c)], edgecolors='none', label=c)
+            ax.add_collection(coll)
+            self.collections.append(coll)
+        self._segment_pool = []
+        self._total_pool = []
+
+        self.empty_text = ax.text(0.5, 0.5, "表示するタスクが選択されていません。", transform=ax.transAxes,
+                                  ha='center', va='center', visible=False)
+        ax.set_ylabel('作業時間（時間）')
+        ax.set_title(title)
+        # 凡例（カテゴリ）
+        ax.legend(title=legend_title, bbox_to_anchor=(1.02, 1), loc='upper left')
+
+        self.selection = np.arange(len(self.labels))
+        self.update()
+        # ウィンドウの大きさが変わると、文字を出せる棒の太さや目盛りの間隔も変わる
+        ax.figure.canvas.mpl_connect('resize_event', lambda event: self.update())
+
+    def set_selection(self, indices):
+        """labels の位置 indices のタスク名だけを、その順に詰めて表示します。"""
+        self.selection = np.asarray(list(indices), dtype=int)
+        self.update()
+
+    @tracer.traced("graph.update")
+    def update(self):
+        ax = self.ax
+        sel = self.selection
+        k = len(sel)
+        x = np.arange(k, dtype=float)
+        left, right = x - BAR_WIDTH / 2, x + BAR_WIDTH / 2
+        for i, coll in enumerate(self.collections):
+            lo, hi = self.bottoms[i, sel], self.tops[i, sel]
+            # (棒の数, 4 頂点, xy) の配列をまとめて作る
+            coll.set_verts(np.stack([np.column_stack(p) for p in
+                                     ((left, lo), (left, hi), (right, hi), (right, lo))], axis=1))
+
+        totals = self.totals[sel]
+        max_total = totals.max() if k else 0
+        ax.set_xlim(-0.5, max(k, 1) - 0.5)
+        ax.set_ylim(0, max_total * 1.08 if max_total > 0 else 1)
+        self.empty_text.set_visible(k == 0)
+
+        axes_px = max(ax.get_window_extent().width, 1)
+        bar_px = axes_px / max(k, 1)
+        segments, total_labels = [], []
+        if k and bar_px >= MIN_LABEL_BAR_PX:
+            min_display = max_total * MIN_LABEL_RATIO
+            for pos, j in enumerate(sel):
+                for i in np.flatnonzero(self.matrix[:, j] > 0):
+                    h = self.matrix[i, j]
+                    if h >= min_display:
+                        segments.append((pos, self.bottoms[i, j] + h / 2, self.format_seconds(int(h * 3600)),
+                                         self.text_colors[i]))
+                if self.totals[j] > 0:
+                    total_labels.append((pos, self.totals[j], self.format_seconds(int(self.totals[j] * 3600))))
+        self._place(self._segment_pool, segments, dict(ha='center', va='center', fontsize=8))
+        self._place(self._total_pool, [t + (None,) for t in total_labels], dict(ha='center', va='bottom', fontsize=9))
+
+        step = max(1, int(np.ceil(k * MIN_TICK_PX / axes_px)))
+        ticks = np.arange(0, k, step)
+        ax.set_xticks(ticks)
+        ax.set_xticklabels([self.labels[sel[t]] for t in ticks], rotation=45, ha='right')
+
+    def _place(self, pool, items, style):
+        # 必要な数だけ Text を作り足し、余った分は隠しておく
+        while len(pool) < len(items):
+            pool.append(self.ax.text(0, 0, "", **style))
+        for t, (x, y, s, color) in zip(pool, items):
+            t.set_position((x, y))
+            t.set_text(s)
+            if color is not None:
+                t.set_color(color)
+            t.set_visible(True)
+        for t in pool[len(items):]:
+            t.set_visible(False)
+
+
+def _text_color(color_rgba):
+    try:
+        r, g, bl = color_rgba[:3]
+        luminance = 0.299 * r + 0.587 * g + 0.114 * bl
+        return 'white' if luminance < 0.5 else 'black'
+    except Exception:
+        return 'black'
@@ -0,0 +1,708 @@
+"""タスクのメモリ上モデル。
+
+各タスクは永続的な一意の ID（"id"）と並び順キー（"rank"）を持ちます。
+タスクの参照は ID → タスクの辞書で行い、並び順は (rank, id) のソート済み構造で
+別に管理します。並び替えは移動先の前後のキーの間に新しいキーを割り当てるだけなので、
+リスト全体をずらす必要はありません。
+
+ファイル上は従来どおり "tasks" 配列（並び順に整列）として保存され、
+ID や rank を持たない古いファイルは読み込み時に移行されます。
+
+メモリ上の各タスクは Task（__slots__ の軽いオブジェクト）で、辞書と同じ操作で読み書きできます。
+日付は序数、予定は数値、作業者などの繰り返し現れる文字列は共有して持つので、
+辞書のまま持つ場合に比べて 1 件あたりのメモリが数分の 1 になります。
+
+変更は add_listener() で登録した関数へ listener(event, task, old) の形で通知されます。
+event は "add" / "update" / "remove" / "move" / "categories" / "time" / "material" のいずれかで、
+old は変更前の値（"update" なら変わったフィールド、"move" なら {"rank": 旧 rank}、
+"time" なら開始・終了時刻つきの add_time レコード、"material" なら
+{"pos": 位置, "old": 変更前の明細, "new": 変更後の明細}（追加・削除では片方が None））です。
+"""
+import bisect
+import functools
+import itertools
+import math
+import sys
+import uuid
+from datetime import date
+from operator import attrgetter
+
+RANK_DIGITS = "0123456789abcdefghijklmnopqrstuvwxyz"
+RANK_BASE = len(RANK_DIGITS)
+# 末尾への追加・先頭への挿入はこの桁数の整数として一定幅で進め、キーが伸びないようにする
+RANK_WIDTH = 8
+RANK_SPACE = RANK_BASE ** RANK_WIDTH
+RANK_STEP = RANK_BASE ** 4
+RANK_FIRST = RANK_BASE ** (RANK_WIDTH - 1)
+
+
+def new_task_id():
+    return uuid.uuid4().hex
+
+
+def _rank_from_int(v):
+    digits = []
+    for _ in range(RANK_WIDTH):
+        v, r = divmod(v, RANK_BASE)
+        digits.append(RANK_DIGITS[r])
+    # 末尾の 0 は落として表現を一意にする（"a" と "a0" の間にはキーが存在しないため）
+    return "".join(reversed(digits)).rstrip("0")
+
+
+def _rank_to_int(rank):
+    v = 0
+    for ch in rank[:RANK_WIDTH].ljust(RANK_WIDTH, "0"):
+        v = v * RANK_BASE + RANK_DIGITS.index(ch)
+    return v
+
+
+def _rank_midpoint(lo, hi):
+    # lo < 戻り値 < hi（hi が None なら上限なし）となる最短のキーを桁ごとに探す
+    out = []
+    i = 0
+    while True:
+        a = RANK_DIGITS.index(lo[i]) if i < len(lo) else 0
+        b = RANK_DIGITS.index(hi[i]) if hi is not None and i < len(hi) else RANK_BASE
+        if a == b:
+            out.append(RANK_DIGITS[a])
+            i += 1
+            continue
+        mid = (a + b) // 2
+        if mid > a:
+            out.append(RANK_DIGITS[mid])
+            return "".join(out)
+        # 隣り合う桁: lo 側の桁を採用し、以降は上限なしで探す
+        out.append(RANK_DIGITS[a])
+        i += 1
+        hi = None
+
+
+def rank_between(lo, hi):
+    """lo < 戻り値 < hi となる並び順キーを返します。lo / hi は None で端を表します。"""
+    if lo is not None and hi is not None:
+        if not lo < hi:
+            raise ValueError(f"invalid rank range: {lo!r} >= {hi!r}")
+        return _rank_midpoint(lo, hi)
+    if lo is None and hi is None:
+        return _rank_from_int(RANK_FIRST)
+    if hi is None:
+        v = _rank_to_int(lo) + RANK_STEP
+        if v < RANK_SPACE:
+            return _rank_from_int(v)
+        return _rank_midpoint(lo, None)
+    v = _rank_to_int(hi) - RANK_STEP
+    if v > 0:
+        return _rank_from_int(v)
+    return _rank_midpoint("", hi)
+
+
+def initial_ranks(n):
+    """n 件分の等間隔な並び順キーを返します（移行時に使用）。"""
+    step = RANK_STEP if (n + 1) * RANK_STEP < RANK_SPACE else RANK_SPACE // (n + 1)
+    start = RANK_FIRST if RANK_FIRST + n * step < RANK_SPACE else step
+    return [_rank_from_int(start + i * step) for i in range(n)]
+
+
+class SortedKeyList:
+    """ソート済みの要素を小さなリストに分割して保持するコンテナ。
+
+    挿入・削除・位置の検索はいずれも全体をずらさず、該当する区画だけを操作します。
+    """
+
+    LOAD = 1000
+
+    def __init__(self, keys=()):
+        keys = sorted(keys)
+        self._buckets = [keys[i:i + self.LOAD] for i in range(0, len(keys), self.LOAD)]
+        self._maxes = [b[-1] for b in self._buckets]
+        self._len = len(keys)
+
+    def __len__(self):
+        return self._len
+
+    def __iter__(self):
+        return itertools.chain.from_iterable(self._buckets)
+
+    def __reversed__(self):
+        for b in reversed(self._buckets):
+            yield from reversed(b)
+
+    def __contains__(self, key):
+        i = bisect.bisect_left(self._maxes, key)
+        if i == len(self._maxes):
+            return False
+        b = self._buckets[i]
+        j = bisect.bisect_left(b, key)
+        return j < len(b) and b[j] == key
+
+    def add(self, key):
+        if not self._buckets:
+            self._buckets.append([key])
+            self._maxes.append(key)
+        else:
+            i = bisect.bisect_left(self._maxes, key)
+            if i == len(self._maxes):
+                i -= 1
+                self._buckets[i].append(key)
+                self._maxes[i] = key
+            else:
+                bisect.insort(self._buckets[i], key)
+            b = self._buckets[i]
+            if len(b) > 2 * self.LOAD:
+                half = len(b) // 2
+                self._buckets[i:i + 1] = [b[:half], b[half:]]
+                self._maxes[i:i + 1] = [b[half - 1], b[-1]]
+        self._len += 1
+
+    def remove(self, key):
+        i = bisect.bisect_left(self._maxes, key)
+        if i == len(self._maxes):
+            raise ValueError(f"{key!r} not in list")
+        b = self._buckets[i]
+        j = bisect.bisect_left(b, key)
+        if j == len(b) or b[j] != key:
+            raise ValueError(f"{key!r} not in list")
+        del b[j]
+        if b:
+            self._maxes[i] = b[-1]
+        else:
+            del self._buckets[i]
+            del self._maxes[i]
+        self._len -= 1
+
+    def bisect_left(self, key):
+        i = bisect.bisect_left(self._maxes, key)
+        if i == len(self._maxes):
+            return self._len
+        return sum(len(b) for b in self._buckets[:i]) + bisect.bisect_left(self._buckets[i], key)
+
+    def bisect_right(self, key):
+        i = bisect.bisect_right(self._maxes, key)
+        if i == len(self._maxes):
+            return self._len
+        return sum(len(b) for b in self._buckets[:i]) + bisect.bisect_right(self._buckets[i], key)
+
+    def index(self, key):
+        pos = self.bisect_left(key)
+        if pos == self._len or self[pos] != key:
+            raise ValueError(f"{key!r} not in list")
+        return pos
+
+    def __getitem__(self, pos):
+        if pos < 0:
+            # 末尾付近（末尾への追加で毎回参照される）は最後の区画だけを見る
+            if self._buckets and -pos <= len(self._buckets[-1]):
+                return self._buckets[-1][pos]
+            pos += self._len
+        if not 0 <= pos < self._len:
+            raise IndexError("SortedKeyList index out of range")
+        for b in self._buckets:
+            if pos < len(b):
+                return b[pos]
+            pos -= len(b)
+
+    def islice(self, start=0, stop=None):
+        """位置 start から stop までの要素を順に返します。"""
+        stop = self._len if stop is None else min(stop, self._len)
+        if start >= stop:
+            return
+        remaining = stop - start
+        for b in self._buckets:
+            if start >= len(b):
+                start -= len(b)
+                continue
+            chunk = b[start:start + remaining]
+            yield from chunk
+            remaining -= len(chunk)
+            if remaining <= 0:
+                return
+            start = 0
+
+
+_ABSENT = object()  # Task のスロットで「キーが無い」ことを表す
+DATE_FORMAT = "%Y/%m/%d"
+
+
+@functools.lru_cache(maxsize=8192)
+def parse_date(text):
+    """"YYYY/MM/DD" の日付を序数（date.toordinal()）にします。その形式でなければ None。
+
+    同じ文字列からは同じ int オブジェクトが返るので、多数のタスクで共有されます。
+    """
+    if len(text) != 10 or text[4] != "/" or text[7] != "/":
+        return None
+    try:
+        return date(int(text[:4]), int(text[5:7]), int(text[8:])).toordinal()
+    except ValueError:
+        return None
+
+
+@functools.lru_cache(maxsize=None)
+def format_date(ordinal):
+    """序数を "YYYY/MM/DD" に戻します（同じ日付には同じ文字列オブジェクトを返します）。"""
+    return date.fromordinal(ordinal).strftime(DATE_FORMAT)
+
+
+@functools.lru_cache(maxsize=4096)
+def _parse_number(text):
+    # 文字列に戻したときに元と一致する数値だけを数値として持つ（"08" や "1.50" は文字列のまま）
+    try:
+        v = int(text)
+        if str(v) == text:
+            return v
+    except ValueError:
+        try:
+            v = float(text)
+            if math.isfinite(v) and repr(v) == text:
+                return v
+        except ValueError:
+            pass
+    return None
+
+
+_INT_TEXT = {}
+
+
+def _number_text(v):
+    if type(v) is int:
+        text = _INT_TEXT.get(v)
+        if text is None:
+            text = _INT_TEXT[v] = str(v)
+        return text
+    return repr(v)
+
+
+def _intern(v):
+    return sys.intern(v) if type(v) is str else v
+
+
+def _read_estimate(t):
+    v = t.estimate
+    return _number_text(v) if t._estimate_str else v
+
+
+def _write_estimate(t, v):
+    num = _parse_number(v) if type(v) is str else None
+    t._estimate_str = num is not None
+    t.estimate = v if num is None else num
+
+
+def _date_reader(slot):
+    get = attrgetter(slot)
+
+    def read(t):
+        v = get(t)
+        return format_date(v) if type(v) is int else v
+    return read
+
+
+def _date_writer(slot):
+    def write(t, v):
+        ordinal = parse_date(v) if type(v) is str else None
+        setattr(t, slot, v if ordinal is None else ordinal)
+    return write
+
+
+def _write_materials(t, lines):
+    # 材料名も繰り返し現れるので共有する
+    if type(lines) is list:
+        for line in lines:
+            if type(line) is dict and type(line.get("name")) is str:
+                line["name"] = sys.intern(line["name"])
+    t.materials = lines
+
+
+def _plain_writer(slot, intern=False):
+    if intern:
+        return lambda t, v: setattr(t, slot, _intern(v))
+    return lambda t, v: setattr(t, slot, v)
+
+
+# 辞書としてのキー -> (読み出し, 書き込み, スロット)。並びはファイルに書き出すときのキーの順
+_FIELDS = {
+    "name": (attrgetter("name"), _plain_writer("name", True), "name"),
+    "worker": (attrgetter("worker"), _plain_writer("worker", True), "worker"),
+    "estimate": (_read_estimate, _write_estimate, "estimate"),
+    "start_date": (_date_reader("start"), _date_writer("start"), "start"),
+    "end_date": (_date_reader("end"), _date_writer("end"), "end"),
+    "category": (attrgetter("category"), _plain_writer("category", True), "category"),
+    "actual_sec": (attrgetter("actual_sec"), _plain_writer("actual_sec"), "actual_sec"),
+    "progress": (attrgetter("progress"), _plain_writer("progress"), "progress"),
+    "memo_ref": (attrgetter("memo_ref"), _plain_writer("memo_ref"), "memo_ref"),
+    "materials": (attrgetter("materials"), _write_materials, "materials"),
+    "id": (attrgetter("id"), _plain_writer("id"), "id"),
+    "rank": (attrgetter("rank"), _plain_writer("rank"), "rank"),
+}
+_READERS = {k: f[0] for k, f in _FIELDS.items()}
+_WRITERS = {k: f[1] for k, f in _FIELDS.items()}
+
+
+class Task:
+    """タスク 1 件。辞書と同じように t["name"] / t.get() / t.update() で読み書きできます。
+
+    中身は __slots__ の属性で持ち、作業者・カテゴリ・タスク名は sys.intern() で
+    同じ文字列を共有し、日付は序数（int）、予定は数値にして保持します。辞書として
+    読むと元の形（"2025/12/28" や "8"）に戻るので、to_dict() の結果は読み込んだ
+    JSON と同じ内容になります。形式に合わない値（"" の予定など）はそのまま持ちます。
+
+    並べ替えや比較には属性を直接使ってください（start / end は序数、estimate は数値。
+    形式に合わない値のときは元の値なので、start_ordinal / end_ordinal / estimate_hours を
+    使うと None になります）。決まったキー以外は extra（辞書）に入ります。
+    """
+
+    __slots__ = ("id", "rank", "name", "worker", "category", "estimate", "start", "end",
+                 "actual_sec", "progress", "memo_ref", "materials", "extra", "_estimate_str")
+
+    def __init__(self, data=()):
+        # 読み込みで件数分呼ばれるので、__setitem__ を通さずに直接振り分ける
+        if type(data) is not dict:
+            data = dict(data)
+        get = data.get
+        intern = sys.intern
+        self.id = get("id", _ABSENT)
+        self.rank = get("rank", _ABSENT)
+        v = get("name", _ABSENT)
+        self.name = intern(v) if type(v) is str else v
+        v = get("worker", _ABSENT)
+        self.worker = intern(v) if type(v) is str else v
+        v = get("category", _ABSENT)
+        self.category = intern(v) if type(v) is str else v
+        _write_estimate(self, get("estimate", _ABSENT))
+        v = get("start_date", _ABSENT)
+        ordinal = parse_date(v) if type(v) is str else None
+        self.start = v if ordinal is None else ordinal
+        v = get("end_date", _ABSENT)
+        ordinal = parse_date(v) if type(v) is str else None
+        self.end = v if ordinal is None else ordinal
+        self.actual_sec = get("actual_sec", _ABSENT)
+        self.progress = get("progress", _ABSENT)
+        self.memo_ref = get("memo_ref", _ABSENT)
+        _write_materials(self, get("materials", _ABSENT))
+        self.extra = ({k: v for k, v in data.items() if k not in _FIELDS}
+                      if not _FIELDS.keys() >= data.keys() else None)
+
+    # --- 型つきの値 ---
+    @property
+    def start_ordinal(self):
+        return self.start if type(self.start) is int else None
+
+    @property
+    def end_ordinal(self):
+        return self.end if type(self.end) is int else None
+
+    @property
+    def estimate_hours(self):
+        v = self.estimate
+        return v if type(v) in (int, float) else None
+
+    # --- 辞書としての操作 ---
+    def __getitem__(self, key):
+        reader = _READERS.get(key)
+        if reader is None:
+            if self.extra is None:
+                raise KeyError(key)
+            return self.extra[key]
+        v = reader(self)
+        if v is _ABSENT:
+            raise KeyError(key)
+        return v
+
+    def get(self, key, default=None):
+        reader = _READERS.get(key)
+        if reader is None:
+            return default if self.extra is None else self.extra.get(key, default)
+        v = reader(self)
+        return default if v is _ABSENT else v
+
+    def __setitem__(self, key, value):
+        writer = _WRITERS.get(key)
+        if writer is None:
+            if self.extra is None:
+                self.extra = {}
+            self.extra[key] = value
+        else:
+            writer(self, value)
+
+    def __delitem__(self, key):
+        field = _FIELDS.get(key)
+        if field is None:
+            if self.extra is None:
+                raise KeyError(key)
+            del self.extra[key]
+            if not self.extra:
+                self.extra = None
+        elif field[0](self) is _ABSENT:
+            raise KeyError(key)
+        else:
+            setattr(self, field[2], _ABSENT)
+
+    def __contains__(self, key):
+        reader = _READERS.get(key)
+        if reader is None:
+            return self.extra is not None and key in self.extra
+        return reader(self) is not _ABSENT
+
+    def pop(self, key, *default):
+        try:
+            v = self[key]
+        except KeyError:
+            if default:
+                return default[0]
+            raise
+        del self[key]
+        return v
+
+    def setdefault(self, key, default=None):
+        v = self.get(key, _ABSENT)
+        if v is _ABSENT:
+            self[key] = v = default
+        return v
+
+    def update(self, other=(), **kwargs):
+        items = other.items() if hasattr(other, "items") else other
+        for key, value in itertools.chain(items, kwargs.items()):
+            self[key] = value
+
+    def keys(self):
+        return self.to_dict().keys()
+
+    def __iter__(self):
+        return iter(self.to_dict())
+
+    def __len__(self):
+        return len(self.to_dict())
+
+    def items(self):
+        return self.to_dict().items()
+
+    def values(self):
+        return self.to_dict().values()
+
+    def __eq__(self, other):
+        if isinstance(other, (Task, dict)):
+            return self.to_dict() == dict(other)
+        return NotImplemented
+
+    __hash__ = None
+
+    def to_dict(self):
+        """元の形式（v24 / v25 の JSON と同じ値）の辞書を返します。"""
+        d = {}
+        for key, reader in _READERS.items():
+            v = reader(self)
+            if v is not _ABSENT:
+                d[key] = v
+        if self.extra:
+            d.update(self.extra)
+        return d
+
+    def __reduce__(self):
+        return (Task, (self.to_dict(),))
+
+    def __repr__(self):
+        return f"Task({self.to_dict()!r})"
+
+
+class TaskModel:
+    def __init__(self, data=None):
+        self.tasks = {}               # id -> タスク
+        self.order = SortedKeyList()  # (rank, id)
+        self.categories = ["-"]
+        self._listeners = []
+        if data is not None:
+            self.load(data)
+
+    def add_listener(self, listener):
+        self._listeners.append(listener)
+
+    def remove_listener(self, listener):
+        self._listeners.remove(listener)
+
+    def _notify(self, event, task=None, old=None):
+        for listener in self._listeners:
+            listener(event, task, old)
+
+    def load(self, data):
+        """v24 形式の辞書から読み込みます。ID / rank を補った場合は True を返します。"""
+        self.categories = list(data.get("categories", ["-"]))
+        tasks = data.get("tasks", [])
+        migrated = False
+        # rank が欠けているタスクがあれば、ファイル上の並び順どおりに振り直す
+        if any("rank" not in t for t in tasks):
+            for t, r in zip(tasks, initial_ranks(len(tasks))):
+                t["rank"] = r
+            migrated = True
+        self.tasks = {}
+        for i, t in enumerate(tasks):
+            if not t.get("id") or t["id"] in self.tasks:
+                t["id"] = new_task_id()
+                migrated = True
+            # 読み込んだ辞書は 1 件ずつ Task に置き換えて手放す
+            tasks[i] = t = Task(t)
+            self.tasks[t.id] = t
+        self.order = SortedKeyList((t.rank, t.id) for t in tasks)
+        return migrated
+
+    def extend(self, tasks):
+        """読み込んだ Task を追加し、1 件ずつ "add" を通知します（TaskStore.load_stages() 用）。
+
+        ID は既存のタスクと重ならず、rank も割り当て済みであること。
+        """
+        for t in tasks:
+            self.tasks[t.id] = t
+            self.order.add((t.rank, t.id))
+            self._notify("add", t)
+
+    def to_data(self):
+        return {"tasks": [t.to_dict() for t in self], "categories": list(self.categories)}
+
+    # --- 参照 ---
+    def __len__(self):
+        return len(self.tasks)
+
+    def __iter__(self):
+        tasks = self.tasks
+        return (tasks[tid] for _, tid in self.order)
+
+    def get(self, tid):
+        return self.tasks.get(tid)
+
+    def at(self, pos):
+        return self.tasks[self.order[pos][1]]
+
+    def window(self, start, stop):
+        """並び順で start 番目から stop 番目の手前までのタスクを返します。"""
+        tasks = self.tasks
+        return [tasks[tid] for _, tid in self.order.islice(start, stop)]
+
+    def index_of(self, tid):
+        return self.order.index((self.tasks[tid].rank, tid))
+
+    def _rank_at(self, pos):
+        if 0 <= pos < len(self.order):
+            return self.order[pos][0]
+        return None
+
+    # --- 変更レコードの作成 ---
+    def add_task_record(self, fields):
+        """末尾に追加するタスクのレコードを作ります（ID と rank を割り当てる）。"""
+        last = self.order[-1][0] if len(self.order) else None
+        task = dict(fields, id=new_task_id(), rank=rank_between(last, None))
+        return {"op": "add_task", "task": task}
+
+    def update_task_record(self, tid, fields):
+        """fields のうち今の値と違うものだけを書き換えるレコードを作ります（何も変わらなければ None）。
+
+        変えていないフィールドを書き戻さないので、同じ SQLite ファイルを開いている他のアプリが
+        その間に変えたフィールドを上書きしません（sqlite_store.py）。
+        """
+        t = self.tasks[tid]
+        changed = {k: v for k, v in fields.items() if t.get(k) != v}
+        if not changed:
+            return None
+        return {"op": "update_task", "id": tid, "fields": changed}
+
+    def move_task_record(self, tid, target_id):
+        """tid を target_id の位置へ移動するレコードを作ります。
+
+        下へ移動する場合は target の直後、上へ移動する場合は直前に入ります。
+        """
+        src = self.index_of(tid)
+        dst = self.index_of(target_id)
+        if src < dst:
+            rank = rank_between(self._rank_at(dst), self._rank_at(dst + 1))
+        else:
+            rank = rank_between(self._rank_at(dst - 1), self._rank_at(dst))
+        return {"op": "move_task", "id": tid, "rank": rank}
+
+    def _rank_for_position(self, src, pos):
+        # src 番目を取り除いた並びで pos 番目に入る rank（旧形式の位置指定レコード用）
+        shift = 1 if src < pos else 0
+        lo = self._rank_at(pos - 1 + shift) if pos > 0 else None
+        hi = self._rank_at(pos + shift)
+        return rank_between(lo, hi)
+
+    # --- 変更の適用 ---
+    def apply(self, rec):
+        """変更レコードを 1 件適用します。ジャーナルの再生にも同じ処理を使います。"""
+        op = rec["op"]
+        if "index" in rec:
+            # 位置指定の旧形式レコード
+            rec = dict(rec, id=self.at(rec["index"])["id"])
+        if op == "add_task":
+            t = Task(rec["task"])
+            if "id" not in t:
+                t.update(self.add_task_record({})["task"])
+            self.tasks[t.id] = t
+            self.order.add((t.rank, t.id))
+            self._notify("add", t)
+        elif op == "update_task":
+            t = self.tasks[rec["id"]]
+            old = {k: t.get(k) for k in rec["fields"]}
+            t.update(rec["fields"])
+            self._notify("update", t, old)
+        elif op == "delete_task":
+            t = self.tasks.pop(rec["id"])
+            self.order.remove((t.rank, t.id))
+            self._notify("remove", t)
+        elif op == "move_task":
+            if "from" in rec:
+                t = self.at(rec["from"])
+                rank = self._rank_for_position(rec["from"], rec["to"])
+            else:
+                t = self.tasks[rec["id"]]
+                rank = rec["rank"]
+            old = {"rank": t.rank}
+            self.order.remove((t.rank, t.id))
+            t.rank = rank
+            self.order.add((rank, t.id))
+            self._notify("move", t, old)
+        elif op == "add_time":
+            t = self.tasks[rec["id"]]
+            old = {"actual_sec": t.get("actual_sec", 0)}
+            t["actual_sec"] = old["actual_sec"] + rec["sec"]
+            self._notify("update", t, old)
+            if "start" in rec:
+                # 開始・終了時刻つきなら作業時間のエントリとしても通知する（time_log.TimeRollup 用）
+                self._notify("time", t, rec)
+        elif op == "time_entry":
+            # エントリだけを追加する（CSV の取り込み用。actual_sec は変えない）
+            self._notify("time", self.tasks[rec["id"]], rec)
+        elif op == "set_material":
+            # 材料費の明細 1 行を置き換える（pos が末尾なら追加）
+            t = self.tasks[rec["id"]]
+            lines = t.setdefault("materials", [])
+            pos = rec["pos"]
+            old = lines[pos] if pos < len(lines) else None
+            if old is None:
+                lines.append(rec["line"])
+            else:
+                lines[pos] = rec["line"]
+            self._notify("material", t, {"pos": pos, "old": old, "new": rec["line"]})
+        elif op == "delete_material":
+            t = self.tasks[rec["id"]]
+            old = t["materials"].pop(rec["pos"])
+            self._notify("material", t, {"pos": rec["pos"], "old": old, "new": None})
+        elif op == "set_memo":
+            # 本文は保存エンジンがブロブとして保存する（memo_store.py）。モデルは参照だけを持つ
+            t = self.tasks[rec["id"]]
+            old = {"memo_ref": t.get("memo_ref", "")}
+            t.pop("memo", None)
+            t["memo_ref"] = rec["ref"]
+            self._notify("update", t, old)
+        elif op == "add_category":
+            self.categories.append(rec["name"])
+            self._notify("categories")
+        elif op == "delete_category":
+            # 参照しているタスクのカテゴリは '-' に戻す
+            for t in self.tasks.values():
+                if t.category == rec["name"]:
+                    t["category"] = "-"
+                    self._notify("update", t, {"category": rec["name"]})
+            self.categories.remove(rec["name"])
+            self._notify("categories")
+        elif op == "set_categories":
+            self.categories = list(rec["categories"])
+            self._notify("categories")
+        else:
+            raise ValueError(f"unknown journal op: {op}")
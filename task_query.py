@@ -0,0 +1,256 @@
+"""タスクの検索・絞り込み用の索引。
+
+タスク名は 1 文字・2 文字の n-gram（日本語もそのまま扱える）による転置索引、
+作業者とカテゴリは値ごとの ID 集合、開始日・期限日は (日付, ID) のソート済み索引で
+保持します（日付は Task が持つ序数のまま比べます）。どれも TaskModel の変更通知を受けて差分で更新されるので、
+検索のたびに全タスクを走査することはありません。
+"""
+import calendar
+import unicodedata
+from datetime import date
+
+from task_model import SortedKeyList
+
+# 日付として読めない値（空欄など）の索引上の位置。どの日付よりも前に並ぶ
+_NO_DATE = 0
+# 条件の日付が読めないときの範囲（何にも一致しない）
+_NEVER = (1, 0)
+
+
+def normalize(text):
+    """全角・半角や大文字・小文字の違いを吸収した検索用の文字列を返します。"""
+    return unicodedata.normalize("NFKC", text or "").lower()
+
+
+def _date_key(task, slot):
+    v = getattr(task, slot)
+    return v if type(v) is int else _NO_DATE
+
+
+def _date_range(lo, hi):
+    """途中までの日付の指定を序数の範囲 (下限, 上限) にします（指定が無い側は None）。"""
+    try:
+        return (_date_bound(lo, False) if lo else None, _date_bound(hi, True) if hi else None)
+    except ValueError:
+        return _NEVER
+
+
+def _date_bound(text, upper):
+    parts = [p for p in text.split("/") if p]
+    if not 1 <= len(parts) <= 3 or not all(p.isdigit() for p in parts):
+        raise ValueError(text)
+    # 年が途中まで（"202"）なら、その数字で始まる年の範囲として扱う
+    year = int(parts[0].ljust(4, "9" if upper else "0")) if len(parts[0]) < 4 else int(parts[0])
+    month = int(parts[1]) if len(parts) > 1 else (12 if upper else 1)
+    if len(parts) > 2:
+        day = int(parts[2])
+    else:
+        day = calendar.monthrange(year, month)[1] if upper else 1
+    return date(year, month, day).toordinal()
+
+
+def _grams(s):
+    grams = set(s)
+    grams.update(s[i:i + 2] for i in range(len(s) - 1))
+    return grams
+
+
+class TaskQuery:
+    """検索条件。空の項目は条件なしとして扱います。
+
+    日付は "YYYY/MM/DD" 形式で、"2025/12" のように途中までの指定も受け付けます
+    （to 側は「その月の末まで」の意味になります）。
+    """
+
+    def __init__(self, text="", worker="", category="", end_from="", end_to="", start_from="", start_to=""):
+        self.terms = normalize(text).split()
+        self.worker = worker
+        self.category = category
+        self.end_from = end_from
+        self.end_to = end_to
+        self.start_from = start_from
+        self.start_to = start_to
+        self.end_range = _date_range(end_from, end_to)
+        self.start_range = _date_range(start_from, start_to)
+
+    def is_empty(self):
+        return not (self.terms or self.worker or self.category
+                    or self.end_from or self.end_to or self.start_from or self.start_to)
+
+    def matches(self, task):
+        """タスク 1 件が条件を満たすかを索引を使わずに判定します（差分更新用）。"""
+        if self.terms:
+            name = normalize(task.get("name", ""))
+            if not all(term in name for term in self.terms):
+                return False
+        if self.worker and task.get("worker", "-") != self.worker:
+            return False
+        if self.category and task.get("category", "-") != self.category:
+            return False
+        for slot, (lo, hi) in (("end", self.end_range), ("start", self.start_range)):
+            key = _date_key(task, slot)
+            if lo is not None and key < lo:
+                return False
+            if hi is not None and key > hi:
+                return False
+        return True
+
+
+class TaskQueryIndex:
+    def __init__(self, model):
+        self.model = model
+        self.grams = {}        # n-gram -> ID の集合
+        self.workers = {}      # 作業者 -> ID の集合
+        self.categories = {}   # カテゴリ -> ID の集合
+        self.start_dates = SortedKeyList()  # (開始日の序数, id)
+        self.end_dates = SortedKeyList()    # (期限日の序数, id)
+        self._names = {}       # id -> 正規化したタスク名
+        self._indexed = {}     # id -> 索引に登録済みの (worker, category, start_date, end_date)
+        self._built = False
+        self._unindexed = None  # build_chunk() でまだ登録していない ID
+        model.add_listener(self.on_change)
+
+    def build_chunk(self, size=5000):
+        """索引を size 件ずつ作ります（アイドル時に少しずつ呼ぶ用）。作り終えたら True を返します。"""
+        if self._built:
+            return True
+        if self._unindexed is None:
+            self._unindexed = list(self.model.tasks)
+        chunk = self._unindexed[-size:]
+        del self._unindexed[-size:]
+        for tid in chunk:
+            t = self.model.tasks.get(tid)
+            if t is not None and tid not in self._names:
+                self._add(t)
+        if not self._unindexed:
+            self._unindexed = None
+            self._built = True
+        return self._built
+
+    def ensure_built(self):
+        """まだ索引が無ければこの場で作ります。"""
+        if self._built:
+            return
+        if self._unindexed is not None:
+            self.build_chunk(len(self._unindexed))
+            return
+        grams, names, indexed = self.grams, self._names, self._indexed
+        workers, categories = self.workers, self.categories
+        for tid, t in self.model.tasks.items():
+            name = normalize(t.get("name", ""))
+            names[tid] = name
+            for g in _grams(name):
+                ids = grams.get(g)
+                if ids is None:
+                    grams[g] = {tid}
+                else:
+                    ids.add(tid)
+            fields = (t.get("worker", "-"), t.get("category", "-"), _date_key(t, "start"), _date_key(t, "end"))
+            indexed[tid] = fields
+            workers.setdefault(fields[0], set()).add(tid)
+            categories.setdefault(fields[1], set()).add(tid)
+        # 日付索引はまとめて並べ替えて作る
+        self.start_dates = SortedKeyList((f[2], tid) for tid, f in indexed.items())
+        self.end_dates = SortedKeyList((f[3], tid) for tid, f in indexed.items())
+        self._built = True
+
+    # --- 差分更新 ---
+    def on_change(self, event, task, old):
+        if not self._built and self._unindexed is None:
+            return
+        # build_chunk() の途中なら、まだ登録していないタスクは後で登録されるので触らない
+        if event == "add":
+            self._add(task)
+        elif event == "remove":
+            if task["id"] in self._names:
+                self._remove(task["id"])
+        elif event == "update":
+            if task["id"] in self._names and {"name", "worker", "category", "start_date", "end_date"} & old.keys():
+                self._remove(task["id"])
+                self._add(task)
+
+    def _add(self, task):
+        tid = task["id"]
+        name = normalize(task.get("name", ""))
+        self._names[tid] = name
+        for g in _grams(name):
+            self.grams.setdefault(g, set()).add(tid)
+        fields = (task.get("worker", "-"), task.get("category", "-"), _date_key(task, "start"), _date_key(task, "end"))
+        self._indexed[tid] = fields
+        self.workers.setdefault(fields[0], set()).add(tid)
+        self.categories.setdefault(fields[1], set()).add(tid)
+        self.start_dates.add((fields[2], tid))
+        self.end_dates.add((fields[3], tid))
+
+    def _remove(self, tid):
+        name = self._names.pop(tid)
+        for g in _grams(name):
+            self._discard(self.grams, g, tid)
+        worker, category, start, end = self._indexed.pop(tid)
+        self._discard(self.workers, worker, tid)
+        self._discard(self.categories, category, tid)
+        self.start_dates.remove((start, tid))
+        self.end_dates.remove((end, tid))
+
+    @staticmethod
+    def _discard(index, key, tid):
+        ids = index.get(key)
+        if ids is not None:
+            ids.discard(tid)
+            if not ids:
+                del index[key]
+
+    # --- 検索 ---
+    def search(self, query):
+        """条件を満たすタスク ID の集合を返します。条件が空なら None（全件）を返します。"""
+        if query.is_empty():
+            return None
+        self.ensure_built()
+        empty = set()
+        sets = []
+        if query.worker:
+            sets.append(self.workers.get(query.worker, empty))
+        if query.category:
+            sets.append(self.categories.get(query.category, empty))
+        for term in query.terms:
+            if len(term) == 1:
+                sets.append(self.grams.get(term, empty))
+            else:
+                sets.extend(self.grams.get(term[i:i + 2], empty) for i in range(len(term) - 1))
+
+        # 日付の範囲は件数だけ先に数え、候補が少なければ範囲の集合は作らずに候補側を絞る
+        ranges = []
+        for pos, index, (lo, hi) in ((3, self.end_dates, query.end_range), (2, self.start_dates, query.start_range)):
+            if lo is not None or hi is not None:
+                start = index.bisect_left((lo,)) if lo is not None else 0
+                # (hi + 1,) はその日のどの (hi, id) よりも後ろに来る
+                stop = index.bisect_left((hi + 1,)) if hi is not None else len(index)
+                ranges.append((max(stop - start, 0), pos, index, start, stop, lo, hi))
+        ranges.sort(key=lambda r: r[0])
+        if not sets:
+            _, _, index, start, stop, _, _ = ranges.pop(0)
+            sets.append({tid for _, tid in index.islice(start, stop)})
+
+        # 小さい集合から順に積をとる
+        sets.sort(key=len)
+        ids = set(sets[0]).intersection(*sets[1:])
+        indexed = self._indexed
+        for count, pos, index, start, stop, lo, hi in ranges:
+            if count < len(ids):
+                ids.intersection_update(tid for _, tid in index.islice(start, stop))
+            else:
+                ids = {tid for tid in ids
+                       if (lo is None or indexed[tid][pos] >= lo) and (hi is None or indexed[tid][pos] <= hi)}
+
+        # 2-gram がすべて含まれていても連続しているとは限らないので、長い語は文字列で確認する
+        long_terms = [term for term in query.terms if len(term) > 2]
+        if long_terms:
+            names = self._names
+            ids = {tid for tid in ids if all(term in names[tid] for term in long_terms)}
+        return ids
+
+    def values(self, field):
+        """絞り込み候補として出す作業者 / カテゴリの一覧を返します。"""
+        self.ensure_built()
+        index = self.workers if field == "worker" else self.categories
+        return sorted(index)
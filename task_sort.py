@@ -0,0 +1,117 @@
+"""タスク一覧の列見出しでの並べ替え。
+
+列ごとの並べ替えキーは型に合わせて作ります。
+    name / worker / category   日本語向けの照合キー（collation_key）
+    progress                   数値
+    deadline                   期限日の序数（期限の無いタスクは最後）
+同じキーのタスクは手動の並び（rank）の順に並びます。
+
+SortIndex は列ごとに (キー, rank, ID) の SortedKeyList を持ち、モデルの変更通知で
+変わったタスクの分だけを付け替えます。索引はその列で初めて並べ替えたときに作り、以降は
+保持し続けるので、列や昇順・降順を切り替えても並べ替え直す必要はありません（降順は
+同じ並びを後ろから読むだけです）。
+"""
+import re
+import unicodedata
+from functools import lru_cache
+
+from task_model import SortedKeyList
+
+# 列のキー -> 並べ替えに使うタスクのフィールド
+SORT_FIELDS = {
+    "name": "name",
+    "progress": "progress",
+    "deadline": "end_date",
+    "worker": "worker",
+    "category": "category",
+}
+# 期限の無いタスクの並べ替えキー（どの日付よりも後）
+NO_DEADLINE = 1 << 30
+
+_DIGITS = re.compile(r"(\d+)")
+# カタカナをひらがなに寄せる（「テスト」と「てすと」を同じ位置に並べる）
+_KATA_TO_HIRA = str.maketrans({chr(c): chr(c - 0x60) for c in range(0x30A1, 0x30F7)})
+
+
+@lru_cache(maxsize=65536)
+def collation_key(text):
+    """文字列の並べ替えキー。
+
+    全角・半角の違い（NFKC）、英字の大文字・小文字、カタカナ・ひらがなの違いを無視し、
+    数字の部分は数として比べます（「測量2」が「測量10」より前）。漢字は読みではなく
+    文字コードの順です。
+    """
+    s = unicodedata.normalize("NFKC", text).casefold().translate(_KATA_TO_HIRA)
+    # 数と文字列を直接比べないよう、(0, 数) / (1, 文字列) の組にする
+    return tuple((0, int(p)) if i % 2 else (1, p) for i, p in enumerate(_DIGITS.split(s)) if p)
+
+
+def _text_key(field):
+    def key(task):
+        v = task.get(field, "")
+        return collation_key(v if isinstance(v, str) else str(v))
+    return key
+
+
+def _progress_key(task):
+    v = task.get("progress", 0)
+    if type(v) in (int, float):
+        return v
+    try:
+        return float(v)
+    except (TypeError, ValueError):
+        return -1
+
+
+def _deadline_key(task):
+    end = task.end_ordinal
+    return NO_DEADLINE if end is None else end
+
+
+SORT_KEYS = {
+    "name": _text_key("name"),
+    "progress": _progress_key,
+    "deadline": _deadline_key,
+    "worker": _text_key("worker"),
+    "category": _text_key("category"),
+}
+
+
+class SortIndex:
+    """列ごとの並び（SortedKeyList）をモデルの変更に合わせて差分で保持します。"""
+
+    def __init__(self, model):
+        self.model = model
+        self.lists = {}  # 列 -> SortedKeyList((キー, rank, id))
+        self.keys = {}   # 列 -> {id: (キー, rank, id)}
+        model.add_listener(self.on_change)
+
+    @staticmethod
+    def key(column, task):
+        return (SORT_KEYS[column](task), task.rank, task.id)
+
+    def get(self, column):
+        """column の並びを返します（初回だけ全件を並べ替えて作ります）。"""
+        lst = self.lists.get(column)
+        if lst is None:
+            key = SORT_KEYS[column]
+            keys = self.keys[column] = {tid: (key(t), t.rank, tid) for tid, t in self.model.tasks.items()}
+            lst = self.lists[column] = SortedKeyList(keys.values())
+        return lst
+
+    def on_change(self, event, task, old):
+        if task is None or event not in ("add", "update", "remove", "move"):
+            return
+        tid = task.id
+        for column, lst in self.lists.items():
+            keys = self.keys[column]
+            if event == "remove":
+                lst.remove(keys.pop(tid))
+                continue
+            k = self.key(column, task)
+            before = keys.get(tid)
+            if k != before:
+                if before is not None:
+                    lst.remove(before)
+                lst.add(k)
+                keys[tid] = k
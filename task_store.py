@@ -0,0 +1,507 @@
+"""タスクデータの保存エンジン。
+
+保存エンジンは TaskStore のインターフェース（load / append / write_snapshot / close）を
+実装します。open_store() はファイルの拡張子で実装を選びます:
+    .db / .sqlite / .sqlite3  SqliteStore（sqlite_store.py）
+    それ以外                  JournalStore（追記型ジャーナル + スナップショット）
+
+以下は JournalStore の説明です。
+
+変更のたびに JSON 全体を書き直すのではなく、1 件の変更を 1 行のレコードとして
+ジャーナルファイルに追記します。ジャーナルが一定件数たまるとバックグラウンドで
+スナップショット（従来と同じ v24 形式の JSON）へ畳み込みます。
+
+ファイル構成（DATA_FILE = "tasks_std_v24.json" の場合）:
+    tasks_std_v24.json             スナップショット（従来形式と互換。各タスクに id / rank を追加）
+    tasks_std_v24.json.journal     追記中のジャーナル（1 行 1 レコードの JSON）
+    tasks_std_v24.json.compacting  畳み込み中のジャーナル（一時ファイル）
+    tasks_std_v24.json.timelog     作業時間のエントリ（time_log.py。畳み込みの対象外で追記のみ）
+    tasks_std_v24.json.timers      計測中のセッション（task_timer.py。保存のたびに置き換える）
+    tasks_std_v24.json.memos/      メモの本文（memo_store.py。畳み込みのときに参照されなくなったものを消す）
+"""
+import json
+import os
+import re
+import threading
+import time
+
+from memo_store import GC_GRACE_SEC, MEMOS_SUFFIX, FileBlobStore, externalize_memos
+from task_model import Task, TaskModel
+from time_log import TIMELOG_SUFFIX, append_entries, entry_from_record, read_entries
+
+JOURNAL_SUFFIX = ".journal"
+COMPACTING_SUFFIX = ".compacting"
+TIMERS_SUFFIX = ".timers"
+# ジャーナルの件数がこれを超えたらスナップショットへ畳み込む
+COMPACT_THRESHOLD = 500
+SQLITE_SUFFIXES = (".db", ".sqlite", ".sqlite3")
+
+_WS = re.compile(r"[ \t\n\r]*")
+# 配列の要素の後の区切り（前後の空白を含む）
+_ITEM_END = re.compile(r"[ \t\n\r]*([,\]])[ \t\n\r]*")
+# write_json_atomic（indent=4）で書いたスナップショットの "tasks" の要素の終わりと、まとめて解析する件数
+_TASK_END = "\n        },"
+SNAPSHOT_BATCH = 1000
+# スナップショットを読み込むときの 1 回の読み出しの文字数（デコードの間も GIL を持つため分ける）
+READ_CHUNK = 1 << 20
+# load_stages() が 1 回に返すタスクの件数
+LOAD_CHUNK = 200
+_decoder = json.JSONDecoder()
+
+
+class TaskStore:
+    """保存エンジンの共通インターフェース。"""
+
+    def load(self):
+        """保存されているデータから TaskModel を作って返します。"""
+        raise NotImplementedError
+
+    def load_stages(self, chunk=LOAD_CHUNK):
+        """load() と同じデータを読んだ分ずつ返します（起動時に、読みながら一覧を出すため）。
+
+        (種類, 値) を順に返します:
+            ("tasks", [Task, ...])    並び順に chunk 件ずつ。TaskModel.extend() で追加する
+            ("categories", [名前])    set_categories レコードとして適用する
+            ("records", [レコード])   スナップショットより後の変更。TaskModel.apply() で適用する
+            ("model", TaskModel)      それまでに返した分を捨てて、このモデルを使う（以降は返さない）
+        受け取った順に適用すると load() と同じモデルになります。既定では load() の結果を返します。
+        """
+        yield "model", self.load()
+
+    def append(self, *records):
+        """TaskModel.apply() に渡したのと同じ変更レコードを保存します。"""
+        raise NotImplementedError
+
+    def load_time_entries(self):
+        """保存されている作業時間のエントリ（time_log.TimeEntry）を順に返します。"""
+        raise NotImplementedError
+
+    def load_running_timers(self):
+        """最後に保存した計測中セッションのレコード（task_timer.py）を返します。無ければ None。"""
+        return None
+
+    def load_memo(self, ref):
+        """memo_ref が ref のメモの本文を返します（memo_store.py）。無ければ KeyError。"""
+        raise NotImplementedError
+
+    def write_snapshot(self, model):
+        """モデル全体で保存内容を置き換えます。"""
+        raise NotImplementedError
+
+    def close(self):
+        pass
+
+
+def quarantine_store_files(path):
+    """読み込めなかったデータファイルを ".broken-日時" を付けた名前で退避します。
+
+    閉じた状態の保存エンジンに対して使います。退避したファイル名の一覧を返します。
+    作業時間のエントリ（.timelog）とメモの本文（.memos）はタスクとは別に読めるので残します。
+    """
+    if path.lower().endswith(SQLITE_SUFFIXES):
+        paths = [path, path + "-wal", path + "-shm"]
+    else:
+        paths = [path, path + JOURNAL_SUFFIX, path + COMPACTING_SUFFIX]
+    suffix = time.strftime(".broken-%Y%m%d-%H%M%S")
+    moved = []
+    for p in paths:
+        if os.path.exists(p):
+            os.replace(p, p + suffix)
+            moved.append(p + suffix)
+    return moved
+
+
+def open_store(path):
+    if path.lower().endswith(SQLITE_SUFFIXES):
+        from sqlite_store import SqliteStore
+        return SqliteStore(path)
+    return JournalStore(path)
+
+
+def _read_journal(path):
+    """ジャーナルを読み込みます。書き込み途中で終わった末尾の行は無視します。"""
+    records = []
+    if not os.path.exists(path):
+        return records
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                records.append(json.loads(line))
+            except ValueError:
+                break
+    return records
+
+
+def _truncate_torn_tail(path):
+    """書き込み途中で終わった末尾の行（改行で終わっていない行）を切り落とします。
+
+    残したままだと次の追記がその行の続きになり、以降のレコードが読めなくなるため。
+    """
+    if not os.path.exists(path):
+        return
+    with open(path, "rb+") as f:
+        size = f.seek(0, os.SEEK_END)
+        if size == 0:
+            return
+        f.seek(size - 1)
+        if f.read(1) == b"\n":
+            return
+        pos = size
+        while pos > 0:
+            step = min(4096, pos)
+            pos -= step
+            f.seek(pos)
+            i = f.read(step).rfind(b"\n")
+            if i >= 0:
+                f.truncate(pos + i + 1)
+                return
+        f.truncate(0)
+
+
+def _file_size(path):
+    try:
+        return os.path.getsize(path)
+    except FileNotFoundError:
+        return 0
+
+
+def _truncate_to(path, size):
+    """追記に失敗したファイルを追記する前の大きさに戻します。"""
+    try:
+        if os.path.exists(path):
+            with open(path, "rb+") as f:
+                f.truncate(size)
+    except OSError:
+        # 戻せなくても、読み込み時には途中で終わった末尾の行を切り落とす
+        pass
+
+
+def loaded_tasks(items, seen):
+    """load() が移行せずにそのまま読むタスクの辞書を Task にして返します（load_stages() 用）。
+
+    ID / rank が無い・ID が seen と重なる・本文を直接持つメモがあるなど、移行が要れば ValueError。
+    """
+    out = []
+    for t in items:
+        if "rank" not in t or not t.get("id") or t["id"] in seen or "memo" in t:
+            raise ValueError("tasks need migration")
+        seen.add(t["id"])
+        out.append(Task(t))
+    return out
+
+
+def _needs_migration(records):
+    # 位置指定の旧形式レコード、ID の無いタスクや本文を直接持つメモを作るレコード
+    return any("index" in r or "from" in r
+               or (r["op"] == "add_task" and ("id" not in r["task"] or "memo" in r["task"]))
+               or (r["op"] == "update_task" and "memo" in r["fields"])
+               for r in records)
+
+
+def _read_text(path):
+    with open(path, "r", encoding="utf-8") as f:
+        return "".join(iter(lambda: f.read(READ_CHUNK), ""))
+
+
+def loads_snapshot(text):
+    """スナップショットの JSON を解析します（json.loads と同じ結果）。
+
+    "tasks" の配列は SNAPSHOT_BATCH 件ずつ（区切りが見つからなければ 1 件ずつ）解析します。
+    json.loads は 1 回の呼び出しの間 GIL を持ち続けるので、起動時の読み込みや畳み込みを
+    ワーカースレッドで行っても、その間は画面のスレッドが止まるため。形が想定と違えば json.loads に任せます。
+    """
+    try:
+        out = {}
+        for key, value in iter_snapshot(text):
+            if key == "tasks":
+                out.setdefault(key, []).extend(value)
+            else:
+                out[key] = value
+        return out
+    except (ValueError, IndexError):
+        return json.loads(text)
+
+
+def iter_snapshot(text):
+    """スナップショットの最上位のキーと値を (キー, 値) の形で先頭から順に返します。
+
+    "tasks" の配列は ("tasks", [要素, ...]) を何回かに分けて返します（最初は空のリスト）。
+    "tasks" が配列でない・キーが重なるなど、想定と違う形なら ValueError（または IndexError）。
+    """
+    def skip(i):
+        return _WS.match(text, i).end()
+
+    raw_decode = _decoder.raw_decode
+    i = skip(0)
+    if text[i] != "{":
+        raise ValueError("not an object")
+    seen = set()
+    i = skip(i + 1)
+    if text[i] == "}":
+        i += 1
+    while text[i - 1] != "}":
+        key, i = raw_decode(text, i)
+        if not isinstance(key, str) or key in seen:
+            raise ValueError("bad key")
+        seen.add(key)
+        i = skip(i)
+        if text[i] != ":":
+            raise ValueError("expected ':'")
+        i = skip(i + 1)
+        if key == "tasks":
+            if text[i] != "[":
+                raise ValueError("tasks is not an array")
+            yield key, []
+            i = skip(i + 1)
+            while True:
+                # SNAPSHOT_BATCH 件先の要素の終わりまでを 1 回で解析する
+                end = i
+                for _ in range(SNAPSHOT_BATCH):
+                    j = text.find(_TASK_END, end)
+                    if j < 0:
+                        break
+                    end = j + len(_TASK_END) - 1
+                if end == i:
+                    break
+                try:
+                    batch = json.loads("[" + text[i:end] + "]")
+                except ValueError:
+                    break
+                yield key, batch
+                i = skip(end + 1)
+            if text[i] == "]":
+                i += 1
+            else:
+                # 残り（最後の要素や、区切りが見つからない形式）は 1 件ずつ
+                batch = []
+                item_end = _ITEM_END.match
+                while True:
+                    item, i = raw_decode(text, i)
+                    batch.append(item)
+                    m = item_end(text, i)
+                    if m is None:
+                        raise ValueError("expected ',' or ']'")
+                    i = m.end()
+                    if m.group(1) == "]":
+                        break
+                    if len(batch) >= SNAPSHOT_BATCH:
+                        yield key, batch
+                        batch = []
+                yield key, batch
+        else:
+            value, i = raw_decode(text, i)
+            yield key, value
+        i = skip(i)
+        i += 1
+        if text[i - 1] == ",":
+            i = skip(i)
+        elif text[i - 1] != "}":
+            raise ValueError("expected ',' or '}'")
+    if skip(i) != len(text):
+        raise ValueError("extra data")
+
+
+def write_json_atomic(path, data):
+    """data を JSON で一時ファイルに書き、fsync してから path に置き換えます。"""
+    tmp = path + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(data, f, ensure_ascii=False, indent=4)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, path)
+
+
+class JournalStore(TaskStore):
+    def __init__(self, path, compact_threshold=COMPACT_THRESHOLD):
+        self.path = path
+        self.journal_path = path + JOURNAL_SUFFIX
+        self.compacting_path = path + COMPACTING_SUFFIX
+        self.timelog_path = path + TIMELOG_SUFFIX
+        self.timers_path = path + TIMERS_SUFFIX
+        self.memos = FileBlobStore(path + MEMOS_SUFFIX)
+        self.compact_threshold = compact_threshold
+        self._seq = 0
+        self._pending = 0
+        self._compact_thread = None
+
+    def _read_snapshot(self):
+        if os.path.exists(self.path):
+            return loads_snapshot(_read_text(self.path))
+        return {"tasks": [], "categories": ["-"]}
+
+    @staticmethod
+    def _replay(model, base, records):
+        # スナップショットに取り込み済みのレコード（seq が journal_seq 以下）は読み飛ばす
+        last = base
+        for rec in records:
+            if rec.get("seq", 0) <= base:
+                continue
+            model.apply(rec)
+            last = rec["seq"]
+        return last
+
+    def load(self):
+        """スナップショットとジャーナルから TaskModel を復元します。"""
+        for p in (self.journal_path, self.timelog_path):
+            _truncate_torn_tail(p)
+        data = self._read_snapshot()
+        model = TaskModel()
+        migrated = model.load(data)
+        # 前回の畳み込みが途中で終わっていれば、その分も先に再生する
+        pending = _read_journal(self.compacting_path) + _read_journal(self.journal_path)
+        # 位置指定の旧形式レコードも ID の無いタスクを生むので移行扱いにする
+        migrated |= any("index" in r or "from" in r or (r["op"] == "add_task" and "id" not in r["task"])
+                        for r in pending)
+        self._seq = self._replay(model, data.get("journal_seq", 0), pending)
+        self._pending = len(pending)
+        # 本文をタスクに直接持つ従来のメモはブロブへ移す
+        migrated |= externalize_memos(model, self.memos.write) > 0
+        if migrated:
+            # 割り当てた ID をジャーナルより先に確定させる
+            self.write_snapshot(model)
+        return model
+
+    def load_stages(self, chunk=LOAD_CHUNK):
+        """スナップショットの "tasks" を解析した分ずつ返します（TaskStore.load_stages()）。
+
+        移行が要るデータ（ID / rank の無いタスク、本文を直接持つメモ、旧形式のレコード）を
+        見つけたら、load() で読み直して ("model", ...) を返します。
+        """
+        for p in (self.journal_path, self.timelog_path):
+            _truncate_torn_tail(p)
+        pending = _read_journal(self.compacting_path) + _read_journal(self.journal_path)
+        data = {}
+        try:
+            if _needs_migration(pending):
+                raise ValueError("journal needs migration")
+            seen = set()
+            text = _read_text(self.path) if os.path.exists(self.path) else "{}"
+            for key, value in iter_snapshot(text):
+                if key != "tasks":
+                    data[key] = value
+                    continue
+                for i in range(0, len(value), chunk):
+                    yield "tasks", loaded_tasks(value[i:i + chunk], seen)
+        except (ValueError, IndexError):
+            yield "model", self.load()
+            return
+        # スナップショットに取り込み済みのレコード（seq が journal_seq 以下）は除く（_replay() と同じ）
+        base = data.get("journal_seq", 0)
+        records = [r for r in pending if r.get("seq", 0) > base]
+        self._seq = records[-1]["seq"] if records else base
+        self._pending = len(pending)
+        yield "categories", list(data.get("categories", ["-"]))
+        yield "records", records
+
+    def append(self, *records):
+        """変更レコードをジャーナルへ追記します。コストは変更の大きさに比例します。"""
+        # 計測中のセッションはジャーナルに入れず、最新の状態だけを別ファイルに置き換えで保存する
+        timers = [r for r in records if r["op"] == "timers"]
+        if timers:
+            records = [r for r in records if r["op"] != "timers"]
+        if records:
+            self._append_journal(records)
+        # 止めたセッションの add_time を書いてからチェックポイントを置き換える
+        if timers:
+            write_json_atomic(self.timers_path, timers[-1])
+
+    def _append_journal(self, records):
+        # メモの本文はブロブとして先に書き、ジャーナルには参照だけを残す
+        if any(r["op"] == "set_memo" for r in records):
+            for r in records:
+                if r["op"] == "set_memo" and r.get("text"):
+                    self.memos.write(r["ref"], r["text"])
+            records = [{k: v for k, v in r.items() if k != "text"} if r["op"] == "set_memo" else r
+                       for r in records]
+        # 失敗したら（StoreWriter が同じレコードを再試行するので）この回に追記した分を取り消す
+        sizes = [(p, _file_size(p)) for p in (self.timelog_path, self.journal_path)]
+        seq = self._seq
+        try:
+            records = self._write_entries_and_journal(records)
+        except Exception:
+            self._seq = seq
+            for p, size in sizes:
+                _truncate_to(p, size)
+            raise
+        if not records:
+            return
+        self._pending += len(records)
+        if self._pending >= self.compact_threshold:
+            self.compact()
+
+    def _write_entries_and_journal(self, records):
+        # 作業時間のエントリは先に書く（ジャーナルへ書く前に終了しても、読み込み時に actual_sec を補正できる）
+        entries = [e for e in map(entry_from_record, records) if e is not None]
+        if entries:
+            append_entries(self.timelog_path, entries)
+            # エントリだけのレコードはジャーナルに入れない
+            records = [r for r in records if r["op"] != "time_entry"]
+            if not records:
+                return records
+        lines = []
+        for rec in records:
+            self._seq += 1
+            rec = dict(rec, seq=self._seq)
+            lines.append(json.dumps(rec, ensure_ascii=False, separators=(",", ":")))
+        with open(self.journal_path, "a", encoding="utf-8") as f:
+            f.write("\n".join(lines) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+        return records
+
+    def load_time_entries(self):
+        return read_entries(self.timelog_path)
+
+    def load_memo(self, ref):
+        return self.memos.read(ref)
+
+    def load_running_timers(self):
+        try:
+            with open(self.timers_path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def compact(self):
+        """ジャーナルを退避してバックグラウンドでスナップショットへ畳み込みます。"""
+        if self._compact_thread is not None and self._compact_thread.is_alive():
+            return
+        # 前回の畳み込みが残っている場合は、新しいジャーナルを退避する前にそちらを片付ける
+        gc_before = None
+        if not os.path.exists(self.compacting_path):
+            if not os.path.exists(self.journal_path):
+                return
+            os.replace(self.journal_path, self.compacting_path)
+            self._pending = 0
+            # 退避より後のレコードが参照するメモは、退避より後に書かれる（または更新時刻が進む）
+            gc_before = time.time() - GC_GRACE_SEC
+        self._compact_thread = threading.Thread(target=self._compact_worker, args=(gc_before,), daemon=False)
+        self._compact_thread.start()
+
+    def _compact_worker(self, gc_before=None):
+        # メモリ上のデータには触れず、ディスク上のスナップショット + 退避ジャーナルから再構築する
+        data = self._read_snapshot()
+        model = TaskModel(data)
+        seq = self._replay(model, data.get("journal_seq", 0), _read_journal(self.compacting_path))
+        write_json_atomic(self.path, dict(model.to_data(), journal_seq=seq))
+        os.remove(self.compacting_path)
+        if gc_before is not None:
+            # どのタスクからも参照されなくなった古いメモを消す
+            self.memos.collect_garbage({t["memo_ref"] for t in model if t.get("memo_ref")}, gc_before)
+
+    def write_snapshot(self, model):
+        """モデル全体をスナップショットとして書き出し、ジャーナルを空にします。"""
+        self.close()
+        write_json_atomic(self.path, dict(model.to_data(), journal_seq=self._seq))
+        for p in (self.journal_path, self.compacting_path):
+            if os.path.exists(p):
+                os.remove(p)
+        self._pending = 0
+
+    def close(self):
+        if self._compact_thread is not None:
+            self._compact_thread.join()
+            self._compact_thread = None
@@ -0,0 +1,433 @@
+"""複数のアプリで同じタスクデータを使うための同期サーバーとクライアント。
+
+    python scheduler.py --data 共有フォルダ/tasks_std_v24.json serve [--host 127.0.0.1] [--port 8765]
+    python scheduler.py --server 127.0.0.1:8765
+
+データファイルを開くのはサーバー（SyncServer。asyncio）だけで、TaskModel もサーバーが持ちます。
+アプリ（SyncClient）は起動時に 1 回だけ全体を受け取り、以降は変更レコードをまとめて送って、
+版番号つきの差分（delta）だけを受け取ります。全員が同じ順で同じレコードを適用するので、
+各アプリのモデルはサーバーと同じ内容に保たれます。
+
+同時編集はタスク単位の楽観的排他で扱います。サーバーはタスク（カテゴリ一覧は CATEGORIES_KEY）
+ごとに最後に変わった版を覚えておき、送られてきたレコードが前提にした版（base）と
+違えば、そのまとめて送られたレコードをすべて拒否します。拒否されたアプリは最新の差分を
+受け取ってからやり直します。作業時間の加算（add_time / time_entry）は順序によらず
+同じ結果になるので、タスクがあれば版を問わず受け付け、タスクの版も進めません。
+
+プロトコルは 1 行 1 メッセージの JSON です:
+    C→S {"type": "hello"}
+    S→C {"type": "snapshot", "version", "data", "versions"}
+    C→S {"type": "commit", "id", "records", "base": {タスク ID: 版}}
+    S→全員 {"type": "delta", "version", "records", "tasks": [変わったキー], "bumped": [版が進んだキー]}
+    S→C {"type": "ack" / "reject" / "error", "reply_to", "version", "conflicts"}
+    C→S {"type": "memo", "id", "ref"} / {"type": "time_entries", "id"}
+    S→C {"type": "memo", "reply_to", "text"} / {"type": "time_entries", "reply_to", "entries"}
+差分ではメモの本文は送らず（参照だけ）、必要になったアプリが memo で取りに来ます。
+
+認証はありません。既定では自分のマシン（127.0.0.1）からの接続だけを受け付けます。
+"""
+import asyncio
+import itertools
+import json
+import os
+import queue
+import socket
+import threading
+
+from store_writer import StoreWriter, StoreWriteError
+from task_model import TaskModel
+from task_store import TaskStore, write_json_atomic
+from time_log import TimeEntry
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8765
+# カテゴリ一覧の版を覚えておくキー（タスク ID とは重ならない）
+CATEGORIES_KEY = "#categories"
+# 1 メッセージの上限（サーバーが受け取る側）
+MAX_MESSAGE = 64 * 1024 * 1024
+# クライアントが応答を待つ秒数
+REQUEST_TIMEOUT = 30.0
+
+# タスク ID を持つレコードのうち、版を問わず受け付けるもの
+COMMUTATIVE_OPS = {"add_time", "time_entry"}
+TASK_OPS = {"update_task", "delete_task", "move_task", "set_material", "delete_material", "set_memo"} | COMMUTATIVE_OPS
+CATEGORY_OPS = {"delete_category", "set_categories"}
+
+
+def encode(msg):
+    return (json.dumps(msg, ensure_ascii=False, separators=(",", ":")) + "\n").encode("utf-8")
+
+
+def base_keys(records):
+    """records が前提にする版のキー（タスク ID / CATEGORIES_KEY）。同じ送信で作るタスクは除きます。"""
+    keys, created = [], set()
+    for rec in records:
+        op = rec["op"]
+        if op == "add_task":
+            created.add(rec["task"].get("id"))
+        elif op in TASK_OPS and op not in COMMUTATIVE_OPS and rec["id"] not in created:
+            keys.append(rec["id"])
+        elif op in CATEGORY_OPS:
+            keys.append(CATEGORIES_KEY)
+    return keys
+
+
+class SyncError(Exception):
+    """サーバーとの通信に失敗した、またはサーバーがレコードを受け付けられなかった。"""
+
+
+# --- サーバー ---
+class _Peer:
+    def __init__(self, writer):
+        self.writer = writer
+        self.queue = asyncio.Queue()
+
+    def send(self, data):
+        self.queue.put_nowait(data)
+
+    async def run_sender(self):
+        # 溜まっているメッセージはまとめて 1 回で書く
+        while True:
+            data = await self.queue.get()
+            chunks = [data]
+            while data is not None and not self.queue.empty():
+                data = self.queue.get_nowait()
+                chunks.append(data)
+            if data is None:
+                chunks.pop()
+            if chunks:
+                self.writer.write(b"".join(chunks))
+                await self.writer.drain()
+            if data is None:
+                return
+
+
+class SyncServer:
+    def __init__(self, store):
+        self.store = store
+        self.model = store.load()
+        self.writer = StoreWriter(store)
+        self.version = 0
+        self.versions = {}     # タスク ID / CATEGORIES_KEY -> 最後に変わった版
+        self.peers = set()
+        self.commits = 0
+        self.rejects = 0
+        self._touched = None   # 適用中のレコードで変わったキー
+        self.model.add_listener(self._on_change)
+
+    def _on_change(self, event, task, old):
+        if self._touched is not None:
+            self._touched.add(CATEGORIES_KEY if task is None else task["id"])
+
+    # --- 変更の受け付け ---
+    def conflicts(self, records, base):
+        """受け付けられないキーの一覧を返します（空なら受け付けられる）。"""
+        out = [k for k, v in base.items() if self.versions.get(k, 0) != v]
+        tasks, created = self.model.tasks, set()
+        for rec in records:
+            op = rec.get("op")
+            if op == "add_task":
+                tid = rec["task"].get("id")
+                if not tid or tid in tasks or tid in created:
+                    out.append(tid)
+                created.add(tid)
+            elif op in TASK_OPS:
+                tid = rec["id"]
+                if tid not in created and (tid not in tasks or (op not in COMMUTATIVE_OPS and tid not in base)):
+                    out.append(tid)
+            elif op == "add_category":
+                if rec["name"] in self.model.categories:
+                    out.append(CATEGORIES_KEY)
+            elif op in CATEGORY_OPS:
+                if CATEGORIES_KEY not in base:
+                    out.append(CATEGORIES_KEY)
+            else:
+                raise ValueError(f"受け付けられないレコードです: {op!r}")
+        return sorted(set(out), key=str)
+
+    def commit(self, records, base):
+        """records を適用して全員に差分を送ります。(応答の種類, 版, 衝突したキー) を返します。"""
+        conflicts = self.conflicts(records, base)
+        if conflicts:
+            self.rejects += 1
+            return "reject", self.version, conflicts
+        # 作業時間の加算は他の編集と衝突しないので、タスクの版は進めない（表示の更新には含める）
+        touched, bumped = set(), set()
+        applied = []
+        try:
+            for rec in records:
+                self._touched = touched if rec["op"] in COMMUTATIVE_OPS else bumped
+                self.model.apply(rec)
+                applied.append(rec)
+        finally:
+            self._touched = None
+            if applied:
+                # 途中で失敗しても、適用できた分は全員に同じように適用させる
+                self.version += 1
+                for key in bumped:
+                    self.versions[key] = self.version
+                self.writer.submit(*applied)
+                self._broadcast({"type": "delta", "version": self.version,
+                                 "tasks": sorted(touched | bumped), "bumped": sorted(bumped),
+                                 "records": [{k: v for k, v in r.items() if k != "text"} if r["op"] == "set_memo"
+                                             else r for r in applied]})
+        self.commits += 1
+        return "ack", self.version, []
+
+    def _broadcast(self, msg):
+        data = encode(msg)
+        for peer in self.peers:
+            peer.send(data)
+
+    def snapshot(self):
+        return {"type": "snapshot", "version": self.version, "data": self.model.to_data(), "versions": self.versions}
+
+    # --- 接続 ---
+    async def handle(self, reader, writer):
+        peer = _Peer(writer)
+        sender = asyncio.ensure_future(peer.run_sender())
+        loop = asyncio.get_running_loop()
+        try:
+            async for line in reader:
+                msg = json.loads(line)
+                kind = msg.get("type")
+                if kind == "hello":
+                    # 全体を送るのは接続したときだけ。以降の差分はこの後ろに順に並ぶ
+                    peer.send(encode(self.snapshot()))
+                    self.peers.add(peer)
+                elif kind == "commit":
+                    try:
+                        result, version, conflicts = self.commit(msg["records"], msg.get("base", {}))
+                        reply = {"type": result, "version": version, "conflicts": conflicts}
+                    except Exception as e:
+                        reply = {"type": "error", "version": self.version, "error": str(e)}
+                    peer.send(encode(dict(reply, reply_to=msg["id"])))
+                elif kind == "memo":
+                    try:
+                        text = await loop.run_in_executor(None, self.writer.read, self.store.load_memo, msg["ref"])
+                        reply = {"type": "memo", "text": text}
+                    except KeyError:
+                        reply = {"type": "error", "error": "not_found"}
+                    except StoreWriteError as e:
+                        reply = {"type": "error", "error": "write_failed", "message": str(e)}
+                    peer.send(encode(dict(reply, reply_to=msg["id"])))
+                elif kind == "time_entries":
+                    try:
+                        entries = await loop.run_in_executor(
+                            None, self.writer.read, lambda: [list(e) for e in self.store.load_time_entries()])
+                        reply = {"type": "time_entries", "entries": entries}
+                    except StoreWriteError as e:
+                        reply = {"type": "error", "error": "write_failed", "message": str(e)}
+                    peer.send(encode(dict(reply, reply_to=msg["id"])))
+        except (ConnectionError, ValueError):
+            pass
+        finally:
+            self.peers.discard(peer)
+            peer.send(None)
+            try:
+                await sender
+            except ConnectionError:
+                pass
+            writer.close()
+
+    async def start(self, host=DEFAULT_HOST, port=DEFAULT_PORT):
+        return await asyncio.start_server(self.handle, host, port, limit=MAX_MESSAGE)
+
+    def close(self):
+        """書き込み待ちの変更を保存して保存エンジンを閉じます。"""
+        return self.writer.close()
+
+
+def serve(store, host=DEFAULT_HOST, port=DEFAULT_PORT, ready=None):
+    """サーバーを動かします（Ctrl+C で止めるまで戻りません）。"""
+    server = SyncServer(store)
+
+    async def run():
+        srv = await server.start(host, port)
+        if ready is not None:
+            ready(server, srv.sockets[0].getsockname())
+        async with srv:
+            await srv.serve_forever()
+
+    try:
+        asyncio.run(run())
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.close()
+    return server
+
+
+# --- クライアント ---
+class SyncClient(TaskStore):
+    """サーバーに接続してモデルを共有する保存エンジン。
+
+    変更は append() ではなく commit() で送ります（サーバーが受け付けた順にモデルへ適用される）。
+    他のアプリの変更は受信用のスレッドが溜めておき、poll() を呼んだスレッドで適用します。
+    計測中のセッション（timers）はアプリごとのものなので、timers_path に保存します。
+    """
+
+    def __init__(self, host=DEFAULT_HOST, port=DEFAULT_PORT, timers_path=None, timeout=REQUEST_TIMEOUT):
+        self.address = (host, port)
+        self.timers_path = timers_path
+        self.timeout = timeout
+        self.model = None
+        self.version = 0
+        self.versions = {}
+        self.last_conflicts = []
+        self.closed = False
+        self._touched = set()  # 前回の poll() 以降に差分で変わったキー
+        self._sock = socket.create_connection(self.address, timeout)
+        self._sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        self._file = self._sock.makefile("rb")
+        self._send_lock = threading.Lock()
+        self._ids = itertools.count(1)
+        self._replies = {}
+        self._deltas = queue.Queue()
+        self._reader = None
+
+    def _send(self, msg):
+        with self._send_lock:
+            try:
+                self._sock.sendall(encode(msg))
+            except OSError as e:
+                self.closed = True
+                raise SyncError(f"同期サーバーに送れませんでした: {e}") from e
+
+    def _request(self, msg):
+        if self.closed:
+            raise SyncError("同期サーバーとの接続が切れています")
+        rid = next(self._ids)
+        reply = self._replies[rid] = queue.Queue(1)
+        self._send(dict(msg, id=rid))
+        try:
+            msg = reply.get(timeout=self.timeout)
+        except queue.Empty:
+            raise SyncError("同期サーバーから応答がありません") from None
+        finally:
+            self._replies.pop(rid, None)
+        if msg is None:
+            raise SyncError("同期サーバーとの接続が切れました")
+        return msg
+
+    def _read_loop(self):
+        try:
+            for line in self._file:
+                msg = json.loads(line)
+                if "reply_to" in msg:
+                    q = self._replies.get(msg["reply_to"])
+                    if q is not None:
+                        q.put(msg)
+                else:
+                    self._deltas.put(msg)
+        except (OSError, ValueError):
+            pass
+        self.closed = True
+        self._deltas.put(None)
+        for q in list(self._replies.values()):
+            q.put(None)
+
+    # --- TaskStore ---
+    def load(self):
+        self._sock.settimeout(None)
+        self._send({"type": "hello"})
+        msg = json.loads(self._file.readline() or "null")
+        if not msg or msg.get("type") != "snapshot":
+            raise SyncError("同期サーバーからデータを受け取れませんでした")
+        self.model = TaskModel(msg["data"])
+        self.version = msg["version"]
+        self.versions = dict(msg["versions"])
+        self._reader = threading.Thread(target=self._read_loop, name="sync-reader", daemon=True)
+        self._reader.start()
+        return self.model
+
+    def append(self, *records):
+        # 保存エンジンとして受け取るのは、このアプリの計測中のセッションだけ
+        others = [r for r in records if r["op"] != "timers"]
+        if others:
+            raise ValueError("同期サーバーを使うときは commit() で変更を送ってください")
+        if records and self.timers_path:
+            os.makedirs(os.path.dirname(self.timers_path) or ".", exist_ok=True)
+            write_json_atomic(self.timers_path, records[-1])
+
+    def load_running_timers(self):
+        try:
+            with open(self.timers_path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (TypeError, OSError, ValueError):
+            return None
+
+    def load_memo(self, ref):
+        msg = self._request({"type": "memo", "ref": ref})
+        if msg.get("error") == "write_failed":
+            # サーバーが保存に失敗し続けている
+            raise StoreWriteError(msg["message"])
+        if msg["type"] != "memo":
+            raise KeyError(ref)
+        return msg["text"]
+
+    def load_time_entries(self):
+        msg = self._request({"type": "time_entries"})
+        if msg.get("error") == "write_failed":
+            raise StoreWriteError(msg["message"])
+        return [TimeEntry(*e) for e in msg["entries"]]
+
+    def close(self):
+        self.closed = True
+        try:
+            self._sock.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass
+        self._sock.close()
+
+    # --- 同期 ---
+    def _apply(self, msg):
+        for rec in msg["records"]:
+            self.model.apply(rec)
+        self.version = msg["version"]
+        for key in msg["bumped"]:
+            self.versions[key] = msg["version"]
+        self._touched.update(msg["tasks"])
+
+    def poll(self):
+        """届いている差分をすべて適用します。
+
+        前回の poll() 以降に変わったキー（タスク ID / CATEGORIES_KEY）の集合を返します。
+        commit() の中で適用した他のアプリの変更も含みます。
+        """
+        while True:
+            try:
+                msg = self._deltas.get_nowait()
+            except queue.Empty:
+                break
+            if msg is None:
+                break
+            self._apply(msg)
+        touched, self._touched = self._touched, set()
+        return touched
+
+    def _apply_until(self, version):
+        while self.version < version:
+            try:
+                msg = self._deltas.get(timeout=self.timeout)
+            except queue.Empty:
+                raise SyncError("同期サーバーから差分が届きません") from None
+            if msg is None:
+                raise SyncError("同期サーバーとの接続が切れました")
+            self._apply(msg)
+
+    def commit(self, records, base=None):
+        """records をまとめて送ります。受け付けられたら True（モデルにも適用済み）を返します。
+
+        他のアプリが先に同じタスクを変更していた場合は False を返し、モデルはその変更を
+        反映した最新の状態になります（衝突したキーは last_conflicts）。前提にする版は
+        いまの版ですが、編集画面を開いたときの版など、base（キー -> 版）で指定することもできます。
+        """
+        records = list(records)
+        base = dict({k: self.versions.get(k, 0) for k in base_keys(records)}, **(base or {}))
+        reply = self._request({"type": "commit", "records": records, "base": base})
+        self._apply_until(reply["version"])
+        if reply["type"] == "error":
+            raise SyncError(reply["error"])
+        self.last_conflicts = reply.get("conflicts", [])
+        return reply["type"] == "ack"
@@ -0,0 +1,124 @@
+"""複数タスクの同時計測と、表示の更新をまとめて行うタイマー。
+
+TimerSet は計測中のセッション（タスク ID ごと）を持ち、経過時間は time.monotonic() で
+測ります（時計の変更に影響されない）。日付ごとの集計に使う開始・終了の時刻は、
+開始時の time.time() に経過時間を足して求めます。
+
+計測中のセッションは {"op": "timers", "sessions": [...]} レコードとして保存エンジンへ
+書き出しておき（チェックポイント）、異常終了しても次の起動時に復元できるようにします。
+このレコードは TaskModel には適用しません。
+
+TickScheduler は計測中のすべての表示を 1 つの after() ループで更新します。次に表示の
+秒が変わる時刻まで眠り、秒が変わった表示だけを描き直します。
+"""
+import time
+
+# 計測中のセッションを保存し直す間隔（秒）。異常終了時はこの時刻までの計測が残る
+CHECKPOINT_INTERVAL = 30
+# ティックの最短間隔（ミリ秒）。秒の変わり目が近いタイマーはまとめて更新する
+MIN_TICK_MS = 50
+
+
+class TimerSession:
+    def __init__(self, task_id, start, mono_start=None):
+        self.task_id = task_id
+        self.start = start  # 開始時刻（time.time()）
+        # 復元したセッションは、開始からの経過時間に合わせて monotonic の起点を戻す
+        self.mono_start = mono_start if mono_start is not None else time.monotonic() - (time.time() - start)
+
+    def elapsed(self, now=None):
+        return (time.monotonic() if now is None else now) - self.mono_start
+
+
+class TimerSet:
+    def __init__(self):
+        self.sessions = {}  # task_id -> TimerSession
+
+    def __contains__(self, task_id):
+        return task_id in self.sessions
+
+    def __len__(self):
+        return len(self.sessions)
+
+    def start(self, task_id):
+        session = TimerSession(task_id, time.time(), time.monotonic())
+        self.sessions[task_id] = session
+        return session
+
+    def stop_record(self, task_id):
+        """計測を止め、経過時間を加える add_time レコードを返します。"""
+        session = self.sessions.pop(task_id)
+        elapsed = session.elapsed()
+        return {"op": "add_time", "id": task_id, "sec": int(elapsed),
+                "start": session.start, "end": session.start + elapsed}
+
+    def discard(self, task_id):
+        self.sessions.pop(task_id, None)
+
+    def restore(self, sessions):
+        """checkpoint_record() で保存したセッションを復元します。"""
+        for s in sessions:
+            self.sessions[s["id"]] = TimerSession(s["id"], s["start"])
+
+    def checkpoint_record(self):
+        """計測中のセッションを保存するレコード（checked は保存した時刻）。"""
+        now = time.time()
+        return {"op": "timers", "checked": now,
+                "sessions": [{"id": s.task_id, "start": s.start} for s in self.sessions.values()]}
+
+
+def interrupted_records(checkpoint):
+    """異常終了したセッションを、最後に保存できた時刻で止める add_time レコードにします。"""
+    end = checkpoint.get("checked", 0)
+    records = []
+    for s in checkpoint.get("sessions", []):
+        stop = max(end, s["start"])
+        records.append({"op": "add_time", "id": s["id"], "sec": int(stop - s["start"]),
+                        "start": s["start"], "end": stop})
+    return records
+
+
+class TickScheduler:
+    """表示中のタイマーを 1 つのループでまとめて更新します。
+
+    add(key, session, render) で登録すると、表示する秒が変わるたびに render(秒) が呼ばれます。
+    root は after() / after_cancel() を持つ Tk のウィジェットです。
+    """
+
+    def __init__(self, root):
+        self.root = root
+        self._items = {}  # key -> [session, render, 表示中の秒]
+        self._job = None
+
+    def add(self, key, session, render):
+        self._items[key] = [session, render, None]
+        self._reschedule(0)
+
+    def remove(self, key):
+        self._items.pop(key, None)
+        if not self._items and self._job is not None:
+            self.root.after_cancel(self._job)
+            self._job = None
+
+    def _reschedule(self, delay_ms):
+        if self._job is not None:
+            self.root.after_cancel(self._job)
+        self._job = self.root.after(delay_ms, self._tick)
+
+    def _tick(self):
+        self._job = None
+        if not self._items:
+            return
+        now = time.monotonic()
+        next_change = None
+        for item in list(self._items.values()):
+            session, render, shown = item
+            elapsed = session.elapsed(now)
+            sec = int(elapsed)
+            if sec != shown:
+                item[2] = sec
+                render(sec)
+            wait = sec + 1 - elapsed
+            if next_change is None or wait < next_change:
+                next_change = wait
+        self._reschedule(max(MIN_TICK_MS, int(next_change * 1000) + 1))
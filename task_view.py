@@ -0,0 +1,506 @@
+"""タスク一覧（左側の Treeview）の表示を管理します。"""
+import tkinter as tk
+
+from task_model import SortedKeyList
+from task_sort import SORT_FIELDS, SortIndex
+
+
+class TaskListView:
+    """一覧に表示するタスクの並び（絞り込み・並べ替え後）を保持し、モデルの変更を行単位の更新として一覧へ伝えます。
+
+    TaskModel の変更通知を受け、表示対象に入る・外れる・並びが変わるといった差分だけを
+    rows（TreeRowSync または VirtualTaskList）の insert_row / update_row / delete_row /
+    move_row に変換します。絞り込みが無いときはモデルの並び（列で並べ替えているときは
+    SortIndex のその列の並び）をそのまま使います。
+    """
+
+    def __init__(self, model, rows=None):
+        self.model = model
+        self.rows = rows
+        self.query = None
+        # 列での並べ替え（None なら手動の並び）。索引はモデルの変更をこのビューより先に受け取る
+        self.sort_index = SortIndex(model)
+        self.sort_column = None
+        self.descending = False
+        self._keys = None     # 絞り込み中の並びのキー。None なら全件
+        self._members = None  # 絞り込み中のタスク ID -> _keys に入れたキー
+        model.add_listener(self.on_change)
+
+    def _key(self, task):
+        # 並びのキー: 手動なら (rank, id)、列で並べ替えているなら (列のキー, rank, id)
+        if self.sort_column is None:
+            return (task.rank, task.id)
+        return self.sort_index.keys[self.sort_column][task.id]
+
+    def _base(self):
+        # 絞り込みが無いときの並び
+        if self.sort_column is None:
+            return self.model.order
+        return self.sort_index.get(self.sort_column)
+
+    def set_filter(self, query, ids):
+        """query に一致するタスク ID の集合 ids で表示対象を置き換えます（None で解除）。"""
+        if ids is None:
+            self.query = None
+            self._keys = None
+            self._members = None
+            return
+        self.query = query
+        tasks = self.model.tasks
+        if len(ids) > len(tasks) // 8:
+            # 件数が多いときは今の並びを順に見るほうが並べ替えより速い
+            keys = [k for k in self._base() if k[-1] in ids]
+        else:
+            keys = [self._key(tasks[tid]) for tid in ids]
+        self._members = {k[-1]: k for k in keys}
+        self._keys = SortedKeyList(keys)
+
+    def set_sort(self, column, descending=False):
+        """列 column で並べ替えます（None で手動の並びに戻す）。
+
+        その列の索引は最初の 1 回だけ作り、昇順・降順の切り替えは並びを読む向きを変えるだけです。
+        """
+        if column is not None:
+            self.sort_index.get(column)
+        changed = column != self.sort_column
+        self.sort_column = column
+        self.descending = bool(descending) and column is not None
+        if changed and self._keys is not None:
+            # 絞り込み中は表示対象のキーだけを新しい列のキーに入れ替える
+            self.set_filter(self.query, set(self._members))
+
+    # --- 一覧から見た並び ---
+    def _seq(self):
+        return self._base() if self._keys is None else self._keys
+
+    def __len__(self):
+        return len(self._seq())
+
+    def __iter__(self):
+        tasks = self.model.tasks
+        seq = self._seq()
+        return (tasks[k[-1]] for k in (reversed(seq) if self.descending else seq))
+
+    def window(self, start, stop):
+        """並びで start 番目から stop 番目の手前までのタスクを返します。"""
+        if self._keys is None and self.sort_column is None:
+            return self.model.window(start, stop)
+        tasks = self.model.tasks
+        seq = self._seq()
+        if self.descending:
+            n = len(seq)
+            keys = list(seq.islice(max(n - stop, 0), max(n - start, 0)))
+            keys.reverse()
+        else:
+            keys = seq.islice(start, stop)
+        return [tasks[k[-1]] for k in keys]
+
+    def at(self, pos):
+        seq = self._seq()
+        if self.descending:
+            pos = len(seq) - 1 - pos
+        return self.model.tasks[seq[pos][-1]]
+
+    def index_of(self, tid):
+        seq = self._seq()
+        pos = seq.index(self._key(self.model.tasks[tid]))
+        return len(seq) - 1 - pos if self.descending else pos
+
+    def __contains__(self, tid):
+        if self._keys is None:
+            return tid in self.model.tasks
+        return tid in self._members
+
+    # --- モデルの変更 → 行の更新 ---
+    def on_change(self, event, task, old):
+        if self.rows is None or task is None:
+            return
+        tid = task["id"]
+        if self._keys is None:
+            if event == "add":
+                self.rows.insert_row(task, self.index_of(tid))
+            elif event == "update":
+                self.rows.update_row(task)
+                if self.sort_column is not None and SORT_FIELDS[self.sort_column] in old:
+                    # 並べ替えている列の値が変わった: 行を新しい位置へ移す
+                    self.rows.move_row(tid, self.index_of(tid))
+            elif event == "remove":
+                self.rows.delete_row(tid)
+            elif event == "move":
+                self.rows.move_row(tid, self.index_of(tid))
+            return
+
+        if event == "remove":
+            key = self._members.pop(tid, None)
+            if key is not None:
+                self._keys.remove(key)
+                self.rows.delete_row(tid)
+        elif event in ("add", "update", "move"):
+            before = self._members.get(tid)
+            # 並び替え（move）では一致するかどうかは変わらない
+            keep = before is not None if event == "move" else self.query.matches(task)
+            if keep:
+                key = self._key(task)
+                if before is None:
+                    self._members[tid] = key
+                    self._keys.add(key)
+                    self.rows.insert_row(task, self.index_of(tid))
+                    return
+                if key != before:
+                    self._keys.remove(before)
+                    self._keys.add(key)
+                    self._members[tid] = key
+                    self.rows.move_row(tid, self.index_of(tid))
+                if event == "update":
+                    self.rows.update_row(task)
+            elif before is not None:
+                del self._members[tid]
+                self._keys.remove(before)
+                self.rows.delete_row(tid)
+
+
+class TreeRowSync:
+    """Treeview の行とタスクを 1 対 1 で対応付け、変更があった行だけを書き換えます。
+
+    行の iid にはタスク ID をそのまま使うので、編集・並び替え・削除のたびに全行を
+    作り直す必要はありません。row_values(task) は 1 行分の表示値のタプルを返す関数です。
+    """
+
+    # 少しずつ作り直すとき（rebuild(first=...)）に 1 回の after() で入れる行数
+    FILL_CHUNK = 500
+
+    def __init__(self, tree, row_values):
+        self.tree = tree
+        self.row_values = row_values
+        self._values = {}  # iid -> 表示中の値
+        self._fill_job = None
+
+    @property
+    def filling(self):
+        """少しずつ作り直している途中か。"""
+        return self._fill_job is not None
+
+    def rebuild(self, tasks, first=None, done=None):
+        """全行を作り直します（起動時など、一覧全体が入れ替わるときだけ使います）。
+
+        first を指定すると最初の first 行だけをすぐに入れ、残りは FILL_CHUNK 行ずつ after() で
+        入れます（tasks は window() を持つ TaskListView）。その間の編集は通常どおり行に反映され、
+        入れ終えたら並びを置き直して done() を呼びます。
+        """
+        if self._fill_job is not None:
+            self.tree.after_cancel(self._fill_job)
+            self._fill_job = None
+        self.tree.delete(*self.tree.get_children())
+        self._values.clear()
+        if first is None:
+            for t in tasks:
+                self.insert_row(t)
+            if done is not None:
+                done()
+            return
+        self._fill(tasks, 0, first, done)
+
+    def _fill(self, view, start, count, done):
+        self._fill_job = None
+        # 途中の編集で挿入済みの行（insert_row で入ったもの）は飛ばす
+        for t in view.window(start, start + count):
+            if t["id"] not in self._values:
+                self.insert_row(t)
+        if start + count < len(view):
+            self._fill_job = self.tree.after(1, self._fill, view, start + count, self.FILL_CHUNK, done)
+            return
+        # 途中の削除で位置がずれて入れ損ねた行を足し、途中の編集で前後した行を並びどおりに置き直す
+        for t in view:
+            if t["id"] not in self._values:
+                self.insert_row(t)
+        self.reorder(view)
+        if done is not None:
+            done()
+
+    def insert_row(self, task, index=tk.END):
+        iid = task["id"]
+        values = self.row_values(task)
+        if index != tk.END and index >= len(self._values):
+            # 位置の指定は兄弟の行を先頭からたどるので、末尾への追加（起動時の読み込みなど）は END で入れる
+            index = tk.END
+        self.tree.insert("", index, iid=iid, values=values)
+        self._values[iid] = values
+        return iid
+
+    def update_row(self, task):
+        """表示値が変わっていればその行だけを書き換えます。"""
+        iid = task["id"]
+        if iid not in self._values:
+            return
+        values = self.row_values(task)
+        if values != self._values[iid]:
+            self.tree.item(iid, values=values)
+            self._values[iid] = values
+
+    def update_rows(self, tasks):
+        for t in tasks:
+            self.update_row(t)
+
+    def delete_row(self, iid):
+        if self._values.pop(iid, None) is not None:
+            self.tree.delete(iid)
+
+    def reorder(self, tasks):
+        """行を作り直さずに tasks の順に並べ替えます（Tk への呼び出しは 1 回）。"""
+        self.tree.set_children("", *(t["id"] for t in tasks))
+
+    def move_row(self, iid, index):
+        """行を作り直さずに index の位置へ移動します。
+
+        index は移動後の並びでの位置（list.pop してから list.insert するときと同じ意味）です。
+        """
+        if iid in self._values:
+            # いったん切り離してから戻すことで、index を「自分を除いた並び」で数える
+            self.tree.detach(iid)
+            self.tree.move(iid, "", index)
+
+
+class VirtualTaskList(tk.Frame):
+    """表示されている範囲の行だけウィジェットを持つ仮想スクロール一覧。
+
+    行数に関係なく、作るのは「見えている行数 + OVERSCAN」行分のラベルだけです。
+    スクロールするとラベルの文字を入れ替えて別のタスクを表示します。
+    表示するタスクは source（len(source), source.window(start, stop), source.at(pos),
+    source.index_of(id) を持つもの）から取り出すので、TaskModel をそのまま渡せます。
+
+    Treeview と差し替えて使えるよう、selection() / selection_set() / identify_row() / see()
+    と <<TreeviewSelect>> 仮想イベント、TreeRowSync と同じ行更新メソッドを備えています。
+    """
+
+    ROW_HEIGHT = 20
+    OVERSCAN = 2
+    SELECT_BG = "#cce5ff"
+    # 行のラベル上で起きたマウスイベントは一覧の座標に直して bind 先へ渡す
+    _ROW_EVENTS = ("<ButtonPress-1>", "<ButtonRelease-1>", "<B1-Motion>")
+
+    def __init__(self, master, columns, row_values, height=20):
+        """columns は (キー, 見出し, 幅, 配置) のリストです。"""
+        super().__init__(master)
+        self.columns = columns
+        self.row_values = row_values
+        self.source = None
+        self.top = 0
+        self._selected = None
+        self._rows = []      # 行ごとのラベルのリスト
+        self._shown = []     # 行ごとの (表示中の値, 選択中か)
+        self._handlers = {}  # イベント -> bind された関数のリスト
+        self._redraw_pending = False
+
+        self.header = tk.Frame(self)
+        self.header.grid(row=0, column=0, sticky="ew")
+        self.body = tk.Frame(self, bg="white", height=height * self.ROW_HEIGHT,
+                             width=sum(c[2] for c in columns), takefocus=1)
+        self.body.grid(row=1, column=0, sticky="nsew")
+        self.scrollbar = tk.Scrollbar(self, orient=tk.VERTICAL, command=self.yview)
+        self.scrollbar.grid(row=0, column=1, rowspan=2, sticky="ns")
+        self.grid_rowconfigure(1, weight=1)
+        self.grid_columnconfigure(0, weight=1)
+
+        self._header_labels = [tk.Label(self.header, text=c[1], relief="raised", bd=1) for c in columns]
+        self.body.bind("<Configure>", self._on_configure)
+        self._bind_wheel(self.body)
+        self.body.bind("<Up>", lambda e: self._move_selection(-1))
+        self.body.bind("<Down>", lambda e: self._move_selection(1))
+
+    # --- レイアウト ---
+    def _column_layout(self, total_width):
+        # 既定の幅で並べ、余った幅は最後の列に回す
+        xs = []
+        x = 0
+        for i, c in enumerate(self.columns):
+            w = c[2] if i < len(self.columns) - 1 else max(c[2], total_width - x)
+            xs.append((x, w))
+            x += w
+        return xs
+
+    def _on_configure(self, event):
+        layout = self._column_layout(event.width)
+        for lbl, (x, w) in zip(self._header_labels, layout):
+            lbl.place(x=x, y=0, width=w, relheight=1)
+        self.header.config(height=self._header_labels[0].winfo_reqheight())
+
+        n = event.height // self.ROW_HEIGHT + self.OVERSCAN
+        while len(self._rows) < n:
+            self._rows.append(self._make_row(len(self._rows)))
+            self._shown.append(None)
+        while len(self._rows) > n:
+            for lbl in self._rows.pop():
+                lbl.destroy()
+            self._shown.pop()
+        for k, row in enumerate(self._rows):
+            for lbl, (x, w) in zip(row, layout):
+                lbl.place(x=x, y=k * self.ROW_HEIGHT, width=w, height=self.ROW_HEIGHT)
+        self.redraw()
+
+    def _make_row(self, k):
+        row = []
+        for c in self.columns:
+            lbl = tk.Label(self.body, anchor=c[3], bg="white", padx=4)
+            lbl.bind("<ButtonPress-1>", lambda e, k=k: self._on_row_event("<ButtonPress-1>", e, k))
+            lbl.bind("<ButtonRelease-1>", lambda e, k=k: self._on_row_event("<ButtonRelease-1>", e, k))
+            lbl.bind("<B1-Motion>", lambda e, k=k: self._on_row_event("<B1-Motion>", e, k))
+            self._bind_wheel(lbl)
+            row.append(lbl)
+        return row
+
+    def _bind_wheel(self, widget):
+        widget.bind("<MouseWheel>", lambda e: self.yview("scroll", -1 * (e.delta // 120) * 3, "units"))
+        widget.bind("<Button-4>", lambda e: self.yview("scroll", -3, "units"))
+        widget.bind("<Button-5>", lambda e: self.yview("scroll", 3, "units"))
+
+    def _visible_rows(self):
+        return max(1, self.body.winfo_height() // self.ROW_HEIGHT)
+
+    # --- 描画 ---
+    def redraw(self):
+        self._redraw_pending = False
+        total = len(self.source) if self.source is not None else 0
+        visible = self._visible_rows()
+        self.top = max(0, min(self.top, total - visible))
+        tasks = self.source.window(self.top, self.top + len(self._rows)) if total else []
+        for k, row in enumerate(self._rows):
+            if k < len(tasks):
+                task = tasks[k]
+                shown = (self.row_values(task), task["id"] == self._selected)
+            else:
+                shown = (("",) * len(self.columns), False)
+            # 前回と同じ内容なら Tk へは何も送らない
+            if shown != self._shown[k]:
+                bg = self.SELECT_BG if shown[1] else "white"
+                for lbl, text in zip(row, shown[0]):
+                    lbl.config(text=text, bg=bg)
+                self._shown[k] = shown
+        if total:
+            self.scrollbar.set(self.top / total, min(1.0, (self.top + visible) / total))
+        else:
+            self.scrollbar.set(0.0, 1.0)
+
+    def _schedule_redraw(self):
+        # 連続した更新は 1 回の再描画にまとめる
+        if not self._redraw_pending:
+            self._redraw_pending = True
+            self.after_idle(self.redraw)
+
+    def yview(self, *args):
+        total = len(self.source) if self.source is not None else 0
+        if not args or not total:
+            return
+        if args[0] == "moveto":
+            self.top = int(float(args[1]) * total)
+        elif args[0] == "scroll":
+            step = self._visible_rows() if args[2] == "pages" else 1
+            self.top += int(args[1]) * step
+        self.redraw()
+
+    # --- Treeview 互換の操作 ---
+    def heading(self, column, text=None, command=None):
+        """列の見出しの文字と、見出しを押したときに呼ぶ関数を設定します。"""
+        i = [c[0] for c in self.columns].index(column)
+        lbl = self._header_labels[i]
+        if text is not None:
+            lbl.config(text=text)
+        if command is not None:
+            lbl.bind("<Button-1>", lambda e: command())
+
+    def bind(self, sequence=None, func=None, add=None):
+        if sequence in self._ROW_EVENTS:
+            handlers = self._handlers.setdefault(sequence, [])
+            if not add:
+                handlers.clear()
+            handlers.append(func)
+            return None
+        return super().bind(sequence, func, add)
+
+    def _on_row_event(self, sequence, event, k):
+        y = k * self.ROW_HEIGHT + event.y
+        if sequence == "<ButtonPress-1>":
+            self.body.focus_set()
+            iid = self.identify_row(y)
+            if iid:
+                self.selection_set(iid)
+        row_event = _RowEvent(self, event.x, y)
+        for func in self._handlers.get(sequence, []):
+            func(row_event)
+
+    def identify_row(self, y):
+        if self.source is None or y < 0:
+            return ""
+        pos = self.top + int(y) // self.ROW_HEIGHT
+        if pos >= len(self.source):
+            return ""
+        return self.source.at(pos)["id"]
+
+    def selection(self):
+        return (self._selected,) if self._selected is not None else ()
+
+    def selection_set(self, iid):
+        if iid == self._selected:
+            return
+        self._selected = iid
+        self.redraw()
+        self.event_generate("<<TreeviewSelect>>")
+
+    def _move_selection(self, delta):
+        if self._selected is None or self.source is None:
+            return
+        pos = self.source.index_of(self._selected) + delta
+        if 0 <= pos < len(self.source):
+            iid = self.source.at(pos)["id"]
+            self.see(iid)
+            self.selection_set(iid)
+
+    def see(self, iid):
+        pos = self.source.index_of(iid)
+        visible = self._visible_rows()
+        if pos < self.top:
+            self.top = pos
+        elif pos >= self.top + visible:
+            self.top = pos - visible + 1
+        self.redraw()
+
+    # --- TreeRowSync と同じ行更新メソッド ---
+    filling = False
+
+    def rebuild(self, source, first=None, done=None):
+        # 見えている行だけを描くので、first（先に入れる行数）に関係なくすぐに終わる
+        self.source = source
+        self._shown = [None] * len(self._rows)
+        self.redraw()
+        if done is not None:
+            done()
+
+    def reorder(self, source):
+        # 見えている範囲を描き直すだけでよい
+        self.rebuild(source)
+
+    def insert_row(self, task, index=tk.END):
+        self._schedule_redraw()
+        return task["id"]
+
+    def update_row(self, task):
+        self._schedule_redraw()
+
+    def update_rows(self, tasks):
+        self._schedule_redraw()
+
+    def delete_row(self, iid):
+        if iid == self._selected:
+            self._selected = None
+        self._schedule_redraw()
+
+    def move_row(self, iid, index):
+        self._schedule_redraw()
+
+
+class _RowEvent:
+    """VirtualTaskList が bind 先へ渡すイベント（y は一覧の本体からの座標）。"""
+
+    def __init__(self, widget, x, y):
+        self.widget = widget
+        self.x = x
+        self.y = y
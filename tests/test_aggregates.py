@@ -0,0 +1,89 @@
+"""差分で保持する集計（CategoryPivot / TimeRollup / CapacityPlanner）が、作り直した集計と一致すること。"""
+import random
+from datetime import date, timedelta
+
+from capacity import CapacityPlanner
+from task_aggregate import CategoryPivot
+from test_stores import open_backend, random_records
+from time_log import TimeRollup
+
+TODAY = date(2025, 3, 3)
+
+
+def nonzero(d):
+    return {k: v for k, v in d.items() if abs(v) > 1e-9}
+
+
+def run(store, model, steps, seed):
+    """変更レコードをモデルに適用し、保存エンジンにも書きます（エントリを読み直して集計を作り直すため）。"""
+    rnd = random.Random(seed)
+    memos = {}
+    for _ in range(steps):
+        rec = random_records(model, rnd, memos)
+        model.apply(rec)
+        store.append(rec)
+
+
+def test_category_pivot_matches_rebuild(tmp_path):
+    store = open_backend(tmp_path, "json")
+    model = store.load()
+    pivot = CategoryPivot(model)
+    for seed in range(5):
+        run(store, model, 200, seed)
+        labels, categories, matrix = pivot.pivot()
+        fresh = CategoryPivot(model)
+        f_labels, f_categories, f_matrix = fresh.pivot()
+        fresh.close()
+        assert categories == f_categories
+        # 合計の同じ名前どうしの順は、名前が現れた順によるので列ごとに比べる
+        assert ({n: tuple(matrix[:, i]) for i, n in enumerate(labels)}
+                == {n: tuple(f_matrix[:, i]) for i, n in enumerate(f_labels)})
+        totals = matrix.sum(axis=0)
+        assert all(totals[i] >= totals[i + 1] - 1e-9 for i in range(len(totals) - 1))
+    store.close()
+
+
+def test_time_rollup_matches_rebuild(tmp_path):
+    store = open_backend(tmp_path, "json")
+    model = store.load()
+    rollup = TimeRollup(model)
+    rollup.build([])
+    first, last = TODAY - timedelta(days=5), TODAY + timedelta(days=15)
+    for seed in range(5):
+        run(store, model, 200, seed)
+        fresh = TimeRollup(model)
+        assert fresh.build(store.load_time_entries()) == []
+        for attr in ("by_task", "by_category", "by_worker"):
+            assert nonzero(getattr(rollup, attr)) == nonzero(getattr(fresh, attr)), attr
+        assert {tid: nonzero(d) for tid, d in rollup.task_days.items() if nonzero(d)} == \
+               {tid: nonzero(d) for tid, d in fresh.task_days.items() if nonzero(d)}
+        for a, b in rollup.periods(first, last, unit="week"):
+            assert rollup.period_total(a, b) == fresh.period_total(a, b)
+            for c in model.categories:
+                assert rollup.period_total(a, b, category=c) == fresh.period_total(a, b, category=c)
+            for w in "xyz":
+                assert rollup.period_total(a, b, worker=w) == fresh.period_total(a, b, worker=w)
+    store.close()
+
+
+def test_capacity_planner_matches_rebuild(tmp_path):
+    store = open_backend(tmp_path, "json")
+    model = store.load()
+    planner = CapacityPlanner(model, today=TODAY)
+    rnd = random.Random(9)
+    for seed in range(5):
+        run(store, model, 200, seed)
+        fresh = CapacityPlanner(model, today=TODAY)
+        assert planner.spans.keys() == fresh.spans.keys()
+        for _ in range(10):
+            a = TODAY + timedelta(days=rnd.randrange(-5, 60))
+            b = a + timedelta(days=rnd.randrange(30))
+            assert abs(planner.load(a, b) - fresh.load(a, b)) < 1e-6
+            for field in ("worker", "category"):
+                got, want = nonzero(planner.load_by(field, a, b)), nonzero(fresh.load_by(field, a, b))
+                assert got.keys() == want.keys()
+                assert all(abs(got[k] - want[k]) < 1e-6 for k in got)
+            for w in "xyz":
+                assert sorted(planner.tasks_in(w, a, b)) == sorted(fresh.tasks_in(w, a, b))
+        assert sorted(planner.late_tasks()) == sorted(fresh.late_tasks())
+    store.close()
@@ -0,0 +1,191 @@
+"""保存エンジン（JournalStore / SqliteStore）の追記と読み直し。"""
+import copy
+import os
+import random
+
+import pytest
+
+from memo_store import set_memo_record
+from sqlite_store import SqliteStore
+from task_model import TaskModel
+from task_store import JournalStore
+
+START = 1741000000.0
+
+
+def open_backend(tmp_path, kind, **kw):
+    if kind == "json":
+        return JournalStore(str(tmp_path / "tasks.json"), **kw)
+    return SqliteStore(str(tmp_path / "tasks.db"))
+
+
+def dump(model):
+    """比べるためのタスクの一覧とカテゴリ。
+
+    空の明細・メモ（[] / ""）はキーが無いのと同じに扱います（SQLite では区別しない）。
+    to_dict() は明細のリストをそのまま返すので、後の変更で書き換わらないよう複製します。
+    """
+    tasks = [{k: v for k, v in t.to_dict().items() if v or k not in ("materials", "memo_ref")} for t in model]
+    return copy.deepcopy(tasks), list(model.categories)
+
+
+def random_records(model, rnd, memos):
+    """model の今の状態に対する変更レコードを 1 件作ります（適用はしない）。"""
+    ids = list(model.tasks)
+    k = rnd.randrange(10) if ids else 0
+    if k == 0:
+        return model.add_task_record({"name": f"t{rnd.randrange(20)}", "worker": rnd.choice("xyz"),
+                                      "category": rnd.choice(model.categories),
+                                      "estimate": str(rnd.randrange(1, 30)), "actual_sec": 0,
+                                      "start_date": f"2025/03/{rnd.randrange(1, 20):02d}",
+                                      "end_date": f"2025/04/{rnd.randrange(1, 30):02d}"})
+    tid = rnd.choice(ids)
+    t = model.tasks[tid]
+    if k == 1:
+        return {"op": "update_task", "id": tid, "fields": {"progress": rnd.randrange(101), "name": "n",
+                                                           "end_date": f"2025/03/{rnd.randrange(1, 32):02d}"}}
+    if k == 2:
+        return {"op": "delete_task", "id": tid}
+    if k == 3:
+        return model.move_task_record(tid, rnd.choice(ids))
+    if k == 4:
+        start = START + rnd.randrange(10 ** 6)
+        return {"op": "add_time", "id": tid, "sec": 60, "start": start, "end": start + 60}
+    if k == 5:
+        lines = t.get("materials") or []
+        return {"op": "set_material", "id": tid, "pos": rnd.randrange(len(lines) + 1),
+                "line": {"name": "m", "qty": 1, "price": 2}}
+    if k == 6 and t.get("materials"):
+        return {"op": "delete_material", "id": tid, "pos": rnd.randrange(len(t["materials"]))}
+    if k == 7:
+        rec = set_memo_record(tid, f"メモ{rnd.randrange(30)}")
+        memos[rec["ref"]] = rec["text"]
+        return rec
+    if k == 8:
+        name = f"c{rnd.randrange(4)}"
+        op = "delete_category" if name in model.categories else "add_category"
+        return {"op": op, "name": name}
+    return {"op": "update_task", "id": tid, "fields": {"category": rnd.choice(model.categories)}}
+
+
+def run_workload(store, model, steps, seed=1):
+    rnd = random.Random(seed)
+    memos = {}
+    entries = 0
+    for _ in range(steps):
+        batch = []
+        for _ in range(rnd.randrange(1, 4)):
+            rec = random_records(model, rnd, memos)
+            model.apply(rec)
+            batch.append(rec)
+            entries += rec["op"] == "add_time"
+        store.append(*batch)
+    return entries
+
+
+@pytest.mark.parametrize("kind", ["json", "db"])
+def test_append_then_reload(tmp_path, kind):
+    store = open_backend(tmp_path, kind)
+    model = store.load()
+    entries = run_workload(store, model, 300)
+    store.close()
+
+    store = open_backend(tmp_path, kind)
+    loaded = store.load()
+    assert dump(loaded) == dump(model)
+    assert len(list(store.load_time_entries())) == entries
+    for t in loaded:
+        if t.get("memo_ref"):
+            assert store.load_memo(t["memo_ref"])
+    store.close()
+
+
+def test_journal_compaction_keeps_data(tmp_path):
+    store = open_backend(tmp_path, "json", compact_threshold=20)
+    model = store.load()
+    run_workload(store, model, 200, seed=2)
+    store.close()
+    # 畳み込みが走って、ジャーナルの残りは閾値より短い
+    assert os.path.exists(store.path)
+    assert store._pending < 20
+
+    store = open_backend(tmp_path, "json", compact_threshold=20)
+    assert dump(store.load()) == dump(model)
+    # 畳み込みの後もさらに追記して読み直せる
+    model = store.load()
+    run_workload(store, model, 50, seed=3)
+    store.close()
+    assert dump(open_backend(tmp_path, "json").load()) == dump(model)
+
+
+@pytest.mark.parametrize("kind", ["json", "db"])
+def test_failed_append_can_be_retried(tmp_path, kind, monkeypatch):
+    store = open_backend(tmp_path, kind)
+    model = store.load()
+    add = model.add_task_record({"name": "a", "actual_sec": 0})
+    model.apply(add)
+    store.append(add)
+    tid = add["task"]["id"]
+
+    # 作業時間のエントリを書いた後、ジャーナル（SQLite では 2 件目のレコード）で 1 回だけ失敗させる
+    failed = []
+    if kind == "json":
+        real = os.fsync
+
+        def flaky(fd):
+            if not failed:
+                failed.append(fd)
+                raise OSError("fsync failed")
+            return real(fd)
+        monkeypatch.setattr(os, "fsync", flaky)
+    else:
+        real = store._apply
+
+        def flaky(rec):
+            if rec["op"] == "update_task" and not failed:
+                failed.append(rec)
+                raise OSError("disk full")
+            return real(rec)
+        monkeypatch.setattr(store, "_apply", flaky)
+
+    records = [{"op": "add_time", "id": tid, "sec": 60, "start": START, "end": START + 60},
+               {"op": "update_task", "id": tid, "fields": {"progress": 40}}]
+    with pytest.raises(OSError):
+        store.append(*records)
+    assert failed
+    # StoreWriter と同じく、同じレコードをそのまま書き直す
+    store.append(*records)
+    for rec in records:
+        model.apply(rec)
+    store.close()
+
+    store = open_backend(tmp_path, kind)
+    loaded = store.load()
+    assert dump(loaded) == dump(model)
+    assert loaded.tasks[tid]["actual_sec"] == 60
+    assert len(list(store.load_time_entries())) == 1
+    store.close()
+
+
+def test_sqlite_reid_is_persisted(tmp_path):
+    store = open_backend(tmp_path, "db")
+    store.conn.execute("INSERT INTO tasks (id, rank, name, progress) VALUES ('', 'a', 'x', 0)")
+    store.conn.execute("INSERT INTO time_entries (task_id, start, end, duration) VALUES ('', ?, ?, 60)",
+                       (START, START + 60))
+    store.conn.commit()
+    tid = next(iter(store.load())).id
+    store.append({"op": "update_task", "id": tid, "fields": {"progress": 50}})
+    store.close()
+
+    store = open_backend(tmp_path, "db")
+    t = next(iter(store.load()))
+    assert (t.id, t["progress"]) == (tid, 50)
+    assert [e.task_id for e in store.load_time_entries()] == [tid]
+    store.close()
+
+
+def test_new_store_is_empty(tmp_path):
+    for kind in ("json", "db"):
+        store = open_backend(tmp_path, kind)
+        assert dump(store.load()) == dump(TaskModel())
+        store.close()
@@ -0,0 +1,272 @@
+"""作業時間の記録（計測 1 回 = 1 エントリ）と集計。
+
+計測を停止するたびに (タスク ID, 開始, 終了, 秒数) のエントリを保存します。
+CSV から取り込んだエントリは time_entry レコードで、actual_sec を変えずにエントリだけを追加します。
+JournalStore では "<データファイル>.timelog" に 1 行 1 エントリのタブ区切りで追記し、
+SqliteStore では time_entries テーブルに入れます。
+
+TimeRollup はエントリとタスクの変更通知から、タスク・カテゴリ・作業者ごとの合計と、
+日ごとの秒数の累積和（Fenwick 木）を差分で保持します。期間の合計は O(log n) で求まるので、
+レポートのたびに全エントリを数え直す必要はありません。
+
+タスクの "actual_sec" は従来どおりファイルに保存される累計で、エントリの合計から導ける
+キャッシュとして扱います（エントリ導入前の時間はエントリを持たない分として残ります）。
+
+アーカイブしたタスク（archive.py）のエントリは保存したまま集計からは外れるので、
+日ごとの集計には set_extra() でアーカイブの索引の分を足します。
+"""
+import os
+from collections import namedtuple
+from datetime import datetime, timedelta
+
+TimeEntry = namedtuple("TimeEntry", "task_id start end sec")
+
+TIMELOG_SUFFIX = ".timelog"
+# TimeRollup が元に戻す操作のために覚えておく、消したタスクの日ごとの秒数の件数
+REMOVED_DAYS_KEPT = 1000
+
+
+def entry_from_record(rec):
+    """開始・終了時刻つきの add_time / time_entry レコードからエントリを作ります（無ければ None）。"""
+    if "start" not in rec:
+        return None
+    return TimeEntry(rec["id"], rec["start"], rec["end"], rec["sec"])
+
+
+# --- JournalStore 用のファイル形式 ---
+def append_entries(path, entries):
+    with open(path, "a", encoding="utf-8") as f:
+        f.write("".join(f"{e.task_id}\t{e.start:.3f}\t{e.end:.3f}\t{e.sec}\n" for e in entries))
+        f.flush()
+        os.fsync(f.fileno())
+
+
+def read_entries(path):
+    """エントリを読み込みます。書き込み途中で終わった末尾の行は無視します。"""
+    if not os.path.exists(path):
+        return
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            parts = line.rstrip("\n").split("\t")
+            if len(parts) != 4:
+                break
+            try:
+                yield TimeEntry(parts[0], float(parts[1]), float(parts[2]), int(parts[3]))
+            except ValueError:
+                break
+
+
+def task_days(entries, tids):
+    """tids のタスクのエントリを、タスクごとの {日の序数: 秒数} にまとめます。"""
+    out = {}
+    for e in entries:
+        if e.task_id in tids:
+            per_day = out.setdefault(e.task_id, {})
+            for day, sec in split_by_day(e.start, e.end):
+                per_day[day] = per_day.get(day, 0) + sec
+    return out
+
+
+def split_by_day(start, end):
+    """[start, end) をローカル時刻の日ごとに分け、(日の序数, 秒数) を返します。"""
+    t = datetime.fromtimestamp(start)
+    stop = datetime.fromtimestamp(end)
+    while t < stop:
+        next_day = datetime.combine(t.date() + timedelta(days=1), datetime.min.time())
+        seg_end = min(next_day, stop)
+        yield t.date().toordinal(), (seg_end - t).total_seconds()
+        t = seg_end
+
+
+class DayTotals:
+    """日ごとの秒数の累積和（Fenwick 木）。日は date.toordinal() の整数で表します。"""
+
+    SIZE = 1 << 20  # 西暦 2870 年頃までの序数が入る
+
+    def __init__(self):
+        self._tree = {}
+
+    def add(self, day, sec):
+        tree = self._tree
+        i = day
+        while i < self.SIZE:
+            tree[i] = tree.get(i, 0) + sec
+            i += i & -i
+
+    def prefix(self, day):
+        """day 以前の合計秒数。"""
+        tree = self._tree
+        total = 0
+        i = min(day, self.SIZE - 1)
+        while i > 0:
+            total += tree.get(i, 0)
+            i -= i & -i
+        return total
+
+    def between(self, first, last):
+        """first 日から last 日まで（両端を含む）の合計秒数。"""
+        return self.prefix(last) - self.prefix(first - 1)
+
+
+class TimeRollup:
+    """作業時間の集計をタスクの変更に合わせて差分で保持します。
+
+    合計（by_task / by_category / by_worker）はタスクの actual_sec をもとにし、
+    日ごとの集計はエントリをもとにします。タスクのカテゴリや作業者が変わった場合は、
+    そのタスクの分だけを移し替えます。
+    """
+
+    def __init__(self, model):
+        self.model = model
+        self.by_task = {}      # id -> 秒
+        self.by_category = {}  # カテゴリ -> 秒
+        self.by_worker = {}    # 作業者 -> 秒
+        self.days = DayTotals()
+        self.category_days = {}  # カテゴリ -> DayTotals
+        self.worker_days = {}    # 作業者 -> DayTotals
+        self.task_days = {}      # id -> {日: 秒}
+        self._removed_days = {}  # 消したタスクの id -> {日: 秒}（同じ ID で戻されたら足し直す）
+        self._extra = {}         # set_extra() で足した分
+        self._built = False
+        model.add_listener(self.on_change)
+
+    def build(self, entries):
+        """保存済みのエントリから集計を作ります。
+
+        actual_sec がエントリの合計より小さいタスク（エントリの保存後にジャーナルへ書く前に
+        終了した場合など）は、actual_sec を補正する update_task レコードを返します。
+        """
+        entry_total = {}
+        for e in entries:
+            if e.task_id not in self.model.tasks:
+                continue
+            entry_total[e.task_id] = entry_total.get(e.task_id, 0) + e.sec
+            self._add_days(e.task_id, e.start, e.end)
+        fixes = []
+        for tid, sec in entry_total.items():
+            if self.model.tasks[tid].get("actual_sec", 0) < sec:
+                fixes.append({"op": "update_task", "id": tid, "fields": {"actual_sec": sec}})
+        for t in self.model.tasks.values():
+            self._add_total(t, t.get("actual_sec", 0))
+        self._built = True
+        return fixes
+
+    @property
+    def built(self):
+        return self._built
+
+    def _add_total(self, task, sec):
+        tid = task["id"]
+        self.by_task[tid] = self.by_task.get(tid, 0) + sec
+        cat = task.get("category", "-")
+        self.by_category[cat] = self.by_category.get(cat, 0) + sec
+        worker = task.get("worker", "-")
+        self.by_worker[worker] = self.by_worker.get(worker, 0) + sec
+
+    def _add_days(self, tid, start, end):
+        self.add_task_days(tid, split_by_day(start, end))
+
+    def add_task_days(self, tid, days):
+        """モデルにあるタスク tid の日ごとの秒数 [(日の序数, 秒数)] を集計に足します。
+
+        アーカイブから戻したタスクの分を、エントリを読み直さずに戻すときにも使います。
+        """
+        task = self.model.tasks[tid]
+        per_day = self.task_days.setdefault(tid, {})
+        cat_days = self.category_days.setdefault(task.get("category", "-"), DayTotals())
+        worker_days = self.worker_days.setdefault(task.get("worker", "-"), DayTotals())
+        for day, sec in days:
+            per_day[day] = per_day.get(day, 0) + sec
+            self.days.add(day, sec)
+            cat_days.add(day, sec)
+            worker_days.add(day, sec)
+
+    def set_extra(self, days):
+        """モデルに無いタスクの日ごとの秒数 {"category" / "worker": {値: {日の序数: 秒数}}} を足します。
+
+        アーカイブ済みのタスク（archive.py の索引の集計）用です。前回渡した分は引いてから足します。
+        """
+        for sign, extra in ((-1, self._extra), (1, days)):
+            for field, index in (("category", self.category_days), ("worker", self.worker_days)):
+                for value, per_day in extra.get(field, {}).items():
+                    totals = index.setdefault(value, DayTotals())
+                    for day, sec in per_day.items():
+                        totals.add(day, sign * sec)
+                        if field == "category":
+                            self.days.add(day, sign * sec)
+        self._extra = days
+
+    def _move_days(self, tid, field, old_value, new_value):
+        index = self.category_days if field == "category" else self.worker_days
+        old_days = index.setdefault(old_value, DayTotals())
+        new_days = index.setdefault(new_value, DayTotals())
+        for day, sec in self.task_days.get(tid, {}).items():
+            old_days.add(day, -sec)
+            new_days.add(day, sec)
+
+    # --- タスクの変更通知 ---
+    def on_change(self, event, task, old):
+        if not self._built or task is None:
+            return
+        tid = task["id"]
+        if event == "add":
+            self._add_total(task, task.get("actual_sec", 0))
+            # 元に戻す操作で作り直されたタスク: エントリは保存エンジンに残っているので、消したときの分を戻す
+            days = self._removed_days.pop(tid, None)
+            if days:
+                self.add_task_days(tid, days.items())
+        elif event == "remove":
+            self._add_total(task, -task.get("actual_sec", 0))
+            self.by_task.pop(tid, None)
+            days = self.task_days.pop(tid, {})
+            for day, sec in days.items():
+                self.days.add(day, -sec)
+                self.category_days[task.get("category", "-")].add(day, -sec)
+                self.worker_days[task.get("worker", "-")].add(day, -sec)
+            if days:
+                self._removed_days[tid] = days
+                if len(self._removed_days) > REMOVED_DAYS_KEPT:
+                    # 古いものから忘れる（元に戻しても日ごとの分は戻らず、再起動で正しくなる）
+                    del self._removed_days[next(iter(self._removed_days))]
+        elif event == "time":
+            self._add_days(tid, old["start"], old["end"])
+        elif event == "update":
+            # 変更前の値（old に無いフィールドは変わっていない。None は元にキーが無かった）
+            before = {"id": tid}
+            for field in ("category", "worker"):
+                before[field] = (old[field] if old[field] is not None else "-") if field in old else task.get(field, "-")
+            moved = [f for f in ("category", "worker") if before[f] != task.get(f, "-")]
+            if "actual_sec" not in old and not moved:
+                return
+            # 変更前の秒数を変更前のカテゴリ・作業者から引き、変更後の秒数を変更後の側に足す
+            self._add_total(before, -(old.get("actual_sec", task.get("actual_sec", 0)) or 0))
+            self._add_total(task, task.get("actual_sec", 0))
+            for field in moved:
+                self._move_days(tid, field, before[field], task.get(field, "-"))
+
+    # --- 期間の集計 ---
+    def period_total(self, first, last, worker=None, category=None):
+        """first 日から last 日まで（date）の合計秒数。worker / category で絞り込めます。"""
+        if worker is not None:
+            totals = self.worker_days.get(worker)
+        elif category is not None:
+            totals = self.category_days.get(category)
+        else:
+            totals = self.days
+        if totals is None:
+            return 0
+        return totals.between(first.toordinal(), last.toordinal())
+
+    def periods(self, first, last, unit="day"):
+        """first から last までを日（"day"）または月曜始まりの週（"week"）で区切った (開始日, 終了日) の一覧。"""
+        if unit == "week":
+            d = first - timedelta(days=first.weekday())
+            step = timedelta(days=7)
+        else:
+            d = first
+            step = timedelta(days=1)
+        out = []
+        while d <= last:
+            out.append((max(d, first), min(d + step - timedelta(days=1), last)))
+            d += step
+        return out
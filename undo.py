@@ -0,0 +1,321 @@
+"""元に戻す／やり直す（Ctrl+Z / Ctrl+Y）の履歴。
+
+データ全体の複製は持たず、変更レコードごとに「逆向きのレコード」を作って履歴に積みます。
+1 回の操作の記録にかかる時間と履歴の大きさは、その操作で変わった分（タスク 1 件、
+カテゴリの削除なら参照していたタスクの件数）に比例し、データの件数にはよりません。
+
+    add_task          → delete_task
+    update_task       → 変わったフィールドの元の値での update_task
+                        （元に無かったフィールドを足したときは、元の内容での delete_task + add_task）
+    delete_task       → 削除したタスクの内容そのままの add_task（ID・rank・材料費を含む）と、
+                        メモがあればその本文での set_memo
+    move_task         → 元の rank への move_task
+    set_material      → 元の行への set_material（追加だった場合は delete_material）
+    delete_material   → 元の明細全体での update_task
+    set_memo          → 元の本文での set_memo
+    add_category      → delete_category
+    delete_category   → add_category と元の一覧での set_categories（'-' に戻したタスクは update_task で戻す）
+    set_categories    → 元の一覧での set_categories
+作業時間の記録（add_time / time_entry）は作業時間のログと対になっているので元に戻せません。
+
+タスクを作り直す逆向きのレコードは、メモを参照ではなく本文で持ちます。どのタスクからも
+参照されなくなったメモのブロブは保存エンジンが消すため、参照だけでは戻せないことがあるためです。
+
+元に戻す前に、その操作の直後の状態のままかを確かめます（同期サーバー経由の他のユーザーの
+変更や CSV の取り込みで変わっていれば、その操作と、それより古い履歴は捨てます）。
+履歴は MAX_STEPS 回・MAX_BYTES（レコードを JSON にした大きさの合計）までで、超えた分は
+古いものから捨てます。path を指定すると終了時に保存し、次回の起動時に読み込みます。
+"""
+import copy
+import json
+import os
+
+from memo_store import set_memo_record
+from task_store import write_json_atomic
+
+HISTORY_SUFFIX = ".undo"
+# 履歴に残す操作の回数と、大きさ（レコードを JSON にしたバイト数）の合計の上限
+MAX_STEPS = 200
+MAX_BYTES = 8 * 1024 * 1024
+HISTORY_VERSION = 1
+
+# 元に戻せない（履歴に残さない）レコード
+NOT_UNDOABLE = {"add_time", "time_entry", "timers"}
+# 操作の名前（メニューに「元に戻す: 〜」と出す。複数のレコードなら最初のもの）
+OP_LABELS = {
+    "add_task": "タスクの追加",
+    "update_task": "タスクの編集",
+    "delete_task": "タスクの削除",
+    "move_task": "並び替え",
+    "set_material": "材料費の編集",
+    "delete_material": "材料費の削除",
+    "set_memo": "メモの保存",
+    "add_category": "カテゴリの追加",
+    "delete_category": "カテゴリの削除",
+    "set_categories": "カテゴリの並び替え",
+}
+
+
+class UndoError(Exception):
+    """履歴の操作をいまの状態に適用できない。"""
+
+
+def inverse_records(model, records, memo_text=None):
+    """records を適用する前の model から、records を打ち消すレコードの一覧を作ります。
+
+    逆向きのレコードはどれも適用前の値に戻すものなので、後のレコードから順に適用すれば
+    同じタスクを何度か変えた場合でも最初の状態に戻ります。元に戻せないレコードが含まれていれば
+    None を返します。memo_text(ref) はメモの本文を返す関数です（set_memo を戻すときに使います）。
+    """
+    inverse = []
+    for rec in records:
+        op = rec["op"]
+        if op in NOT_UNDOABLE:
+            return None
+        inv = _inverse(model, rec, memo_text)
+        if inv is None:
+            return None
+        inverse.append(inv)
+    # 後に適用したものから先に戻す
+    out = []
+    for inv in reversed(inverse):
+        out.extend(inv)
+    return out
+
+
+def _inverse(model, rec, memo_text):
+    op = rec["op"]
+    if op == "add_task":
+        tid = rec["task"].get("id")
+        return [{"op": "delete_task", "id": tid}] if tid else None
+    # SqliteStore の set_categories は並べ替えだけなので、カテゴリの追加・削除は add / delete_category で戻す
+    if op == "add_category" and rec["name"] not in model.categories:
+        return [{"op": "delete_category", "name": rec["name"]}]
+    if op == "set_categories" or op == "add_category":
+        return [{"op": "set_categories", "categories": list(model.categories)}]
+    if op == "delete_category":
+        name = rec["name"]
+        back = [{"op": "add_category", "name": name},
+                {"op": "set_categories", "categories": list(model.categories)}]
+        back.extend({"op": "update_task", "id": t.id, "fields": {"category": name}}
+                    for t in model.tasks.values() if t.category == name)
+        return back
+    t = model.tasks.get(rec.get("id"))
+    if t is None:
+        return None
+    tid = t.id
+    if op == "update_task":
+        if not all(k in t for k in rec["fields"]):
+            # 元に無かったフィールドを消すレコードは無いので、元の内容で作り直す（ID・rank はそのまま）
+            readd = _readd(t, memo_text)
+            return None if readd is None else [{"op": "delete_task", "id": tid}] + readd
+        fields = {k: copy.deepcopy(t[k]) for k in rec["fields"]}
+        return [{"op": "update_task", "id": tid, "fields": fields}]
+    if op == "delete_task":
+        return _readd(t, memo_text)
+    if op == "move_task":
+        return [{"op": "move_task", "id": tid, "rank": t.rank}]
+    if op == "set_material":
+        lines = t.get("materials") or []
+        pos = rec["pos"]
+        if pos < len(lines):
+            return [{"op": "set_material", "id": tid, "pos": pos, "line": copy.deepcopy(lines[pos])}]
+        return [{"op": "delete_material", "id": tid, "pos": pos}]
+    if op == "delete_material":
+        return [{"op": "update_task", "id": tid, "fields": {"materials": copy.deepcopy(t.get("materials") or [])}}]
+    if op == "set_memo":
+        text = _memo(t, memo_text)
+        return None if text is None else [{"op": "set_memo", "id": tid, "ref": t.get("memo_ref", ""), "text": text}]
+    return None
+
+
+def _memo(t, memo_text):
+    # t のメモの本文（メモが無ければ ""）。本文を読めなければ None
+    ref = t.get("memo_ref", "")
+    if not ref:
+        return ""
+    if memo_text is None:
+        return None
+    try:
+        return memo_text(ref)
+    except KeyError:
+        # 元の本文が見つからない
+        return None
+
+
+def _readd(t, memo_text):
+    # t を元の内容で作り直すレコード。メモは本文ごと set_memo で戻す（archive.restore_records と同じ）
+    text = _memo(t, memo_text)
+    if text is None:
+        return None
+    task = copy.deepcopy(t.to_dict())
+    task.pop("memo_ref", None)
+    records = [{"op": "add_task", "task": task}]
+    if text:
+        records.append(set_memo_record(t.id, text))
+    return records
+
+
+def holds(model, records):
+    """model が records を適用した直後の状態のままかを返します。
+
+    同じタスク・フィールドを何度か変えるレコードは最後のものだけを比べるので、後ろから見ていきます。
+    """
+    tasks = model.tasks
+    seen = set()
+    for rec in reversed(records):
+        op = rec["op"]
+        if op in ("add_category", "delete_category", "set_categories"):
+            if "#categories" in seen:
+                continue
+            seen.add("#categories")
+            if op == "add_category":
+                ok = rec["name"] in model.categories
+            elif op == "delete_category":
+                ok = rec["name"] not in model.categories
+            else:
+                ok = list(model.categories) == list(rec["categories"])
+            if not ok:
+                return False
+            continue
+        tid = rec["task"].get("id") if op == "add_task" else rec.get("id")
+        if tid in seen:
+            # 後のレコードで追加・削除したタスク
+            continue
+        t = tasks.get(tid)
+        if op in ("add_task", "delete_task"):
+            seen.add(tid)
+            if (t is None) == (op == "add_task"):
+                return False
+            continue
+        if t is None:
+            return False
+        if op == "update_task":
+            checks = [(k, t.get(k), v) for k, v in rec["fields"].items()]
+        elif op == "move_task":
+            checks = [("rank", t.rank, rec["rank"])]
+        elif op == "set_material":
+            lines = t.get("materials") or []
+            pos = rec["pos"]
+            checks = [(("materials", pos), lines[pos] if pos < len(lines) else None, rec["line"])]
+        elif op == "set_memo":
+            checks = [("memo_ref", t.get("memo_ref", ""), rec["ref"])]
+        else:
+            checks = []
+        for key, now, expected in checks:
+            if (tid, key) not in seen:
+                seen.add((tid, key))
+                if now != expected:
+                    return False
+    return True
+
+
+def _size(records):
+    return len(json.dumps(records, ensure_ascii=False))
+
+
+class UndoHistory:
+    """元に戻す・やり直すの履歴。1 回の操作 = (名前, 変更レコード, 逆向きのレコード, 大きさ)。"""
+
+    def __init__(self, path=None, max_steps=MAX_STEPS, max_bytes=MAX_BYTES):
+        self.path = path
+        self.max_steps = max_steps
+        self.max_bytes = max_bytes
+        self.undo_steps = []
+        self.redo_steps = []
+        self.bytes = 0
+        if path:
+            self._load()
+
+    # --- 記録 ---
+    def prepare(self, model, records, memo_text=None):
+        """records を適用する前に呼び、履歴に積む操作を返します（元に戻せない操作なら None）。"""
+        inverse = inverse_records(model, records, memo_text)
+        if not inverse:
+            return None
+        records = copy.deepcopy(list(records))
+        label = OP_LABELS.get(records[0]["op"], records[0]["op"])
+        return [label, records, inverse, _size(records) + _size(inverse)]
+
+    def push(self, step):
+        """prepare() した操作を、適用できた後に履歴へ積みます。やり直しの履歴は捨てます。"""
+        if step is None:
+            return
+        self.undo_steps.append(step)
+        self.bytes += step[3]
+        for s in self.redo_steps:
+            self.bytes -= s[3]
+        self.redo_steps = []
+        self._trim()
+
+    def _trim(self):
+        while self.undo_steps and (len(self.undo_steps) > self.max_steps or self.bytes > self.max_bytes):
+            self.bytes -= self.undo_steps.pop(0)[3]
+
+    def clear(self):
+        self.undo_steps, self.redo_steps, self.bytes = [], [], 0
+
+    # --- 元に戻す・やり直す ---
+    @property
+    def undo_label(self):
+        """次に元に戻す操作の名前（無ければ None）。"""
+        return self.undo_steps[-1][0] if self.undo_steps else None
+
+    @property
+    def redo_label(self):
+        return self.redo_steps[-1][0] if self.redo_steps else None
+
+    def undo(self, model):
+        """最後の操作を打ち消すレコードを返します（まだ適用はしません。適用できたら done_undo()）。
+
+        その操作の後にデータが変わっていて戻せない場合は、それより古い履歴を捨てて UndoError を出します。
+        """
+        if not self.undo_steps:
+            raise UndoError("元に戻す操作がありません")
+        step = self.undo_steps[-1]
+        if not holds(model, step[1]):
+            self.clear()
+            raise UndoError(f"「{step[0]}」の後にデータが変わっているため、元に戻せません")
+        return step[0], copy.deepcopy(step[2])
+
+    def done_undo(self):
+        self.redo_steps.append(self.undo_steps.pop())
+
+    def redo(self, model):
+        """元に戻した操作をもう一度行うレコードを返します（適用できたら done_redo()）。"""
+        if not self.redo_steps:
+            raise UndoError("やり直す操作がありません")
+        step = self.redo_steps[-1]
+        if not holds(model, step[2]):
+            for s in self.redo_steps:
+                self.bytes -= s[3]
+            self.redo_steps = []
+            raise UndoError(f"「{step[0]}」を元に戻した後にデータが変わっているため、やり直せません")
+        return step[0], copy.deepcopy(step[1])
+
+    def done_redo(self):
+        self.undo_steps.append(self.redo_steps.pop())
+
+    # --- 保存 ---
+    def _load(self):
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return
+        if data.get("version") != HISTORY_VERSION:
+            return
+        self.undo_steps = data.get("undo", [])
+        self.redo_steps = data.get("redo", [])
+        self.bytes = sum(s[3] for s in self.undo_steps + self.redo_steps)
+        self._trim()
+
+    def save(self):
+        """履歴を path に書き出します（path が無ければ何もしません）。"""
+        if not self.path:
+            return
+        if not self.undo_steps and not self.redo_steps:
+            if os.path.exists(self.path):
+                os.remove(self.path)
+            return
+        write_json_atomic(self.path, {"version": HISTORY_VERSION, "undo": self.undo_steps, "redo": self.redo_steps})